@@ -0,0 +1,252 @@
+"""
+V5 流水线分阶段基准测试：在合成语料 (或已有的章节目录) 上分别测量
+合并、V2 分割、V4 分割、融合分割 (规划 + PDF)、重打包、PDF 创建 六个阶段的耗时与内存峰值，
+结果写入 JSON，便于在不同提交之间比较。
+
+内存指标：
+  - peak_traced_mb：tracemalloc 记录的 Python / NumPy 分配峰值 (不含 Pillow 内部缓冲区)；
+  - peak_rss_mb：后台线程每 10ms 采样的进程常驻内存峰值 (仅支持 /proc，其他平台为 null)。
+
+用法示例:
+    python benchmarks/bench_pipeline.py --tier quick -o bench_quick.json
+    python benchmarks/bench_pipeline.py --tier full --repeat 3 -o after.json --compare before.json
+    python benchmarks/bench_pipeline.py --corpus /path/to/chapters -o real.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+import tracemalloc
+import contextlib
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+
+import image_processes_pipeline_v5 as v5
+from comic_core.cut_plan_sidecar import cut_plan_path
+from comic_core.memory_governor import current_rss_bytes
+from synthetic_corpus import generate_corpus, CORPUS_MANIFEST
+
+RESULTS_VERSION = 1
+STAGES = ["merge", "v2", "v4", "hybrid", "repack", "pdf"]
+RSS_SAMPLE_SECONDS = 0.01
+
+# quick：CI 规模，几秒内完成，按原宽度合并；full：接近真实章节的规模，按 V5 的目标宽度合并
+TIERS = {
+    "quick": {
+        "corpus": {"chapters": 1, "images_per_chapter": 4, "width": 320,
+                   "image_height": [600, 1200], "panel_height": [200, 500], "band_height": [60, 160]},
+        "target_width": 320,
+    },
+    "full": {
+        "corpus": {"chapters": 3, "images_per_chapter": 40, "width": 800},
+        "target_width": v5.PDF_TARGET_PAGE_WIDTH_PIXELS,
+    },
+}
+
+
+class _StageMeter:
+    """计时并记录一个阶段的内存峰值。"""
+
+    def __enter__(self):
+        self.peak_rss = current_rss_bytes()
+        self._stop = threading.Event()
+        self._sampler = None
+        if self.peak_rss is not None:
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+        tracemalloc.start()
+        self._start = time.perf_counter()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            self.peak_rss = max(self.peak_rss, current_rss_bytes() or 0)
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._start
+        _, self.peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        return False
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _chapter_dirs(corpus_dir):
+    return sorted(os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir)
+                  if os.path.isdir(os.path.join(corpus_dir, name)) and not name.startswith('.'))
+
+
+def run_chapter(chapter_dir, work_dir, target_width, verbose=False):
+    """
+    在 work_dir 中对一个章节依次运行六个阶段 (合并时缩放到 target_width，None 表示保持原宽度)。
+
+    :return: ({阶段: {"seconds", "peak_traced", "peak_rss"}}, {输出计数})
+    """
+    name = os.path.basename(chapter_dir)
+    long_dir = os.path.join(work_dir, "long")
+    pdf_dir = os.path.join(work_dir, "pdf")
+    measurements = {}
+
+    def measure(stage, fn, *args):
+        sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with sink, _StageMeter() as meter:
+            result = fn(*args)
+        measurements[stage] = {"seconds": meter.seconds, "peak_traced": meter.peak_traced, "peak_rss": meter.peak_rss}
+        return result
+
+    long_image_path = measure("merge", v5.merge_to_long_image, chapter_dir, long_dir,
+                              f"{name}.png", target_width)
+    if not long_image_path:
+        raise RuntimeError(f"章节 '{name}' 合并失败")
+    v2_paths = measure("v2", v5.split_long_image_v2, long_image_path, os.path.join(work_dir, "v2"),
+                       v5.MIN_SOLID_COLOR_BAND_HEIGHT, v5.SPLIT_BAND_COLORS_RGB, v5.COLOR_MATCH_TOLERANCE)
+    v4_paths = measure("v4", v5.split_long_image_v4, long_image_path, os.path.join(work_dir, "v4"),
+                       v5.QUANTIZATION_FACTOR, v5.MAX_UNIQUE_COLORS_IN_BG,
+                       v5.MIN_SOLID_COLOR_BAND_HEIGHT_V4, v5.EDGE_MARGIN_PERCENT)
+    # 切割方案旁路文件会让融合分割跳过行分析，计时前删除
+    if os.path.exists(cut_plan_path(long_image_path)):
+        os.remove(cut_plan_path(long_image_path))
+    pages, hybrid_pdf = measure("hybrid", v5.split_long_image_hybrid_with_pdf_fallback, long_image_path,
+                                os.path.join(work_dir, "hybrid"), pdf_dir, f"{name}_hybrid.pdf", name)
+    split_paths = v2_paths if len(v2_paths) > 1 else v4_paths
+    repacked = measure("repack", v5.repack_split_images, split_paths, os.path.join(work_dir, "repack"), name,
+                       v5.MAX_REPACKED_FILESIZE_MB, v5.MAX_REPACKED_PAGE_HEIGHT_PX)
+    repacked_pdf = measure("pdf", v5.create_pdf_from_images, repacked, pdf_dir, f"{name}_repacked.pdf")
+
+    outputs = {"v2_segments": len(v2_paths), "v4_segments": len(v4_paths), "hybrid_pages": len(pages),
+               "repacked_pages": len(repacked), "hybrid_pdf": bool(hybrid_pdf), "repacked_pdf": bool(repacked_pdf)}
+    return measurements, outputs
+
+
+def _summarize(samples):
+    seconds = [sample["seconds"] for sample in samples]
+    rss = [sample["peak_rss"] for sample in samples if sample["peak_rss"] is not None]
+    return {
+        "seconds": [round(value, 4) for value in seconds],
+        "best": round(min(seconds), 4),
+        "median": round(statistics.median(seconds), 4),
+        "peak_traced_mb": round(max(sample["peak_traced"] for sample in samples) / 2**20, 2),
+        "peak_rss_mb": round(max(rss) / 2**20, 2) if rss else None,
+    }
+
+
+def run_benchmark(corpus_dir, repeat=1, target_width=v5.PDF_TARGET_PAGE_WIDTH_PIXELS, verbose=False):
+    """
+    对语料目录中的每个章节运行 repeat 轮；同一轮内各章节的阶段耗时相加，内存峰值取最大值。
+
+    :return: 结果字典 (见 JSON 输出)。
+    """
+    chapters = _chapter_dirs(corpus_dir)
+    if not chapters:
+        raise ValueError(f"目录 '{corpus_dir}' 中没有章节文件夹")
+    rounds = []
+    outputs = {}
+    for _ in range(repeat):
+        totals = {stage: {"seconds": 0.0, "peak_traced": 0, "peak_rss": None} for stage in STAGES}
+        for chapter_dir in chapters:
+            with tempfile.TemporaryDirectory(prefix="cf_bench_") as work_dir:
+                measurements, outputs[os.path.basename(chapter_dir)] = run_chapter(chapter_dir, work_dir, target_width, verbose)
+            for stage, sample in measurements.items():
+                total = totals[stage]
+                total["seconds"] += sample["seconds"]
+                total["peak_traced"] = max(total["peak_traced"], sample["peak_traced"])
+                if sample["peak_rss"] is not None:
+                    total["peak_rss"] = max(total["peak_rss"] or 0, sample["peak_rss"])
+        rounds.append(totals)
+
+    corpus_info = None
+    manifest_path = os.path.join(corpus_dir, CORPUS_MANIFEST)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            corpus_info = json.load(f)["spec"]
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "corpus": corpus_info,
+        "chapters": len(chapters),
+        "target_width": target_width,
+        "repeat": repeat,
+        "stages": {stage: _summarize([totals[stage] for totals in rounds]) for stage in STAGES},
+        "outputs": outputs,
+    }
+
+
+def print_report(results, baseline=None):
+    print(f"\n{'阶段':<8}{'最佳(秒)':>10}{'中位(秒)':>10}{'traced(MB)':>12}{'RSS(MB)':>10}" + ("   对比基线" if baseline else ""))
+    for stage in STAGES:
+        row = results["stages"][stage]
+        rss = "-" if row["peak_rss_mb"] is None else f"{row['peak_rss_mb']:.1f}"
+        line = f"{stage:<8}{row['best']:>10.3f}{row['median']:>10.3f}{row['peak_traced_mb']:>12.1f}{rss:>10}"
+        old = (baseline or {}).get("stages", {}).get(stage)
+        if old and row["best"] > 0:
+            line += f"   {old['best'] / row['best']:.2f}x"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="V5 流水线分阶段基准测试")
+    parser.add_argument('--tier', choices=sorted(TIERS), default="quick", help='合成语料规模 (默认 quick)')
+    parser.add_argument('--corpus', default=None, help='使用已有的语料目录 (每个子文件夹一个章节)，不再生成合成语料')
+    parser.add_argument('--seed', type=int, default=0, help='合成语料的随机种子')
+    parser.add_argument('--target-width', type=int, default=None,
+                        help='合并时缩放到的宽度 (默认取规模预设；使用 --corpus 时默认 V5 的目标宽度)')
+    parser.add_argument('--repeat', type=int, default=1, help='重复轮数 (报告最佳值与中位数)')
+    parser.add_argument('-o', '--output', default=None, help='结果 JSON 路径')
+    parser.add_argument('--compare', default=None, help='基线结果 JSON，打印各阶段的加速比')
+    parser.add_argument('--verbose', action='store_true', help='显示流水线各阶段的原始输出')
+    args = parser.parse_args(argv)
+
+    temp_corpus = None
+    corpus_dir = args.corpus
+    if corpus_dir is None:
+        temp_corpus = tempfile.mkdtemp(prefix="cf_corpus_")
+        corpus_dir = temp_corpus
+        print(f"生成 {args.tier} 规模的合成语料 (种子 {args.seed})...")
+        generate_corpus(corpus_dir, dict(TIERS[args.tier]["corpus"], seed=args.seed))
+    target_width = args.target_width
+    if target_width is None:
+        target_width = TIERS[args.tier]["target_width"] if temp_corpus else v5.PDF_TARGET_PAGE_WIDTH_PIXELS
+    try:
+        results = run_benchmark(corpus_dir, max(1, args.repeat), target_width, args.verbose)
+    finally:
+        if temp_corpus:
+            shutil.rmtree(temp_corpus, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=1)
+        print(f"\n结果已写入: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
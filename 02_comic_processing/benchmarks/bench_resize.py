@@ -0,0 +1,98 @@
+"""
+宽度归一化基准测试：每张源图片 "解码 + 缩放到目标宽度" 的耗时。
+
+exact 即原来的做法 (完整解码后从原尺寸 LANCZOS)，作为对比基线；
+balanced / fast 使用 JPEG 解码时缩放与整数倍缩小，同时报告与 exact 结果的 PSNR。
+
+用法示例:
+    python benchmarks/bench_resize.py --source-width 2400 --target-width 1500 --images 20
+    python benchmarks/bench_resize.py --corpus /path/to/chapter --target-width 1500 -o resize.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+
+from comic_core.fast_resize import RESIZE_QUALITY_GAPS, open_rgb_at_width
+from synthetic_corpus import generate_corpus
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+def _psnr(reference, candidate):
+    mse = np.mean((reference.astype(np.float32) - candidate.astype(np.float32)) ** 2)
+    return float('inf') if mse == 0 else float(10 * np.log10(255.0 ** 2 / mse))
+
+
+def run_resize_benchmark(image_paths, target_width, repeat=3):
+    """
+    :return: {模式: {"ms_per_image", "speedup", "min_psnr_db"}}；耗时取 repeat 轮中的最佳值。
+    """
+    references = [np.asarray(open_rgb_at_width(path, target_width, quality="exact")) for path in image_paths]
+    results = {}
+    for quality in RESIZE_QUALITY_GAPS:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs = [open_rgb_at_width(path, target_width, quality=quality) for path in image_paths]
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        psnr = min(_psnr(reference, np.asarray(output)) for reference, output in zip(references, outputs))
+        results[quality] = {"ms_per_image": round(best * 1000 / len(image_paths), 2), "min_psnr_db": round(psnr, 2)}
+    baseline = results["exact"]["ms_per_image"]
+    for row in results.values():
+        row["speedup"] = round(baseline / row["ms_per_image"], 2) if row["ms_per_image"] else None
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="宽度归一化 (解码 + 缩放) 基准测试")
+    parser.add_argument('--corpus', default=None, help='使用已有的图片目录，不再生成合成 JPEG')
+    parser.add_argument('--source-width', type=int, default=2400, help='合成源图片宽度')
+    parser.add_argument('--target-width', type=int, default=1500, help='缩放目标宽度')
+    parser.add_argument('--images', type=int, default=12, help='合成源图片数量')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('-o', '--output', default=None, help='结果 JSON 路径')
+    args = parser.parse_args(argv)
+
+    temp_dir = None
+    image_dir = args.corpus
+    if image_dir is None:
+        temp_dir = tempfile.mkdtemp(prefix="cf_resize_")
+        generate_corpus(temp_dir, {"images_per_chapter": args.images, "width": args.source_width,
+                                   "image_height": [2000, 4000], "formats": ["jpeg"]})
+        image_dir = os.path.join(temp_dir, "chapter_01")
+    try:
+        image_paths = sorted(os.path.join(image_dir, name) for name in os.listdir(image_dir)
+                             if name.lower().endswith(IMAGE_EXTENSIONS))
+        if not image_paths:
+            print(f"目录 '{image_dir}' 中没有图片。")
+            return 1
+        results = run_resize_benchmark(image_paths, args.target_width, max(1, args.repeat))
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print(f"\n{len(image_paths)} 张图片 → 宽度 {args.target_width}px")
+    print(f"{'模式':<10}{'毫秒/张':>10}{'加速比':>8}{'最低 PSNR(dB)':>16}")
+    for quality, row in results.items():
+        print(f"{quality:<10}{row['ms_per_image']:>10.1f}{row['speedup']:>8.2f}{row['min_psnr_db']:>16.1f}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"images": len(image_paths), "target_width": args.target_width, "modes": results},
+                      f, ensure_ascii=False, indent=1)
+        print(f"\n结果已写入: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+V4 行分析基准测试：旧版逐行 np.unique vs 颜色码整块归约。
+
+用法示例:
+    python benchmarks/bench_v4_analysis.py --width 1500 --height 300000 --legacy-rows 20000
+
+旧版实现在 30 万行上需要数分钟，--legacy-rows 只对前 N 行计时并按行数线性外推，
+同时校验这 N 行的分类结果与新实现完全一致。
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from comic_core.row_classifier import classify_simple_rows_v4
+
+QUANTIZATION_FACTOR = 32
+MAX_UNIQUE_COLORS_IN_BG = 5
+EDGE_MARGIN_PERCENT = 0.10
+
+
+def legacy_get_dominant_color_numpy(pixels_quantized):
+    """旧版 get_dominant_color_numpy 的原样拷贝。"""
+    if pixels_quantized.size == 0:
+        return None, 0
+    pixels_list = pixels_quantized.reshape(-1, 3)
+    unique_colors, counts = np.unique(pixels_list, axis=0, return_counts=True)
+    num_unique_colors = len(unique_colors)
+    if num_unique_colors == 0:
+        return None, 0
+    dominant_color = tuple(unique_colors[np.argmax(counts)])
+    return dominant_color, num_unique_colors
+
+
+def legacy_classify(rgb_array, quantization_factor, max_unique_colors, edge_margin_percent):
+    """旧版 split_long_image_v4 的两阶段逐行分析。"""
+    img_height, img_width = rgb_array.shape[:2]
+    quantized_array = rgb_array // quantization_factor
+    margin_width = int(img_width * edge_margin_percent)
+    center_start, center_end = margin_width, img_width - margin_width
+    simple = np.zeros(img_height, dtype=bool)
+    for y in range(img_height):
+        dominant_color, color_count = legacy_get_dominant_color_numpy(quantized_array[y, center_start:center_end])
+        if color_count > max_unique_colors or dominant_color is None:
+            continue
+        left_color, left_count = legacy_get_dominant_color_numpy(quantized_array[y, :margin_width])
+        if left_count > max_unique_colors or left_color != dominant_color:
+            continue
+        right_color, right_count = legacy_get_dominant_color_numpy(quantized_array[y, -margin_width:])
+        if right_count > max_unique_colors or right_color != dominant_color:
+            continue
+        simple[y] = True
+    return simple
+
+
+def make_strip(width, height, seed=0):
+    """生成近似条漫的长图：带噪声的分镜块与浅色空白带交替出现。"""
+    rng = np.random.default_rng(seed)
+    strip = np.empty((height, width, 3), dtype=np.uint8)
+    y = 0
+    while y < height:
+        panel_h = min(int(rng.integers(800, 2400)), height - y)
+        base = rng.integers(0, 256, size=3)
+        noise = rng.integers(-60, 61, size=(panel_h, width, 3), dtype=np.int16)
+        strip[y:y + panel_h] = np.clip(base + noise, 0, 255)
+        y += panel_h
+        band_h = min(int(rng.integers(40, 300)), height - y)
+        strip[y:y + band_h] = rng.integers(235, 256)
+        y += band_h
+    return strip
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="V4 行分析基准测试")
+    parser.add_argument('--width', type=int, default=1500)
+    parser.add_argument('--height', type=int, default=300000)
+    parser.add_argument('--legacy-rows', type=int, default=20000,
+                        help='旧版实现计时的行数 (0 表示跳过旧版，-1 表示全量)')
+    args = parser.parse_args(argv)
+
+    print(f"生成 {args.width}x{args.height} 的合成长图...")
+    strip = make_strip(args.width, args.height)
+
+    start = time.perf_counter()
+    simple = classify_simple_rows_v4(strip, QUANTIZATION_FACTOR, MAX_UNIQUE_COLORS_IN_BG, EDGE_MARGIN_PERCENT)
+    new_seconds = time.perf_counter() - start
+    print(f"新实现 (颜色码 + 直方图): {new_seconds:.2f} 秒, {args.height / new_seconds:,.0f} 行/秒")
+
+    if args.legacy_rows == 0:
+        return 0
+    legacy_rows = args.height if args.legacy_rows < 0 else min(args.legacy_rows, args.height)
+    start = time.perf_counter()
+    legacy_simple = legacy_classify(strip[:legacy_rows], QUANTIZATION_FACTOR, MAX_UNIQUE_COLORS_IN_BG, EDGE_MARGIN_PERCENT)
+    legacy_seconds = time.perf_counter() - start
+    legacy_total = legacy_seconds * args.height / legacy_rows
+    label = "实测" if legacy_rows == args.height else f"前 {legacy_rows} 行外推"
+    print(f"旧实现 (逐行 np.unique): {legacy_total:.2f} 秒 ({label})")
+    print(f"加速比: {legacy_total / new_seconds:.1f}x")
+
+    if not np.array_equal(legacy_simple, simple[:legacy_rows]):
+        mismatches = np.flatnonzero(legacy_simple != simple[:legacy_rows])
+        print(f"❌ 分类结果不一致，共 {mismatches.size} 行，例如第 {mismatches[:10].tolist()} 行")
+        return 1
+    print(f"✅ 前 {legacy_rows} 行的分类结果与旧版完全一致")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
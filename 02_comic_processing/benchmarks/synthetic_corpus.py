@@ -0,0 +1,195 @@
+"""
+合成条漫语料生成器：按固定随机种子生成可复现的漫画章节，用于基准测试与回归比较。
+
+每个章节是一个项目文件夹 (可直接交给 image_processes_pipeline_v5.py -p 处理)，内容为一条虚拟长图
+按不同高度切成的若干张图片 (切口可能落在分镜中间，与网站下载的章节一致)。长图由以下块交替组成：
+  - 分镜：宽度、高度随机，四周留出背景色边距，内部为带噪声的色块；
+  - 纯色带：背景色取自 V5 的 SPLIT_BAND_COLORS_RGB；
+  - 渐变带：在两种背景色之间逐行渐变；
+  - 噪声带：背景色叠加轻微噪声 (模拟纸张纹理和有损压缩)。
+图片格式在 JPEG / WebP / PNG 中随机选取。根目录的 corpus.json 记录生成参数、
+每张图片的格式与高度，以及每个章节中各个色带在长图中的行区间 (真值)。
+
+用法示例:
+    python benchmarks/synthetic_corpus.py -o /tmp/corpus --chapters 3 --images 30 --width 800 --seed 1
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+from PIL import Image
+
+CORPUS_MANIFEST = "corpus.json"
+FORMAT_EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp", "png": ".png"}
+SAVE_FORMATS = {"jpeg": "JPEG", "webp": "WEBP", "png": "PNG"}
+
+DEFAULT_SPEC = {
+    "seed": 0,
+    "chapters": 1,
+    "images_per_chapter": 20,
+    "width": 800,
+    "image_height": [1200, 4000],
+    "panel_height": [300, 1600],
+    "band_height": [60, 400],
+    "gradient_ratio": 0.15,
+    "noisy_ratio": 0.15,
+    "formats": ["jpeg", "webp", "png"],
+    "quality": 90,
+}
+
+
+def default_band_colors():
+    """V5 流水线预设的背景色 (导入时才加载 V5 模块)。"""
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from image_processes_pipeline_v5 import SPLIT_BAND_COLORS_RGB
+    return [tuple(color) for color in SPLIT_BAND_COLORS_RGB]
+
+
+def _randint(rng, bounds):
+    return int(rng.integers(bounds[0], bounds[1] + 1))
+
+
+def _panel_rows(rng, width, height, background):
+    """背景色上的一格分镜：随机宽度与左右边距，内部为带噪声的色块。"""
+    rows = np.empty((height, width, 3), dtype=np.uint8)
+    rows[:] = background
+    panel_width = max(1, int(width * rng.uniform(0.6, 1.0)))
+    x0 = int(rng.integers(0, width - panel_width + 1))
+    base = rng.integers(0, 256, size=3)
+    noise = rng.integers(-60, 61, size=(height, panel_width, 3), dtype=np.int16)
+    rows[:, x0:x0 + panel_width] = np.clip(base + noise, 0, 255)
+    return rows
+
+
+def _band_rows(rng, width, height, kind, color, band_colors):
+    """一条色带：solid / gradient / noisy。"""
+    if kind == "gradient":
+        other = np.array(band_colors[int(rng.integers(len(band_colors)))], dtype=np.float32)
+        t = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None]
+        line = np.rint(np.array(color, dtype=np.float32) * (1 - t) + other * t).astype(np.uint8)
+        return np.repeat(line[:, None, :], width, axis=1)
+    rows = np.empty((height, width, 3), dtype=np.uint8)
+    rows[:] = color
+    if kind == "noisy":
+        noise = rng.integers(-8, 9, size=rows.shape, dtype=np.int16)
+        rows = np.clip(rows.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return rows
+
+
+def _strip_blocks(rng, spec, band_colors):
+    """无限产生 (类型, 颜色, 行数组)：分镜与色带交替。"""
+    width = spec["width"]
+    while True:
+        background = band_colors[int(rng.integers(len(band_colors)))]
+        yield "panel", None, _panel_rows(rng, width, _randint(rng, spec["panel_height"]), background)
+        draw = rng.random()
+        if draw < spec["gradient_ratio"]:
+            kind = "gradient"
+        elif draw < spec["gradient_ratio"] + spec["noisy_ratio"]:
+            kind = "noisy"
+        else:
+            kind = "solid"
+        yield kind, background, _band_rows(rng, width, _randint(rng, spec["band_height"]), kind, background, band_colors)
+
+
+def generate_chapter(chapter_dir, rng, spec, band_colors):
+    """
+    生成一个章节文件夹。
+
+    :return: {"name", "total_height", "images": [{"file", "format", "height"}], "bands": [{"start", "end", "kind", "color"}]}
+    """
+    os.makedirs(chapter_dir, exist_ok=True)
+    heights = [_randint(rng, spec["image_height"]) for _ in range(spec["images_per_chapter"])]
+    total_height = sum(heights)
+    blocks = _strip_blocks(rng, spec, band_colors)
+    block, offset, consumed = None, 0, 0
+    images, bands = [], []
+
+    for index, height in enumerate(heights, start=1):
+        image = np.empty((height, spec["width"], 3), dtype=np.uint8)
+        filled = 0
+        while filled < height:
+            if block is None or offset == len(block):
+                kind, color, block = next(blocks)
+                offset = 0
+                if kind != "panel":
+                    bands.append({"start": consumed, "end": min(consumed + len(block), total_height),
+                                  "kind": kind, "color": list(color)})
+            take = min(height - filled, len(block) - offset)
+            image[filled:filled + take] = block[offset:offset + take]
+            filled += take
+            offset += take
+            consumed += take
+
+        image_format = spec["formats"][int(rng.integers(len(spec["formats"])))]
+        filename = f"{index:03d}{FORMAT_EXTENSIONS[image_format]}"
+        save_kwargs = {} if image_format == "png" else {"quality": spec["quality"]}
+        Image.fromarray(image).save(os.path.join(chapter_dir, filename), SAVE_FORMATS[image_format], **save_kwargs)
+        images.append({"file": filename, "format": image_format, "height": height})
+
+    return {"name": os.path.basename(chapter_dir), "total_height": total_height, "images": images, "bands": bands}
+
+
+def generate_corpus(output_dir, spec=None, band_colors=None):
+    """
+    生成整个语料库 (相同参数与种子的输出完全一致)，并写入 corpus.json。
+
+    :param spec: 覆盖 DEFAULT_SPEC 中的部分参数。
+    :return: corpus.json 的内容。
+    """
+    spec = dict(DEFAULT_SPEC, **(spec or {}))
+    unknown = set(spec["formats"]) - set(FORMAT_EXTENSIONS)
+    if unknown:
+        raise ValueError(f"不支持的图片格式: {sorted(unknown)}")
+    band_colors = [tuple(color) for color in (band_colors or default_band_colors())]
+    rng = np.random.default_rng(spec["seed"])
+    os.makedirs(output_dir, exist_ok=True)
+    chapters = [
+        generate_chapter(os.path.join(output_dir, f"chapter_{number:02d}"), rng, spec, band_colors)
+        for number in range(1, spec["chapters"] + 1)
+    ]
+    corpus = {"spec": spec, "chapters": chapters}
+    with open(os.path.join(output_dir, CORPUS_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, ensure_ascii=False, indent=1)
+    return corpus
+
+
+def _int_range(text):
+    low, _, high = text.partition(',')
+    return [int(low), int(high or low)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成条漫语料生成器")
+    parser.add_argument('-o', '--output', required=True, help='语料库输出目录 (每个章节一个子文件夹)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SPEC["seed"])
+    parser.add_argument('--chapters', type=int, default=DEFAULT_SPEC["chapters"])
+    parser.add_argument('--images', type=int, default=DEFAULT_SPEC["images_per_chapter"], help='每个章节的图片数')
+    parser.add_argument('--width', type=int, default=DEFAULT_SPEC["width"])
+    parser.add_argument('--image-height', type=_int_range, default=DEFAULT_SPEC["image_height"], help='图片高度范围，如 1200,4000')
+    parser.add_argument('--panel-height', type=_int_range, default=DEFAULT_SPEC["panel_height"], help='分镜高度范围')
+    parser.add_argument('--band-height', type=_int_range, default=DEFAULT_SPEC["band_height"], help='色带高度范围')
+    parser.add_argument('--gradient-ratio', type=float, default=DEFAULT_SPEC["gradient_ratio"], help='渐变带所占比例')
+    parser.add_argument('--noisy-ratio', type=float, default=DEFAULT_SPEC["noisy_ratio"], help='噪声带所占比例')
+    parser.add_argument('--formats', default=",".join(DEFAULT_SPEC["formats"]), help='图片格式，逗号分隔 (jpeg, webp, png)')
+    parser.add_argument('--quality', type=int, default=DEFAULT_SPEC["quality"], help='JPEG / WebP 质量')
+    args = parser.parse_args(argv)
+
+    spec = {
+        "seed": args.seed, "chapters": args.chapters, "images_per_chapter": args.images, "width": args.width,
+        "image_height": args.image_height, "panel_height": args.panel_height, "band_height": args.band_height,
+        "gradient_ratio": args.gradient_ratio, "noisy_ratio": args.noisy_ratio,
+        "formats": [name.strip() for name in args.formats.split(',') if name.strip()], "quality": args.quality,
+    }
+    corpus = generate_corpus(args.output, spec)
+    total_rows = sum(chapter["total_height"] for chapter in corpus["chapters"])
+    total_images = sum(len(chapter["images"]) for chapter in corpus["chapters"])
+    print(f"已生成 {len(corpus['chapters'])} 个章节、{total_images} 张图片，共 {total_rows} 行 → {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
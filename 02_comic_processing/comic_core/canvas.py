@@ -0,0 +1,86 @@
+"""
+内存中的长图画布
+
+合并、分割、重打包与 PDF 阶段直接交换同一块 NumPy 画布的行切片，
+中间结果不再经过 PNG 编码 / 解码往返：
+  - 合并：把每张源图片解码后写入预先分配好的 (H, W, 3) 画布；
+  - 分割：片段是画布的行区间 (start, end)，取用时是零拷贝视图；
+  - 重打包：只在行区间上做规划，相邻片段合并成一个更长的行区间；
+  - 输出：只有最终的 PDF 需要编码。
+"""
+
+import zlib
+
+import numpy as np
+
+from .streaming_split import CANVAS_BACKGROUND, load_canvas_rows
+from .fast_resize import DEFAULT_RESIZE_QUALITY
+
+# 估算 PNG 大小时最多采样的行数
+SIZE_ESTIMATE_SAMPLE_ROWS = 256
+
+
+def build_canvas_array(images_data, canvas_width, target_width, on_image_done=None,
+                       resize_quality=DEFAULT_RESIZE_QUALITY):
+    """
+    按 merge_to_long_image 的规则把所有源图片写入一块 uint8 画布。
+    与其一致，解码失败的图片不占位置，后面的图片依次上移，空白留在画布末尾 (总高度不变)。
+
+    :param on_image_done: 可选回调 on_image_done(已处理图片数, 总数, 异常或 None)。
+    :return: 形状为 (总高度, canvas_width, 3) 的数组。
+    """
+    total_height = sum(item["height"] for item in images_data)
+    canvas = np.full((total_height, canvas_width, 3), CANVAS_BACKGROUND, dtype=np.uint8)
+    y = 0
+    for i, item_info in enumerate(images_data):
+        error = None
+        try:
+            canvas[y:y + item_info["height"]] = load_canvas_rows(item_info, canvas_width, target_width, resize_quality)
+            y += item_info["height"]
+        except Exception as e:
+            error = e
+        if on_image_done:
+            on_image_done(i + 1, len(images_data), error)
+    return canvas
+
+
+def estimate_png_bytes(rows):
+    """
+    估算一段行编码为 PNG 后的字节数：对均匀采样的行做 zlib 快速压缩后按行数放大。
+    未使用 PNG 的行滤波，因此估算值通常偏大，作为重打包的大小上限是保守的。
+    """
+    height = len(rows)
+    if height == 0:
+        return 0
+    step = max(1, height // SIZE_ESTIMATE_SAMPLE_ROWS)
+    sample = np.ascontiguousarray(rows[::step])
+    return int(len(zlib.compress(sample.tobytes(), 1)) * height / len(sample))
+
+
+def plan_repack(segments, max_size_bytes, max_height_px, size_of):
+    """
+    按"双重限制"把相邻的片段行区间合并为重打包后的页面行区间，
+    规则与 repack_split_images 的按文件分桶完全相同。
+
+    :param segments: [(start, end), ...]，按顺序首尾相接。
+    :param size_of: 回调 size_of(start, end)，返回该片段的 (估算) 字节数。
+    :return: [(start, end), ...]
+    """
+    if len(segments) <= 1:
+        return list(segments)
+    pages = []
+    bucket_start = bucket_end = None
+    bucket_size = bucket_height = 0
+    for start, end in segments:
+        size, height = size_of(start, end), end - start
+        if bucket_start is not None and (bucket_size + size > max_size_bytes or bucket_height + height > max_height_px):
+            pages.append((bucket_start, bucket_end))
+            bucket_start, bucket_size, bucket_height = start, size, height
+        else:
+            if bucket_start is None:
+                bucket_start = start
+            bucket_size += size
+            bucket_height += height
+        bucket_end = end
+    pages.append((bucket_start, bucket_end))
+    return pages
@@ -0,0 +1,95 @@
+"""
+CBZ 写入器
+
+CBZ 就是按文件名顺序阅读的 ZIP 图片包。页面以 ZIP_STORED (不压缩) 写入：
+图片本身已经压缩过，再 deflate 只会浪费时间。页面文件名是补零的序号，
+字典序即自然顺序；close() 时追加 ComicInfo.xml (标题、页数、每页尺寸)。
+
+已编码的图片 (JPEG / WebP / PNG) 直接复制原始字节，不解码也不重新编码；
+其他页面由调用方先编码 (见 document_writer.encode_page) 再以 add_bytes 写入。
+"""
+
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+
+COMIC_INFO_FILENAME = "ComicInfo.xml"
+PASSTHROUGH_EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp", "PNG": ".png"}
+JPEG_MAX_DIMENSION = 65500
+
+
+def is_cbz_passthrough_candidate(info):
+    """
+    根据尺寸索引中的信息判断图片能否原样存入 CBZ。
+    CMYK JPEG 在阅读器中的反相约定不一致，与 PDF 一样仍走重新编码。
+    """
+    if not info or info.get("format") not in PASSTHROUGH_EXTENSIONS:
+        return False
+    return info["format"] != "JPEG" or info.get("mode") in ("RGB", "L")
+
+
+class CbzWriter:
+    """逐页写入的 CBZ 生成器。用法：with CbzWriter(path, title) as writer: writer.add_file(...)"""
+
+    def __init__(self, path, title=None):
+        self.path = path
+        self.title = title or os.path.splitext(os.path.basename(path))[0]
+        self.pages = []  # [(宽, 高, 字节数)]
+        self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    @property
+    def page_count(self):
+        return len(self.pages)
+
+    def _next_name(self, extension):
+        return f"{len(self.pages) + 1:04d}{extension}"
+
+    def add_bytes(self, data, extension, width, height):
+        """写入一页已编码的图片数据，extension 如 '.jpg'。"""
+        self._zip.writestr(self._next_name(extension), data)
+        self.pages.append((width, height, len(data)))
+
+    def add_file(self, path, width, height, image_format):
+        """直接复制一个已编码图片文件的原始字节。"""
+        self._zip.write(path, self._next_name(PASSTHROUGH_EXTENSIONS[image_format]))
+        self.pages.append((width, height, os.path.getsize(path)))
+
+    def _comic_info(self):
+        root = ET.Element("ComicInfo", {
+            "xmlns:xsi": "http://www.w3.org/2001/XMLSchema-instance",
+            "xmlns:xsd": "http://www.w3.org/2001/XMLSchema",
+        })
+        ET.SubElement(root, "Title").text = self.title
+        ET.SubElement(root, "PageCount").text = str(self.page_count)
+        pages = ET.SubElement(root, "Pages")
+        for index, (width, height, size) in enumerate(self.pages):
+            ET.SubElement(pages, "Page", {
+                "Image": str(index), "ImageWidth": str(width), "ImageHeight": str(height), "ImageSize": str(size),
+            })
+        return ET.tostring(root, encoding="utf-8", xml_declaration=True)
+
+    def close(self):
+        """写入 ComicInfo.xml 并关闭文件。"""
+        if self._zip is None:
+            return
+        self._zip.writestr(COMIC_INFO_FILENAME, self._comic_info())
+        self._zip.close()
+        self._zip = None
+
+    def abort(self):
+        """出错时关闭并删除未完成的文件。"""
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
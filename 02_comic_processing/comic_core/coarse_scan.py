@@ -0,0 +1,115 @@
+"""
+粗到细的切割带检测
+
+先用 Image.reduce(f) 生成宽高都缩小 f 倍的代理图，在代理图上找出可能的切割带，
+再只对候选带附近的行做全分辨率分类，其余行直接视为内容行。
+
+V2 (纯色带) 的代理判定是保守的，结果与全分辨率扫描完全一致：
+  - 纯色行内每个像素与行首像素的距离不超过 tol，缩小后 (区块均值，取整误差每通道不超过 0.5)
+    同一代理行内任意两个像素的距离不超过 2*tol + 2，因此完整落在纯色段内的代理行必定通过该判定；
+  - 纯色段内每一行的行首像素都属于背景色，这一条件只需读取第一列，直接在原图上按区块检查；
+  - 高度 >= min_h 的纯色段至少包含 k_min = (min_h - f + 1) // f 个完整区块，
+    所以只需检查长度 >= k_min 的代理候选段，并在其两侧各扩展一个区块后做全分辨率精细化；
+  - 未被精细化的行视为内容行：它们只可能属于高度 < min_h 的纯色段，不影响切割结果。
+该推导要求 k_min >= 1，即 min_h >= 2f - 1，否则退回全分辨率扫描。
+
+V4 (色彩同质性) 的代理判定是启发式的：区块均值可能产生新的量化颜色，
+因此提供 verify 参数与全分辨率结果逐行比对。
+"""
+
+import numpy as np
+from PIL import Image
+
+from .row_classifier import (
+    classify_solid_rows, classify_simple_rows_v4, first_pixel_in_palette, true_runs,
+    _rows_within_tolerance, _squared_tolerance
+)
+
+# 生成代理图时每次处理的原图行数上限 (会向下取整到 f 的倍数)
+REDUCE_CHUNK_ROWS = 8192
+
+
+def reduce_rgb(rgb_array, factor):
+    """用 Image.reduce 按区块均值把 (H, W, 3) 数组缩小 factor 倍，分块处理以限制临时内存。"""
+    height = rgb_array.shape[0]
+    chunk_rows = max(factor, REDUCE_CHUNK_ROWS // factor * factor)
+    parts = []
+    for start in range(0, height, chunk_rows):
+        chunk = np.ascontiguousarray(rgb_array[start:start + chunk_rows, :, :3])
+        parts.append(np.asarray(Image.fromarray(chunk).reduce(factor)))
+    return np.concatenate(parts) if parts else np.zeros((0, 0, 3), dtype=np.uint8)
+
+
+def min_proxy_run_length(min_band_height, factor):
+    """高度 >= min_band_height 的段在代理图中至少对应的完整区块数；返回 0 表示无法保证。"""
+    return max(0, (min_band_height - factor + 1) // factor)
+
+
+def refine_windows(proxy_mask, factor, height, k_min):
+    """把长度 >= k_min 的代理候选段扩展一个区块后映射回原图行区间，并合并重叠的区间。"""
+    windows = []
+    for start, end in zip(*true_runs(proxy_mask)):
+        if end - start < k_min:
+            continue
+        w0, w1 = max(0, (start - 1) * factor), min(height, (end + 1) * factor)
+        if windows and w0 <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], w1))
+        else:
+            windows.append((w0, w1))
+    return windows
+
+
+def _refined_mask(rgb_array, windows, classify):
+    mask = np.zeros(rgb_array.shape[0], dtype=bool)
+    for w0, w1 in windows:
+        mask[w0:w1] = classify(rgb_array[w0:w1])
+    return mask
+
+
+def coarse_solid_mask(rgb_array, band_colors_list, tolerance, min_band_height, factor):
+    """
+    粗到细地计算 V2 纯色行掩码。
+
+    :return: (掩码, 全分辨率分类的行数)；掩码用于 find_solid_band_cuts 时与全分辨率扫描结果一致。
+    """
+    height = rgb_array.shape[0]
+    classify = lambda rows: classify_solid_rows(rows, band_colors_list, tolerance)
+    k_min = min_proxy_run_length(max(1, min_band_height), factor)
+    if factor <= 1 or k_min < 1 or tolerance < 0 or height == 0:
+        return classify(rgb_array), height
+
+    # 区块内所有行的行首像素都属于背景色 (只读第一列)
+    base_ok = first_pixel_in_palette(rgb_array, band_colors_list, tolerance)
+    padded = np.ones(-(-height // factor) * factor, dtype=bool)
+    padded[:height] = base_ok
+    block_ok = padded.reshape(-1, factor).all(axis=1)
+
+    # 只对行首合格的区块生成代理行并检查一致性
+    proxy_mask = np.zeros(len(block_ok), dtype=bool)
+    if block_ok.any():
+        proxy_tol_sq = _squared_tolerance(2 * float(tolerance) + 2)
+        for start, end in zip(*true_runs(block_ok)):
+            proxy = reduce_rgb(rgb_array[start * factor:end * factor], factor)
+            proxy_mask[start:end] = _rows_within_tolerance(proxy, proxy_tol_sq)
+    windows = refine_windows(proxy_mask, factor, height, k_min)
+    return _refined_mask(rgb_array, windows, classify), sum(w1 - w0 for w0, w1 in windows)
+
+
+def coarse_simple_mask_v4(rgb_array, quantization_factor, max_unique_colors, edge_margin_percent, min_band_height, factor):
+    """
+    粗到细地计算 V4 简单行掩码 (启发式，见模块说明)。
+
+    :return: (掩码, 全分辨率分类的行数)
+    """
+    height = rgb_array.shape[0]
+    classify = lambda rows: classify_simple_rows_v4(rows, quantization_factor, max_unique_colors, edge_margin_percent)
+    k_min = min_proxy_run_length(min_band_height, factor)
+    # 代理图过窄时边缘区域宽度为 0，无法做判定，退回全分辨率扫描
+    proxy_margin = int((rgb_array.shape[1] // max(1, factor)) * edge_margin_percent)
+    if factor <= 1 or k_min < 1 or height == 0 or proxy_margin <= 0:
+        return classify(rgb_array), height
+
+    proxy = reduce_rgb(rgb_array, factor)
+    proxy_mask = classify_simple_rows_v4(proxy, quantization_factor, max_unique_colors, edge_margin_percent)
+    windows = refine_windows(proxy_mask, factor, height, k_min)
+    return _refined_mask(rgb_array, windows, classify), sum(w1 - w0 for w0, w1 in windows)
@@ -0,0 +1,121 @@
+"""
+背景色查找表 (颜色类 LUT)
+
+"某个像素是否属于背景色" 的判定只取决于背景色表与容差：与表中任意颜色的欧氏距离不超过容差。
+与其对每个像素逐个比较所有背景色，不如一次性把 2^24 种 RGB 颜色的判定结果
+预先算好，存成 2 MiB 的位图 (每种颜色一位)。之后对任意形状的像素数组只需
+一次整数打包加一次花式索引即可得到结果，与背景色数量无关。
+
+位图按 (背景色集合, 平方容差) 的哈希缓存在磁盘上 (默认 ~/.cache/contentforge，
+可用环境变量 CONTENTFORGE_CACHE_DIR 指定)，多个进程、多次运行共用；进程内另有一层内存缓存。
+缓存目录不可写时只在内存中使用，不影响结果。
+"""
+
+import os
+import json
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+
+LUT_VERSION = 1
+CACHE_DIR_ENV = "CONTENTFORGE_CACHE_DIR"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "contentforge")
+_LUT_BYTES = (1 << 24) // 8
+
+
+def squared_tolerance(tolerance):
+    """返回整数平方容差；容差为负时任何颜色都不匹配，返回 -1。"""
+    if tolerance < 0:
+        return -1
+    return int(np.floor(float(tolerance) * float(tolerance)))
+
+
+def normalize_palette(band_colors_list):
+    """去重并排序后的背景色元组 (重复列出的颜色只算一次)。"""
+    return tuple(sorted(set(tuple(int(v) for v in c[:3]) for c in band_colors_list)))
+
+
+def cache_dir():
+    return os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+
+
+def lut_key(palette, tol_sq):
+    payload = json.dumps({"version": LUT_VERSION, "palette": palette, "tol_sq": tol_sq})
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _sphere_offsets(tol_sq):
+    """平方距离不超过 tol_sq 的所有整数偏移 (dr, dg, db)。"""
+    radius = int(np.floor(np.sqrt(tol_sq)))
+    axis = np.arange(-radius, radius + 1, dtype=np.int32)
+    dr, dg, db = np.meshgrid(axis, axis, axis, indexing="ij")
+    inside = dr * dr + dg * dg + db * db <= tol_sq
+    return np.stack([dr[inside], dg[inside], db[inside]], axis=1)
+
+
+def pack_rgb(rgb):
+    """(..., 3) 的 RGB 数组 -> 同形状的 24 位颜色码 (int32)。"""
+    rgb = np.asarray(rgb)
+    codes = rgb[..., 0].astype(np.int32) << 16
+    codes |= rgb[..., 1].astype(np.int32) << 8
+    codes |= rgb[..., 2].astype(np.int32)
+    return codes
+
+
+def build_lut_bits(palette, tol_sq):
+    """按背景色与平方容差构建位图：第 code 位为 1 表示颜色 code 属于背景色。"""
+    member = np.zeros(1 << 24, dtype=bool)
+    if tol_sq >= 0 and palette:
+        offsets = _sphere_offsets(tol_sq)
+        for color in palette:
+            points = offsets + np.array(color, dtype=np.int32)
+            points = points[((points >= 0) & (points <= 255)).all(axis=1)]
+            member[pack_rgb(points)] = True
+    return np.packbits(member, bitorder="little")
+
+
+def _load_cached(path):
+    try:
+        bits = np.load(path, allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    return bits if bits.dtype == np.uint8 and bits.shape == (_LUT_BYTES,) else None
+
+
+def _save_cached(path, bits):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.save(f, bits, allow_pickle=False)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+
+class BandColorLUT:
+    """背景色判定表。用法：band_color_lut(colors, tolerance).contains(pixels)"""
+
+    def __init__(self, bits):
+        self.bits = bits
+
+    def contains(self, rgb):
+        """(..., 3) 的 RGB 数组 -> 同形状的布尔数组，表示每个像素是否属于背景色。"""
+        codes = pack_rgb(rgb)
+        return ((self.bits[codes >> 3] >> (codes & 7).astype(np.uint8)) & 1).astype(bool)
+
+
+@lru_cache(maxsize=8)
+def _cached_lut(palette, tol_sq):
+    path = os.path.join(cache_dir(), f"band_lut_{lut_key(palette, tol_sq)}.npy")
+    bits = _load_cached(path)
+    if bits is None:
+        bits = build_lut_bits(palette, tol_sq)
+        _save_cached(path, bits)
+    return BandColorLUT(bits)
+
+
+def band_color_lut(band_colors_list, tolerance):
+    """取得 (背景色, 容差) 对应的判定表：先查进程内缓存，再查磁盘缓存，都没有时构建并写入磁盘。"""
+    return _cached_lut(normalize_palette(band_colors_list), squared_tolerance(tolerance))
@@ -0,0 +1,67 @@
+"""
+切割方案旁路文件
+
+分割完成后在长图旁边保存 <长图文件名>.cutplan.json，记录：
+  - method：使用的切割方法 (V2 / V4)；
+  - segments：片段行区间 [[start, end], ...]；
+  - analysis：行分析参数 (目标宽度、背景色、容差、最小带高等)；
+  - strip：长图指纹 (文件大小、修改时间、宽、高)。
+
+重打包上限、PDF 质量等输出参数不影响片段，因此只要长图与分析参数不变，
+修改输出参数后直接读取旁路文件重新规划页面并编码，无需重新合并和行分析。
+"""
+
+import os
+import json
+
+CUT_PLAN_SUFFIX = ".cutplan.json"
+CUT_PLAN_VERSION = 1
+
+
+def cut_plan_path(strip_path):
+    return strip_path + CUT_PLAN_SUFFIX
+
+
+def strip_fingerprint(strip_path, width, height):
+    stat = os.stat(strip_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "width": int(width), "height": int(height)}
+
+
+def save_cut_plan(strip_path, method, segments, width, height, analysis_params):
+    """原子写入旁路文件；写入失败时静默放弃。"""
+    sidecar_path = cut_plan_path(strip_path)
+    temp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+    data = {
+        "version": CUT_PLAN_VERSION,
+        "method": method,
+        "segments": [[int(start), int(end)] for start, end in segments],
+        "analysis": analysis_params,
+        "strip": strip_fingerprint(strip_path, width, height),
+    }
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, sidecar_path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def load_cut_plan(strip_path, width, height, analysis_params):
+    """
+    读取与当前长图、分析参数都匹配的旁路文件。
+
+    :return: {"method", "segments": [(start, end), ...]}；不存在或已失效时返回 None。
+    """
+    try:
+        with open(cut_plan_path(strip_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        fingerprint = strip_fingerprint(strip_path, width, height)
+    except (OSError, ValueError):
+        return None
+    if (not isinstance(data, dict) or data.get("version") != CUT_PLAN_VERSION
+            or data.get("strip") != fingerprint or data.get("analysis") != analysis_params):
+        return None
+    return {"method": data["method"], "segments": [tuple(segment) for segment in data["segments"]]}
@@ -0,0 +1,87 @@
+"""
+单次分析的切割方案规划
+
+V2 / V4 两种切割方法都只是在同一块解码后的画布上求行区间，重打包也只是把相邻行区间合并。
+因此可以先在内存中得到完整的"切割方案" (片段 → 页面)，再解析地检查 PDF 的限制：
+  - 硬限制：每一页的宽和高都不能超过 PDF_MAX_PAGE_PIXELS (Pillow / PDF 阅读器的上限)；
+  - 软限制：每一页的估算大小不超过重打包的大小预算 (单个片段本身超标时无法再拆分)。
+选中一个方案之后才进行编码，V2 不合格时改用 V4 只需多一次行分析，不再需要写盘、生成 PDF 后删除重来。
+两种方案都违反硬限制时，把过高的页面强制按高度上限切开 (画布本身过宽时无法切开，由调用方判定失败)。
+
+方案用字典表示：
+  {"method", "segments", "pages", "page_bytes", "too_tall", "over_budget"}
+"""
+
+from .canvas import plan_repack
+
+PDF_MAX_PAGE_PIXELS = 65500
+
+
+def build_plan(method, segments, width, size_of, max_size_bytes, max_height_px):
+    """
+    对一组片段行区间做重打包规划，并标记违反限制的页面。
+
+    :param size_of: 回调 size_of(start, end)，返回片段的 (估算) 字节数，每个片段只调用一次。
+    """
+    segments = list(segments)
+    segment_bytes = {segment: size_of(*segment) for segment in segments}
+    pages = plan_repack(segments, max_size_bytes, max_height_px, size_of=lambda start, end: segment_bytes[(start, end)])
+    page_bytes = [0] * len(pages)
+    page_index = 0
+    for segment in segments:
+        while segment[0] >= pages[page_index][1]:
+            page_index += 1
+        page_bytes[page_index] += segment_bytes[segment]
+    return _with_checks(method, segments, pages, page_bytes, width, max_size_bytes)
+
+
+def _with_checks(method, segments, pages, page_bytes, width, max_size_bytes):
+    too_tall = [page for page in pages if page[1] - page[0] > PDF_MAX_PAGE_PIXELS or width > PDF_MAX_PAGE_PIXELS]
+    over_budget = [page for page, size in zip(pages, page_bytes) if size > max_size_bytes]
+    return {
+        "method": method,
+        "segments": segments,
+        "pages": pages,
+        "page_bytes": page_bytes,
+        "too_tall": too_tall,
+        "over_budget": over_budget,
+    }
+
+
+def is_feasible(plan):
+    """方案至少有一页且没有违反硬限制。"""
+    return bool(plan["pages"]) and not plan["too_tall"]
+
+
+def is_clean(plan):
+    """方案既满足硬限制也满足大小预算，无需再尝试其他方法。"""
+    return is_feasible(plan) and not plan["over_budget"]
+
+
+def choose_plan(plans):
+    """按给定顺序 (优先级) 选择方案：优先完全合格的，其次超预算页面最少的可行方案；都不可行时返回 None。"""
+    feasible = [plan for plan in plans if is_feasible(plan)]
+    if not feasible:
+        return None
+    return min(feasible, key=lambda plan: len(plan["over_budget"]))
+
+
+def force_slice_plan(plan, width, size_of, max_size_bytes, max_height_px):
+    """
+    把方案中过高的页面等高切开，其余页面保持不变。切片高度取 max_height_px 与 PDF_MAX_PAGE_PIXELS 中较小的一个，
+    切开后的方案一定满足硬限制。宽度超过 PDF_MAX_PAGE_PIXELS 时无法靠切片解决，抛出 ValueError。
+    """
+    if width > PDF_MAX_PAGE_PIXELS:
+        raise ValueError(f"画布宽度 {width}px 超过 PDF 上限 {PDF_MAX_PAGE_PIXELS}px，无法按高度切片")
+    if max_height_px < 1:
+        raise ValueError(f"页面高度上限必须为正数: {max_height_px}")
+    slice_height = min(max_height_px, PDF_MAX_PAGE_PIXELS)
+    pages = []
+    for start, end in plan["pages"]:
+        if end - start <= PDF_MAX_PAGE_PIXELS:
+            pages.append((start, end))
+            continue
+        for slice_start in range(start, end, slice_height):
+            pages.append((slice_start, min(slice_start + slice_height, end)))
+    page_bytes = [size_of(start, end) for start, end in pages]
+    return _with_checks(f"{plan['method']} + 强制切片", plan["segments"], pages, page_bytes, width, max_size_bytes)
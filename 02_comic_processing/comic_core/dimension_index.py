@@ -0,0 +1,131 @@
+"""
+图片尺寸索引
+
+每个图片目录下保存一个 JSON 旁路文件，记录该目录中图片的宽、高、格式与色彩模式，
+以 文件名 + 文件大小 + 修改时间 为键。文件未变化时直接读取索引，不再打开图片；
+缺失或过期的条目在线程池中只读取文件头来补全 (PIL 的 Image.open 不会解码像素)。
+
+合并、重打包、PDF 创建等步骤的尺寸预扫描都通过 get_image_dimensions 完成，
+对网络存储上的大量页面可以省掉绝大部分重复的文件头读取。
+其他按文件计算、只随文件内容变化的数据 (如页面感知哈希) 通过 get_indexed_values
+存在同一个索引条目的其他字段中，文件变化时与尺寸一起失效。
+"""
+
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from PIL import Image
+
+INDEX_FILENAME = ".contentforge_dimensions.json"
+INDEX_VERSION = 1
+# 读取文件头的线程数；网络存储上主要是 I/O 等待，线程数可以高于 CPU 核数
+DEFAULT_HEADER_WORKERS = 8
+
+
+def read_image_header(path):
+    """只读取文件头，返回 {"width", "height", "format", "mode"}；无法识别时返回 None。"""
+    try:
+        with Image.open(path) as img:
+            return {"width": img.width, "height": img.height, "format": img.format, "mode": img.mode}
+    except Exception:
+        return None
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _load_index(directory):
+    try:
+        with open(os.path.join(directory, INDEX_FILENAME), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") == INDEX_VERSION and isinstance(data.get("entries"), dict):
+            return data["entries"]
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _save_index(directory, entries):
+    """原子写入索引；目录只读等情况下静默放弃，不影响主流程。"""
+    index_path = os.path.join(directory, INDEX_FILENAME)
+    temp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": INDEX_VERSION, "entries": entries}, f, ensure_ascii=False)
+        os.replace(temp_path, index_path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def get_image_dimensions(paths, max_workers=DEFAULT_HEADER_WORKERS, persist=True, progress=None):
+    """
+    批量获取图片尺寸信息。
+
+    :param paths: 图片路径列表。
+    :param persist: 是否读写目录下的索引文件；对即用即删的中间文件应传 False。
+    :param progress: 可选回调 progress(已完成数, 总数)。
+    :return: {路径: {"width", "height", "format", "mode"} 或 None (无法读取)}
+    """
+    return get_indexed_values(paths, "info", read_image_header, max_workers, persist, progress)
+
+
+def get_indexed_values(paths, field, compute, max_workers=DEFAULT_HEADER_WORKERS, persist=True, progress=None):
+    """
+    批量获取按文件缓存在索引中的字段值，缺失或过期的在线程池中用 compute(路径) 计算。
+
+    :param field: 索引条目中的字段名 ("info" 为尺寸信息)。
+    :return: {路径: compute 的结果}；文件不存在时为 None。
+    """
+    results = {}
+    misses = []  # [(路径, 目录, 文件名, 键)]
+    indexes = {}
+    for path in paths:
+        directory, filename = os.path.split(os.path.abspath(path))
+        try:
+            key = _file_key(path)
+        except OSError:
+            results[path] = None
+            continue
+        if persist:
+            if directory not in indexes:
+                indexes[directory] = _load_index(directory)
+            entry = indexes[directory].get(filename)
+            if entry and entry.get("size") == key[0] and entry.get("mtime_ns") == key[1] and field in entry:
+                results[path] = entry[field]
+                continue
+        misses.append((path, directory, filename, key))
+
+    total = len(paths)
+    done = total - len(misses)
+    if progress:
+        progress(done, total)
+
+    if misses:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(misses)))) as executor:
+            futures = {executor.submit(compute, miss[0]): miss for miss in misses}
+            for future in as_completed(futures):
+                path, directory, filename, key = futures[future]
+                value = future.result()
+                results[path] = value
+                if persist:
+                    entry = indexes[directory].get(filename)
+                    # 文件未变化时保留条目中的其他字段，否则整条重建
+                    if not entry or entry.get("size") != key[0] or entry.get("mtime_ns") != key[1]:
+                        entry = {"size": key[0], "mtime_ns": key[1]}
+                        indexes[directory][filename] = entry
+                    entry[field] = value
+                done += 1
+                if progress:
+                    progress(done, total)
+
+    if persist:
+        changed_directories = {miss[1] for miss in misses}
+        for directory in changed_directories:
+            _save_index(directory, indexes[directory])
+    return results
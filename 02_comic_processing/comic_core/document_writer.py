@@ -0,0 +1,132 @@
+"""
+PDF / CBZ 输出
+
+按输出格式 ('pdf'、'cbz' 或 'both') 同时驱动 StreamingPdfWriter 与 CbzWriter，每页最多解码、编码一次：
+  - 能直接使用的已编码文件原样写入 (PDF 嵌入 RGB / 灰度 JPEG，CBZ 复制 JPEG / WebP / PNG 字节)；
+  - 其余页面只编码一次 JPEG，两种格式共用同一份数据。
+两种格式的文件名由 PDF 路径推出 (同名，扩展名分别为 .pdf 与 .cbz)。
+页面编码 (encode_page) 与写入 (add_encoded) 可以拆开，在其他线程中预先编码后再按顺序写入。
+"""
+
+import io
+import os
+
+from PIL import Image
+
+from .pdf_writer import StreamingPdfWriter, is_jpeg_passthrough_candidate
+from .cbz_writer import CbzWriter, is_cbz_passthrough_candidate, JPEG_MAX_DIMENSION
+
+OUTPUT_FORMATS = ("pdf", "cbz", "both")
+
+
+def output_paths(pdf_path, output_format):
+    """本次要写出的文件 {格式: 路径}，按 PDF、CBZ 的顺序。"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"未知的输出格式 '{output_format}'，可选: {', '.join(OUTPUT_FORMATS)}")
+    base = os.path.splitext(pdf_path)[0]
+    formats = ("pdf", "cbz") if output_format == "both" else (output_format,)
+    return {name: f"{base}.{name}" for name in formats}
+
+
+def primary_output_path(pdf_path, output_format):
+    """代表本次输出的文件：有 PDF 时为 PDF，否则为 CBZ。"""
+    return next(iter(output_paths(pdf_path, output_format).values()))
+
+
+def encode_page(img, output_format, jpeg_quality):
+    """
+    把一页编码为待写入的数据，与 DocumentWriter.add_image 的编码完全相同：
+    JPEG；只输出 CBZ 且尺寸超过 JPEG 上限时为 PNG。
+
+    :return: (数据, 扩展名, 宽, 高, 模式)，交给同一输出格式的 DocumentWriter.add_encoded 写入。
+    """
+    if img.mode not in ("RGB", "L"):
+        img = img.convert('RGB')
+    buffer = io.BytesIO()
+    if output_format == "cbz" and max(img.size) > JPEG_MAX_DIMENSION:
+        img.save(buffer, format='PNG')
+        extension = ".png"
+    else:
+        img.save(buffer, format='JPEG', quality=jpeg_quality, optimize=True)
+        extension = ".jpg"
+    return buffer.getvalue(), extension, img.width, img.height, img.mode
+
+
+class DocumentWriter:
+    """用法：with DocumentWriter(pdf_path, 'both', dpi, quality) as writer: writer.add_file(path, info)"""
+
+    def __init__(self, pdf_path, output_format="pdf", dpi=300, jpeg_quality=85):
+        self.paths = output_paths(pdf_path, output_format)
+        self.output_format = output_format
+        self.jpeg_quality = jpeg_quality
+        self.pdf = StreamingPdfWriter(self.paths["pdf"], dpi) if "pdf" in self.paths else None
+        try:
+            self.cbz = CbzWriter(self.paths["cbz"]) if "cbz" in self.paths else None
+        except Exception:
+            if self.pdf:
+                self.pdf.abort()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    @property
+    def primary_path(self):
+        return next(iter(self.paths.values()))
+
+    @property
+    def page_count(self):
+        return (self.pdf or self.cbz).page_count
+
+    def add_file(self, path, info, prepare=None):
+        """
+        写入一个已是目标尺寸的图片文件。
+
+        :param info: 尺寸索引中的 {"width", "height", "format", "mode"}。
+        :param prepare: 需要解码时把 PIL 图片转为可写入的 RGB 图片，默认 img.convert('RGB')。
+        """
+        pdf_direct = bool(self.pdf) and is_jpeg_passthrough_candidate(info)
+        cbz_direct = bool(self.cbz) and is_cbz_passthrough_candidate(info)
+        if pdf_direct:
+            self.pdf.add_jpeg_file(path, info["width"], info["height"], info["mode"])
+        if cbz_direct:
+            self.cbz.add_file(path, info["width"], info["height"], info["format"])
+        to_pdf, to_cbz = bool(self.pdf) and not pdf_direct, bool(self.cbz) and not cbz_direct
+        if to_pdf or to_cbz:
+            with Image.open(path) as img:
+                self._add_encoded(prepare(img) if prepare else img.convert('RGB'), to_pdf, to_cbz)
+
+    def add_image(self, img):
+        """写入一张 PIL 图片 (编码一次，两种格式共用)。"""
+        self._add_encoded(img, bool(self.pdf), bool(self.cbz))
+
+    def add_encoded(self, page):
+        """写入一页 encode_page(img, self.output_format, self.jpeg_quality) 的结果。"""
+        self._write_encoded(page, bool(self.pdf), bool(self.cbz))
+
+    def _add_encoded(self, img, to_pdf, to_cbz):
+        self._write_encoded(encode_page(img, "pdf" if to_pdf else "cbz", self.jpeg_quality), to_pdf, to_cbz)
+
+    def _write_encoded(self, page, to_pdf, to_cbz):
+        data, extension, width, height, mode = page
+        if to_pdf:
+            self.pdf.add_jpeg(data, width, height, mode)
+        if to_cbz:
+            self.cbz.add_bytes(data, extension, width, height)
+
+    def close(self):
+        for writer in (self.pdf, self.cbz):
+            if writer:
+                writer.close()
+
+    def abort(self):
+        for writer in (self.pdf, self.cbz):
+            if writer:
+                writer.abort()
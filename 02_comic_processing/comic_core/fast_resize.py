@@ -0,0 +1,65 @@
+"""
+快速缩小 (宽度归一化)
+
+源图片常是 2000~3000px 宽的 JPEG，而合并 / PDF 的目标宽度只有 1500~1600px。
+完整解码后再从原尺寸做 LANCZOS 既慢又占内存，这里分三步：
+  1. JPEG 解码时缩放 (Image.draft)：libjpeg 直接按 1/2、1/4、1/8 解码，像素数最多减少到 1/64；
+  2. 整数倍缩小 (Image.reduce，由 resize 的 reducing_gap 触发)：按块平均，代价极低；
+  3. 最后一次 LANCZOS 重采样到精确尺寸。
+前两步只缩小到目标尺寸的 gap 倍为止，gap 越大越接近直接 LANCZOS 的结果。每种模式给出
+(解码缩放 gap, 整数倍缩小 gap)：
+  - 'fast'：(0.75, 1.0)，允许 JPEG 以略低于目标的尺寸解码再放大一点，
+    常见的 2000~3000px → 1500px 也能按 1/2 解码，速度约为 exact 的两倍；
+  - 'balanced'：(2.0, 2.0) (默认)，只在源图至少是目标的 2 倍宽时生效，与直接 LANCZOS 肉眼无差别；
+  - 'exact'：不做前两步，与原来的逐像素 LANCZOS 完全一致。
+放大 (源图比目标窄) 时三种模式相同。
+"""
+
+from PIL import Image
+
+RESIZE_QUALITY_GAPS = {"fast": (0.75, 1.0), "balanced": (2.0, 2.0), "exact": None}
+DEFAULT_RESIZE_QUALITY = "balanced"
+
+
+def _gaps(quality):
+    if quality not in RESIZE_QUALITY_GAPS:
+        raise ValueError(f"未知的缩放质量 '{quality}'，可选: {', '.join(RESIZE_QUALITY_GAPS)}")
+    return RESIZE_QUALITY_GAPS[quality] or (None, None)
+
+
+def scaled_height(width, height, target_width):
+    """按目标宽度等比缩放后的高度 (与各流水线原有的取整方式一致)。"""
+    return int(height * (target_width / width))
+
+
+def draft_for_size(img, size, quality=DEFAULT_RESIZE_QUALITY):
+    """
+    对尚未解码的 JPEG 启用解码时缩放，解码尺寸不小于 gap × 目标尺寸。
+    必须在 load / convert 之前调用；非 JPEG 或无需缩小时不做任何事。
+    """
+    gap, _ = _gaps(quality)
+    if gap is None or img.format != "JPEG" or img.width <= size[0]:
+        return
+    img.draft(None, (max(1, int(size[0] * gap)), max(1, int(size[1] * gap))))
+
+
+def resize_exact(img, size, quality=DEFAULT_RESIZE_QUALITY):
+    """先按整数倍 reduce，再 LANCZOS 到精确尺寸；尺寸相同时原样返回。"""
+    if img.size == tuple(size):
+        return img
+    _, gap = _gaps(quality)
+    return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=gap)
+
+
+def open_rgb_at_width(path, target_width=None, target_height=None, quality=DEFAULT_RESIZE_QUALITY):
+    """
+    打开图片并转为 RGB；给出 target_width 且与原宽度不同时缩放到 (target_width, target_height)。
+
+    :param target_height: 省略时按原图比例计算。
+    """
+    with Image.open(path) as img:
+        if not target_width or img.width == target_width:
+            return img.convert("RGB")
+        size = (target_width, target_height or scaled_height(img.width, img.height, target_width))
+        draft_for_size(img, size, quality)
+        return resize_exact(img.convert("RGB"), size, quality)
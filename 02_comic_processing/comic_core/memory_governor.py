@@ -0,0 +1,175 @@
+"""
+项目内存调控
+
+经典 / 内存交接模式下整张长图以 RGB 画布常驻内存，超大项目可能直接耗尽物理内存被系统杀掉，
+事先没有任何提示。这里在处理项目之前，按尺寸索引中的源图尺寸估算各阶段的内存 (字节)：
+  - merge    : 长图画布 W×H×3，加上正在解码的最大一张源图 (按 RGBA 计) 及其缩放结果；
+  - load     : 经典模式重新读取长图：解码结果、convert("RGB") 副本与 NumPy 副本各一份；
+  - analysis : 画布 + 行分析按块生成的 int32 量化 / 差值数组；
+  - output   : 画布 + 正在编码的页面 (PIL 副本与编码缓冲)；
+  - stream   : 流式模式的滚动缓冲区、编码队列中的片段 (按最高的单张源图计) 与正在解码的源图；
+  - repack   : 流式模式重打包时的单页画布及其 RGB 副本。
+峰值估算超过预算、且流式模式的估算更小时改用流式模式 (choose_mode)。
+
+实际用量由 StageMemoryRecorder 记录：每个阶段运行时由后台线程采样本进程的常驻内存 (RSS)，
+与估算值一起写入校准日志，便于据此修正这里的估算公式。只统计当前进程，
+--scan-workers 等子进程的内存不计入。
+"""
+
+import os
+import time
+import threading
+import contextlib
+
+from .row_classifier import CHUNK_PIXELS
+
+MODES = ("classic", "in_memory", "streaming")
+RSS_SAMPLE_SECONDS = 0.01
+
+_RGB = 3
+_RGBA = 4
+_INT32 = 4
+
+
+def current_rss_bytes():
+    """当前进程的常驻内存 (字节)；仅支持 /proc，其他平台返回 None。"""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def estimate_stage_bytes(dimensions, mode, target_width=None, page_height_limit=30000, encode_queue_depth=4):
+    """
+    按源图尺寸估算指定模式下各阶段的内存 (字节)。
+
+    :param dimensions: 源图尺寸信息的可迭代对象 ({"width", "height"}，即尺寸索引的条目)，None 会被跳过。
+    :param target_width: 合并时统一缩放到的宽度；None 表示按原宽度合并 (画布宽度取最宽的源图)。
+    :return: {阶段: 字节数}，阶段见模块说明。
+    """
+    total_height, canvas_width, tallest, decode_bytes = 0, 0, 0, 0
+    for info in dimensions:
+        if info is None or not info["width"]:
+            continue
+        width, height = info["width"], info["height"]
+        scaled_width, scaled_height = width, height
+        if target_width and width != target_width:
+            scaled_width, scaled_height = target_width, int(height * (target_width / width))
+        total_height += scaled_height
+        canvas_width = max(canvas_width, scaled_width)
+        tallest = max(tallest, scaled_height)
+        decode_bytes = max(decode_bytes, width * height * _RGBA + scaled_width * scaled_height * _RGB)
+
+    canvas = canvas_width * total_height * _RGB
+    page = canvas_width * min(total_height, page_height_limit) * _RGB
+    row_chunks = CHUNK_PIXELS * _RGB * _INT32 * 2
+    if mode == "streaming":
+        segment = canvas_width * tallest * _RGB
+        return {
+            "stream": segment * (2 + encode_queue_depth) + decode_bytes + row_chunks,
+            "repack": page * 2,
+            "output": page * 2,
+        }
+    stages = {"merge": canvas + decode_bytes}
+    if mode == "classic":
+        stages["load"] = canvas * 3
+    stages["analysis"] = canvas + row_chunks
+    stages["output"] = canvas + page * 2
+    return stages
+
+
+def peak_estimate(stage_bytes):
+    return max(stage_bytes.values(), default=0)
+
+
+def choose_mode(requested_mode, estimates, budget_bytes):
+    """
+    按预算选择处理模式：请求的模式放得进预算时照用，否则改用流式模式；
+    流式模式的估算并不更小时 (项目很短、单张源图很高) 保留请求的模式，只给出警告。
+
+    :param estimates: {模式: estimate_stage_bytes 的结果}，至少包含 requested_mode 与 "streaming"。
+    :param budget_bytes: 单个项目可用的内存；None 表示不限制。
+    :return: (模式, 说明)；未改变模式且在预算之内时说明为 None。
+    """
+    if budget_bytes is None:
+        return requested_mode, None
+    requested_peak = peak_estimate(estimates[requested_mode])
+    streaming_peak = peak_estimate(estimates["streaming"])
+    if requested_peak <= budget_bytes:
+        return requested_mode, None
+    if requested_mode != "streaming" and streaming_peak < requested_peak:
+        note = (f"预估峰值 {requested_peak / 2**20:.0f}MB 超出预算 {budget_bytes / 2**20:.0f}MB，"
+                f"改用流式模式 (预估 {streaming_peak / 2**20:.0f}MB)")
+        if streaming_peak > budget_bytes:
+            note += "，仍超出预算，可能内存不足"
+        return "streaming", note
+    return requested_mode, (f"预估峰值 {requested_peak / 2**20:.0f}MB 超出预算 {budget_bytes / 2**20:.0f}MB"
+                            f"，流式模式也无法降低 (预估 {streaming_peak / 2**20:.0f}MB)，可能内存不足")
+
+
+class StageMemoryRecorder:
+    """
+    记录各阶段的耗时与 RSS 峰值。用法：
+
+        recorder = StageMemoryRecorder()
+        with recorder.stage("merge"):
+            ...
+        recorder.stages  # {"merge": {"seconds", "start_rss", "peak_rss"}}
+
+    同名阶段多次运行 (如流式模式 V2 失败后以 V4 重跑) 时累加耗时、取最大峰值。
+    """
+
+    def __init__(self, sample_seconds=RSS_SAMPLE_SECONDS):
+        self.sample_seconds = sample_seconds
+        self.baseline_rss = current_rss_bytes()
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start_rss = current_rss_bytes()
+        peak = [start_rss]
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(self.sample_seconds):
+                peak[0] = max(peak[0], current_rss_bytes() or 0)
+
+        sampler = None
+        if start_rss is not None:
+            sampler = threading.Thread(target=sample, daemon=True)
+            sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stop.set()
+            if sampler:
+                sampler.join()
+                peak[0] = max(peak[0], current_rss_bytes() or 0)
+            self._merge(name, time.perf_counter() - start, start_rss, peak[0])
+
+    def _merge(self, name, seconds, start_rss, peak_rss):
+        record = self.stages.get(name)
+        if record is None:
+            self.stages[name] = {"seconds": seconds, "start_rss": start_rss, "peak_rss": peak_rss}
+            return
+        record["seconds"] += seconds
+        if peak_rss is not None:
+            record["peak_rss"] = max(record["peak_rss"] or 0, peak_rss)
+
+    def calibration_record(self, estimates):
+        """
+        生成一条校准记录：每个阶段的估算值与实测的 RSS 增量 (峰值减去项目开始时的 RSS)。
+        """
+        stages = {}
+        for name in list(estimates) + [name for name in self.stages if name not in estimates]:
+            measured = self.stages.get(name)
+            peak = measured["peak_rss"] if measured else None
+            stages[name] = {
+                "estimate": estimates.get(name),
+                "peak_rss": peak,
+                "measured": peak - self.baseline_rss if peak is not None and self.baseline_rss is not None else None,
+                "seconds": round(measured["seconds"], 3) if measured else None,
+            }
+        return {"baseline_rss": self.baseline_rss, "stages": stages}
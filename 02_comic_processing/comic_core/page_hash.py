@@ -0,0 +1,125 @@
+"""
+重复页面识别 (感知哈希)
+
+下载的章节里常有每章都一样的片头、公告、广告页。这里为每张源图计算两种 64 位感知哈希：
+  - dHash：缩成 9x8 灰度图，逐行比较相邻像素的明暗 (对亮度、压缩差异不敏感)；
+  - pHash：缩成 32x32 灰度图做二维 DCT，取左上 8x8 低频系数与中位数比较 (对缩放、轻微裁剪不敏感)。
+两种哈希的汉明距离都不超过阈值、且宽高比相近时才视为重复——两者同时误判的概率很低。
+
+纯色或几乎纯色的图片 (条漫中的留白、分隔图) 哈希几乎都相同，但它们是排版的一部分，
+灰度标准差低于下限的图片不参与去重。
+
+哈希只依赖文件内容，缓存在各目录的尺寸索引 (dimension_index) 中。
+"""
+
+import numpy as np
+from PIL import Image
+
+from .dimension_index import get_indexed_values, DEFAULT_HEADER_WORKERS
+
+HASH_FIELD = "page_hash"
+DEFAULT_MAX_DISTANCE = 8
+DEFAULT_MIN_STDDEV = 8.0
+DEFAULT_ASPECT_TOLERANCE = 0.02
+
+_DCT_SIZE = 32
+_HASH_SIZE = 8
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+
+
+def _bits_to_hex(bits):
+    return np.packbits(bits.astype(np.uint8).ravel()).tobytes().hex()
+
+
+def dhash_bits(gray):
+    """gray 为 PIL 灰度图；返回 64 个布尔位 (每行左像素是否比右像素亮)。"""
+    small = np.asarray(gray.resize((_HASH_SIZE + 1, _HASH_SIZE), Image.Resampling.BOX), dtype=np.int16)
+    return small[:, :-1] > small[:, 1:]
+
+
+def phash_bits(gray32):
+    """gray32 为 32x32 的灰度数组；返回 64 个布尔位 (低频 DCT 系数是否高于中位数，中位数不含直流分量)。"""
+    coefficients = (_DCT @ gray32 @ _DCT.T)[:_HASH_SIZE, :_HASH_SIZE].ravel()
+    return coefficients > np.median(coefficients[1:])
+
+
+def compute_page_hash(path):
+    """
+    计算一张图片的感知哈希。
+
+    :return: {"dhash": 16 位十六进制, "phash": 16 位十六进制, "std": 灰度标准差}；无法读取时返回 None。
+    """
+    try:
+        with Image.open(path) as img:
+            img.draft('L', (_DCT_SIZE * 2, _DCT_SIZE * 2))  # JPEG 直接以 1/2~1/8 解码
+            gray = img.convert('L')
+    except Exception:
+        return None
+    gray32 = np.asarray(gray.resize((_DCT_SIZE, _DCT_SIZE), Image.Resampling.BOX), dtype=np.float64)
+    return {
+        "dhash": _bits_to_hex(dhash_bits(gray)),
+        "phash": _bits_to_hex(phash_bits(gray32)),
+        "std": round(float(gray32.std()), 2),
+    }
+
+
+def get_page_hashes(paths, max_workers=DEFAULT_HEADER_WORKERS, progress=None):
+    """批量获取感知哈希，优先读取目录索引中的缓存。"""
+    return get_indexed_values(paths, HASH_FIELD, compute_page_hash, max_workers, progress=progress)
+
+
+def _popcount(values):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def find_duplicate_pages(paths, hashes, dimensions, max_distance=DEFAULT_MAX_DISTANCE,
+                         min_stddev=DEFAULT_MIN_STDDEV, aspect_tolerance=DEFAULT_ASPECT_TOLERANCE):
+    """
+    按给定顺序找出与前面某张图片重复的图片 (第一次出现的保留)。
+
+    :param hashes: {路径: compute_page_hash 的结果}。
+    :param dimensions: {路径: {"width", "height", ...}}。
+    :return: [{"path", "duplicate_of", "dhash_distance", "phash_distance"}]，按 paths 顺序。
+    """
+    kept_paths = []
+    kept_dhash = np.empty(len(paths), dtype=np.uint64)
+    kept_phash = np.empty(len(paths), dtype=np.uint64)
+    kept_aspect = np.empty(len(paths), dtype=np.float64)
+    duplicates = []
+    for path in paths:
+        page_hash, info = hashes.get(path), dimensions.get(path)
+        if not page_hash or not info or not info["width"] or page_hash["std"] < min_stddev:
+            continue
+        dhash = np.uint64(int(page_hash["dhash"], 16))
+        phash = np.uint64(int(page_hash["phash"], 16))
+        aspect = info["height"] / info["width"]
+
+        count = len(kept_paths)
+        if count:
+            dhash_distance = _popcount(kept_dhash[:count] ^ dhash)
+            phash_distance = _popcount(kept_phash[:count] ^ phash)
+            similar_aspect = np.abs(kept_aspect[:count] - aspect) <= aspect_tolerance * aspect
+            matches = np.flatnonzero((dhash_distance <= max_distance) & (phash_distance <= max_distance) & similar_aspect)
+            if matches.size:
+                best = matches[np.argmin(dhash_distance[matches] + phash_distance[matches])]
+                duplicates.append({
+                    "path": path,
+                    "duplicate_of": kept_paths[best],
+                    "dhash_distance": int(dhash_distance[best]),
+                    "phash_distance": int(phash_distance[best]),
+                })
+                continue
+
+        kept_dhash[count], kept_phash[count], kept_aspect[count] = dhash, phash, aspect
+        kept_paths.append(path)
+    return duplicates
@@ -0,0 +1,83 @@
+"""
+单张长图的多核行分析
+
+长图像素数组复制到 multiprocessing.shared_memory 中，按行划分为若干相互重叠的分区，
+每个工作进程直接映射共享内存 (不经过 pickle 传输像素)，对自己的分区做行分类
+(可叠加粗到细扫描)，只返回 True 行的游程编码 (run-length)，父进程把游程合并回整图掩码。
+
+分区边界的处理：
+  - 逐行分类本身与相邻行无关，分区内的结果在分区边界处天然正确；
+  - 粗到细扫描只精细化分区内高度 >= min_h 的候选段，跨越分区边界的纯色段可能被截短而漏检。
+    每个分区向后多读 overlap >= min_h 行：跨越边界的段若在后一分区内不足 min_h 行，
+    则它在前一分区的重叠部分内完整可见；精细化得到的 True 行都是精确的，因此对重叠行取逻辑或即可。
+
+合并结果与整图单进程扫描一致的前提是各分区的扫描本身精确：V2 粗扫描与缩小倍数 <= 1 的逐行分析满足这一点；
+V4 的代理图判定是启发式的，开启后各分区与单进程粗扫描一样可能漏判色带。
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .coarse_scan import coarse_solid_mask, coarse_simple_mask_v4
+from .row_classifier import true_runs, runs_to_mask
+
+# 每个工作进程至少分到的行数，长图过短时多进程的启动开销得不偿失
+MIN_ROWS_PER_WORKER = 4096
+
+
+def default_scan_workers():
+    return max(1, os.cpu_count() or 1)
+
+
+def partition_rows(height, workers, overlap):
+    """把 [0, height) 划分为 workers 个分区，除最后一个外每个分区向后多包含 overlap 行。"""
+    workers = max(1, min(workers, height // MIN_ROWS_PER_WORKER or 1))
+    bounds = np.linspace(0, height, workers + 1).astype(int)
+    return [(int(bounds[i]), int(min(height, bounds[i + 1] + overlap))) for i in range(workers)]
+
+
+def _classify_partition(task):
+    """工作进程入口：映射共享内存中的分区并返回 (True 行游程, 精细化行数)。"""
+    shm_name, shape, start, end, method, params = task
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        rows = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)[start:end]
+        if method == "v2":
+            mask, refined_rows = coarse_solid_mask(rows, *params)
+        else:
+            mask, refined_rows = coarse_simple_mask_v4(rows, *params)
+        starts, ends = true_runs(mask)
+        del rows
+        return (starts + start).tolist(), (ends + start).tolist(), refined_rows
+    finally:
+        shm.close()
+
+
+def parallel_row_mask(rgb_array, method, params, min_band_height, workers):
+    """
+    在多个进程中计算行掩码。
+
+    :param method: 'v2' 时 params 为 coarse_solid_mask 的 (颜色列表, 容差, min_h, 缩小倍数)；
+                   'v4' 时为 coarse_simple_mask_v4 的 (量化因子, 颜色上限, 边缘比例, min_h, 缩小倍数)。
+                   缩小倍数 <= 1 时各分区逐行全分辨率分析。
+    :return: (掩码, 精细化行数, 实际使用的分区数)
+    """
+    height = rgb_array.shape[0]
+    partitions = partition_rows(height, workers, max(1, min_band_height))
+    shm = shared_memory.SharedMemory(create=True, size=max(1, rgb_array.nbytes))
+    try:
+        shared = np.ndarray(rgb_array.shape, dtype=np.uint8, buffer=shm.buf)
+        shared[:] = rgb_array
+        del shared
+        tasks = [(shm.name, rgb_array.shape, start, end, method, params) for start, end in partitions]
+        with ProcessPoolExecutor(max_workers=len(tasks)) as executor:
+            results = list(executor.map(_classify_partition, tasks))
+    finally:
+        shm.close()
+        shm.unlink()
+    # 各分区的游程已换算为长图中的绝对行号，重叠部分取逻辑或
+    mask = runs_to_mask(height, [run for starts, ends, _ in results for run in zip(starts, ends)])
+    return mask, sum(refined for _, _, refined in results), len(partitions)
@@ -0,0 +1,75 @@
+"""
+PDF 图片去重
+
+多个章节 PDF 合并时，每章重复出现的图片 (片头、版权页、Logo) 会被原样复制多份。
+这里按内容哈希 (原始流字节 + 影响解码的字典项) 找出相同的图片 XObject，
+把所有引用指向第一份；其余副本不再被引用，pikepdf 保存时不会写出。
+
+字典项中的间接引用 (如 ICC 色彩空间、SMask) 按对象编号比较，因此只有引用同一对象
+的图片才视为相同——宁可漏掉，不会误合并。
+"""
+
+import hashlib
+
+import pikepdf
+
+# 不影响图片内容、比较时忽略的字典项
+_IGNORED_KEYS = {"/Length"}
+
+
+def image_content_key(image):
+    """图片 XObject 的内容哈希。"""
+    digest = hashlib.sha256()
+    for key in sorted(k for k in image.keys() if k not in _IGNORED_KEYS):
+        digest.update(key.encode())
+        value = image[key]
+        # 整数、实数等标量被 pikepdf 转成了 Python 对象
+        digest.update(value.unparse(resolved=False) if isinstance(value, pikepdf.Object) else repr(value).encode())
+    digest.update(b"\0")
+    digest.update(image.read_raw_bytes())
+    return digest.digest()
+
+
+def deduplicate_images(pdf):
+    """
+    在整个文档中合并内容相同的图片 XObject (含 Form XObject 内引用的图片)。
+
+    :return: 被替换掉的图片引用数。
+    """
+    canonical = {}  # 内容哈希 -> 第一份图片
+    keys_by_object = {}  # 图片对象编号 -> 内容哈希 (同一对象只哈希一次)
+    visited_resources = set()
+    replaced = 0
+
+    def visit(resources):
+        nonlocal replaced
+        if resources is None or "/XObject" not in resources:
+            return
+        if resources.is_indirect:
+            if resources.objgen in visited_resources:
+                return
+            visited_resources.add(resources.objgen)
+        xobjects = resources.XObject
+        for name in list(xobjects.keys()):
+            xobject = xobjects[name]
+            if not isinstance(xobject, pikepdf.Stream):
+                continue
+            subtype = xobject.get("/Subtype")
+            if subtype == pikepdf.Name.Form:
+                visit(xobject.get("/Resources"))
+                continue
+            if subtype != pikepdf.Name.Image:
+                continue
+            objgen = xobject.objgen
+            key = keys_by_object.get(objgen)
+            if key is None:
+                key = image_content_key(xobject)
+                keys_by_object[objgen] = key
+            first = canonical.setdefault(key, xobject)
+            if first.objgen != objgen:
+                xobjects[name] = first
+                replaced += 1
+
+    for page in pdf.pages:
+        visit(page.obj.get("/Resources"))
+    return replaced
@@ -0,0 +1,176 @@
+"""
+PDF 页面分片渲染
+
+超长页面不再先渲染成一整张位图再裁切，而是用 PyMuPDF 的 clip 矩形逐片渲染：
+每片只光栅化页面中对应的一段，峰值内存是一片 (最多 max_height 行) 而不是整页。
+分片边界在像素坐标中计算 (整页像素高度按 MuPDF 的取整方式求出)，
+各片首尾相接，与原来整页渲染后裁切得到的尺寸、文件名完全一致。
+
+只由一张铺满页面的图片构成的页面 (常见于图片转成的漫画 PDF) 不做光栅化，
+直接取出内嵌图片的原始数据 (JPEG 原样写出，无损且几乎不耗时)。含文字、矢量图形、注释、
+透明蒙版或多张图片拼合的页面仍按 DPI 渲染。内嵌图片超过 max_height 时在原始分辨率上切割。
+
+渲染以页面为单位分发到进程池 (PyMuPDF 文档对象不能跨线程共享)，每个任务自行打开 PDF；
+文件名只由 PDF 名、页码、分片号决定，与完成顺序无关。
+"""
+
+import io
+import os
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+DEFAULT_RENDER_WORKERS = max(1, min(os.cpu_count() or 1, 8))
+
+# 可直接写出的内嵌图片格式 (extract_image 的 ext -> 输出扩展名)
+EXTRACTABLE_IMAGE_EXTENSIONS = {"jpeg": "jpg", "png": "png"}
+# 判断图片是否铺满页面时允许的误差 (PDF 点)
+PAGE_COVER_TOLERANCE = 1.0
+
+
+def page_pixel_size(page, dpi):
+    """页面按 dpi 渲染后的像素 (宽, 高)，与 page.get_pixmap(dpi=dpi) 一致。"""
+    zoom = dpi / 72
+    irect = (page.rect * fitz.Matrix(zoom, zoom)).irect
+    return irect.width, irect.height
+
+
+def plan_page_slices(pixel_height, max_height):
+    """把页面的像素高度切成若干段 [(top, bottom)]，每段不超过 max_height 行。"""
+    count = max(1, math.ceil(pixel_height / max_height))
+    return [(i * max_height, min((i + 1) * max_height, pixel_height)) for i in range(count)]
+
+
+def slice_filenames(base_name, page_num, slice_count, image_format):
+    """页面 (及其分片) 的输出文件名；不需要切割时沿用无分片号的文件名。"""
+    if slice_count == 1:
+        return [f"{base_name}_page_{page_num:03d}.{image_format}"]
+    return [f"{base_name}_page_{page_num:03d}_part_{part:02d}.{image_format}" for part in range(1, slice_count + 1)]
+
+
+def find_single_image(page):
+    """
+    页面只绘制了一张铺满整页、未旋转且无透明蒙版的图片时返回其 xref，否则返回 None。
+    """
+    if page.rotation or page.first_annot is not None:
+        return None
+    images = page.get_images(full=True)
+    if len(images) != 1 or images[0][1]:
+        return None
+    draw_ops = page.get_bboxlog()
+    if len(draw_ops) != 1 or draw_ops[0][0] != "fill-image":
+        return None
+    # 不请求 xref：get_image_info(xrefs=True) 要逐张计算图片摘要，比这里的其余检查慢两个数量级
+    placements = page.get_image_info()
+    if len(placements) != 1 or placements[0]["has-mask"]:
+        return None
+    a, b, c, d, _, _ = placements[0]["transform"]
+    if b or c or a <= 0 or d <= 0:
+        return None
+    if any(abs(x - y) > PAGE_COVER_TOLERANCE for x, y in zip(placements[0]["bbox"], page.rect)):
+        return None
+    return images[0][0]
+
+
+def extract_page_image(doc, page):
+    """取出单图页面的内嵌图片：{"ext", "image", "width", "height"}；不适合直接写出时返回 None。"""
+    xref = find_single_image(page)
+    if xref is None:
+        return None
+    image = doc.extract_image(xref)
+    if not image or image.get("ext") not in EXTRACTABLE_IMAGE_EXTENSIONS or image.get("colorspace") not in (1, 3):
+        return None
+    return image
+
+
+def _save_extracted(image, output_dir, base_name, page_num, max_height, image_format):
+    extension = EXTRACTABLE_IMAGE_EXTENSIONS[image["ext"]]
+    slices = plan_page_slices(image["height"], max_height)
+    if len(slices) == 1:
+        name = slice_filenames(base_name, page_num, 1, extension)[0]
+        with open(os.path.join(output_dir, name), "wb") as f:
+            f.write(image["image"])
+        return [name]
+
+    names = slice_filenames(base_name, page_num, len(slices), image_format)
+    with Image.open(io.BytesIO(image["image"])) as img:
+        for (top, bottom), name in zip(slices, names):
+            img.crop((0, top, img.width, bottom)).save(os.path.join(output_dir, name))
+    return names
+
+
+def render_page(pdf_path, page_index, output_dir, base_name, dpi, max_height, image_format, extract_images=True):
+    """
+    渲染一页并保存 (超高时按 clip 分片渲染)。可在子进程中运行。
+
+    :param extract_images: 单图页面直接写出内嵌图片 (文件扩展名随图片格式)，不做光栅化。
+    :return: (输出像素高度, [已保存的文件名], 是否直接取自内嵌图片)
+    """
+    with fitz.open(pdf_path) as doc:
+        page = doc[page_index]
+        image = extract_page_image(doc, page) if extract_images else None
+        if image is not None:
+            names = _save_extracted(image, output_dir, base_name, page_index + 1, max_height, image_format)
+            return image["height"], names, True
+
+        _, pixel_height = page_pixel_size(page, dpi)
+        slices = plan_page_slices(pixel_height, max_height)
+        names = slice_filenames(base_name, page_index + 1, len(slices), image_format)
+        if len(slices) == 1:
+            page.get_pixmap(dpi=dpi).save(os.path.join(output_dir, names[0]))
+            return pixel_height, names, False
+
+        zoom = dpi / 72
+        rect = page.rect
+        for (top, bottom), name in zip(slices, names):
+            clip = fitz.Rect(rect.x0, rect.y0 + top / zoom, rect.x1, rect.y0 + bottom / zoom)
+            pix = page.get_pixmap(dpi=dpi, clip=clip)
+            pix.save(os.path.join(output_dir, name))
+            del pix
+        return pixel_height, names, False
+
+
+class PageRenderPool:
+    """
+    多个 PDF 的页面共用一个进程池渲染。
+    用法：with PageRenderPool(workers) as pool: futures = pool.submit_pdf(...)；按页序逐个取 result()。
+    """
+
+    def __init__(self, max_workers=DEFAULT_RENDER_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers) if self.max_workers > 1 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(cancel=exc_type is not None)
+        return False
+
+    def submit_pdf(self, pdf_path, output_dir, base_name, dpi, max_height, image_format, extract_images=True):
+        """提交一个 PDF 的所有页面，返回按页序排列的 future 列表 (单进程时在取结果时才渲染)。"""
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+        args = [(pdf_path, index, output_dir, base_name, dpi, max_height, image_format, extract_images)
+                for index in range(page_count)]
+        if self._executor is not None:
+            return [self._executor.submit(render_page, *task) for task in args]
+        return [_LazyResult(render_page, task) for task in args]
+
+    def shutdown(self, cancel=False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=cancel)
+            self._executor = None
+
+
+class _LazyResult:
+    """单进程模式下的占位 future：取结果时才在当前进程渲染，保持逐页的内存占用。"""
+
+    def __init__(self, func, args):
+        self._func = func
+        self._args = args
+
+    def result(self):
+        return self._func(*self._args)
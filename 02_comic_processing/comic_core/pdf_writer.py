@@ -0,0 +1,113 @@
+"""
+流式 PDF 写入器
+
+每添加一页就把该页的图片、内容流和页面对象直接写入文件，内存中只保留各对象的偏移量，
+峰值内存为一页。页面树、目录和交叉引用表在 close() 时写在文件末尾。
+
+已经是合适尺寸的 JPEG (RGB 或灰度) 原样作为 DCTDecode 流嵌入，不解码也不重新编码；
+其他页面由调用方先编码为 JPEG (见 document_writer.encode_page) 再写入，与 Pillow save_all 生成的 PDF 等价。
+"""
+
+import os
+
+PDF_HEADER = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+JPEG_COLOR_SPACES = {"RGB": b"/DeviceRGB", "L": b"/DeviceGray"}
+
+
+def is_jpeg_passthrough_candidate(info):
+    """
+    根据尺寸索引中的信息判断图片能否直接嵌入：必须是 RGB 或灰度 JPEG。
+    CMYK JPEG 在不同软件中的反相约定不一致，仍走重新编码。
+    """
+    return bool(info) and info.get("format") == "JPEG" and info.get("mode") in JPEG_COLOR_SPACES
+
+
+class StreamingPdfWriter:
+    """逐页写入的最小 PDF 生成器。用法：with StreamingPdfWriter(path, dpi) as writer: writer.add_jpeg(data, w, h, mode)"""
+
+    def __init__(self, path, dpi=300):
+        self.path = path
+        self.dpi = float(dpi)
+        self.page_count = 0
+        self._file = open(path, 'wb')
+        self._file.write(PDF_HEADER)
+        self._offsets = {}
+        self._next_object_number = 3  # 1 为目录，2 为页面树，在 close() 时写入
+        self._page_object_numbers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _allocate(self):
+        number = self._next_object_number
+        self._next_object_number += 1
+        return number
+
+    def _write_object(self, number, body, stream=None):
+        self._offsets[number] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % number)
+        self._file.write(body)
+        if stream is not None:
+            self._file.write(b"\nstream\n")
+            self._file.write(stream)
+            self._file.write(b"\nendstream")
+        self._file.write(b"\nendobj\n")
+
+    def add_jpeg(self, jpeg_bytes, width, height, mode):
+        """把一段完整的 JPEG 数据作为一页写入，mode 为 'RGB' 或 'L'。"""
+        image_number, content_number, page_number = self._allocate(), self._allocate(), self._allocate()
+        self._write_object(
+            image_number,
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s "
+            b"/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>"
+            % (width, height, JPEG_COLOR_SPACES[mode], len(jpeg_bytes)),
+            jpeg_bytes
+        )
+        page_width, page_height = width * 72.0 / self.dpi, height * 72.0 / self.dpi
+        content = b"q %.4f 0 0 %.4f 0 0 cm /Im0 Do Q" % (page_width, page_height)
+        self._write_object(content_number, b"<< /Length %d >>" % len(content), content)
+        self._write_object(
+            page_number,
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.4f %.4f] "
+            b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+            % (page_width, page_height, image_number, content_number)
+        )
+        self._page_object_numbers.append(page_number)
+        self.page_count += 1
+
+    def add_jpeg_file(self, path, width, height, mode):
+        """直接嵌入一个 JPEG 文件的原始字节。"""
+        with open(path, 'rb') as f:
+            self.add_jpeg(f.read(), width, height, mode)
+
+    def close(self):
+        """写入页面树、目录和交叉引用表并关闭文件。"""
+        if self._file is None:
+            return
+        kids = b" ".join(b"%d 0 R" % number for number in self._page_object_numbers)
+        self._write_object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, self.page_count))
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self._file.tell()
+        size = self._next_object_number
+        self._file.write(b"xref\n0 %d\n0000000000 65535 f\r\n" % size)
+        for number in range(1, size):
+            self._file.write(b"%010d 00000 n\r\n" % self._offsets[number])
+        self._file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_offset))
+        self._file.close()
+        self._file = None
+
+    def abort(self):
+        """出错时关闭并删除未完成的文件。"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,144 @@
+"""
+项目清单 (断点续跑)
+
+每个项目目录下保存一个 JSON 清单，记录：
+  - inputs：按长图顺序排列的输入图片 (相对路径、大小、修改时间、SHA-1、在长图中的高度)；
+  - params：流水线参数，分为影响行分析的 analysis 与只影响输出的 output 两组；
+  - masks：V2 / V4 行掩码的游程编码 (只记录 True 行区间)；
+  - plan：选中的切割方案 (方法与页面行区间)；
+  - artifacts：已生成的长图与输出文件 (PDF / CBZ；路径、大小、修改时间)；
+  - status：'running' 或 'done'。
+
+重新运行时：输入与参数都未变化且 PDF 仍在的项目直接跳过；长图仍在时跳过合并；
+方案已记录时跳过行分析。项目中追加了章节时，长图前部未变化的图片对应的行掩码直接复用，
+只需对变化之后的行重新分析。清单随项目文件夹一起移动。
+"""
+
+import os
+import json
+import hashlib
+
+from .row_classifier import true_runs
+
+MANIFEST_FILENAME = ".contentforge_manifest.json"
+MANIFEST_VERSION = 1
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint_inputs(images_data, project_dir, previous_inputs=None):
+    """
+    为长图中的每张图片生成指纹。大小与修改时间都未变化的文件沿用上次的 SHA-1，不再重新读取。
+
+    :param images_data: analyze_image_dimensions 返回的列表 (含 "path" 与长图中的 "height")。
+    """
+    known = {item["path"]: item for item in (previous_inputs or [])}
+    inputs = []
+    for item in images_data:
+        relative_path = os.path.relpath(item["path"], project_dir)
+        stat = os.stat(item["path"])
+        previous = known.get(relative_path)
+        if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+            sha1 = previous["sha1"]
+        else:
+            sha1 = file_sha1(item["path"])
+        inputs.append({
+            "path": relative_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "sha1": sha1, "height": item["height"],
+        })
+    return inputs
+
+
+def _content_keys(inputs):
+    return [(item["sha1"], item["height"]) for item in inputs]
+
+
+def inputs_match(old_inputs, new_inputs):
+    """两组输入的内容与顺序完全相同 (只比较 SHA-1 与长图中的高度，文件改名或 touch 不算变化)。"""
+    return _content_keys(old_inputs or []) == _content_keys(new_inputs)
+
+
+def unchanged_prefix_rows(old_inputs, new_inputs):
+    """长图开头内容未变化的行数：两组输入最长公共前缀的高度之和。"""
+    rows = 0
+    for old, new in zip(_content_keys(old_inputs or []), _content_keys(new_inputs)):
+        if old != new:
+            break
+        rows += new[1]
+    return rows
+
+
+def mask_to_runs(mask):
+    starts, ends = true_runs(mask)
+    return [[int(start), int(end)] for start, end in zip(starts, ends)]
+
+
+def reusable_mask_rows(runs, prefix_rows, min_band_height):
+    """
+    旧掩码中可以直接复用的行数 b：只对 [b, 总高度) 重新分析，再与旧掩码的 [0, b) 拼接。
+
+    先从未变化前缀的末尾后退 min_band_height 行：跨越前缀末尾、高度达标的段在前缀内至少有
+    min_band_height 行，因此一定出现在旧掩码中；边界若落在旧掩码的某个 True 段内部，就退到该段起点。
+    这样没有任何高度达标的段跨越 b，V2 (段末) 与 V4 (段中点) 的切割点都与整体重新分析一致。
+    """
+    boundary = max(0, prefix_rows - max(1, min_band_height))
+    for start, end in runs:
+        if start < boundary < end:
+            return start
+        if start >= boundary:
+            break
+    return boundary
+
+
+def load_manifest(project_dir):
+    """读取项目清单；不存在、损坏或版本不符时返回 None。"""
+    try:
+        with open(os.path.join(project_dir, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(project_dir, manifest):
+    """原子写入项目清单；写入失败时静默放弃，不影响主流程。"""
+    manifest_path = os.path.join(project_dir, MANIFEST_FILENAME)
+    temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    manifest["version"] = MANIFEST_VERSION
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp_path, manifest_path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def artifact_record(path, project_dir=None):
+    """记录一个产物文件；project_dir 给出时保存相对路径。"""
+    stat = os.stat(path)
+    recorded_path = os.path.relpath(path, project_dir) if project_dir else os.path.abspath(path)
+    return {"path": recorded_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def artifact_exists(record, project_dir=None):
+    """产物文件仍然存在且大小、修改时间与记录一致。"""
+    if not record:
+        return False
+    path = os.path.join(project_dir, record["path"]) if project_dir else record["path"]
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return stat.st_size == record.get("size") and stat.st_mtime_ns == record.get("mtime_ns")
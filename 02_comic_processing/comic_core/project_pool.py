@@ -0,0 +1,89 @@
+"""
+按内存预算调度的项目进程池
+
+多个项目 (子文件夹) 在 ProcessPoolExecutor 中并行处理。每个项目提交前先估算其峰值内存，
+正在运行的项目估算值之和不超过预算时才会提交新项目，避免两个超大项目同时运行。
+提交顺序可以由调用方给出 (如 project_scheduler.lpt_order 的最长优先顺序)。
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+
+def available_memory_bytes():
+    """尽力获取当前可用物理内存 (字节)；无法获取时返回 None。"""
+    try:
+        with open('/proc/meminfo', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+
+    if sys.platform == 'win32':
+        try:
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [
+                    ('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                    ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                    ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                    ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                    ('ullAvailExtendedVirtual', ctypes.c_ulonglong),
+                ]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return int(status.ullAvailPhys)
+        except Exception:
+            pass
+        return None
+
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def run_budgeted_pool(task_args, worker, max_workers, memory_budget_bytes, memory_estimates, on_result=None, order=None):
+    """
+    在进程池中运行 worker(*task_args[i])，并限制同时运行任务的估算内存之和。
+
+    调度规则：按顺序挑选第一个放得进剩余预算的待处理任务；单个任务的估算值超过整个预算时，
+    只在没有其他任务运行时才提交 (独占运行)。memory_budget_bytes 为 None 时只受 max_workers 限制。
+
+    :param order: 可选，任务序号的提交优先顺序；默认按任务顺序。
+    :param on_result: 可选回调 on_result(任务序号, 结果, 异常或 None)，按完成顺序在主进程中调用。
+    :return: 按任务顺序排列的结果列表 (任务抛出异常时对应位置为 None)。
+    """
+    results = [None] * len(task_args)
+    pending = list(order) if order is not None else list(range(len(task_args)))
+    running = {}  # future -> 任务序号
+
+    def fits(index):
+        if memory_budget_bytes is None or not running:
+            return True
+        in_use = sum(memory_estimates[i] for i in running.values())
+        return in_use + memory_estimates[index] <= memory_budget_bytes
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            while pending and len(running) < max_workers:
+                index = next((i for i in pending if fits(i)), None)
+                if index is None:
+                    break
+                pending.remove(index)
+                running[executor.submit(worker, *task_args[index])] = index
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    results[index] = future.result()
+                if on_result:
+                    on_result(index, results[index], error)
+    return results
@@ -0,0 +1,126 @@
+"""
+项目耗时预测与最长优先 (LPT) 调度
+
+并行处理多个项目时，最后才开始的超长连载会拖长整批的总耗时。调度前先按尺寸索引
+统计每个项目的源图总像素数与文件数，预测其耗时，并按预测耗时从长到短提交 (LPT)；
+内存准入仍由 project_pool.run_budgeted_pool 负责。
+
+预测模型按阶段分别拟合：阶段耗时 ≈ a × 像素数 + b × 文件数。系数从此前运行写下的
+计时日志 (JSON Lines，每行一个项目：{"pixels", "files", "elapsed", "stages": {阶段: {"seconds"}}}) 中
+用最小二乘求得，没有历史记录时使用默认吞吐量。日志中 elapsed 超出各阶段之和的部分记为 "other" 阶段。
+"""
+
+import os
+import json
+
+import numpy as np
+
+from .dimension_index import get_image_dimensions
+
+TIMING_HISTORY_LIMIT = 200
+DEFAULT_PIXELS_PER_SECOND = 20e6
+DEFAULT_SECONDS_PER_FILE = 0.005
+OTHER_STAGE = "other"
+
+
+def project_features(image_paths):
+    """项目的工作量特征：{"pixels": 源图总像素数, "files": 可读取的图片数}，尺寸来自尺寸索引。"""
+    pixels, files = 0, 0
+    for info in get_image_dimensions(image_paths).values():
+        if info is None:
+            continue
+        pixels += info["width"] * info["height"]
+        files += 1
+    return {"pixels": pixels, "files": files}
+
+
+def load_timing_history(log_path, limit=TIMING_HISTORY_LIMIT):
+    """读取计时日志中最近 limit 条带有工作量特征的记录；日志不存在或损坏的行会被忽略。"""
+    records = []
+    try:
+        with open(log_path, encoding='utf-8') as f:
+            lines = f.readlines()
+    except OSError:
+        return records
+    for line in lines[-limit:]:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and record.get("pixels") and record.get("stages"):
+            records.append(record)
+    return records
+
+
+def _stage_seconds(record):
+    seconds = {name: values["seconds"] for name, values in record["stages"].items()
+               if isinstance(values, dict) and values.get("seconds") is not None}
+    if record.get("elapsed") is not None:
+        seconds[OTHER_STAGE] = max(0.0, record["elapsed"] - sum(seconds.values()))
+    return seconds
+
+
+def _fit_rates(samples):
+    """samples 为 [(像素数, 文件数, 秒)]；返回非负的 (秒/像素, 秒/文件)。"""
+    features = np.array([(pixels, files) for pixels, files, _ in samples], dtype=np.float64)
+    seconds = np.array([s for _, _, s in samples], dtype=np.float64)
+    if len(samples) >= 2:
+        scale = features.max(axis=0)
+        scale[scale == 0] = 1.0
+        coefficients = np.linalg.lstsq(features / scale, seconds, rcond=None)[0] / scale
+        if (coefficients >= 0).all():
+            return float(coefficients[0]), float(coefficients[1])
+    # 样本太少或拟合出负系数时，只按像素数估算
+    return float(seconds.sum() / max(features[:, 0].sum(), 1.0)), 0.0
+
+
+class CostModel:
+    """按阶段预测项目耗时。stage_rates: {阶段: (秒/像素, 秒/文件)}。"""
+
+    def __init__(self, stage_rates=None, samples=0):
+        self.stage_rates = stage_rates or {"total": (1 / DEFAULT_PIXELS_PER_SECOND, DEFAULT_SECONDS_PER_FILE)}
+        self.samples = samples
+
+    @classmethod
+    def from_history(cls, records, mode=None):
+        """
+        从计时日志记录中学习各阶段吞吐量。给出 mode 且有该模式的记录时只用这些记录
+        (各模式的阶段不同)，否则使用全部记录；没有记录时返回默认模型。
+        """
+        if mode is not None and any(record.get("mode") == mode for record in records):
+            records = [record for record in records if record.get("mode") == mode]
+        samples = {}
+        for record in records:
+            for stage, seconds in _stage_seconds(record).items():
+                samples.setdefault(stage, []).append((record["pixels"], record.get("files", 0), seconds))
+        if not samples:
+            return cls()
+        return cls({stage: _fit_rates(stage_samples) for stage, stage_samples in samples.items()}, len(records))
+
+    def predict(self, features):
+        """预测耗时 (秒)。features 为 project_features 的结果。"""
+        return sum(per_pixel * features["pixels"] + per_file * features["files"]
+                   for per_pixel, per_file in self.stage_rates.values())
+
+    def describe(self):
+        """各阶段吞吐量的简短说明，用于打印。"""
+        source = f"{self.samples} 条历史记录" if self.samples else "默认吞吐量"
+        parts = [f"{stage} {1 / per_pixel / 1e6:.1f}MP/s" if per_pixel else f"{stage} -"
+                 for stage, (per_pixel, _) in self.stage_rates.items()]
+        return f"{source}: " + ", ".join(parts)
+
+
+def lpt_order(costs):
+    """最长优先：按预测耗时从大到小排列的任务序号 (耗时相同时保持原顺序)。"""
+    return sorted(range(len(costs)), key=lambda index: -costs[index])
+
+
+def append_timing_record(log_path, record):
+    """追加一条计时记录，写入失败时返回错误信息，成功返回 None。"""
+    try:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        return str(e)
+    return None
@@ -0,0 +1,279 @@
+"""
+长图逐行分类引擎 (V2 纯色带 / V4 色彩同质性)
+
+用少量整块 NumPy 运算为整张长图计算每行的布尔分类掩码，取代逐像素或
+逐行的 Python 循环。
+
+V2 判定规则与旧版 is_solid_color_row 完全一致：
+  1. 行首像素与背景色表中任意颜色的欧氏距离不超过容差 (查 color_lut 中预先算好的判定表)；
+  2. 该行其余每个像素与行首像素的欧氏距离都不超过容差。
+距离全部以整数平方比较，不做开方。
+
+V4 判定规则与旧版 get_dominant_color_numpy 逐行分析完全一致：
+中间区域量化后的颜色种类不超过上限，且左右边缘的颜色种类同样不超过
+上限、主色调与中间区域相同。量化后的 RGB 被折叠为单个整数颜色码，
+每行的颜色统计由整块的 bincount / 排序归约完成。
+"""
+
+import numpy as np
+
+from .color_lut import band_color_lut, squared_tolerance as _squared_tolerance
+
+# 单次处理的像素数上限，用于控制 int32 临时数组的内存占用
+CHUNK_PIXELS = 4 * 1024 * 1024
+# 颜色码总数不超过此值时用直方图 (bincount) 统计，否则改用排序统计
+MAX_HISTOGRAM_CODES = 4096
+# 单次直方图的单元数上限 (行数 x 颜色码数)
+HISTOGRAM_CELLS = 8 * 1024 * 1024
+
+
+def _rows_per_chunk(width):
+    return max(1, CHUNK_PIXELS // max(1, width))
+
+
+def _rows_within_tolerance(rows, tol_sq):
+    """
+    判断每行所有像素与行首像素的平方距离是否都不超过 tol_sq。
+    先用单通道最大差做上下界快速筛选，只有落在模糊区间的行才计算精确平方距离。
+    """
+    num_rows, width = rows.shape[:2]
+    # 展开为连续的二维数组再比较，避免 (N, 1, 3) 广播的低效访存
+    flat = np.ascontiguousarray(rows).reshape(num_rows, -1)
+    first = np.tile(rows[:, 0, :], width)
+    abs_diff = np.maximum(flat, first)
+    abs_diff -= np.minimum(flat, first)  # uint8，不会溢出
+    row_max = abs_diff.max(axis=1).astype(np.int32)
+
+    # 单通道最大差 c 满足: c^2 <= 距离^2 <= 3 * c^2
+    result = 3 * row_max ** 2 <= tol_sq
+    ambiguous = np.flatnonzero(~result & (row_max ** 2 <= tol_sq))
+    if ambiguous.size:
+        d = abs_diff[ambiguous].reshape(-1, width, 3).astype(np.int32)
+        result[ambiguous] = (np.einsum('ijk,ijk->ij', d, d) <= tol_sq).all(axis=1)
+    return result
+
+
+def first_pixel_in_palette(rgb_array, band_colors_list, tolerance):
+    """只检查每行的行首像素是否属于背景色 (纯色行的必要条件)，开销与行数成正比。"""
+    height = rgb_array.shape[0]
+    if height == 0 or rgb_array.shape[1] == 0:
+        return np.zeros(height, dtype=bool)
+    return band_color_lut(band_colors_list, tolerance).contains(rgb_array[:, 0, :3])
+
+
+def classify_solid_rows(rgb_array, band_colors_list, tolerance, progress=None):
+    """
+    计算每一行是否为纯色带行。
+
+    :param rgb_array: 形状为 (H, W, 3) 的 uint8 数组 (RGB)。
+    :param band_colors_list: 背景色列表 [(r, g, b), ...]。
+    :param tolerance: 欧氏距离容差。
+    :param progress: 可选回调 progress(已处理行数, 总行数)。
+    :return: 长度为 H 的布尔数组。
+    """
+    height, width = rgb_array.shape[:2]
+    solid_mask = np.zeros(height, dtype=bool)
+    if height == 0 or width == 0:
+        return solid_mask
+
+    tol_sq = _squared_tolerance(tolerance)
+    if tol_sq < 0 or not band_colors_list:
+        return solid_mask
+    palette_lut = band_color_lut(band_colors_list, tolerance)
+
+    rows_per_chunk = _rows_per_chunk(width)
+    for start in range(0, height, rows_per_chunk):
+        end = min(start + rows_per_chunk, height)
+        chunk = rgb_array[start:end, :, :3]
+
+        # 1. 行首像素是否属于背景色
+        base_ok = palette_lut.contains(chunk[:, 0, :])
+
+        # 2. 仅对行首合格的行检查整行一致性
+        candidate_rows = np.flatnonzero(base_ok)
+        if candidate_rows.size:
+            uniform = _rows_within_tolerance(chunk[candidate_rows], tol_sq)
+            solid_mask[start + candidate_rows[uniform]] = True
+
+        if progress:
+            progress(end, height)
+
+    return solid_mask
+
+
+def true_runs(mask):
+    """返回布尔掩码中连续 True 段的 (starts, ends) 数组，ends 为开区间。"""
+    mask = np.asarray(mask, dtype=bool)
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return edges[0::2], edges[1::2]
+
+
+def runs_to_mask(height, runs):
+    """
+    true_runs 的逆操作：把 (start, end) 行区间 (ends 为开区间) 写成长度为 height 的布尔掩码。
+    超出 height 的部分被截断，重叠的区间取逻辑或。
+    """
+    mask = np.zeros(height, dtype=bool)
+    for start, end in runs:
+        mask[start:end] = True
+    return mask
+
+
+def find_solid_band_cuts(solid_mask, min_band_height):
+    """
+    按 V2 规则从纯色行掩码中求切割点：
+    一段纯色行之后出现内容行，且该段高度达到 min_band_height 时，
+    在该段中点切割。延伸到图片末尾的纯色段不产生切割。
+    """
+    height = len(solid_mask)
+    min_band_height = max(1, min_band_height)
+    cuts = []
+    current_segment_start_y = 0
+    for start, end in zip(*true_runs(solid_mask)):
+        if end >= height:
+            break
+        band_height = end - start
+        if band_height >= min_band_height:
+            cut_point_y = int(start + band_height // 2)
+            if cut_point_y > current_segment_start_y:
+                cuts.append(cut_point_y)
+            current_segment_start_y = cut_point_y
+    return cuts
+
+
+def cuts_to_segments(cuts, height, min_tail_height=1):
+    """
+    将切割点转换为 [(start, end), ...] 片段列表。
+    最后一个片段的高度小于 min_tail_height 时被丢弃 (V2 丢弃 <= 10px 的尾片)。
+    """
+    segments = []
+    last_y = 0
+    for cut_y in cuts:
+        segments.append((last_y, cut_y))
+        last_y = cut_y
+    if height - last_y >= max(1, min_tail_height):
+        segments.append((last_y, height))
+    return segments
+
+
+# --- V4 色彩同质性分析 ---
+
+def pack_quantized_colors(rgb_block, quantization_factor):
+    """
+    将 RGB 像素量化后折叠为单个整数颜色码。
+    颜色码保持 (r, g, b) 的字典序，与 np.unique(axis=0) 的排序一致。
+
+    :return: (颜色码数组 int32, 颜色码总数)
+    """
+    levels = 255 // quantization_factor + 1
+    quantized = rgb_block[..., :3] // quantization_factor
+    codes = quantized[..., 0].astype(np.int32)
+    codes *= levels
+    codes += quantized[..., 1]
+    codes *= levels
+    codes += quantized[..., 2]
+    return codes, levels ** 3
+
+
+def _row_color_stats_histogram(codes, num_codes):
+    """直方图统计：返回每行的 (主色调颜色码, 颜色种类数)。"""
+    num_rows = codes.shape[0]
+    offsets = (np.arange(num_rows, dtype=np.int64) * num_codes)[:, None]
+    hist = np.bincount((codes + offsets).ravel(), minlength=num_rows * num_codes).reshape(num_rows, num_codes)
+    # argmax 取第一个最大值，即并列时颜色码最小者
+    return hist.argmax(axis=1), np.count_nonzero(hist, axis=1)
+
+
+def _row_color_stats_sorted(codes):
+    """排序统计：返回每行的 (主色调颜色码, 颜色种类数)，适用于颜色码空间很大的情况。"""
+    num_rows, width = codes.shape
+    sorted_codes = np.sort(codes, axis=1)
+    run_start_mask = np.ones((num_rows, width), dtype=bool)
+    run_start_mask[:, 1:] = sorted_codes[:, 1:] != sorted_codes[:, :-1]
+    unique_counts = run_start_mask.sum(axis=1)
+
+    # 展平后每行的第一个元素必定是一段的开始，因此各段按行连续排列
+    run_starts = np.flatnonzero(run_start_mask)
+    run_rows = run_starts // width
+    run_lengths = np.diff(np.append(run_starts, num_rows * width))
+    row_first_run = np.flatnonzero(np.r_[True, run_rows[1:] != run_rows[:-1]])
+    max_lengths = np.maximum.reduceat(run_lengths, row_first_run)
+
+    # 每行第一个达到最大长度的段，即并列时颜色码最小者
+    longest = np.flatnonzero(run_lengths == max_lengths[run_rows])
+    first_longest = longest[np.r_[True, run_rows[longest][1:] != run_rows[longest][:-1]]]
+    return sorted_codes.ravel()[run_starts[first_longest]], unique_counts
+
+
+def row_color_stats(codes, num_codes):
+    """
+    逐行统计二维颜色码数组的主色调与颜色种类数。
+    宽度为 0 时主色调为 -1、种类数为 0 (对应旧版返回 None, 0)。
+    """
+    num_rows, width = codes.shape
+    if num_rows == 0 or width == 0:
+        return np.full(num_rows, -1, dtype=np.int64), np.zeros(num_rows, dtype=np.int64)
+
+    if num_codes > MAX_HISTOGRAM_CODES:
+        return _row_color_stats_sorted(codes)
+
+    rows_per_batch = max(1, HISTOGRAM_CELLS // num_codes)
+    dominant = np.empty(num_rows, dtype=np.int64)
+    counts = np.empty(num_rows, dtype=np.int64)
+    for start in range(0, num_rows, rows_per_batch):
+        end = min(start + rows_per_batch, num_rows)
+        dominant[start:end], counts[start:end] = _row_color_stats_histogram(codes[start:end], num_codes)
+    return dominant, counts
+
+
+def classify_simple_rows_v4(rgb_array, quantization_factor, max_unique_colors, edge_margin_percent, progress=None):
+    """
+    计算每一行是否为 V4 意义下的"简单"(空白)行。
+
+    :param rgb_array: 形状为 (H, W, 3) 的 uint8 数组 (RGB)。
+    :param progress: 可选回调 progress(已处理行数, 总行数)。
+    :return: 长度为 H 的布尔数组。
+    """
+    height, width = rgb_array.shape[:2]
+    simple_mask = np.zeros(height, dtype=bool)
+    margin_width = int(width * edge_margin_percent)
+    # 没有边缘区域时旧版的边缘主色调为 None，任何行都不可能是简单行
+    if height == 0 or margin_width <= 0:
+        return simple_mask
+
+    rows_per_chunk = _rows_per_chunk(width)
+    for start in range(0, height, rows_per_chunk):
+        end = min(start + rows_per_chunk, height)
+        codes, num_codes = pack_quantized_colors(rgb_array[start:end], quantization_factor)
+
+        # 快速筛选：中间区域颜色种类不超过上限的行成为候选行
+        center_dominant, center_count = row_color_stats(codes[:, margin_width:width - margin_width], num_codes)
+        candidates = np.flatnonzero((center_count > 0) & (center_count <= max_unique_colors))
+
+        # 精准验证：只对候选行统计左右边缘
+        if candidates.size:
+            candidate_codes = codes[candidates]
+            ok = np.ones(candidates.size, dtype=bool)
+            for edge_codes in (candidate_codes[:, :margin_width], candidate_codes[:, width - margin_width:]):
+                edge_dominant, edge_count = row_color_stats(edge_codes, num_codes)
+                ok &= (edge_count <= max_unique_colors) & (edge_dominant == center_dominant[candidates])
+            simple_mask[start + candidates[ok]] = True
+
+        if progress:
+            progress(end, height)
+
+    return simple_mask
+
+
+def find_v4_band_cuts(simple_mask, min_band_height):
+    """
+    按 V4 规则从简单行掩码中求切割点：
+    高度达到 min_band_height 且不位于图片首尾的简单行区块，在其中点切割。
+    """
+    height = len(simple_mask)
+    cuts = []
+    for start, end in zip(*true_runs(simple_mask)):
+        if start > 0 and end < height and (end - start) >= min_band_height:
+            cuts.append(int(start + (end - start) // 2))
+    return cuts
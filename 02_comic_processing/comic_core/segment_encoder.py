@@ -0,0 +1,64 @@
+"""
+有界线程池编码器
+
+分割片段的 PNG 保存、重打包时的合并保存都是 CPU 密集的 zlib / libjpeg 编码，
+Pillow 在编码期间会释放 GIL，因此在线程池中可以多核并行。
+
+提交任务时如果未完成的任务数已达到 queue_depth 就阻塞等待，
+因此同时驻留在内存中的片段最多为 queue_depth 个 (提交方持有的当前片段除外)。
+结果按提交顺序返回，文件名由提交方决定，输出与串行保存完全一致；每个任务的异常单独记录。
+
+用法:
+    with SegmentEncoder() as encoder:
+        for path, segment in ...:
+            encoder.submit(path, segment.save, path, "PNG")
+    for path, result, error in encoder.results(): ...
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_ENCODE_WORKERS = max(1, min(4, os.cpu_count() or 1))
+DEFAULT_QUEUE_DEPTH = 4
+
+
+class SegmentEncoder:
+
+    def __init__(self, max_workers=DEFAULT_ENCODE_WORKERS, queue_depth=DEFAULT_QUEUE_DEPTH):
+        self.max_workers = max(1, max_workers)
+        self.queue_depth = max(1, queue_depth)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._slots = threading.BoundedSemaphore(self.queue_depth)
+        self._jobs = []  # [(输出路径, future)]，按提交顺序
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def submit(self, output_path, fn, *args, **kwargs):
+        """提交一个编码任务 fn(*args, **kwargs)；队列已满时阻塞，直到有任务完成。"""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._jobs.append((output_path, future))
+
+    def close(self):
+        """等待全部任务完成。"""
+        self._executor.shutdown(wait=True)
+
+    def results(self):
+        """等待全部任务完成，按提交顺序返回 [(输出路径, 返回值, 异常或 None)]。"""
+        self.close()
+        collected = []
+        for output_path, future in self._jobs:
+            error = future.exception()
+            collected.append((output_path, None if error else future.result(), error))
+        return collected
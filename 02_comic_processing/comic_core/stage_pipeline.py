@@ -0,0 +1,162 @@
+"""
+分阶段流水线
+
+多个任务 (项目) 依次流过若干阶段，每个阶段一个线程，阶段之间用有界队列连接：
+第 N+1 个项目解码时，第 N 个项目在做行分析，第 N-1 个项目在编码 / 写出。
+NumPy 与 Pillow 的重计算都会释放 GIL，因此各阶段可以在多核上真正重叠；
+有界队列限制了排队中的任务数，也就限制了同时驻留在内存中的画布数。
+
+每个阶段是一个函数 fn(item) -> item，前一阶段的返回值就是后一阶段的输入。
+某个任务在某阶段抛出异常后，后续阶段不再处理它，异常随结果一起返回。
+每个阶段统计忙碌时间、等待输入 (饥饿) 与等待下游 (阻塞) 的时间，用于找出瓶颈；
+每个任务在各阶段的忙碌时间另记在 item_seconds 中，便于按任务记录耗时。
+
+用法:
+    pipeline = StagePipeline([("decode", decode), ("analyze", analyze), ("encode", encode)])
+    results = pipeline.run(items)        # [(结果, 异常或 None)]，按输入顺序
+    for line in pipeline.report(): print(line)
+"""
+
+import sys
+import time
+import queue
+import threading
+import contextlib
+
+DEFAULT_QUEUE_DEPTH = 1
+
+_DONE = object()
+
+
+class _ThreadRoutedStream:
+    """按线程转发写入：已登记的线程写入各自的缓冲区，其余线程写入原来的流。"""
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.targets = {}
+
+    def _target(self):
+        return self.targets.get(threading.get_ident(), self.fallback)
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.fallback, name)
+
+
+@contextlib.contextmanager
+def _routed_output():
+    stdout, stderr = _ThreadRoutedStream(sys.stdout), _ThreadRoutedStream(sys.stderr)
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        yield stdout, stderr
+    finally:
+        sys.stdout, sys.stderr = stdout.fallback, stderr.fallback
+
+
+class StagePipeline:
+
+    def __init__(self, stages, queue_depth=DEFAULT_QUEUE_DEPTH):
+        """
+        :param stages: [(阶段名, fn)]，按执行顺序。
+        :param queue_depth: 每两个阶段之间最多排队的任务数。
+        """
+        self.stages = list(stages)
+        self.queue_depth = max(1, queue_depth)
+        self.stats = {name: {"busy": 0.0, "starved": 0.0, "blocked": 0.0, "items": 0} for name, _ in self.stages}
+        self.item_seconds = []  # 每个任务 {阶段: 忙碌秒数}，按输入顺序
+        self.wall = 0.0
+
+    def run(self, items, log_of=None, on_result=None):
+        """
+        让 items 依次流过全部阶段。
+
+        :param log_of: 可选，log_of(序号) 返回该任务的日志缓冲区；给出时各阶段的 print 输出写入对应缓冲区，
+                       不会与其他任务交错。
+        :param on_result: 可选回调 on_result(序号, 结果, 异常或 None)，在调用线程中按完成顺序调用；
+                          此时 item_seconds[序号] 已经完整。
+        :return: 按输入顺序排列的 [(结果, 异常或 None)]。
+        """
+        items = list(items)
+        queues = [queue.Queue(maxsize=self.queue_depth) for _ in range(len(self.stages) + 1)]
+        results = [None] * len(items)
+        self.item_seconds = [{} for _ in items]
+
+        with _routed_output() as (stdout, stderr):
+            def worker(position, name, fn):
+                stats = self.stats[name]
+                inbox, outbox = queues[position], queues[position + 1]
+                while True:
+                    waited = time.perf_counter()
+                    packet = inbox.get()
+                    stats["starved"] += time.perf_counter() - waited
+                    if packet is _DONE:
+                        outbox.put(_DONE)
+                        return
+                    index, value, error = packet
+                    if error is None:
+                        ident = threading.get_ident()
+                        log = log_of(index) if log_of else None
+                        if log is not None:
+                            stdout.targets[ident] = stderr.targets[ident] = log
+                        started = time.perf_counter()
+                        try:
+                            value = fn(value)
+                        except Exception as e:
+                            value, error = None, e
+                        finally:
+                            busy = time.perf_counter() - started
+                            stats["busy"] += busy
+                            self.item_seconds[index][name] = busy
+                            stats["items"] += 1
+                            stdout.targets.pop(ident, None)
+                            stderr.targets.pop(ident, None)
+                    waited = time.perf_counter()
+                    outbox.put((index, value, error))
+                    stats["blocked"] += time.perf_counter() - waited
+
+            start = time.perf_counter()
+            threads = [threading.Thread(target=worker, args=(position, name, fn), daemon=True)
+                       for position, (name, fn) in enumerate(self.stages)]
+            for thread in threads:
+                thread.start()
+
+            def feed():
+                for index, item in enumerate(items):
+                    queues[0].put((index, item, None))
+                queues[0].put(_DONE)
+
+            feeder = threading.Thread(target=feed, daemon=True)
+            feeder.start()
+            while True:
+                packet = queues[-1].get()
+                if packet is _DONE:
+                    break
+                index, value, error = packet
+                results[index] = (value, error)
+                if on_result:
+                    on_result(index, value, error)
+            for thread in threads + [feeder]:
+                thread.join()
+            self.wall = time.perf_counter() - start
+        return results
+
+    def utilization(self):
+        """{阶段: 忙碌时间占总耗时的比例}。"""
+        return {name: (stats["busy"] / self.wall if self.wall else 0.0) for name, stats in self.stats.items()}
+
+    def report(self):
+        """各阶段利用率报告 (文本行)，最后一行指出瓶颈阶段。"""
+        lines = [f"{'阶段':<10}{'忙碌(秒)':>10}{'利用率':>8}{'等待输入(秒)':>14}{'等待下游(秒)':>14}{'任务数':>8}"]
+        utilization = self.utilization()
+        for name, stats in self.stats.items():
+            lines.append(f"{name:<10}{stats['busy']:>10.1f}{utilization[name]:>8.0%}"
+                         f"{stats['starved']:>14.1f}{stats['blocked']:>14.1f}{stats['items']:>8}")
+        if self.stats:
+            bottleneck = max(self.stats, key=lambda name: self.stats[name]["busy"])
+            lines.append(f"总耗时 {self.wall:.1f} 秒，瓶颈阶段: {bottleneck} (利用率 {utilization[bottleneck]:.0%})")
+        return lines
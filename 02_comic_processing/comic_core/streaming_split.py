@@ -0,0 +1,191 @@
+"""
+流式合并 + 分割
+
+按自然顺序逐张解码源图片，把它们在长图中对应的行追加到一个有界的滚动缓冲区，
+行一到达就完成分类，一旦确认切割点便立即吐出完成的片段并释放其内存。
+长图从不完整地存在于内存中，峰值内存只取决于最高的单个片段。
+
+由于 V2 / V4 的行分类只依赖行本身，逐图分类的结果与整图分类完全一致；
+跨越两张源图片的纯色带由状态机中的"未结束色带"自然衔接。
+"""
+
+import numpy as np
+
+from .row_classifier import classify_solid_rows, classify_simple_rows_v4, true_runs
+from .fast_resize import DEFAULT_RESIZE_QUALITY, open_rgb_at_width
+
+CANVAS_BACKGROUND = 255
+
+
+def load_canvas_rows(item_info, canvas_width, target_width, resize_quality=DEFAULT_RESIZE_QUALITY):
+    """
+    按 merge_to_long_image 的规则解码一张源图片，返回它在长图中占据的行。
+
+    :param item_info: 尺寸分析得到的 {"path", "width", "height"} 字典。
+    :param resize_quality: 缩放质量，见 comic_core.fast_resize。
+    :return: 形状为 (height, canvas_width, 3) 的 uint8 数组；解码失败时抛出异常，由调用方处理。
+    """
+    rows = np.full((item_info["height"], canvas_width, 3), CANVAS_BACKGROUND, dtype=np.uint8)
+    pixels = np.asarray(open_rgb_at_width(item_info["path"], target_width, item_info["height"], resize_quality))
+    x_offset = 0 if target_width else (canvas_width - pixels.shape[1]) // 2
+    rows[:pixels.shape[0], x_offset:x_offset + pixels.shape[1]] = pixels[:item_info["height"]]
+    return rows
+
+
+class RollingRowBuffer:
+    """按绝对行号管理的行缓冲区，只保留尚未吐出的行。"""
+
+    def __init__(self):
+        self.pieces = []  # [(绝对起始行, 数组), ...]
+        self.buffered_rows = 0
+
+    def append(self, start_y, rows):
+        if len(rows):
+            self.pieces.append((start_y, rows))
+            self.buffered_rows += len(rows)
+
+    def take(self, start_y, end_y):
+        """取出 [start_y, end_y) 的行并丢弃 end_y 之前的所有行。"""
+        parts, remaining = [], []
+        for piece_start, rows in self.pieces:
+            piece_end = piece_start + len(rows)
+            if piece_end <= start_y:
+                continue
+            lo, hi = max(start_y, piece_start), min(end_y, piece_end)
+            if lo < hi:
+                parts.append(rows[lo - piece_start:hi - piece_start])
+            if piece_end > end_y:
+                keep_from = max(end_y, piece_start)
+                remaining.append((keep_from, rows[keep_from - piece_start:]))
+        self.pieces = remaining
+        self.buffered_rows = sum(len(rows) for _, rows in remaining)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.empty((0, 0, 3), dtype=np.uint8)
+
+
+class StreamingBandSplitter:
+    """
+    V2 / V4 切割规则的增量状态机。
+
+    method='v2': 任意纯色段只要后面出现内容行且高度达标即在中点切割 (与 find_solid_band_cuts 一致)，
+                 末尾不超过 10px 的尾片被丢弃。
+    method='v4': 不位于长图开头的空白段在后面出现内容行且高度达标时切割 (与 find_v4_band_cuts 一致)，
+                 尾片总是保留。
+    """
+
+    def __init__(self, method, classify_rows, min_band_height):
+        if method not in ('v2', 'v4'):
+            raise ValueError(f"未知的分割方法: {method}")
+        self.method = method
+        self.classify_rows = classify_rows
+        self.min_band_height = max(1, min_band_height) if method == 'v2' else min_band_height
+        self.min_tail_height = 11 if method == 'v2' else 1
+        self.buffer = RollingRowBuffer()
+        self.total_rows = 0
+        self.segment_start_y = 0
+        self.open_band_start_y = None  # 尚未被内容行终止的色带起点
+        self.cut_points = []
+        self.peak_buffered_rows = 0
+
+    def feed(self, rows):
+        """追加一批长图行，返回因此确认的片段列表 [(start_y, end_y, 数组), ...]。"""
+        block_start = self.total_rows
+        self.buffer.append(block_start, rows)
+        self.total_rows += len(rows)
+        self.peak_buffered_rows = max(self.peak_buffered_rows, self.buffer.buffered_rows)
+        if not len(rows):
+            return []
+
+        mask = np.asarray(self.classify_rows(rows), dtype=bool)
+        emitted = []
+        starts, ends = true_runs(mask)
+
+        if self.open_band_start_y is not None and not mask[0]:
+            emitted += self._close_band(self.open_band_start_y, block_start)
+            self.open_band_start_y = None
+
+        for start, end in zip(starts, ends):
+            band_start_y = block_start + start
+            if start == 0 and self.open_band_start_y is not None:
+                band_start_y = self.open_band_start_y
+            if end == len(mask):
+                self.open_band_start_y = band_start_y
+            else:
+                self.open_band_start_y = None
+                emitted += self._close_band(band_start_y, block_start + end)
+        return emitted
+
+    def finish(self):
+        """输入结束：吐出最后的尾片 (如果达到最小高度)。延伸到末尾的色带不产生切割。"""
+        segments = []
+        if self.total_rows - self.segment_start_y >= self.min_tail_height:
+            segments.append(self._emit(self.total_rows))
+        else:
+            self.buffer.take(self.segment_start_y, self.total_rows)
+        return segments
+
+    def _close_band(self, band_start_y, band_end_y):
+        band_height = band_end_y - band_start_y
+        if band_height < self.min_band_height:
+            return []
+        if self.method == 'v4' and band_start_y == 0:
+            return []
+        cut_point_y = band_start_y + band_height // 2
+        if cut_point_y <= self.segment_start_y:
+            self.segment_start_y = cut_point_y
+            return []
+        self.cut_points.append(cut_point_y)
+        return [self._emit(cut_point_y)]
+
+    def _emit(self, end_y):
+        start_y = self.segment_start_y
+        segment = self.buffer.take(start_y, end_y)
+        self.segment_start_y = end_y
+        return start_y, end_y, segment
+
+
+def make_v2_splitter(band_colors_list, tolerance, min_band_height):
+    return StreamingBandSplitter(
+        'v2', lambda rows: classify_solid_rows(rows, band_colors_list, tolerance), min_band_height
+    )
+
+
+def make_v4_splitter(quantization_factor, max_unique_colors, min_band_height, edge_margin_percent):
+    return StreamingBandSplitter(
+        'v4',
+        lambda rows: classify_simple_rows_v4(rows, quantization_factor, max_unique_colors, edge_margin_percent),
+        min_band_height
+    )
+
+
+def stream_segments(image_items, canvas_width, target_width, splitter, on_image_done=None,
+                    resize_quality=DEFAULT_RESIZE_QUALITY):
+    """
+    逐张解码源图片并喂给分割状态机，按顺序产出 (start_y, end_y, 数组) 片段。
+
+    与 merge_to_long_image 一致：解码失败的图片不占位置，后面的图片依次上移，
+    它原本的高度在所有图片之后以白色行补上 (长图的总高度不变)。
+
+    :param on_image_done: 可选回调 on_image_done(已处理图片数, 总数, 异常或 None)。
+    """
+    total = len(image_items)
+    failed_heights = []
+    for i, item_info in enumerate(image_items):
+        error = None
+        try:
+            rows = load_canvas_rows(item_info, canvas_width, target_width, resize_quality)
+        except Exception as e:
+            error = e
+            failed_heights.append(item_info["height"])
+        else:
+            for segment in splitter.feed(rows):
+                yield segment
+            del rows
+        if on_image_done:
+            on_image_done(i + 1, total, error)
+    for height in failed_heights:
+        for segment in splitter.feed(np.full((height, canvas_width, 3), CANVAS_BACKGROUND, dtype=np.uint8)):
+            yield segment
+    for segment in splitter.finish():
+        yield segment
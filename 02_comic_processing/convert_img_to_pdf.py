@@ -4,9 +4,18 @@ import os
 import shutil
 import sys
 import re
+import io
+import time
+import argparse
+import contextlib
 from PIL import Image, ImageFile
 import natsort
 import traceback
+from comic_core.dimension_index import get_image_dimensions
+from comic_core.document_writer import DocumentWriter, OUTPUT_FORMATS
+from comic_core.fast_resize import draft_for_size, resize_exact, scaled_height
+from comic_core.project_pool import available_memory_bytes, run_budgeted_pool
+from comic_core.project_scheduler import CostModel, project_features, load_timing_history, lpt_order, append_timing_record
 
 # --- 全局配置 ---
 ImageFile.LOAD_TRUNCATED_IMAGES = True
@@ -18,13 +27,26 @@ IMAGE_EXTENSIONS_FOR_MERGE = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif',
 # --- PDF页面与图像质量设置 ---
 PDF_TARGET_PAGE_WIDTH_PIXELS = 1600
 PDF_DPI = 300
+PDF_IMAGE_JPEG_QUALITY = 75  # 与此前 Pillow 生成 PDF 时的默认 JPEG 质量一致
+OUTPUT_FORMAT = "pdf"  # 输出格式：pdf / cbz (ZIP_STORED 图片包 + ComicInfo.xml) / both
+RESIZE_QUALITY = "balanced"  # 缩小到页宽的方式：fast / balanced (JPEG 解码时缩放 + 整数倍缩小) / exact (直接 LANCZOS)
+
+# --- 并行处理设置 ---
+# 未指定 --memory-budget-mb 时，使用当前可用内存的这一比例作为并行转换的内存预算
+DEFAULT_MEMORY_BUDGET_FRACTION = 0.75
+# 每个文件夹的耗时与工作量 (像素数、文件数)，写在 PDF 输出目录中；并行模式据此预测耗时，最长的文件夹最先开始
+TIMING_LOG_FILENAME = "conversion_timing.jsonl"
 # --- 全局配置结束 ---
 
+PROGRESS_BAR_ENABLED = True  # 并行模式的子进程中关闭，避免日志中充斥进度条
+
 
 def print_progress_bar(iteration, total, prefix='', suffix='', decimals=1, length=50, fill='█', print_end="\r"):
     """
     在终端打印一个可视化的进度条。
     """
+    if not PROGRESS_BAR_ENABLED:
+        return
     if total == 0:
         percent_str = "0.0%"
         filled_length = 0
@@ -66,86 +88,86 @@ def find_image_folders(root_dir, excluded_dirs):
 
 
 def create_pdf_from_images(image_paths_list, output_pdf_path,
-                           target_page_width_px, pdf_target_dpi):
+                           target_page_width_px, pdf_target_dpi, output_format=OUTPUT_FORMAT):
     """
-    从一系列图片文件路径创建一个PDF文件。
+    从一系列图片文件路径创建一个PDF文件 (output_format 为 'cbz' / 'both' 时输出同名 CBZ 或两者)。
+    :return: 有 PDF 时返回 PDF 路径，否则返回 CBZ 路径；失败时返回 None。
     """
     if not image_paths_list:
         print("    警告: 没有有效的图片可用于创建此PDF。")
         return None
 
-    processed_pil_images = []
-    total_images_for_pdf = len(image_paths_list)
-    print_progress_bar(0, total_images_for_pdf, prefix='      转换图片:', suffix='完成', length=40)
-
-    for i, image_path in enumerate(image_paths_list):
-        try:
-            with Image.open(image_path) as img:
-                img_to_process = img
-                if img_to_process.mode in ['RGBA', 'P']:
-                    background = Image.new("RGB", img_to_process.size, (255, 255, 255))
-                    background.paste(img_to_process, mask=img_to_process.split()[3] if img_to_process.mode == 'RGBA' else None)
-                    img_to_process = background
-                elif img_to_process.mode != 'RGB':
-                    img_to_process = img_to_process.convert('RGB')
-
-                original_width, original_height = img_to_process.size
-                if original_width > target_page_width_px:
-                    ratio = target_page_width_px / original_width
-                    new_height = int(original_height * ratio)
-                    img_resized = img_to_process.resize((target_page_width_px, new_height), Image.Resampling.LANCZOS)
-                else:
-                    img_resized = img_to_process.copy()
-
-                processed_pil_images.append(img_resized)
-        except Exception as e:
-            sys.stdout.write(f"\r      警告: 处理图片 '{os.path.basename(image_path)}' 失败: {e}。已跳过。\n")
-        finally:
-            print_progress_bar(i + 1, total_images_for_pdf, prefix='      转换图片:', suffix='完成', length=40)
+    # 借助尺寸索引提前排除无法识别的文件，避免逐张解码时才发现
+    dimensions = get_image_dimensions(image_paths_list)
+    unreadable = [p for p in image_paths_list if dimensions.get(p) is None]
+    for image_path in unreadable:
+        print(f"    警告: 无法识别图片 '{os.path.basename(image_path)}'，已跳过。")
+    image_paths_list = [p for p in image_paths_list if dimensions.get(p) is not None]
 
-    if not processed_pil_images:
+    total_images_for_pdf = len(image_paths_list)
+    if not total_images_for_pdf:
         print("    错误: 没有图片成功处理，无法创建PDF。")
         return None
+    print_progress_bar(0, total_images_for_pdf, prefix='      转换图片:', suffix='完成', length=40)
 
+    # 逐页写入，内存中只保留当前一页；宽度无需缩放时，RGB / 灰度 JPEG 原样嵌入 PDF，
+    # JPEG / WebP / PNG 原样存入 CBZ，都不再解码和重新编码
+    pages_written = 0
     try:
-        if len(processed_pil_images) == 1:
-            processed_pil_images[0].save(
-                output_pdf_path,
-                resolution=float(pdf_target_dpi),
-                optimize=True
-            )
-        else:
-            first_image = processed_pil_images[0]
-            other_images = processed_pil_images[1:]
-            first_image.save(
-                output_pdf_path,
-                save_all=True,
-                append_images=other_images,
-                resolution=float(pdf_target_dpi),
-                optimize=True
-            )
-        
-        print(f"    ✅ 成功创建 PDF: {os.path.basename(output_pdf_path)}")
-        return output_pdf_path
+        with DocumentWriter(output_pdf_path, output_format, pdf_target_dpi, PDF_IMAGE_JPEG_QUALITY) as writer:
+            for i, image_path in enumerate(image_paths_list):
+                info = dimensions[image_path]
+                try:
+                    if info["width"] <= target_page_width_px:
+                        writer.add_file(image_path, info, prepare=lambda img: _prepare_page_image(img, target_page_width_px))
+                    else:
+                        with Image.open(image_path) as img:
+                            writer.add_image(_prepare_page_image(img, target_page_width_px))
+                    pages_written += 1
+                except Exception as e:
+                    sys.stdout.write(f"\r      警告: 处理图片 '{os.path.basename(image_path)}' 失败: {e}。已跳过。\n")
+                finally:
+                    print_progress_bar(i + 1, total_images_for_pdf, prefix='      转换图片:', suffix='完成', length=40)
+            if pages_written == 0:
+                raise ValueError("没有图片成功处理")
     except Exception as e:
-        print(f"    ❌ 错误: 保存 PDF '{os.path.basename(output_pdf_path)}' 失败: {e}")
+        print(f"    ❌ 错误: 保存 {output_format.upper()} '{os.path.basename(output_pdf_path)}' 失败: {e}")
         traceback.print_exc()
         return None
-    finally:
-        for img_obj in processed_pil_images:
-            try:
-                img_obj.close()
-            except Exception:
-                pass
+
+    for path in writer.paths.values():
+        print(f"    ✅ 成功创建 {os.path.splitext(path)[1][1:].upper()}: {os.path.basename(path)}")
+    return writer.primary_path
+
+
+def _prepare_page_image(img, target_page_width_px):
+    """把图片转换为 RGB (透明部分铺白底)，宽度超过目标页宽时等比缩小。"""
+    original_width, original_height = img.size
+    target_size = None
+    if original_width > target_page_width_px:
+        target_size = (target_page_width_px, scaled_height(original_width, original_height, target_page_width_px))
+        draft_for_size(img, target_size, RESIZE_QUALITY)
+
+    img_to_process = img
+    if img_to_process.mode in ['RGBA', 'P']:
+        background = Image.new("RGB", img_to_process.size, (255, 255, 255))
+        background.paste(img_to_process, mask=img_to_process.split()[3] if img_to_process.mode == 'RGBA' else None)
+        img_to_process = background
+    elif img_to_process.mode != 'RGB':
+        img_to_process = img_to_process.convert('RGB')
+
+    if target_size:
+        return resize_exact(img_to_process, target_size, RESIZE_QUALITY)
+    return img_to_process
 
 
 def normalize_filenames(pdf_dir):
     """
     清理并规范化PDF文件夹中所有文件的名称。
     """
-    print("\n--- 步骤 3: 正在规范化PDF文件名 ---")
+    print("\n--- 步骤 3: 正在规范化PDF / CBZ文件名 ---")
     try:
-        pdf_files = [f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf')]
+        pdf_files = [f for f in os.listdir(pdf_dir) if f.lower().endswith(('.pdf', '.cbz'))]
     except FileNotFoundError:
         print(f"    目录 '{pdf_dir}' 未找到，跳过文件名规范化。")
         return
@@ -174,14 +196,118 @@ def normalize_filenames(pdf_dir):
         print("    所有文件名已符合规范，无需更改。")
 
 
-def run_conversion_process(root_dir):
+def list_folder_images(image_dir_path):
+    """文件夹中 (不含子文件夹) 按自然顺序排列的图片路径。"""
+    image_filenames = [f for f in os.listdir(image_dir_path)
+                       if f.lower().endswith(IMAGE_EXTENSIONS_FOR_MERGE) and not f.startswith('.')]
+    return [os.path.join(image_dir_path, f) for f in natsort.natsorted(image_filenames)]
+
+
+def estimate_folder_peak_bytes(image_paths, target_page_width_px=PDF_TARGET_PAGE_WIDTH_PIXELS):
+    """
+    估算转换一个文件夹的峰值内存：逐页写入时只持有当前一页，
+    取最大一页的解码结果 (按 RGBA 计) 加上缩放到页宽后的 RGB 副本。
+    """
+    peak = 0
+    for info in get_image_dimensions(image_paths).values():
+        if info is None:
+            continue
+        width, height = info["width"], info["height"]
+        page_width = min(width, target_page_width_px)
+        peak = max(peak, width * height * 4 + page_width * scaled_height(width, height, page_width) * 3)
+    return peak
+
+
+def convert_folder(image_dir_path, overall_pdf_output_dir, output_format=OUTPUT_FORMAT):
+    """
+    把一个图片文件夹转换为 PDF (或 CBZ)，不负责移动文件夹。
+
+    :return: {"path", "name", "status": 'ok' | 'failed' | 'empty', "pdf_path", "elapsed", "features", "log"}
+    """
+    start_time = time.time()
+    folder_name = os.path.basename(image_dir_path)
+    result = {"path": image_dir_path, "name": folder_name, "status": "failed", "pdf_path": None,
+              "elapsed": 0.0, "features": None, "log": None}
+    try:
+        sorted_image_paths = list_folder_images(image_dir_path)
+    except Exception as e:
+        print(f"  ❌ 错误: 无法读取文件夹 '{folder_name}' 的内容: {e}")
+        return result
+
+    if not sorted_image_paths:
+        print("    文件夹内未找到符合条件的图片，已跳过。")
+        result["status"] = "empty"
+        return result
+
+    output_pdf_filepath = os.path.join(overall_pdf_output_dir, f"{folder_name}.pdf")
+    result["pdf_path"] = create_pdf_from_images(
+        sorted_image_paths, output_pdf_filepath,
+        PDF_TARGET_PAGE_WIDTH_PIXELS, PDF_DPI, output_format
+    )
+    result["status"] = "ok" if result["pdf_path"] else "failed"
+    result["elapsed"] = time.time() - start_time
+    result["features"] = project_features(sorted_image_paths)
+    return result
+
+
+def convert_folder_captured(image_dir_path, overall_pdf_output_dir, output_format=OUTPUT_FORMAT):
+    """并行模式的子进程入口：关闭进度条，并把该文件夹的全部输出收集到独立的日志缓冲区中。"""
+    global PROGRESS_BAR_ENABLED
+    PROGRESS_BAR_ENABLED = False
+    log_buffer = io.StringIO()
+    with contextlib.redirect_stdout(log_buffer), contextlib.redirect_stderr(log_buffer):
+        try:
+            result = convert_folder(image_dir_path, overall_pdf_output_dir, output_format)
+        except Exception as e:
+            print(f"  ❌ 处理文件夹 '{os.path.basename(image_dir_path)}' 时发生未捕获的错误: {e}")
+            traceback.print_exc()
+            result = {"path": image_dir_path, "name": os.path.basename(image_dir_path), "status": "failed",
+                      "pdf_path": None, "elapsed": 0.0, "features": None, "log": None}
+    result["log"] = log_buffer.getvalue()
+    return result
+
+
+def record_timing(timing_log_path, result):
+    """把成功转换的文件夹的工作量与耗时追加到计时日志，供下次运行预测耗时。"""
+    if result["status"] != "ok" or not result["features"]:
+        return
+    record = {"project": result["name"], "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "elapsed": round(result["elapsed"], 3), "stages": {"convert": {"seconds": round(result["elapsed"], 3)}}}
+    record.update(result["features"])
+    error = append_timing_record(timing_log_path, record)
+    if error:
+        print(f"    警告: 写入计时日志失败: {error}")
+
+
+def move_converted_folder(image_dir_path, success_move_target_dir):
+    """移动已成功转换的文件夹；返回是否成功 (与目标同名而跳过时视为成功)。"""
+    folder_name = os.path.basename(image_dir_path)
+    print(f"    移动已成功处理的文件夹: {folder_name}")
+    try:
+        if folder_name == os.path.basename(success_move_target_dir):
+            print(f"      -> 跳过移动，源与目标文件夹同名。")
+        else:
+            shutil.move(image_dir_path, success_move_target_dir)
+            print(f"      -> 已移至 '{SUCCESS_MOVE_SUBDIR_NAME}' 文件夹。")
+        return True
+    except Exception as e:
+        print(f"      ❌ 错误: 移动文件夹失败: {e}")
+        return False
+
+
+def run_conversion_process(root_dir, output_format=OUTPUT_FORMAT, workers=1, memory_budget_mb=None):
     """
-    执行从查找文件夹到生成PDF再到移动和重命名的完整流程。
+    执行从查找文件夹到生成PDF (或 CBZ) 再到移动和重命名的完整流程。
+
+    workers > 1 时在进程池中并行转换：按计时日志学习到的吞吐量预测各文件夹耗时，
+    预计最久的文件夹最先开始 (LPT)，同时运行的文件夹估算内存之和不超过预算。
+    并行模式下所有转换结束后才按原顺序移动文件夹，嵌套的图片文件夹不会在转换前被移走。
     """
     # 根据根目录名称创建唯一的PDF输出文件夹
     root_dir_basename = os.path.basename(os.path.abspath(root_dir))
     overall_pdf_output_dir = os.path.join(root_dir, f"{root_dir_basename}_pdfs")
     os.makedirs(overall_pdf_output_dir, exist_ok=True)
+    timing_log_path = os.path.join(overall_pdf_output_dir, TIMING_LOG_FILENAME)
     
     # 创建用于存放成功处理项目的文件夹
     success_move_target_dir = os.path.join(root_dir, SUCCESS_MOVE_SUBDIR_NAME)
@@ -200,49 +326,63 @@ def run_conversion_process(root_dir):
     failed_tasks = []
     success_count = 0
 
-    for i, image_dir_path in enumerate(folders_to_process):
-        folder_name = os.path.basename(image_dir_path)
-        print(f"\n--- ({i+1}/{total_folders}) 正在处理: {folder_name} ---")
-
-        try:
-            image_filenames = [f for f in os.listdir(image_dir_path)
-                               if f.lower().endswith(IMAGE_EXTENSIONS_FOR_MERGE) and not f.startswith('.')]
-        except Exception as e:
-            print(f"  ❌ 错误: 无法读取文件夹 '{folder_name}' 的内容: {e}")
-            failed_tasks.append(folder_name)
-            continue
-            
-        if not image_filenames:
-            print("    文件夹内未找到符合条件的图片，已跳过。")
-            continue
-
-        sorted_image_paths = [os.path.join(image_dir_path, f) for f in natsort.natsorted(image_filenames)]
-        output_pdf_filename = f"{folder_name}.pdf"
-        output_pdf_filepath = os.path.join(overall_pdf_output_dir, output_pdf_filename)
-
-        result_path = create_pdf_from_images(
-            sorted_image_paths, output_pdf_filepath,
-            PDF_TARGET_PAGE_WIDTH_PIXELS, PDF_DPI
-        )
-        
-        if result_path:
-            success_count += 1
-            # 移动已成功处理的文件夹
-            print(f"    移动已成功处理的文件夹: {folder_name}")
-            try:
-                # 确保目标文件夹存在
-                if os.path.basename(image_dir_path) == os.path.basename(success_move_target_dir):
-                    print(f"      -> 跳过移动，源与目标文件夹同名。")
-                else:
-                    shutil.move(image_dir_path, success_move_target_dir)
-                    print(f"      -> 已移至 '{SUCCESS_MOVE_SUBDIR_NAME}' 文件夹。")
-            except Exception as e:
-                print(f"      ❌ 错误: 移动文件夹失败: {e}")
-                if folder_name not in failed_tasks:
-                    failed_tasks.append(f"{folder_name} (移动失败)")
-                success_count -= 1
+    def finish_folder(result, move=True):
+        nonlocal success_count
+        record_timing(timing_log_path, result)
+        if result["status"] == "failed":
+            failed_tasks.append(result["name"])
+        elif result["status"] == "ok":
+            if not move or move_converted_folder(result["path"], success_move_target_dir):
+                success_count += 1
+            else:
+                failed_tasks.append(f"{result['name']} (移动失败)")
+
+    if workers > 1 and total_folders > 1:
+        if memory_budget_mb is not None:
+            memory_budget_bytes = memory_budget_mb * 1024 * 1024
         else:
-            failed_tasks.append(folder_name)
+            available = available_memory_bytes()
+            memory_budget_bytes = int(available * DEFAULT_MEMORY_BUDGET_FRACTION) if available else None
+        cost_model = CostModel.from_history(load_timing_history(timing_log_path))
+        print(f"⚙️  并行模式: {workers} 个工作进程，内存预算: "
+              f"{f'{memory_budget_bytes / 1024 / 1024:.0f}MB' if memory_budget_bytes else '不限'}")
+        print(f"    耗时模型 — {cost_model.describe()}")
+        memory_estimates, predicted_seconds = [], []
+        for image_dir_path in folders_to_process:
+            try:
+                image_paths = list_folder_images(image_dir_path)
+            except OSError:
+                image_paths = []
+            memory_estimates.append(estimate_folder_peak_bytes(image_paths))
+            predicted_seconds.append(cost_model.predict(project_features(image_paths)))
+        schedule = lpt_order(predicted_seconds)
+        print("    调度顺序 (预计耗时最长的优先):")
+        for index in schedule:
+            print(f"    - {os.path.basename(folders_to_process[index])}: 预计 {predicted_seconds[index]:.1f} 秒，"
+                  f"峰值内存约 {memory_estimates[index] / 1024 / 1024:.0f}MB")
+
+        completed = []
+
+        def on_result(index, result, error):
+            folder_name = os.path.basename(folders_to_process[index])
+            completed.append(index)
+            print(f"\n--- ({len(completed)}/{total_folders}) 已完成: {folder_name} ---")
+            if error is not None:
+                print(f"  ❌ 工作进程处理文件夹 '{folder_name}' 时异常退出: {error}")
+            elif result.get("log"):
+                print(result["log"].rstrip("\n"))
+
+        results = run_budgeted_pool(
+            [(path, overall_pdf_output_dir, output_format) for path in folders_to_process],
+            convert_folder_captured, workers, memory_budget_bytes, memory_estimates, on_result, order=schedule
+        )
+        for image_dir_path, result in zip(folders_to_process, results):
+            finish_folder(result or {"path": image_dir_path, "name": os.path.basename(image_dir_path),
+                                     "status": "failed", "features": None})
+    else:
+        for i, image_dir_path in enumerate(folders_to_process):
+            print(f"\n--- ({i+1}/{total_folders}) 正在处理: {os.path.basename(image_dir_path)} ---")
+            finish_folder(convert_folder(image_dir_path, overall_pdf_output_dir, output_format))
 
     normalize_filenames(overall_pdf_output_dir)
 
@@ -264,11 +404,26 @@ def run_conversion_process(root_dir):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量图片文件夹转PDF / CBZ")
+    parser.add_argument('-p', '--path', default=None, help='包含多个图片子文件夹的【根目录】路径 (省略时交互输入)。')
+    parser.add_argument(
+        '--output', choices=OUTPUT_FORMATS, default=OUTPUT_FORMAT,
+        help=f'输出格式 (默认 {OUTPUT_FORMAT})：cbz 为不压缩的图片包 + ComicInfo.xml，无需缩放的 JPEG / WebP / PNG 原样存入；both 同时输出两者。'
+    )
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行转换文件夹的进程数 (默认 1，即逐个处理)；并行时预计耗时最长的文件夹最先开始。')
+    parser.add_argument('--memory-budget-mb', type=int, default=None,
+                        help='并行模式下同时转换的文件夹估算内存上限 (MB)，默认取当前可用内存的 75%%。')
+    args = parser.parse_args()
+
     print("=" * 70)
     print("=== 批量图片文件夹转PDF脚本 (V2 - 支持成功后移动) ===")
     print("=" * 70)
     
-    root_input_dir = ""
+    root_input_dir = os.path.abspath(args.path) if args.path else ""
+    if root_input_dir and not os.path.isdir(root_input_dir):
+        print(f"错误：路径 '{root_input_dir}' 不是一个有效的目录或不存在。")
+        sys.exit(1)
     # 尝试从共享设置加载默认路径
     try:
         sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -278,7 +433,7 @@ if __name__ == "__main__":
     except (ImportError, FileNotFoundError):
         default_root_dir_name = os.path.join(os.path.expanduser("~"), "Downloads")
 
-    while True:
+    while not root_input_dir:
         prompt_message = (
             f"请输入包含多个图片子文件夹的【根目录】路径。\n"
             f"(直接按 Enter 键将使用默认路径: '{default_root_dir_name}'): "
@@ -298,7 +453,7 @@ if __name__ == "__main__":
             print(f"\n错误：路径 '{abs_path_to_check}' 不是一个有效的目录或不存在。请重试。\n")
     
     try:
-        run_conversion_process(root_input_dir)
+        run_conversion_process(root_input_dir, args.output, args.workers, args.memory_budget_mb)
     except Exception as e:
         print("\n" + "!"*70)
         print("脚本在执行过程中遇到意外的严重错误，已终止。")
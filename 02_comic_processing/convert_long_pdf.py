@@ -1,23 +1,29 @@
 import os
-import fitz  # PyMuPDF
-from PIL import Image
-import math
 import sys
 import json
 import shutil
 import traceback
 
+from comic_core.pdf_rasterizer import PageRenderPool, DEFAULT_RENDER_WORKERS
+
 # --- 可配置参数 ---
 
 # 图像渲染的DPI (分辨率)，越高质量越好，文件也越大
 DPI = 300
 
-# 页面最大高度 (像素)，超过此高度将被切割
+# 页面最大高度 (像素)，超过此高度将按 clip 区域逐片渲染 (不再渲染整页后裁切)
 MAX_PAGE_HEIGHT = 16384
 
+# 并行渲染页面的进程数 (1 表示在当前进程中逐页渲染)
+RENDER_WORKERS = DEFAULT_RENDER_WORKERS
+
 # 输出图片格式 ('png' 或 'jpg')
 IMAGE_FORMAT = 'png'
 
+# 只含一张铺满页面图片的页面直接提取内嵌图片 (JPEG 原样写出，不按 DPI 渲染)；
+# 设为 False 则所有页面都按 DPI 渲染为 IMAGE_FORMAT
+EXTRACT_EMBEDDED_IMAGES = True
+
 # 新增：处理完的PDF源文件存放目录名
 PROCESSED_PDF_FOLDER_NAME = "converted_pdfs"
 
@@ -37,6 +43,8 @@ def convert_pdf_with_splitting_in_subdirs(root_dir: str):
     print(f"[*] 开始处理...")
     print(f"[*] 根目录: {root_dir}")
     print(f"[*] 页面最大高度: {MAX_PAGE_HEIGHT}px")
+    print(f"[*] 渲染进程数: {RENDER_WORKERS}")
+    print(f"[*] 单图页面直接提取内嵌图片: {'是' if EXTRACT_EMBEDDED_IMAGES else '否'}")
     print("-" * 50)
 
     if not os.path.isdir(root_dir):
@@ -59,108 +67,107 @@ def convert_pdf_with_splitting_in_subdirs(root_dir: str):
     total_successful_conversions = 0
     total_failed_conversions = 0
 
-    # 遍历每个子目录
-    for subdir in sorted(subdirs):
-        subdir_path = os.path.join(root_dir, subdir)
-        print(f"\n{'='*60}")
-        print(f"[*] 正在处理子目录: {subdir}")
-        print(f"[*] 子目录路径: {subdir_path}")
-        print(f"{'='*60}")
+    # 遍历每个子目录；所有子目录共用一个渲染进程池
+    with PageRenderPool(RENDER_WORKERS) as render_pool:
+        for subdir in sorted(subdirs):
+            subdir_path = os.path.join(root_dir, subdir)
+            print(f"\n{'='*60}")
+            print(f"[*] 正在处理子目录: {subdir}")
+            print(f"[*] 子目录路径: {subdir_path}")
+            print(f"{'='*60}")
         
-        # 创建存放已处理PDF的文件夹（以子目录名命名）
-        processed_pdfs_dir = os.path.join(subdir_path, f"{subdir}_processed_pdfs")
-        os.makedirs(processed_pdfs_dir, exist_ok=True)
-        print(f"[*] 已处理的PDF将被移至: {processed_pdfs_dir}")
+            # 创建存放已处理PDF的文件夹（以子目录名命名）
+            processed_pdfs_dir = os.path.join(subdir_path, f"{subdir}_processed_pdfs")
+            os.makedirs(processed_pdfs_dir, exist_ok=True)
+            print(f"[*] 已处理的PDF将被移至: {processed_pdfs_dir}")
         
-        # 获取当前子目录中的PDF文件
-        try:
-            pdf_files = [f for f in os.listdir(subdir_path) 
-                        if f.lower().endswith('.pdf') and not f.startswith('.')]
-            if not pdf_files:
-                print(f"[警告] 在子目录 '{subdir}' 中未找到任何PDF文件。")
+            # 获取当前子目录中的PDF文件
+            try:
+                pdf_files = [f for f in os.listdir(subdir_path) 
+                            if f.lower().endswith('.pdf') and not f.startswith('.')]
+                if not pdf_files:
+                    print(f"[警告] 在子目录 '{subdir}' 中未找到任何PDF文件。")
+                    continue
+            except Exception as e:
+                print(f"[错误] 无法读取子目录 '{subdir_path}': {e}")
                 continue
-        except Exception as e:
-            print(f"[错误] 无法读取子目录 '{subdir_path}': {e}")
-            continue
         
-        print(f"[*] 在子目录 '{subdir}' 中找到 {len(pdf_files)} 个PDF文件。")
+            print(f"[*] 在子目录 '{subdir}' 中找到 {len(pdf_files)} 个PDF文件。")
         
-        successful_conversions = 0
-        failed_conversions = 0
+            successful_conversions = 0
+            failed_conversions = 0
 
-        for pdf_file in sorted(pdf_files):
-            pdf_path = os.path.join(subdir_path, pdf_file)
+            # 先为所有PDF提交渲染任务 (多个PDF的页面在进程池中并行)，再按文件、页码顺序收集结果
+            submitted = []
+            for pdf_file in sorted(pdf_files):
+                pdf_path = os.path.join(subdir_path, pdf_file)
             
-            if not os.path.exists(pdf_path):
-                print(f"\n--- 跳过文件: {pdf_file} ---")
-                print(f"  [警告] 文件路径无效或不可读: {pdf_path}")
-                failed_conversions += 1
-                continue
-
-            pdf_base_name = os.path.splitext(pdf_file)[0]
-            current_output_subdir = os.path.join(subdir_path, pdf_base_name)
+                if not os.path.exists(pdf_path):
+                    print(f"\n--- 跳过文件: {pdf_file} ---")
+                    print(f"  [警告] 文件路径无效或不可读: {pdf_path}")
+                    failed_conversions += 1
+                    continue
+
+                pdf_base_name = os.path.splitext(pdf_file)[0]
+                current_output_subdir = os.path.join(subdir_path, pdf_base_name)
             
-            try:
-                os.makedirs(current_output_subdir, exist_ok=True)
+                try:
+                    os.makedirs(current_output_subdir, exist_ok=True)
+                except Exception as e:
+                    print(f"[错误] 创建输出子目录 '{current_output_subdir}' 失败: {e}")
+                    failed_conversions += 1
+                    continue 
+
+                try:
+                    futures = render_pool.submit_pdf(pdf_path, current_output_subdir, pdf_base_name,
+                                                     DPI, MAX_PAGE_HEIGHT, IMAGE_FORMAT, EXTRACT_EMBEDDED_IMAGES)
+                except Exception as e:
+                    print(f"[错误] 打开文件 '{pdf_file}' 时发生严重错误: {type(e).__name__} - {e}")
+                    failed_conversions += 1
+                    continue
+                submitted.append((pdf_file, pdf_path, current_output_subdir, futures))
+
+            for pdf_file, pdf_path, current_output_subdir, futures in submitted:
                 print(f"\n--- 处理文件: {pdf_file} ---")
                 print(f"    输出至: {current_output_subdir}")
-            except Exception as e:
-                print(f"[错误] 创建输出子目录 '{current_output_subdir}' 失败: {e}")
-                failed_conversions += 1
-                continue 
-            
-            try:
-                doc = fitz.open(pdf_path)
-                for i, page in enumerate(doc):
-                    page_num = i + 1
-                    pix = page.get_pixmap(dpi=DPI)
-                    
-                    if pix.height <= MAX_PAGE_HEIGHT:
-                        image_filename = f"{pdf_base_name}_page_{page_num:03d}.{IMAGE_FORMAT}"
-                        output_path = os.path.join(current_output_subdir, image_filename)
-                        pix.save(output_path)
-                        print(f"  - 已保存页面: {page_num} -> {image_filename}")
-                    else:
-                        print(f"  - 页面 {page_num} 高度为 {pix.height}px，超过最大值 {MAX_PAGE_HEIGHT}px，正在切割...")
-                        img_pil = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                        num_splits = math.ceil(img_pil.height / MAX_PAGE_HEIGHT)
-                        
-                        for part_num in range(num_splits):
-                            top = part_num * MAX_PAGE_HEIGHT
-                            bottom = min((part_num + 1) * MAX_PAGE_HEIGHT, img_pil.height)
-                            box = (0, top, img_pil.width, bottom)
-                            cropped_img = img_pil.crop(box)
-                            image_filename = f"{pdf_base_name}_page_{page_num:03d}_part_{part_num+1:02d}.{IMAGE_FORMAT}"
-                            output_path = os.path.join(current_output_subdir, image_filename)
-                            cropped_img.save(output_path)
-                            print(f"    - 已保存分片: {part_num+1}/{num_splits} -> {image_filename}")
-                doc.close()
-                print(f"--- 完成文件: {pdf_file} ---")
-                successful_conversions += 1
-
-                # 移动已成功处理的PDF文件到子目录专用的processed文件夹
                 try:
-                    destination_path = os.path.join(processed_pdfs_dir, pdf_file)
-                    shutil.move(pdf_path, destination_path)
-                    print(f"    -> 已将源文件 '{pdf_file}' 移动至 '{subdir}_processed_pdfs' 文件夹。")
-                except Exception as move_error:
-                    print(f"    [警告] 移动文件 '{pdf_file}' 失败: {move_error}")
-
-            except Exception as e:
-                print(f"[错误] 处理文件 '{pdf_file}' 时发生严重错误: {type(e).__name__} - {e}")
-                failed_conversions += 1
-                continue
+                    for i, future in enumerate(futures):
+                        page_num = i + 1
+                        pixel_height, image_filenames, extracted = future.result()
+                        source_label = "提取内嵌图片" if extracted else "渲染"
+                    
+                        if len(image_filenames) == 1:
+                            print(f"  - 已保存页面 ({source_label}): {page_num} -> {image_filenames[0]}")
+                        else:
+                            print(f"  - 页面 {page_num} 高度为 {pixel_height}px，超过最大值 {MAX_PAGE_HEIGHT}px，已切割 ({source_label})...")
+                            for part_num, image_filename in enumerate(image_filenames, 1):
+                                print(f"    - 已保存分片: {part_num}/{len(image_filenames)} -> {image_filename}")
+                    print(f"--- 完成文件: {pdf_file} ---")
+                    successful_conversions += 1
+
+                    # 移动已成功处理的PDF文件到子目录专用的processed文件夹
+                    try:
+                        destination_path = os.path.join(processed_pdfs_dir, pdf_file)
+                        shutil.move(pdf_path, destination_path)
+                        print(f"    -> 已将源文件 '{pdf_file}' 移动至 '{subdir}_processed_pdfs' 文件夹。")
+                    except Exception as move_error:
+                        print(f"    [警告] 移动文件 '{pdf_file}' 失败: {move_error}")
+
+                except Exception as e:
+                    print(f"[错误] 处理文件 '{pdf_file}' 时发生严重错误: {type(e).__name__} - {e}")
+                    failed_conversions += 1
+                    continue
 
         
-        # 子目录处理完成统计
-        print(f"\n--- 子目录 '{subdir}' 处理完毕 ---")
-        print(f"    成功处理: {successful_conversions} 个PDF文件。")
-        print(f"    跳过/失败: {failed_conversions} 个PDF文件。")
-        print(f"    输出图片保存在各自PDF同名的子子目录中。")
-        print(f"    处理过的PDF源文件已移至 '{subdir}_processed_pdfs' 文件夹。")
+            # 子目录处理完成统计
+            print(f"\n--- 子目录 '{subdir}' 处理完毕 ---")
+            print(f"    成功处理: {successful_conversions} 个PDF文件。")
+            print(f"    跳过/失败: {failed_conversions} 个PDF文件。")
+            print(f"    输出图片保存在各自PDF同名的子子目录中。")
+            print(f"    处理过的PDF源文件已移至 '{subdir}_processed_pdfs' 文件夹。")
         
-        total_successful_conversions += successful_conversions
-        total_failed_conversions += failed_conversions
+            total_successful_conversions += successful_conversions
+            total_failed_conversions += failed_conversions
     
     # 总体处理完成统计
     print("\n" + "=" * 70)
@@ -4,9 +4,13 @@ from PIL import Image, ImageFile
 import natsort
 import sys
 from collections import Counter
-import math
 import traceback
 import json
+import numpy as np
+
+from comic_core.row_classifier import classify_solid_rows, find_solid_band_cuts, cuts_to_segments
+from comic_core.dimension_index import get_image_dimensions
+from comic_core.segment_encoder import SegmentEncoder
 
 # --- 全局配置 ---
 ImageFile.LOAD_TRUNCATED_IMAGES = True
@@ -181,26 +185,24 @@ def merge_to_long_image(source_project_dir, output_long_image_dir, long_image_fi
     total_calculated_height = 0
     max_calculated_width = 0
 
-    total_files_to_analyze = len(sorted_image_filepaths)
-    if total_files_to_analyze > 0:
-        print_progress_bar(0, total_files_to_analyze, prefix='    分析图片尺寸:', suffix='完成', length=40)
-    
-    for i, filepath in enumerate(sorted_image_filepaths):
-        try:
-            with Image.open(filepath) as img:
-                images_data.append({
-                    "path": filepath,
-                    "width": img.width,
-                    "height": img.height
-                })
-                total_calculated_height += img.height
-                if img.width > max_calculated_width:
-                    max_calculated_width = img.width
-        except Exception as e:
-            print(f"\n    警告: 打开或读取图片 '{os.path.basename(filepath)}' 失败: {e}。已跳过。")
+    # 尺寸来自目录下的尺寸索引，缺失的条目在线程池中只读文件头补全
+    dimensions = get_image_dimensions(
+        sorted_image_filepaths,
+        progress=lambda done, total: print_progress_bar(done, total, prefix='    分析图片尺寸:', suffix='完成', length=40)
+    )
+    for filepath in sorted_image_filepaths:
+        info = dimensions.get(filepath)
+        if info is None:
+            print(f"\n    警告: 打开或读取图片 '{os.path.basename(filepath)}' 失败。已跳过。")
             continue
-        if total_files_to_analyze > 0:
-            print_progress_bar(i + 1, total_files_to_analyze, prefix='    分析图片尺寸:', suffix='完成', length=40)
+        images_data.append({
+            "path": filepath,
+            "width": info["width"],
+            "height": info["height"]
+        })
+        total_calculated_height += info["height"]
+        if info["width"] > max_calculated_width:
+            max_calculated_width = info["width"]
 
     if not images_data:
         print("    没有有效的图片可供合并。")
@@ -241,37 +243,6 @@ def merge_to_long_image(source_project_dir, output_long_image_dir, long_image_fi
 # 注意：原 detect_and_add_background_colors 函数已删除
 # 现在直接使用预设的韩漫常见背景色，提高速度和效率
 
-def are_colors_close(color1, color2, tolerance):
-    """根据欧氏距离检查两种RGB颜色是否接近。"""
-    if tolerance == 0:
-        return color1 == color2
-    r1, g1, b1 = color1
-    r2, g2, b2 = color2
-    distance = math.sqrt((r1 - r2)**2 + (g1 - g2)**2 + (b1 - b2)**2)
-    return distance <= tolerance
-
-def is_solid_color_row(pixels, y, width, solid_colors_list, tolerance):
-    """检查给定行是否为纯色带，允许一定的容差。"""
-    if width == 0:
-        return False
-
-    first_pixel_rgb = pixels[0, y][:3]
-    
-    base_color_match = None
-    for base_color in solid_colors_list:
-        if are_colors_close(first_pixel_rgb, base_color, tolerance):
-            base_color_match = first_pixel_rgb
-            break
-            
-    if base_color_match is None:
-        return False
-        
-    for x in range(1, width):
-        if not are_colors_close(pixels[x, y][:3], base_color_match, tolerance):
-            return False
-            
-    return True
-
 def split_long_image(long_image_path, output_split_dir, min_solid_band_height, band_colors_list, tolerance):
     """基于在足够高的纯色带后找到内容行的逻辑来分割长图。"""
     print(f"\n  --- 步骤 2: 按纯色带分割长图 '{os.path.basename(long_image_path)}' ---")
@@ -285,57 +256,35 @@ def split_long_image(long_image_path, output_split_dir, min_solid_band_height, b
     try:
         if min_solid_band_height < 1: min_solid_band_height = 1
 
-        img = Image.open(long_image_path).convert("RGBA")
-        pixels = img.load()
-        img_width, img_height = img.size
+        with Image.open(long_image_path) as img:
+            img_rgba = img.convert("RGBA")
+        img_width, img_height = img_rgba.size
 
         if img_height == 0 or img_width == 0:
             print(f"    图片 '{os.path.basename(long_image_path)}' 尺寸为零，无法分割。")
             return []
 
         original_basename, _ = os.path.splitext(os.path.basename(long_image_path))
-        part_index = 1
-        current_segment_start_y = 0
-        solid_band_after_last_content_start_y = -1
 
         print_progress_bar(0, img_height, prefix='    扫描长图:    ', suffix='完成', length=40)
-
-        for y in range(img_height):
-            print_progress_bar(y + 1, img_height, prefix='    扫描长图:    ', suffix=f'第 {y+1}/{img_height} 行', length=40)
-
-            is_solid = is_solid_color_row(pixels, y, img_width, band_colors_list, tolerance)
-
-            if not is_solid: # 这是一个 "内容" 行
-                if solid_band_after_last_content_start_y != -1:
-                    solid_band_height = y - solid_band_after_last_content_start_y
-                    if solid_band_height >= min_solid_band_height:
-                        cut_point_y = solid_band_after_last_content_start_y + (solid_band_height // 2)
-                        if cut_point_y > current_segment_start_y:
-                            segment = img.crop((0, current_segment_start_y, img_width, cut_point_y))
-                            output_filename = f"{original_basename}_split_part_{part_index}.png"
-                            output_filepath = os.path.join(output_split_dir, output_filename)
-                            try:
-                                segment.save(output_filepath, "PNG")
-                                split_image_paths.append(output_filepath)
-                                part_index += 1
-                            except Exception as e_save:
-                                print(f"      保存分割片段 '{output_filename}' 失败: {e_save}")
-                        current_segment_start_y = cut_point_y
-                solid_band_after_last_content_start_y = -1
-            else: # 这是一个 "纯色" 行
-                if solid_band_after_last_content_start_y == -1:
-                    solid_band_after_last_content_start_y = y
-
-        if current_segment_start_y < img_height:
-            segment = img.crop((0, current_segment_start_y, img_width, img_height))
-            if segment.height > 10: # 避免保存过小的切片
-                output_filename = f"{original_basename}_split_part_{part_index}.png"
-                output_filepath = os.path.join(output_split_dir, output_filename)
-                try:
-                    segment.save(output_filepath, "PNG")
-                    split_image_paths.append(output_filepath)
-                except Exception as e_save:
-                     print(f"      保存最后一个分割片段 '{output_filename}' 失败: {e_save}")
+        solid_mask = classify_solid_rows(
+            np.asarray(img_rgba)[:, :, :3], band_colors_list, tolerance,
+            progress=lambda done, total: print_progress_bar(done, total, prefix='    扫描长图:    ', suffix=f'第 {done}/{total} 行', length=40)
+        )
+        cut_points = find_solid_band_cuts(solid_mask, min_solid_band_height)
+
+        # 片段在有界线程池中并行编码，文件名按切割顺序预先确定
+        with SegmentEncoder() as encoder:
+            segments = cuts_to_segments(cut_points, img_height, min_tail_height=11) # 避免保存过小的尾部切片
+            for part_index, (start_y, end_y) in enumerate(segments, start=1):
+                segment = img_rgba.crop((0, start_y, img_width, end_y))
+                output_filepath = os.path.join(output_split_dir, f"{original_basename}_split_part_{part_index}.png")
+                encoder.submit(output_filepath, segment.save, output_filepath, "PNG")
+        for output_filepath, _, e_save in encoder.results():
+            if e_save is None:
+                split_image_paths.append(output_filepath)
+            else:
+                print(f"      保存分割片段 '{os.path.basename(output_filepath)}' 失败: {e_save}")
 
         if not split_image_paths and img_height > 0:
             print(f"    未能根据指定的纯色带分割 '{os.path.basename(long_image_path)}'。")
@@ -358,15 +307,15 @@ def _merge_image_list_for_repack(image_paths, output_path):
     images_data = []
     total_height = 0
     max_width = 0
+    dimensions = get_image_dimensions(image_paths, persist=False)
     for path in image_paths:
-        try:
-            with Image.open(path) as img:
-                images_data.append({"path": path, "width": img.width, "height": img.height})
-                total_height += img.height
-                if img.width > max_width:
-                    max_width = img.width
-        except Exception:
+        info = dimensions.get(path)
+        if info is None:
             continue
+        images_data.append({"path": path, "width": info["width"], "height": info["height"]})
+        total_height += info["height"]
+        if info["width"] > max_width:
+            max_width = info["width"]
             
     if not images_data: return False
 
@@ -13,6 +13,10 @@ except ImportError:
     print("错误：此脚本需要 numpy 库。请使用 'pip install numpy' 命令进行安装。")
     sys.exit(1)
 
+from comic_core.row_classifier import classify_simple_rows_v4, find_v4_band_cuts, cuts_to_segments
+from comic_core.dimension_index import get_image_dimensions
+from comic_core.segment_encoder import SegmentEncoder
+
 # --- 全局配置 ---
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 Image.MAX_IMAGE_PIXELS = None
@@ -86,17 +90,18 @@ def merge_to_long_image(source_project_dir, output_long_image_dir, long_image_fi
 
     sorted_image_filepaths = natsort.natsorted(image_filepaths)
     images_data, total_height = [], 0
-    print_progress_bar(0, len(sorted_image_filepaths), prefix='    分析并计算尺寸:', suffix='完成', length=40)
-    for i, filepath in enumerate(sorted_image_filepaths):
-        try:
-            with Image.open(filepath) as img:
-                new_height = int(img.height * (target_width / img.width)) if img.width != target_width else img.height
-                images_data.append({"path": filepath, "new_height": new_height})
-                total_height += new_height
-        except Exception as e:
-            print(f"\n    警告: 打开或读取图片 '{os.path.basename(filepath)}' 失败: {e}。已跳过。")
+    dimensions = get_image_dimensions(
+        sorted_image_filepaths,
+        progress=lambda done, total: print_progress_bar(done, total, prefix='    分析并计算尺寸:', suffix='完成', length=40)
+    )
+    for filepath in sorted_image_filepaths:
+        info = dimensions.get(filepath)
+        if info is None:
+            print(f"\n    警告: 打开或读取图片 '{os.path.basename(filepath)}' 失败。已跳过。")
             continue
-        print_progress_bar(i + 1, len(sorted_image_filepaths), prefix='    分析并计算尺寸:', suffix='完成', length=40)
+        new_height = int(info["height"] * (target_width / info["width"])) if info["width"] != target_width else info["height"]
+        images_data.append({"path": filepath, "new_height": new_height})
+        total_height += new_height
 
     if not images_data or target_width <= 0 or total_height <= 0:
         print(f"    计算得到的画布尺寸异常 ({target_width}x{total_height})，无法创建长图。")
@@ -125,18 +130,6 @@ def merge_to_long_image(source_project_dir, output_long_image_dir, long_image_fi
         return None
 
 # ▼▼▼ V4 核心函数 - 两阶段色彩同质性分析 ▼▼▼
-def get_dominant_color_numpy(pixels_quantized):
-    """[V4 性能核心] 使用纯NumPy从量化后的像素块中找到主色调。"""
-    if pixels_quantized.size == 0:
-        return None, 0
-    pixels_list = pixels_quantized.reshape(-1, 3)
-    unique_colors, counts = np.unique(pixels_list, axis=0, return_counts=True)
-    num_unique_colors = len(unique_colors)
-    if num_unique_colors == 0:
-        return None, 0
-    dominant_color = tuple(unique_colors[np.argmax(counts)])
-    return dominant_color, num_unique_colors
-
 def split_long_image_v4(long_image_path, output_split_dir, quantization_factor, max_unique_colors, min_band_height, edge_margin_percent):
     """
     [V4 核心逻辑] 通过两阶段向量化分析来识别和分割图像，实现极致速度。
@@ -160,97 +153,41 @@ def split_long_image_v4(long_image_path, output_split_dir, quantization_factor,
                 return [dest_path]
 
             print(f"    分析一个 {img_width}x{img_height} 的图片...")
-            print("    [1/3] 色彩量化...")
-            quantized_array = np.array(img_rgb) // quantization_factor
-            
-            margin_width = int(img_width * edge_margin_percent)
-            center_start, center_end = margin_width, img_width - margin_width
-
-            # --- [V4 核心优化 1: 快速筛选阶段] ---
-            print("    [2/3] 快速筛选候选行...")
-            candidate_indices = []
-            candidate_dominant_colors = {}
-            # 依然逐行，但只做最快的中心区域分析
-            for y in range(img_height):
-                center_pixels = quantized_array[y, center_start:center_end]
-                dominant_color, color_count = get_dominant_color_numpy(center_pixels)
-                if color_count <= max_unique_colors and dominant_color is not None:
-                    candidate_indices.append(y)
-                    candidate_dominant_colors[y] = dominant_color
-            
-            if not candidate_indices:
-                print("    未能找到任何候选行，无需分割。")
-                dest_path = os.path.join(output_split_dir, os.path.basename(long_image_path))
-                shutil.copy2(long_image_path, dest_path)
-                return [dest_path]
-
-            # --- [V4 核心优化 2: 精准验证阶段] ---
-            print(f"    [3/3] 从 {len(candidate_indices)} 个候选行中精准验证边缘...")
-            row_types = np.full(img_height, 'complex', dtype=object)
-            # 只对少数候选行进行耗时的边缘分析
-            for y in candidate_indices:
-                center_dominant_color = candidate_dominant_colors[y]
-                
-                # 分析左边缘
-                left_pixels = quantized_array[y, :margin_width]
-                left_dominant_color, left_color_count = get_dominant_color_numpy(left_pixels)
-                if left_color_count > max_unique_colors or left_dominant_color != center_dominant_color:
-                    continue
-
-                # 分析右边缘
-                right_pixels = quantized_array[y, -margin_width:]
-                right_dominant_color, right_color_count = get_dominant_color_numpy(right_pixels)
-                if right_color_count > max_unique_colors or right_dominant_color != center_dominant_color:
-                    continue
-                
-                row_types[y] = 'simple'
-            
+            print("    [1/2] 色彩量化并整块统计每行色彩 (颜色码 + 直方图归约)...")
+            simple_mask = classify_simple_rows_v4(
+                np.asarray(img_rgb), quantization_factor, max_unique_colors, edge_margin_percent
+            )
             analysis_duration = time.time() - start_time
-            print(f"    分析完成，耗时: {analysis_duration:.2f} 秒。")
-
-            # --- 后续的切块与保存逻辑 ---
-            blocks, last_y = [], 0
-            change_points = np.where(row_types[:-1] != row_types[1:])[0] + 1
-            for y_change in change_points:
-                blocks.append({'type': row_types[last_y], 'start': last_y, 'end': y_change})
-                last_y = y_change
-            blocks.append({'type': row_types[last_y], 'start': last_y, 'end': img_height})
-            
-            original_basename, _ = os.path.splitext(os.path.basename(long_image_path))
-            part_index, last_cut_y, cut_found = 1, 0, False
-            split_image_paths = []
-            
-            print(f"    正在从 {len(blocks)} 个内容/空白区块中寻找切割点...")
-            for i, block in enumerate(blocks):
-                if block['type'] == 'simple' and (block['end'] - block['start']) >= min_band_height:
-                    if i > 0 and i < len(blocks) - 1:
-                        cut_found = True
-                        cut_point_y = block['start'] + (block['end'] - block['start']) // 2
-                        segment = img_rgb.crop((0, last_cut_y, img_width, cut_point_y))
-                        output_filename = f"{original_basename}_split_part_{part_index}.png"
-                        output_filepath = os.path.join(output_split_dir, output_filename)
-                        segment.save(output_filepath, "PNG")
-                        split_image_paths.append(output_filepath)
-                        print(f"      在 Y={cut_point_y} 处找到合格空白区，已切割并保存: {output_filename}")
-                        part_index += 1
-                        last_cut_y = cut_point_y
-
-            segment = img_rgb.crop((0, last_cut_y, img_width, img_height))
-            output_filename = f"{original_basename}_split_part_{part_index}.png"
-            output_filepath = os.path.join(output_split_dir, output_filename)
-            segment.save(output_filepath, "PNG")
-            split_image_paths.append(output_filepath)
-            
-            if not cut_found:
+            print(f"    分析完成，耗时: {analysis_duration:.2f} 秒，共 {int(simple_mask.sum())} 个空白行。")
+
+            print("    [2/2] 从内容/空白区块中寻找切割点...")
+            cut_points = find_v4_band_cuts(simple_mask, min_band_height)
+            if not cut_points:
                 print("\n    [V4 诊断报告] 未能找到任何合格的空白区进行分割。")
                 print(f"    建议检查参数: MAX_UNIQUE_COLORS_IN_BG={max_unique_colors}, MIN_SOLID_COLOR_BAND_HEIGHT={min_band_height}")
-                if len(split_image_paths) == 1:
-                    os.remove(split_image_paths[0])
                 dest_path = os.path.join(output_split_dir, os.path.basename(long_image_path))
                 shutil.copy2(long_image_path, dest_path)
                 print("    由于未执行任何分割，已将原图复制到输出目录。")
                 return [dest_path]
 
+            original_basename, _ = os.path.splitext(os.path.basename(long_image_path))
+            # 片段在有界线程池中并行编码，文件名按切割顺序预先确定
+            with SegmentEncoder() as encoder:
+                for part_index, (start_y, end_y) in enumerate(cuts_to_segments(cut_points, img_height), start=1):
+                    segment = img_rgb.crop((0, start_y, img_width, end_y))
+                    output_filename = f"{original_basename}_split_part_{part_index}.png"
+                    output_filepath = os.path.join(output_split_dir, output_filename)
+                    encoder.submit(output_filepath, segment.save, output_filepath, "PNG")
+                    if end_y < img_height:
+                        print(f"      在 Y={end_y} 处找到合格空白区，已切割: {output_filename}")
+            results = encoder.results()
+            split_image_paths = [path for path, _, _ in results]
+            failed = [(path, e_save) for path, _, e_save in results if e_save is not None]
+            for path, e_save in failed:
+                print(f"      保存分割片段 '{os.path.basename(path)}' 失败: {e_save}")
+            if failed:
+                raise RuntimeError(f"{len(failed)} 个分割片段保存失败")
+
             return natsort.natsorted(split_image_paths)
 
     except Exception as e:
@@ -263,13 +200,13 @@ def _merge_image_list_for_repack(image_paths, output_path):
     """一个专门用于重打包的内部合并函数。"""
     if not image_paths: return False
     images_data, total_height, target_width = [], 0, 0
+    dimensions = get_image_dimensions(image_paths, persist=False)
     for path in image_paths:
-        try:
-            with Image.open(path) as img:
-                if target_width == 0: target_width = img.width
-                images_data.append({"path": path, "height": img.height})
-                total_height += img.height
-        except Exception: continue
+        info = dimensions.get(path)
+        if info is None: continue
+        if target_width == 0: target_width = info["width"]
+        images_data.append({"path": path, "height": info["height"]})
+        total_height += info["height"]
     if not images_data or target_width == 0: return False
     merged_canvas = Image.new('RGB', (target_width, total_height))
     current_y = 0
@@ -293,32 +230,41 @@ def repack_split_images(split_image_paths, output_dir, base_filename, max_size_m
     repacked_paths, current_bucket_paths, current_bucket_size, current_bucket_height = [], [], 0, 0
     repack_index = 1
 
-    for img_path in split_image_paths:
-        try:
-            file_size = os.path.getsize(img_path)
-            with Image.open(img_path) as img: img_height = img.height
-        except Exception as e:
-            print(f"\n    警告: 无法读取图片 '{os.path.basename(img_path)}' 的属性: {e}")
-            continue
+    dimensions = get_image_dimensions(split_image_paths, persist=False)
+    # 每个桶的解码、拼接与 PNG 编码在有界线程池中并行执行，文件名按桶的顺序预先确定
+    with SegmentEncoder() as encoder:
+        for img_path in split_image_paths:
+            try:
+                file_size = os.path.getsize(img_path)
+            except OSError as e:
+                print(f"\n    警告: 无法读取图片 '{os.path.basename(img_path)}' 的属性: {e}")
+                continue
+            if dimensions.get(img_path) is None:
+                print(f"\n    警告: 无法读取图片 '{os.path.basename(img_path)}' 的属性。")
+                continue
+            img_height = dimensions[img_path]["height"]
         
-        if current_bucket_paths and ((current_bucket_size + file_size > max_size_bytes) or (current_bucket_height + img_height > max_height_px)):
+            if current_bucket_paths and ((current_bucket_size + file_size > max_size_bytes) or (current_bucket_height + img_height > max_height_px)):
+                output_filename = f"{base_filename}_repacked_{repack_index}.png"
+                output_path = os.path.join(output_dir, output_filename)
+                encoder.submit(output_path, _merge_image_list_for_repack, current_bucket_paths, output_path)
+                repack_index += 1
+                current_bucket_paths, current_bucket_size, current_bucket_height = [img_path], file_size, img_height
+            else:
+                current_bucket_paths.append(img_path)
+                current_bucket_size += file_size
+                current_bucket_height += img_height
+
+        if current_bucket_paths:
             output_filename = f"{base_filename}_repacked_{repack_index}.png"
             output_path = os.path.join(output_dir, output_filename)
-            if _merge_image_list_for_repack(current_bucket_paths, output_path):
-                repacked_paths.append(output_path)
-            repack_index += 1
-            current_bucket_paths, current_bucket_size, current_bucket_height = [img_path], file_size, img_height
-        else:
-            current_bucket_paths.append(img_path)
-            current_bucket_size += file_size
-            current_bucket_height += img_height
-
-    if current_bucket_paths:
-        output_filename = f"{base_filename}_repacked_{repack_index}.png"
-        output_path = os.path.join(output_dir, output_filename)
-        if _merge_image_list_for_repack(current_bucket_paths, output_path):
+            encoder.submit(output_path, _merge_image_list_for_repack, current_bucket_paths, output_path)
+    for output_path, merged, error in encoder.results():
+        if error is not None:
+            print(f"\n    警告: 重打包 '{os.path.basename(output_path)}' 失败: {error}")
+        elif merged:
             repacked_paths.append(output_path)
-    
+
     print(f"    重打包完成，共生成 {len(repacked_paths)} 个新的图片块。")
     print("    ... 正在清理原始分割文件 ...")
     original_files_to_clean = [p for p in split_image_paths if p not in repacked_paths]
@@ -336,15 +282,15 @@ def create_pdf_from_images(image_paths_list, output_pdf_dir, pdf_filename_only):
         return None
 
     safe_image_paths = []
+    dimensions = get_image_dimensions(image_paths_list, persist=False)
     for image_path in image_paths_list:
-        try:
-            with Image.open(image_path) as img:
-                if img.height > 65500 or img.width > 65500:
-                    print(f"\n    警告: 图片 '{os.path.basename(image_path)}' 尺寸过大，已跳过。")
-                else:
-                    safe_image_paths.append(image_path)
-        except Exception as e:
-            print(f"    警告: 无法打开图片 '{image_path}' 进行尺寸检查: {e}")
+        info = dimensions.get(image_path)
+        if info is None:
+            print(f"    警告: 无法打开图片 '{image_path}' 进行尺寸检查。")
+        elif info["height"] > 65500 or info["width"] > 65500:
+            print(f"\n    警告: 图片 '{os.path.basename(image_path)}' 尺寸过大，已跳过。")
+        else:
+            safe_image_paths.append(image_path)
     
     if not safe_image_paths: return None
 
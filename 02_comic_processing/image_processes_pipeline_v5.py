@@ -26,9 +26,6 @@ _log_import_debug("[IMPORT DEBUG] from PIL import Image, ImageFile done")
 from collections import Counter
 _log_import_debug("[IMPORT DEBUG] from collections import Counter done")
 
-import math
-_log_import_debug("[IMPORT DEBUG] import math done")
-
 import traceback
 _log_import_debug("[IMPORT DEBUG] import traceback done")
 
@@ -41,6 +38,10 @@ _log_import_debug("[IMPORT DEBUG] import time done")
 import argparse # 导入 argparse 模块
 _log_import_debug("[IMPORT DEBUG] import argparse done")
 
+import io
+import contextlib
+_log_import_debug("[IMPORT DEBUG] import io, contextlib done")
+
 try:
     import numpy as np
     _log_import_debug("[IMPORT DEBUG] import numpy as np done")
@@ -48,6 +49,62 @@ except ImportError:
     print("错误：此脚本需要 numpy 库。请使用 'pip install numpy' 命令进行安装。")
     sys.exit(1)
 
+from comic_core.row_classifier import (
+    classify_solid_rows, find_solid_band_cuts, cuts_to_segments, classify_simple_rows_v4, find_v4_band_cuts, runs_to_mask
+)
+_log_import_debug("[IMPORT DEBUG] from comic_core.row_classifier import done")
+
+from comic_core.streaming_split import make_v2_splitter, make_v4_splitter, stream_segments
+_log_import_debug("[IMPORT DEBUG] from comic_core.streaming_split import done")
+
+from comic_core.canvas import build_canvas_array, estimate_png_bytes
+_log_import_debug("[IMPORT DEBUG] from comic_core.canvas import done")
+
+from comic_core.project_pool import available_memory_bytes, run_budgeted_pool
+_log_import_debug("[IMPORT DEBUG] from comic_core.project_pool import done")
+
+from comic_core.dimension_index import get_image_dimensions
+_log_import_debug("[IMPORT DEBUG] from comic_core.dimension_index import done")
+
+from comic_core.document_writer import DocumentWriter, OUTPUT_FORMATS, output_paths, primary_output_path, encode_page
+_log_import_debug("[IMPORT DEBUG] from comic_core.document_writer import done")
+
+from comic_core.coarse_scan import coarse_solid_mask, coarse_simple_mask_v4
+_log_import_debug("[IMPORT DEBUG] from comic_core.coarse_scan import done")
+
+from comic_core.cut_planner import build_plan, is_feasible, is_clean, choose_plan, force_slice_plan, PDF_MAX_PAGE_PIXELS
+_log_import_debug("[IMPORT DEBUG] from comic_core.cut_planner import done")
+
+from comic_core.parallel_scan import parallel_row_mask, MIN_ROWS_PER_WORKER
+_log_import_debug("[IMPORT DEBUG] from comic_core.parallel_scan import done")
+
+from comic_core.segment_encoder import SegmentEncoder
+_log_import_debug("[IMPORT DEBUG] from comic_core.segment_encoder import done")
+
+from comic_core.project_manifest import (
+    load_manifest, save_manifest, fingerprint_inputs, inputs_match, unchanged_prefix_rows,
+    mask_to_runs, reusable_mask_rows, artifact_record, artifact_exists
+)
+_log_import_debug("[IMPORT DEBUG] from comic_core.project_manifest import done")
+
+from comic_core.cut_plan_sidecar import load_cut_plan, save_cut_plan
+_log_import_debug("[IMPORT DEBUG] from comic_core.cut_plan_sidecar import done")
+
+from comic_core.fast_resize import RESIZE_QUALITY_GAPS, open_rgb_at_width
+_log_import_debug("[IMPORT DEBUG] from comic_core.fast_resize import done")
+
+from comic_core.page_hash import get_page_hashes, find_duplicate_pages
+_log_import_debug("[IMPORT DEBUG] from comic_core.page_hash import done")
+
+from comic_core.memory_governor import StageMemoryRecorder, estimate_stage_bytes, peak_estimate, choose_mode
+_log_import_debug("[IMPORT DEBUG] from comic_core.memory_governor import done")
+
+from comic_core.project_scheduler import CostModel, project_features, load_timing_history, lpt_order, append_timing_record
+_log_import_debug("[IMPORT DEBUG] from comic_core.project_scheduler import done")
+
+from comic_core.stage_pipeline import StagePipeline
+_log_import_debug("[IMPORT DEBUG] from comic_core.stage_pipeline import done")
+
 
 def natural_sort_key(value):
     """本地自然排序，避免 natsort 在某些 Windows 环境导入时触发 WMI 卡死。"""
@@ -172,17 +229,54 @@ MAX_UNIQUE_COLORS_IN_BG = 5
 MIN_SOLID_COLOR_BAND_HEIGHT_V4 = 30
 EDGE_MARGIN_PERCENT = 0.10
 
+# --- 粗到细扫描配置 ---
+COARSE_SCAN_FACTOR = 8        # 代理图缩小倍数，<= 1 时关闭粗扫描，逐行全分辨率分析
+VERIFY_COARSE_SCAN = False    # 为 True 时同时进行全分辨率扫描，比对切割点并以全分辨率结果为准
+COARSE_SCAN_V4 = False        # V4 代理图判定是启发式的 (网点 / 多色背景可能漏判)，默认 V4 逐行全分辨率分析
+SCAN_WORKERS = 1              # 单张长图行分析使用的进程数 (共享内存分区)，1 为单进程
+
 # --- 重打包与PDF输出配置 ---
 MAX_REPACKED_FILESIZE_MB = 8
 MAX_REPACKED_PAGE_HEIGHT_PX = 30000
 PDF_TARGET_PAGE_WIDTH_PIXELS = 1500
+RESIZE_QUALITY = "balanced"   # 缩放到目标宽度的方式：fast / balanced (JPEG 解码时缩放 + 整数倍缩小) / exact (直接 LANCZOS)
 PDF_IMAGE_JPEG_QUALITY = 85
+OUTPUT_FORMAT = "pdf"         # 输出格式：pdf / cbz (ZIP_STORED 图片包 + ComicInfo.xml) / both
 PDF_DPI = 300
+
+# --- 重复页面去重 (--dedup-pages) ---
+PAGE_DEDUP_MAX_DISTANCE = 8   # dHash 与 pHash 的汉明距离都不超过此值 (且宽高比相近) 才视为重复
+PAGE_DEDUP_REPORT_FILENAME = "page_dedup_report.json"  # 写在 PDF 输出目录中
+PAGE_DEDUP_SKIP = frozenset()  # 本次运行要跳过的重复源图 (绝对路径)，由 configure_page_dedup 设置
+
+# --- 并行处理设置 ---
+ENCODE_WORKERS = 4            # 片段 / 重打包 PNG 编码线程数 (Pillow 编码时释放 GIL)
+ENCODE_QUEUE_DEPTH = 4        # 同时排队等待编码的片段上限，决定编码阶段的额外内存
+# 未指定 --memory-budget-mb 时，使用当前可用内存的这一比例作为内存预算
+DEFAULT_MEMORY_BUDGET_FRACTION = 0.75
+
+# --- 内存调控 ---
+MEMORY_GOVERNOR_ENABLED = True  # 项目的预估峰值内存超出预算时自动改用流式模式
+# 各阶段的内存估算、实测 RSS 峰值与耗时，写在 PDF 输出目录中；并行模式据此学习各阶段吞吐量、预测项目耗时
+MEMORY_CALIBRATION_FILENAME = "memory_calibration.jsonl"
+MEMORY_RECORDER = None  # 当前项目的 StageMemoryRecorder，由 process_project 设置
+
+# --- 流水线模式 (--pipelined) ---
+PIPELINE_QUEUE_DEPTH = 1  # 相邻阶段之间最多排队的项目数
+# 同时驻留在内存中的画布数上限：解码、行分析、编码三个阶段各一块，加上前两个队列中排队的画布
+PIPELINE_CANVAS_SLOTS = 3 + 2 * PIPELINE_QUEUE_DEPTH
+# 写入计时日志时，流水线阶段对应的内存交接模式阶段 (CostModel 按阶段名学习吞吐量)
+PIPELINE_TIMING_STAGES = {"decode": "merge", "analyze": "analysis", "encode": "output", "write": "output"}
 # --- 配置结束 ---
 
 
+PROGRESS_BAR_ENABLED = True  # 并行模式的子进程中关闭，避免日志中充斥进度条
+
+
 def print_progress_bar(iteration, total, prefix='', suffix='', decimals=1, length=50, fill='█', print_end="\r"):
     """在终端打印进度条。"""
+    if not PROGRESS_BAR_ENABLED:
+        return
     if total == 0:
         percent_str = "0.0%"
         filled_length = 0
@@ -199,17 +293,11 @@ def print_progress_bar(iteration, total, prefix='', suffix='', decimals=1, lengt
         sys.stdout.flush()
 
 
-def merge_to_long_image(source_project_dir, output_long_image_dir, long_image_filename_only, target_width=None):
-    """将源目录中的所有图片（包括子目录）垂直合并成一个长图。"""
-    print(f"\n  --- 步骤 1: 合并项目 '{os.path.basename(source_project_dir)}' 中的所有图片以制作长图 ---")
-    if not os.path.isdir(source_project_dir):
-        print(f"    错误: 源项目目录 '{source_project_dir}' 未找到。")
-        return None
-
-    os.makedirs(output_long_image_dir, exist_ok=True)
-    output_long_image_path = os.path.join(output_long_image_dir, long_image_filename_only)
-
-    print(f"    ... 正在递归扫描 '{os.path.basename(source_project_dir)}' 及其所有子文件夹以查找图片 ...")
+def collect_project_image_paths(source_project_dir):
+    """
+    递归收集项目目录中的所有图片路径 (自然排序)，跳过脚本自己创建的中间文件夹
+    以及去重阶段判定为重复的源图。扫描出错时返回 None。
+    """
     image_filepaths = []
     try:
         for dirpath, _, filenames in os.walk(source_project_dir):
@@ -219,56 +307,86 @@ def merge_to_long_image(source_project_dir, output_long_image_dir, long_image_fi
             
             for filename in filenames:
                 if filename.lower().endswith(IMAGE_EXTENSIONS_FOR_MERGE) and not filename.startswith('.'):
-                    image_filepaths.append(os.path.join(dirpath, filename))
+                    filepath = os.path.join(dirpath, filename)
+                    if PAGE_DEDUP_SKIP and os.path.abspath(filepath) in PAGE_DEDUP_SKIP:
+                        continue
+                    image_filepaths.append(filepath)
     except Exception as e:
         print(f"    错误: 扫描目录 '{source_project_dir}' 时发生错误: {e}")
         return None
-        
-    if not image_filepaths:
-        print(f"    在 '{os.path.basename(source_project_dir)}' 及其子目录中未找到符合条件的图片。")
-        return None
 
     # 对收集到的所有完整路径进行自然排序
-    sorted_image_filepaths = natsorted(image_filepaths)
+    return natsorted(image_filepaths)
+
 
+def analyze_image_dimensions(sorted_image_filepaths, target_width=None):
+    """
+    读取每张图片的尺寸，计算其在长图中的高度。
+    :return: (images_data, 长图总高度, 长图宽度)；无法打开的图片会被跳过。
+    """
     images_data = []
     total_calculated_height = 0
     max_calculated_width = 0
 
-    total_files_to_analyze = len(sorted_image_filepaths)
-    if total_files_to_analyze > 0:
-        print_progress_bar(0, total_files_to_analyze, prefix='    分析图片尺寸:', suffix='完成', length=40)
-    
-    for i, filepath in enumerate(sorted_image_filepaths):
-        try:
-            with Image.open(filepath) as img:
-                if target_width and img.width != target_width:
-                    new_height = int(img.height * (target_width / img.width))
-                    images_data.append({
-                        "path": filepath,
-                        "width": target_width,
-                        "height": new_height,
-                        "original_width": img.width,
-                        "original_height": img.height
-                    })
-                    total_calculated_height += new_height
-                    max_calculated_width = target_width
-                else:
-                    images_data.append({
-                        "path": filepath,
-                        "width": img.width,
-                        "height": img.height,
-                        "original_width": img.width,
-                        "original_height": img.height
-                    })
-                    total_calculated_height += img.height
-                    if img.width > max_calculated_width:
-                        max_calculated_width = img.width
-        except Exception as e:
-            print(f"\n    警告: 打开或读取图片 '{os.path.basename(filepath)}' 失败: {e}。已跳过。")
+    # 尺寸来自目录下的尺寸索引，缺失的条目在线程池中只读文件头补全
+    dimensions = get_image_dimensions(
+        sorted_image_filepaths,
+        progress=lambda done, total: print_progress_bar(done, total, prefix='    分析图片尺寸:', suffix='完成', length=40)
+    )
+    for filepath in sorted_image_filepaths:
+        info = dimensions.get(filepath)
+        if info is None:
+            print(f"\n    警告: 打开或读取图片 '{os.path.basename(filepath)}' 失败。已跳过。")
             continue
-        if total_files_to_analyze > 0:
-            print_progress_bar(i + 1, total_files_to_analyze, prefix='    分析图片尺寸:', suffix='完成', length=40)
+        width, height = info["width"], info["height"]
+        if target_width and width != target_width:
+            new_height = int(height * (target_width / width))
+            images_data.append({
+                "path": filepath,
+                "width": target_width,
+                "height": new_height,
+                "original_width": width,
+                "original_height": height
+            })
+            total_calculated_height += new_height
+            max_calculated_width = target_width
+        else:
+            images_data.append({
+                "path": filepath,
+                "width": width,
+                "height": height,
+                "original_width": width,
+                "original_height": height
+            })
+            total_calculated_height += height
+            if width > max_calculated_width:
+                max_calculated_width = width
+
+    return images_data, total_calculated_height, max_calculated_width
+
+
+def merge_to_long_image(source_project_dir, output_long_image_dir, long_image_filename_only, target_width=None):
+    """将源目录中的所有图片（包括子目录）垂直合并成一个长图。"""
+    print(f"\n  --- 步骤 1: 合并项目 '{os.path.basename(source_project_dir)}' 中的所有图片以制作长图 ---")
+    if not os.path.isdir(source_project_dir):
+        print(f"    错误: 源项目目录 '{source_project_dir}' 未找到。")
+        return None
+
+    os.makedirs(output_long_image_dir, exist_ok=True)
+    output_long_image_path = os.path.join(output_long_image_dir, long_image_filename_only)
+
+    print(f"    ... 正在递归扫描 '{os.path.basename(source_project_dir)}' 及其所有子文件夹以查找图片 ...")
+    sorted_image_filepaths = collect_project_image_paths(source_project_dir)
+    if sorted_image_filepaths is None:
+        return None
+        
+    if not sorted_image_filepaths:
+        print(f"    在 '{os.path.basename(source_project_dir)}' 及其子目录中未找到符合条件的图片。")
+        return None
+
+    images_data, total_calculated_height, max_calculated_width = analyze_image_dimensions(
+        sorted_image_filepaths, target_width
+    )
 
     if not images_data:
         print("    没有有效的图片可供合并。")
@@ -286,19 +404,13 @@ def merge_to_long_image(source_project_dir, output_long_image_dir, long_image_fi
         print_progress_bar(0, total_files_to_paste, prefix='    粘贴图片:    ', suffix='完成', length=40)
     for i, item_info in enumerate(images_data):
         try:
-            with Image.open(item_info["path"]) as img:
-                img_rgb = img.convert("RGB")
-                if target_width and img_rgb.width != target_width:
-                    img_to_paste = img_rgb.resize((target_width, item_info['height']), Image.Resampling.LANCZOS)
-                else:
-                    img_to_paste = img_rgb
-                
-                if target_width:
-                    merged_canvas.paste(img_to_paste, (0, current_y_offset))
-                else:
-                    x_offset = (max_calculated_width - img_to_paste.width) // 2
-                    merged_canvas.paste(img_to_paste, (x_offset, current_y_offset))
-                current_y_offset += item_info["height"]
+            img_to_paste = open_rgb_at_width(item_info["path"], target_width, item_info["height"], RESIZE_QUALITY)
+            if target_width:
+                merged_canvas.paste(img_to_paste, (0, current_y_offset))
+            else:
+                x_offset = (max_calculated_width - img_to_paste.width) // 2
+                merged_canvas.paste(img_to_paste, (x_offset, current_y_offset))
+            current_y_offset += item_info["height"]
         except Exception as e:
             print(f"\n    警告: 粘贴图片 '{item_info['path']}' 失败: {e}。")
             pass
@@ -314,40 +426,96 @@ def merge_to_long_image(source_project_dir, output_long_image_dir, long_image_fi
         return None
 
 
-# --- V2 分割相关函数 ---
+# --- 输出 / 去重 / 缩放参数配置 ---
+def configure_output(max_repacked_mb, max_page_height, jpeg_quality, output_format="pdf"):
+    """设置重打包与 PDF / CBZ 输出参数 (并行模式下在每个子进程中调用)；这些参数不影响行分析。"""
+    global MAX_REPACKED_FILESIZE_MB, MAX_REPACKED_PAGE_HEIGHT_PX, PDF_IMAGE_JPEG_QUALITY, OUTPUT_FORMAT
+    MAX_REPACKED_FILESIZE_MB = max_repacked_mb
+    MAX_REPACKED_PAGE_HEIGHT_PX = max_page_height
+    PDF_IMAGE_JPEG_QUALITY = jpeg_quality
+    OUTPUT_FORMAT = output_format
 
 
-def are_colors_close(color1, color2, tolerance):
-    """根据欧氏距离检查两种RGB颜色是否接近。"""
-    if tolerance == 0:
-        return color1 == color2
-    r1, g1, b1 = color1
-    r2, g2, b2 = color2
-    distance = math.sqrt((r1 - r2)**2 + (g1 - g2)**2 + (b1 - b2)**2)
-    return distance <= tolerance
+def configure_page_dedup(skip_paths):
+    """设置要跳过的重复源图 (并行模式下在每个子进程中调用)。"""
+    global PAGE_DEDUP_SKIP
+    PAGE_DEDUP_SKIP = frozenset(os.path.abspath(path) for path in skip_paths)
 
 
-def is_solid_color_row(pixels, y, width, solid_colors_list, tolerance):
-    """检查给定行是否为纯色带，允许一定的容差。"""
-    if width == 0:
-        return False
+def configure_resize(quality):
+    """设置缩放到目标宽度的质量模式 (并行模式下在每个子进程中调用)。"""
+    global RESIZE_QUALITY
+    RESIZE_QUALITY = quality
+
+
+# --- 行分类 (粗到细扫描 / 多核扫描) ---
+def configure_row_scan(factor, verify, scan_workers, coarse_v4=False):
+    """设置粗到细扫描与多核扫描参数 (并行模式下在每个子进程中调用)。"""
+    global COARSE_SCAN_FACTOR, VERIFY_COARSE_SCAN, SCAN_WORKERS, COARSE_SCAN_V4
+    COARSE_SCAN_FACTOR = factor
+    VERIFY_COARSE_SCAN = verify
+    SCAN_WORKERS = scan_workers
+    COARSE_SCAN_V4 = coarse_v4
 
-    first_pixel_rgb = pixels[0, y][:3]
-    
-    base_color_match = None
-    for base_color in solid_colors_list:
-        if are_colors_close(first_pixel_rgb, base_color, tolerance):
-            base_color_match = first_pixel_rgb
-            break
-            
-    if base_color_match is None:
-        return False
-        
-    for x in range(1, width):
-        if not are_colors_close(pixels[x, y][:3], base_color_match, tolerance):
-            return False
-            
-    return True
+
+def _report_coarse_parity(label, coarse_cuts, full_cuts):
+    if coarse_cuts == full_cuts:
+        print(f"    ✅ [{label} 粗扫描校验] {len(full_cuts)} 个切割点与全分辨率结果一致。")
+    else:
+        only_coarse = sorted(set(coarse_cuts) - set(full_cuts))
+        only_full = sorted(set(full_cuts) - set(coarse_cuts))
+        print(f"    ⚠️  [{label} 粗扫描校验] 切割点不一致，已改用全分辨率结果。"
+              f"仅粗扫描: {only_coarse[:10]}，仅全分辨率: {only_full[:10]}")
+
+
+def _scan_rows(rgb_array, method, params, min_band_height, coarse_scan, full_scan, find_cuts):
+    """
+    行分析的统一入口：长图足够高且 SCAN_WORKERS > 1 时在共享内存分区上多进程分析，
+    否则按 params 末尾的缩小倍数在单进程中粗到细扫描 (倍数 <= 1 时逐行全分辨率分析)；
+    VERIFY_COARSE_SCAN 时与全分辨率结果比对。
+    """
+    factor = params[-1]
+    if SCAN_WORKERS > 1 and len(rgb_array) >= 2 * MIN_ROWS_PER_WORKER:
+        mask, refined_rows, partitions = parallel_row_mask(rgb_array, method, params, min_band_height, SCAN_WORKERS)
+        print(f"    多核扫描: {partitions} 个分区，全分辨率分析 {refined_rows}/{len(mask)} 行")
+    elif factor <= 1:
+        return full_scan()
+    else:
+        mask, refined_rows = coarse_scan(rgb_array, *params)
+        print(f"    粗扫描 (1/{factor}): 全分辨率精细化 {refined_rows}/{len(mask)} 行")
+    if VERIFY_COARSE_SCAN and factor > 1:
+        full_mask = full_scan()
+        _report_coarse_parity(method.upper(), find_cuts(mask, min_band_height), find_cuts(full_mask, min_band_height))
+        return full_mask
+    return mask
+
+
+def compute_solid_mask(rgb_array, band_colors_list, tolerance, min_band_height, progress=None):
+    """V2 纯色行掩码：按 COARSE_SCAN_FACTOR 先在代理图上筛选，再只对候选带做全分辨率分析。"""
+    return _scan_rows(
+        rgb_array, "v2", (band_colors_list, tolerance, min_band_height, COARSE_SCAN_FACTOR), min_band_height,
+        coarse_solid_mask,
+        lambda: classify_solid_rows(rgb_array, band_colors_list, tolerance, progress=progress),
+        find_solid_band_cuts
+    )
+
+
+def compute_simple_mask_v4(rgb_array, quantization_factor, max_unique_colors, edge_margin_percent, min_band_height):
+    """
+    V4 简单行掩码：默认逐行全分辨率分析 (多核扫描时各分区同样全分辨率)。
+    代理图判定是启发式的，只有 COARSE_SCAN_V4 为 True 时才启用，可用 VERIFY_COARSE_SCAN 与全分辨率结果比对。
+    """
+    factor = COARSE_SCAN_FACTOR if COARSE_SCAN_V4 else 1
+    return _scan_rows(
+        rgb_array, "v4", (quantization_factor, max_unique_colors, edge_margin_percent, min_band_height, factor),
+        min_band_height,
+        coarse_simple_mask_v4,
+        lambda: classify_simple_rows_v4(rgb_array, quantization_factor, max_unique_colors, edge_margin_percent),
+        find_v4_band_cuts
+    )
+
+
+# --- V2 分割相关函数 ---
 
 
 def split_long_image_v2(long_image_path, output_split_dir, min_solid_band_height, band_colors_list, tolerance):
@@ -364,57 +532,36 @@ def split_long_image_v2(long_image_path, output_split_dir, min_solid_band_height
         if min_solid_band_height < 1: 
             min_solid_band_height = 1
 
-        img = Image.open(long_image_path).convert("RGBA")
-        pixels = img.load()
-        img_width, img_height = img.size
+        # 片段仍以 RGBA 保存 (与原实现一致，片段文件大小决定重打包的分组)，行分类只看 RGB 通道
+        with Image.open(long_image_path) as img:
+            img_rgba = img.convert("RGBA")
+        img_width, img_height = img_rgba.size
 
         if img_height == 0 or img_width == 0:
             print(f"    图片 '{os.path.basename(long_image_path)}' 尺寸为零，无法分割。")
             return []
 
         original_basename, _ = os.path.splitext(os.path.basename(long_image_path))
-        part_index = 1
-        current_segment_start_y = 0
-        solid_band_after_last_content_start_y = -1
 
         print_progress_bar(0, img_height, prefix='    扫描长图:    ', suffix='完成', length=40)
-
-        for y in range(img_height):
-            print_progress_bar(y + 1, img_height, prefix='    扫描长图:    ', suffix=f'第 {y+1}/{img_height} 行', length=40)
-
-            is_solid = is_solid_color_row(pixels, y, img_width, band_colors_list, tolerance)
-
-            if not is_solid:  # 这是一个 "内容" 行
-                if solid_band_after_last_content_start_y != -1:
-                    solid_band_height = y - solid_band_after_last_content_start_y
-                    if solid_band_height >= min_solid_band_height:
-                        cut_point_y = solid_band_after_last_content_start_y + (solid_band_height // 2)
-                        if cut_point_y > current_segment_start_y:
-                            segment = img.crop((0, current_segment_start_y, img_width, cut_point_y))
-                            output_filename = f"{original_basename}_split_part_{part_index}.png"
-                            output_filepath = os.path.join(output_split_dir, output_filename)
-                            try:
-                                segment.save(output_filepath, "PNG")
-                                split_image_paths.append(output_filepath)
-                                part_index += 1
-                            except Exception as e_save:
-                                print(f"      保存分割片段 '{output_filename}' 失败: {e_save}")
-                        current_segment_start_y = cut_point_y
-                solid_band_after_last_content_start_y = -1
-            else:  # 这是一个 "纯色" 行
-                if solid_band_after_last_content_start_y == -1:
-                    solid_band_after_last_content_start_y = y
-
-        if current_segment_start_y < img_height:
-            segment = img.crop((0, current_segment_start_y, img_width, img_height))
-            if segment.height > 10:  # 避免保存过小的切片
-                output_filename = f"{original_basename}_split_part_{part_index}.png"
-                output_filepath = os.path.join(output_split_dir, output_filename)
-                try:
-                    segment.save(output_filepath, "PNG")
-                    split_image_paths.append(output_filepath)
-                except Exception as e_save:
-                    print(f"      保存最后一个分割片段 '{output_filename}' 失败: {e_save}")
+        solid_mask = compute_solid_mask(
+            np.asarray(img_rgba)[:, :, :3], band_colors_list, tolerance, min_solid_band_height,
+            progress=lambda done, total: print_progress_bar(done, total, prefix='    扫描长图:    ', suffix=f'第 {done}/{total} 行', length=40)
+        )
+        cut_points = find_solid_band_cuts(solid_mask, min_solid_band_height)
+
+        # 片段在有界线程池中并行编码，文件名按切割顺序预先确定
+        with SegmentEncoder(ENCODE_WORKERS, ENCODE_QUEUE_DEPTH) as encoder:
+            segments = cuts_to_segments(cut_points, img_height, min_tail_height=11)  # 避免保存过小的尾部切片
+            for part_index, (start_y, end_y) in enumerate(segments, start=1):
+                segment = img_rgba.crop((0, start_y, img_width, end_y))
+                output_filepath = os.path.join(output_split_dir, f"{original_basename}_split_part_{part_index}.png")
+                encoder.submit(output_filepath, segment.save, output_filepath, "PNG")
+        for output_filepath, _, e_save in encoder.results():
+            if e_save is None:
+                split_image_paths.append(output_filepath)
+            else:
+                print(f"      保存分割片段 '{os.path.basename(output_filepath)}' 失败: {e_save}")
 
         if not split_image_paths and img_height > 0:
             print(f"    V2 方法未能根据指定的纯色带分割 '{os.path.basename(long_image_path)}'。")
@@ -429,19 +576,6 @@ def split_long_image_v2(long_image_path, output_split_dir, min_solid_band_height
 
 
 # --- V4 分割相关函数 ---
-def get_dominant_color_numpy(pixels_quantized):
-    """[V4 性能核心] 使用纯NumPy从量化后的像素块中找到主色调。"""
-    if pixels_quantized.size == 0:
-        return None, 0
-    pixels_list = pixels_quantized.reshape(-1, 3)
-    unique_colors, counts = np.unique(pixels_list, axis=0, return_counts=True)
-    num_unique_colors = len(unique_colors)
-    if num_unique_colors == 0:
-        return None, 0
-    dominant_color = tuple(unique_colors[np.argmax(counts)])
-    return dominant_color, num_unique_colors
-
-
 def split_long_image_v4(long_image_path, output_split_dir, quantization_factor, max_unique_colors, min_band_height, edge_margin_percent):
     """V4 分割方法：通过两阶段向量化分析来识别和分割图像，实现极致速度。"""
     print(f"\n  --- 步骤 2 (V4 - 两阶段极速分析): 分割长图 '{os.path.basename(long_image_path)}' ---")
@@ -461,90 +595,38 @@ def split_long_image_v4(long_image_path, output_split_dir, quantization_factor,
                 return []
 
             print(f"    分析一个 {img_width}x{img_height} 的图片...")
-            print("    [1/3] 色彩量化...")
-            quantized_array = np.array(img_rgb) // quantization_factor
-            
-            margin_width = int(img_width * edge_margin_percent)
-            center_start, center_end = margin_width, img_width - margin_width
-
-            # --- [V4 核心优化 1: 快速筛选阶段] ---
-            print("    [2/3] 快速筛选候选行...")
-            candidate_indices = []
-            candidate_dominant_colors = {}
-            # 依然逐行，但只做最快的中心区域分析
-            for y in range(img_height):
-                center_pixels = quantized_array[y, center_start:center_end]
-                dominant_color, color_count = get_dominant_color_numpy(center_pixels)
-                if color_count <= max_unique_colors and dominant_color is not None:
-                    candidate_indices.append(y)
-                    candidate_dominant_colors[y] = dominant_color
-            
-            if not candidate_indices:
-                print("    未能找到任何候选行，V4 方法无法分割。")
-                return []
-
-            # --- [V4 核心优化 2: 精准验证阶段] ---
-            print(f"    [3/3] 从 {len(candidate_indices)} 个候选行中精准验证边缘...")
-            row_types = np.full(img_height, 'complex', dtype=object)
-            # 只对少数候选行进行耗时的边缘分析
-            for y in candidate_indices:
-                center_dominant_color = candidate_dominant_colors[y]
-                
-                # 分析左边缘
-                left_pixels = quantized_array[y, :margin_width]
-                left_dominant_color, left_color_count = get_dominant_color_numpy(left_pixels)
-                if left_color_count > max_unique_colors or left_dominant_color != center_dominant_color:
-                    continue
-
-                # 分析右边缘
-                right_pixels = quantized_array[y, -margin_width:]
-                right_dominant_color, right_color_count = get_dominant_color_numpy(right_pixels)
-                if right_color_count > max_unique_colors or right_dominant_color != center_dominant_color:
-                    continue
-                
-                row_types[y] = 'simple'
-            
+            print("    [1/2] 色彩量化并整块统计每行色彩 (颜色码 + 直方图归约)...")
+            simple_mask = compute_simple_mask_v4(
+                np.asarray(img_rgb), quantization_factor, max_unique_colors, edge_margin_percent, min_band_height
+            )
             analysis_duration = time.time() - start_time
-            print(f"    分析完成，耗时: {analysis_duration:.2f} 秒。")
-
-            # --- 后续的切块与保存逻辑 ---
-            blocks, last_y = [], 0
-            change_points = np.where(row_types[:-1] != row_types[1:])[0] + 1
-            for y_change in change_points:
-                blocks.append({'type': row_types[last_y], 'start': last_y, 'end': y_change})
-                last_y = y_change
-            blocks.append({'type': row_types[last_y], 'start': last_y, 'end': img_height})
-            
-            original_basename, _ = os.path.splitext(os.path.basename(long_image_path))
-            part_index, last_cut_y, cut_found = 1, 0, False
-            split_image_paths = []
-            
-            print(f"    正在从 {len(blocks)} 个内容/空白区块中寻找切割点...")
-            for i, block in enumerate(blocks):
-                if block['type'] == 'simple' and (block['end'] - block['start']) >= min_band_height:
-                    if i > 0 and i < len(blocks) - 1:
-                        cut_found = True
-                        cut_point_y = block['start'] + (block['end'] - block['start']) // 2
-                        segment = img_rgb.crop((0, last_cut_y, img_width, cut_point_y))
-                        output_filename = f"{original_basename}_split_part_{part_index}.png"
-                        output_filepath = os.path.join(output_split_dir, output_filename)
-                        segment.save(output_filepath, "PNG")
-                        split_image_paths.append(output_filepath)
-                        print(f"      在 Y={cut_point_y} 处找到合格空白区，已切割并保存: {output_filename}")
-                        part_index += 1
-                        last_cut_y = cut_point_y
-
-            segment = img_rgb.crop((0, last_cut_y, img_width, img_height))
-            output_filename = f"{original_basename}_split_part_{part_index}.png"
-            output_filepath = os.path.join(output_split_dir, output_filename)
-            segment.save(output_filepath, "PNG")
-            split_image_paths.append(output_filepath)
-            
-            if not cut_found:
+            print(f"    分析完成，耗时: {analysis_duration:.2f} 秒，共 {int(simple_mask.sum())} 个空白行。")
+
+            print("    [2/2] 从内容/空白区块中寻找切割点...")
+            cut_points = find_v4_band_cuts(simple_mask, min_band_height)
+            if not cut_points:
                 print("\n    [V4 诊断报告] 未能找到任何合格的空白区进行分割。")
                 print(f"    建议检查参数: MAX_UNIQUE_COLORS_IN_BG={max_unique_colors}, MIN_SOLID_COLOR_BAND_HEIGHT={min_band_height}")
                 return []
 
+            original_basename, _ = os.path.splitext(os.path.basename(long_image_path))
+            # 片段在有界线程池中并行编码，文件名按切割顺序预先确定
+            with SegmentEncoder(ENCODE_WORKERS, ENCODE_QUEUE_DEPTH) as encoder:
+                for part_index, (start_y, end_y) in enumerate(cuts_to_segments(cut_points, img_height), start=1):
+                    segment = img_rgb.crop((0, start_y, img_width, end_y))
+                    output_filename = f"{original_basename}_split_part_{part_index}.png"
+                    output_filepath = os.path.join(output_split_dir, output_filename)
+                    encoder.submit(output_filepath, segment.save, output_filepath, "PNG")
+                    if end_y < img_height:
+                        print(f"      在 Y={end_y} 处找到合格空白区，已切割: {output_filename}")
+            results = encoder.results()
+            split_image_paths = [path for path, _, _ in results]
+            failed = [(path, e_save) for path, _, e_save in results if e_save is not None]
+            for path, e_save in failed:
+                print(f"      保存分割片段 '{os.path.basename(path)}' 失败: {e_save}")
+            if failed:
+                raise RuntimeError(f"{len(failed)} 个分割片段保存失败")
+
             return natsorted(split_image_paths)
 
     except Exception as e:
@@ -611,139 +693,398 @@ def split_long_image_hybrid(long_image_path, output_split_dir):
     return [dest_path]
 
 
-def split_long_image_hybrid_with_pdf_fallback(long_image_path, output_split_dir, pdf_output_dir, pdf_filename, subdir_name):
-    """融合分割方法：先尝试 V2 + PDF 创建，如果 PDF 创建失败则清理 V2 文件并切换到 V4。
-    
-    失败判定标准：
-    - V2 分割成功但 PDF 创建失败时，清除 V2 分割的图片，重新使用 V4 方式进行分割
-    - V2 分割成功但重打包失败时，清除 V2 分割的图片，重新使用 V4 方式进行分割
-    - V2 分割本身失败时，直接使用 V4 方式进行分割
+def _report_plan(plan):
+    print(f"    {plan['method']} 方案: {len(plan['segments'])} 个片段 → {len(plan['pages'])} 个页面"
+          f"，超高页面 {len(plan['too_tall'])} 个，超出大小预算 {len(plan['over_budget'])} 个")
+
+
+def _mask_with_cache(canvas, plan_cache, key, label, min_band_height, compute):
+    """复用项目清单中长图前部未变化部分的行掩码，只对其后的行调用 compute 重新分析。"""
+    height = canvas.shape[0]
+    runs = plan_cache.get(key) if plan_cache else None
+    if runs is None:
+        return compute(canvas)
+    if plan_cache["prefix_rows"] >= height and plan_cache.get("height") == height:
+        print(f"    ⏭️  输入未变化，直接复用清单中的 {label} 行掩码。")
+        return runs_to_mask(height, runs)
+    boundary = reusable_mask_rows(runs, min(plan_cache["prefix_rows"], height), min_band_height)
+    print(f"    ♻️  复用清单中前 {boundary} 行的 {label} 行掩码，重新分析其后的 {height - boundary} 行。")
+    mask = np.zeros(height, dtype=bool)
+    mask[:boundary] = runs_to_mask(boundary, runs)
+    if boundary < height:
+        mask[boundary:] = compute(canvas[boundary:])
+    return mask
+
+
+def plan_split_from_array(canvas, plan_cache=None):
     """
-    print(f"\n  --- 步骤 2 (V5 - 智能融合分割): 分割长图 '{os.path.basename(long_image_path)}' ---")
-    print("    🔄 采用智能双重分割策略：V2传统方法 → V4极速方法")
-    print("    📋 失败判定标准：PDF 创建失败时自动切换方法")
-    
-    # 首先尝试 V2 方法
+    在同一块画布上规划切割方案：先求 V2 方案并解析检查重打包 / PDF 限制，
+    不合格时再求 V4 方案 (只多一次行分析)，两者都违反硬限制时强制切开过高的页面。
+
+    :param plan_cache: 可选，来自项目清单 {"prefix_rows", "height", "v2", "v4", "plan"}；
+                       给出 "plan" 时直接沿用，否则复用前部未变化部分的行掩码。
+    :return: 选中的方案字典 (见 comic_core.cut_planner)，另附 "mask_runs" 供写入清单。
+    """
+    height, width = canvas.shape[:2]
+    if plan_cache and plan_cache.get("plan") and plan_cache.get("height") == height:
+        stored = plan_cache["plan"]
+        print(f"    ⏭️  输入与参数均未变化，沿用清单中的 {stored['method']} 方案 ({len(stored['pages'])} 个页面)，跳过行分析。")
+        return {
+            "method": stored["method"],
+            "segments": [tuple(segment) for segment in stored["segments"]],
+            "pages": [tuple(page) for page in stored["pages"]],
+            "mask_runs": {"v2": plan_cache.get("v2"), "v4": plan_cache.get("v4")},
+        }
+
+    max_size_bytes = MAX_REPACKED_FILESIZE_MB * 1024 * 1024
+    size_of = lambda start_y, end_y: estimate_png_bytes(canvas[start_y:end_y])
+    print(f"    📐 单次规划：在内存中比较切割方案 (页面上限: {MAX_REPACKED_FILESIZE_MB}MB, {MAX_REPACKED_PAGE_HEIGHT_PX}px)")
+
     print("\n    📋 第一阶段：尝试 V2 传统纯色带分析方法...")
-    print("    🎨 使用预设的韩漫常见背景色进行分割，提高速度和效率...")
-    
-    v2_result = split_long_image_v2(
-        long_image_path,
-        output_split_dir,
-        MIN_SOLID_COLOR_BAND_HEIGHT,
-        SPLIT_BAND_COLORS_RGB,
-        COLOR_MATCH_TOLERANCE
+    solid_mask = _mask_with_cache(
+        canvas, plan_cache, "v2", "V2", MIN_SOLID_COLOR_BAND_HEIGHT,
+        lambda rows: compute_solid_mask(rows, SPLIT_BAND_COLORS_RGB, COLOR_MATCH_TOLERANCE, MIN_SOLID_COLOR_BAND_HEIGHT)
     )
-    
-    if v2_result and len(v2_result) >= 1:
-        print(f"    ✅ V2 分割成功！共分割出 {len(v2_result)} 个片段。")
-        print("    📄 正在尝试从 V2 分割结果创建 PDF...")
-        
-        # 尝试重打包
-        repacked_v2_paths = repack_split_images(
-            v2_result, output_split_dir, base_filename=subdir_name,
-            max_size_mb=MAX_REPACKED_FILESIZE_MB, max_height_px=MAX_REPACKED_PAGE_HEIGHT_PX
-        )
-        
-        if repacked_v2_paths:
-            # 尝试创建 PDF
-            created_pdf_path = create_pdf_from_images(
-                repacked_v2_paths, pdf_output_dir, pdf_filename
+    mask_runs = {"v2": mask_to_runs(solid_mask), "v4": None}
+    v2_segments = cuts_to_segments(
+        find_solid_band_cuts(solid_mask, MIN_SOLID_COLOR_BAND_HEIGHT), height, min_tail_height=11
+    )
+    plans = [build_plan("V2", v2_segments, width, size_of, max_size_bytes, MAX_REPACKED_PAGE_HEIGHT_PX)]
+    _report_plan(plans[0])
+
+    if not is_clean(plans[0]):
+        print("\n    🚀 第二阶段：V2 方案不合格，启用 V4 两阶段极速分析方法...")
+        v4_cuts = []
+        if height >= MIN_SOLID_COLOR_BAND_HEIGHT_V4 * 3:  # 如果图片太短，没必要分割
+            simple_mask = _mask_with_cache(
+                canvas, plan_cache, "v4", "V4", MIN_SOLID_COLOR_BAND_HEIGHT_V4,
+                lambda rows: compute_simple_mask_v4(
+                    rows, QUANTIZATION_FACTOR, MAX_UNIQUE_COLORS_IN_BG, EDGE_MARGIN_PERCENT, MIN_SOLID_COLOR_BAND_HEIGHT_V4
+                )
             )
-            
-            if created_pdf_path:
-                print(f"    ✅ V2 方法完全成功！PDF 已创建: {os.path.basename(created_pdf_path)}")
-                return repacked_v2_paths, created_pdf_path
-            else:
-                print("    ❌ V2 分割成功但 PDF 创建失败，正在清理 V2 文件并切换到 V4 方法...")
-                # 清理 V2 产生的所有文件
-                print("    🧹 清理 V2 分割和重打包产生的所有文件...")
-                for file_path in v2_result:
-                    if os.path.exists(file_path):
-                        try:
-                            os.remove(file_path)
-                            print(f"      已删除 V2 分割文件: {os.path.basename(file_path)}")
-                        except Exception as e:
-                            print(f"      删除失败 {os.path.basename(file_path)}: {e}")
-                
-                for file_path in repacked_v2_paths:
-                    if os.path.exists(file_path):
-                        try:
-                            os.remove(file_path)
-                            print(f"      已删除 V2 重打包文件: {os.path.basename(file_path)}")
-                        except Exception as e:
-                            print(f"      删除失败 {os.path.basename(file_path)}: {e}")
+            mask_runs["v4"] = mask_to_runs(simple_mask)
+            v4_cuts = find_v4_band_cuts(simple_mask, MIN_SOLID_COLOR_BAND_HEIGHT_V4)
+        plans.append(build_plan("V4", cuts_to_segments(v4_cuts, height), width, size_of, max_size_bytes, MAX_REPACKED_PAGE_HEIGHT_PX))
+        _report_plan(plans[1])
+
+    chosen = choose_plan(plans)
+    if chosen is None:
+        print("    ⚠️  两种方案都有超过 PDF 上限的页面，将按高度上限强制切开。")
+        base = next(plan for plan in plans if plan["pages"])
+        chosen = _force_slice(base, width, size_of, max_size_bytes)
+    elif chosen["over_budget"]:
+        print(f"    ⚠️  {len(chosen['over_budget'])} 个页面的估算大小超出预算 (单个片段无法再拆分)，仍继续输出。")
+    print(f"    ✅ 选用 {chosen['method']} 方案，共 {len(chosen['pages'])} 个页面。")
+    chosen["mask_runs"] = mask_runs
+    return chosen
+
+
+def _force_slice(plan, width, size_of, max_size_bytes):
+    """强制切开过高的页面；画布过宽无法切开时原样返回 (仍不可行，输出时会被拒绝)。"""
+    try:
+        return force_slice_plan(plan, width, size_of, max_size_bytes, MAX_REPACKED_PAGE_HEIGHT_PX)
+    except ValueError as e:
+        print(f"    ❌ {e}")
+        return plan
+
+
+def plan_from_segments(canvas, method, segments):
+    """
+    按当前的重打包 / PDF 限制把已知的片段行区间重新规划为页面，不做行分析。
+    用于切割方案旁路文件：只修改了输出参数时直接重新编码。
+    """
+    width = canvas.shape[1]
+    max_size_bytes = MAX_REPACKED_FILESIZE_MB * 1024 * 1024
+    size_of = lambda start_y, end_y: estimate_png_bytes(canvas[start_y:end_y])
+    plan = build_plan(method, segments, width, size_of, max_size_bytes, MAX_REPACKED_PAGE_HEIGHT_PX)
+    if not is_feasible(plan):
+        print("    ⚠️  已保存的方案有超过 PDF 上限的页面，将按高度上限强制切开。")
+        plan = _force_slice(plan, width, size_of, max_size_bytes)
+    print(f"    ✅ 按当前输出参数重新规划 {plan['method']} 方案，共 {len(plan['pages'])} 个页面。")
+    return plan
+
+
+def render_plan_pdf(canvas, plan, pdf_output_dir, pdf_filename, repacked_dir=None, repacked_pattern=None):
+    """
+    按切割方案输出：给出 repacked_dir 时先把页面另存为 PNG (排查用)，再直接从画布行切片编码 PDF。
+
+    :return: PDF 路径；失败时删除残留文件并返回 None。
+    """
+    pages = plan["pages"]
+    if repacked_dir:
+        save_canvas_rows(canvas, pages, repacked_dir, repacked_pattern)
+    created_pdf_path = create_pdf_from_arrays([canvas[start_y:end_y] for start_y, end_y in pages], pdf_output_dir, pdf_filename)
+    if not created_pdf_path:
+        print(f"    ❌ {plan['method']} 方案的 PDF 创建失败。")
+        _remove_files(list(output_paths(os.path.join(pdf_output_dir, pdf_filename), OUTPUT_FORMAT).values()), "失败的输出文件")
+    return created_pdf_path
+
+
+def split_long_image_hybrid_with_pdf_fallback(long_image_path, output_split_dir, pdf_output_dir, pdf_filename, subdir_name,
+                                              keep_intermediates=False, plan_cache=None, on_plan=None):
+    """
+    融合分割方法：长图只解码一次，由 plan_split_from_array 在内存中选出 V2 或 V4 方案，
+    然后直接从画布行切片编码 PDF，不再写出分割片段、生成 PDF 失败后删除重来。
+    keep_intermediates=True 时把选中方案的页面另存为 PNG，便于排查。
+    plan_cache / on_plan 用于断点续跑：传入清单中的记录，方案确定后回调 on_plan(方案)。
+
+    :return: (页面行区间列表, PDF 路径)；失败时 PDF 路径为 None。
+    """
+    print(f"\n  --- 步骤 2 (V5 - 智能融合分割): 分割长图 '{os.path.basename(long_image_path)}' ---")
+    print("    🔄 采用智能双重分割策略：V2传统方法 → V4极速方法")
+    if not os.path.isfile(long_image_path):
+        print(f"    错误: 长图路径 '{long_image_path}' 未找到。")
+        return [], None
+
+    try:
+        with memory_stage("load"), Image.open(long_image_path) as img:
+            canvas = np.asarray(img.convert("RGB"))
+    except Exception as e:
+        print(f"    错误: 读取长图失败: {e}")
+        return [], None
+    if canvas.shape[0] == 0 or canvas.shape[1] == 0:
+        print(f"    图片 '{os.path.basename(long_image_path)}' 尺寸为零，无法分割。")
+        return [], None
+
+    height, width = canvas.shape[:2]
+    analysis_params = pipeline_params()["analysis"]
+    stored = None
+    if not (plan_cache and plan_cache.get("plan")):
+        stored = load_cut_plan(long_image_path, width, height, analysis_params)
+    with memory_stage("analysis"):
+        if stored:
+            print(f"    ⏭️  长图与分析参数均未变化，读取切割方案旁路文件 ({stored['method']}, {len(stored['segments'])} 个片段)，跳过行分析。")
+            plan = plan_from_segments(canvas, stored["method"], stored["segments"])
+            reusable_masks = plan_cache and plan_cache.get("height") == height
+            plan["mask_runs"] = {"v2": plan_cache.get("v2"), "v4": plan_cache.get("v4")} if reusable_masks else None
         else:
-            print("    ❌ V2 分割成功但重打包失败，正在清理 V2 文件并切换到 V4 方法...")
-            # 清理 V2 分割文件
-            print("    🧹 清理 V2 分割产生的文件...")
-            for file_path in v2_result:
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                        print(f"      已删除 V2 分割文件: {os.path.basename(file_path)}")
-                    except Exception as e:
-                        print(f"      删除失败 {os.path.basename(file_path)}: {e}")
+            plan = plan_split_from_array(canvas, plan_cache)
+            save_cut_plan(long_image_path, plan["method"], plan["segments"], width, height, analysis_params)
+    if on_plan:
+        on_plan(plan, canvas.shape)
+    with memory_stage("output"):
+        created_pdf_path = render_plan_pdf(
+            canvas, plan, pdf_output_dir, pdf_filename,
+            repacked_dir=output_split_dir if keep_intermediates else None, repacked_pattern=subdir_name + "_repacked_{}.png"
+        )
+    return plan["pages"], created_pdf_path
+
+
+# --- 流式合并 + 分割 ---
+def configure_encoder(workers, queue_depth):
+    """设置片段编码线程数与队列深度 (并行模式下在每个子进程中调用)。"""
+    global ENCODE_WORKERS, ENCODE_QUEUE_DEPTH
+    ENCODE_WORKERS = workers
+    ENCODE_QUEUE_DEPTH = queue_depth
+
+
+def _save_rows_png(rows, output_path, mode="RGB"):
+    """把一段 (H, W, 3) 行数组以 mode 保存为 PNG (在编码线程中调用)。"""
+    img = Image.fromarray(rows)
+    (img.convert(mode) if mode != img.mode else img).save(output_path, "PNG")
+
+
+def _remove_files(file_paths, label):
+    """删除一组中间文件，失败时仅打印提示。"""
+    for file_path in file_paths:
+        if os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+                print(f"      已删除{label}: {os.path.basename(file_path)}")
+            except Exception as e:
+                print(f"      删除失败 {os.path.basename(file_path)}: {e}")
+
+
+def stream_merge_and_split(images_data, canvas_width, target_width, output_split_dir, long_image_basename, method):
+    """
+    流式合并 + 分割：逐张解码源图片送入滚动缓冲区，确认切割点后立即保存片段。
+    完整长图从不生成，峰值内存取决于最高的片段而非整个项目。
+    片段的命名与切割结果和"先合并再分割"完全相同。
+    """
+    label = "V2 - 传统纯色带分析" if method == 'v2' else "V4 - 两阶段极速分析"
+    print(f"\n  --- 步骤 1+2 (流式 {label}): 边合并边分割 {len(images_data)} 张图片 ---")
+    os.makedirs(output_split_dir, exist_ok=True)
+    total_height = sum(item["height"] for item in images_data)
+
+    if method == 'v2':
+        splitter = make_v2_splitter(SPLIT_BAND_COLORS_RGB, COLOR_MATCH_TOLERANCE, MIN_SOLID_COLOR_BAND_HEIGHT)
     else:
-        print("    ⚠️  V2 方法分割失败，正在切换到 V4 方法...")
-    
-    # 清理可能创建的失败 PDF
+        min_band_height = MIN_SOLID_COLOR_BAND_HEIGHT_V4
+        if total_height < min_band_height * 3:  # 与 split_long_image_v4 一致：图片太短时不分割
+            print("    长图太短，无需分割，将整体作为一个片段。")
+            min_band_height = total_height + 1
+        splitter = make_v4_splitter(QUANTIZATION_FACTOR, MAX_UNIQUE_COLORS_IN_BG, min_band_height, EDGE_MARGIN_PERCENT)
+
+    def on_image_done(done, total, error):
+        if error is not None:
+            print(f"\n    警告: 粘贴图片 '{images_data[done - 1]['path']}' 失败: {error}。")
+        print_progress_bar(done, total, prefix='    流式处理:    ', suffix='完成', length=40)
+
+    # 与 split_long_image_v2 / split_long_image_v4 一致：V2 片段存为 RGBA、V4 片段存为 RGB，重打包按文件大小分组的结果相同
+    segment_mode = "RGBA" if method == 'v2' else "RGB"
+    split_image_paths = []
+    print_progress_bar(0, len(images_data), prefix='    流式处理:    ', suffix='完成', length=40)
+    try:
+        with SegmentEncoder(ENCODE_WORKERS, ENCODE_QUEUE_DEPTH) as encoder:
+            segments = stream_segments(images_data, canvas_width, target_width, splitter, on_image_done, RESIZE_QUALITY)
+            for part_index, (start_y, end_y, segment) in enumerate(segments, start=1):
+                output_filepath = os.path.join(output_split_dir, f"{long_image_basename}_split_part_{part_index}.png")
+                encoder.submit(output_filepath, _save_rows_png, segment, output_filepath, segment_mode)
+                split_image_paths.append(output_filepath)
+        for output_filepath, _, e_save in encoder.results():
+            if e_save is not None:
+                raise RuntimeError(f"保存片段 '{os.path.basename(output_filepath)}' 失败: {e_save}")
+    except Exception as e:
+        print(f"\n    流式分割时发生错误: {e}")
+        traceback.print_exc()
+        _remove_files(split_image_paths, "流式分割文件")
+        return []
+
+    print(f"    流式分割完成: {len(split_image_paths)} 个片段，切割点 {len(splitter.cut_points)} 个。")
+    print(f"    峰值缓冲 {splitter.peak_buffered_rows} 行 (长图总高 {total_height} 行)。")
+    return split_image_paths
+
+
+def stream_split_hybrid_with_pdf_fallback(source_project_dir, output_split_dir, pdf_output_dir, pdf_filename, subdir_name, target_width=None):
+    """
+    流式版本的融合分割：先以 V2 规则流式分割 + 创建 PDF，PDF 创建失败时清理 V2 文件并以 V4 规则重新流式分割。
+    流式模式不持有整块画布，无法使用 plan_split_from_array 的单次规划，仍以 PDF 创建是否成功作为失败判定。
+    """
+    print(f"\n  --- 步骤 1+2 (V5 - 流式智能融合分割): 项目 '{os.path.basename(source_project_dir)}' ---")
+    if not os.path.isdir(source_project_dir):
+        print(f"    错误: 源项目目录 '{source_project_dir}' 未找到。")
+        return None, None
+
+    sorted_image_filepaths = collect_project_image_paths(source_project_dir)
+    if not sorted_image_filepaths:
+        print(f"    在 '{os.path.basename(source_project_dir)}' 及其子目录中未找到符合条件的图片。")
+        return None, None
+
+    images_data, total_height, canvas_width = analyze_image_dimensions(sorted_image_filepaths, target_width)
+    if not images_data or canvas_width == 0 or total_height == 0:
+        print("    没有有效的图片可供合并。")
+        return None, None
+
+    long_image_basename = f"{subdir_name}_{LONG_IMAGE_FILENAME_BASE}"
     potential_pdf_path = os.path.join(pdf_output_dir, pdf_filename)
-    if os.path.exists(potential_pdf_path):
-        try:
-            os.remove(potential_pdf_path)
-            print(f"      已删除失败的 PDF 文件: {pdf_filename}")
-        except Exception as e:
-            print(f"      删除失败的 PDF 文件失败: {e}")
-    
-    # 尝试 V4 方法
-    print("\n    🚀 第二阶段：启用 V4 两阶段极速分析方法...")
-    v4_result = split_long_image_v4(
-        long_image_path,
-        output_split_dir,
-        QUANTIZATION_FACTOR,
-        MAX_UNIQUE_COLORS_IN_BG,
-        MIN_SOLID_COLOR_BAND_HEIGHT_V4,
-        EDGE_MARGIN_PERCENT
-    )
-    
-    if v4_result and len(v4_result) >= 1:
-        print(f"    ✅ V4 分割成功！共分割出 {len(v4_result)} 个片段。")
-        print("    📄 正在从 V4 分割结果创建 PDF...")
-        
-        # 尝试重打包
-        repacked_v4_paths = repack_split_images(
-            v4_result, output_split_dir, base_filename=subdir_name,
-            max_size_mb=MAX_REPACKED_FILESIZE_MB, max_height_px=MAX_REPACKED_PAGE_HEIGHT_PX
-        )
-        
-        if repacked_v4_paths:
-            # 尝试创建 PDF
-            created_pdf_path = create_pdf_from_images(
-                repacked_v4_paths, pdf_output_dir, pdf_filename
+    split_paths = []
+    repacked_paths = None
+    for method in ('v2', 'v4'):
+        if method == 'v4':
+            print("\n    🚀 第二阶段：以 V4 规则重新流式分割...")
+            _remove_files(split_paths, "分割文件")
+            _remove_files(repacked_paths or [], "重打包文件")
+            _remove_files(list(output_paths(potential_pdf_path, OUTPUT_FORMAT).values()), "失败的输出文件")
+
+        with memory_stage("stream"):
+            split_paths = stream_merge_and_split(
+                images_data, canvas_width, target_width, output_split_dir, long_image_basename, method
             )
-            
-            if created_pdf_path:
-                print(f"    ✅ V4 方法完全成功！PDF 已创建: {os.path.basename(created_pdf_path)}")
-                return repacked_v4_paths, created_pdf_path
-            else:
-                print("    ❌ V4 分割成功但 PDF 创建失败。")
-                return repacked_v4_paths, None
+        if not split_paths:
+            print(f"    ⚠️  {method.upper()} 流式分割失败。")
+            continue
+
+        with memory_stage("repack"):
+            repacked_paths = repack_split_images(
+                split_paths, output_split_dir, base_filename=subdir_name,
+                max_size_mb=MAX_REPACKED_FILESIZE_MB, max_height_px=MAX_REPACKED_PAGE_HEIGHT_PX
+            )
+        if not repacked_paths:
+            print(f"    ❌ {method.upper()} 分割成功但重打包失败。")
+            continue
+
+        with memory_stage("output"):
+            created_pdf_path = create_pdf_from_images(repacked_paths, pdf_output_dir, pdf_filename)
+        if created_pdf_path:
+            print(f"    ✅ {method.upper()} 流式方法完全成功！PDF 已创建: {os.path.basename(created_pdf_path)}")
+            return repacked_paths, created_pdf_path
+        print(f"    ❌ {method.upper()} 分割成功但 PDF 创建失败。")
+
+    return repacked_paths or split_paths, None
+
+
+# --- 内存交接模式 ---
+def save_canvas_rows(canvas, row_ranges, output_dir, filename_template):
+    """调试用：把画布的若干行区间保存为 PNG，文件名由 filename_template.format(序号) 生成。"""
+    os.makedirs(output_dir, exist_ok=True)
+    with SegmentEncoder(ENCODE_WORKERS, ENCODE_QUEUE_DEPTH) as encoder:
+        for index, (start_y, end_y) in enumerate(row_ranges, start=1):
+            output_path = os.path.join(output_dir, filename_template.format(index))
+            encoder.submit(output_path, _save_rows_png, canvas[start_y:end_y], output_path)
+    saved_paths = []
+    for output_path, _, error in encoder.results():
+        if error is None:
+            saved_paths.append(output_path)
         else:
-            print("    ❌ V4 分割成功但重打包失败。")
-            return v4_result, None
-    
-    print("    ❌ 两种分割方法都未能有效分割图片，将使用原图。")
-    
-    # 如果两种方法都失败，复制原图并尝试创建 PDF
-    dest_path = os.path.join(output_split_dir, os.path.basename(long_image_path))
-    shutil.copy2(long_image_path, dest_path)
-    
-    created_pdf_path = create_pdf_from_images(
-        [dest_path], pdf_output_dir, pdf_filename
-    )
-    
-    return [dest_path], created_pdf_path
+            print(f"    警告: 保存 '{os.path.basename(output_path)}' 失败: {error}")
+    return saved_paths
+
+
+def load_project_canvas(source_project_dir, long_image_dir, subdir_name, target_width=None, keep_intermediates=False):
+    """内存交接模式的步骤 1：把项目中的所有图片合并为一块内存画布。:return: (H, W, 3) 画布；失败时 None。"""
+    print(f"\n  --- 步骤 1 (内存交接): 合并项目 '{os.path.basename(source_project_dir)}' 中的所有图片 ---")
+    if not os.path.isdir(source_project_dir):
+        print(f"    错误: 源项目目录 '{source_project_dir}' 未找到。")
+        return None
+
+    sorted_image_filepaths = collect_project_image_paths(source_project_dir)
+    if not sorted_image_filepaths:
+        print(f"    在 '{os.path.basename(source_project_dir)}' 及其子目录中未找到符合条件的图片。")
+        return None
+
+    images_data, total_height, canvas_width = analyze_image_dimensions(sorted_image_filepaths, target_width)
+    if not images_data or canvas_width == 0 or total_height == 0:
+        print("    没有有效的图片可供合并。")
+        return None
+
+    def on_image_done(done, total, error):
+        if error is not None:
+            print(f"\n    警告: 粘贴图片 '{images_data[done - 1]['path']}' 失败: {error}。")
+        print_progress_bar(done, total, prefix='    粘贴图片:    ', suffix='完成', length=40)
+
+    print_progress_bar(0, len(images_data), prefix='    粘贴图片:    ', suffix='完成', length=40)
+    canvas = build_canvas_array(images_data, canvas_width, target_width, on_image_done, RESIZE_QUALITY)
+    print(f"    画布已在内存中就绪: {canvas_width}x{total_height}")
+
+    if keep_intermediates:
+        save_canvas_rows(canvas, [(0, total_height)], long_image_dir, f"{subdir_name}_{LONG_IMAGE_FILENAME_BASE}.png")
+    return canvas
+
+
+def plan_project_canvas(canvas, output_split_dir, subdir_name, keep_intermediates=False, plan_cache=None, on_plan=None):
+    """内存交接模式的步骤 2：在画布上规划切割方案。:return: 方案字典 (见 plan_split_from_array)。"""
+    print("\n  --- 步骤 2 (V5 - 内存交接智能融合分割) ---")
+    plan = plan_split_from_array(canvas, plan_cache)
+    if on_plan:
+        on_plan(plan, canvas.shape)
+    if keep_intermediates:
+        save_canvas_rows(canvas, plan["segments"], output_split_dir,
+                         f"{subdir_name}_{LONG_IMAGE_FILENAME_BASE}" + "_split_part_{}.png")
+    return plan
+
+
+def process_project_in_memory(source_project_dir, long_image_dir, output_split_dir, pdf_output_dir, pdf_filename, subdir_name,
+                              target_width=None, keep_intermediates=False, plan_cache=None, on_plan=None):
+    """
+    内存交接版本的 V5 流程：合并、分割、重打包都在同一块画布上完成，只有最终 PDF 需要编码。
+    片段与重打包页面都是画布的行区间，V2 / V4 方案由 plan_split_from_array 在编码之前选定。
+    keep_intermediates=True 时额外把长图、分割片段和重打包页面写到原来的中间目录，便于排查。
+
+    :return: (页面行区间列表, PDF 路径)；失败时 PDF 路径为 None。
+    """
+    with memory_stage("merge"):
+        canvas = load_project_canvas(source_project_dir, long_image_dir, subdir_name, target_width, keep_intermediates)
+    if canvas is None:
+        return None, None
+
+    with memory_stage("analysis"):
+        plan = plan_project_canvas(canvas, output_split_dir, subdir_name, keep_intermediates, plan_cache, on_plan)
+    with memory_stage("output"):
+        created_pdf_path = render_plan_pdf(
+            canvas, plan, pdf_output_dir, pdf_filename,
+            repacked_dir=output_split_dir if keep_intermediates else None, repacked_pattern=subdir_name + "_repacked_{}.png"
+        )
+    return plan["pages"], created_pdf_path
 
 
 def _merge_image_list_for_repack(image_paths, output_path):
@@ -751,15 +1092,15 @@ def _merge_image_list_for_repack(image_paths, output_path):
     if not image_paths: 
         return False
     images_data, total_height, target_width = [], 0, 0
+    dimensions = get_image_dimensions(image_paths, persist=False)
     for path in image_paths:
-        try:
-            with Image.open(path) as img:
-                if target_width == 0: 
-                    target_width = img.width
-                images_data.append({"path": path, "height": img.height})
-                total_height += img.height
-        except Exception: 
+        info = dimensions.get(path)
+        if info is None:
             continue
+        if target_width == 0:
+            target_width = info["width"]
+        images_data.append({"path": path, "height": info["height"]})
+        total_height += info["height"]
     if not images_data or target_width == 0: 
         return False
     merged_canvas = Image.new('RGB', (target_width, total_height))
@@ -784,33 +1125,41 @@ def repack_split_images(split_image_paths, output_dir, base_filename, max_size_m
     repacked_paths, current_bucket_paths, current_bucket_size, current_bucket_height = [], [], 0, 0
     repack_index = 1
 
-    for img_path in split_image_paths:
-        try:
-            file_size = os.path.getsize(img_path)
-            with Image.open(img_path) as img: 
-                img_height = img.height
-        except Exception as e:
-            print(f"\n    警告: 无法读取图片 '{os.path.basename(img_path)}' 的属性: {e}")
-            continue
+    dimensions = get_image_dimensions(split_image_paths, persist=False)
+    # 每个桶的解码、拼接与 PNG 编码在有界线程池中并行执行，文件名按桶的顺序预先确定
+    with SegmentEncoder(ENCODE_WORKERS, ENCODE_QUEUE_DEPTH) as encoder:
+        for img_path in split_image_paths:
+            try:
+                file_size = os.path.getsize(img_path)
+            except OSError as e:
+                print(f"\n    警告: 无法读取图片 '{os.path.basename(img_path)}' 的属性: {e}")
+                continue
+            if dimensions.get(img_path) is None:
+                print(f"\n    警告: 无法读取图片 '{os.path.basename(img_path)}' 的属性。")
+                continue
+            img_height = dimensions[img_path]["height"]
         
-        if current_bucket_paths and ((current_bucket_size + file_size > max_size_bytes) or (current_bucket_height + img_height > max_height_px)):
+            if current_bucket_paths and ((current_bucket_size + file_size > max_size_bytes) or (current_bucket_height + img_height > max_height_px)):
+                output_filename = f"{base_filename}_repacked_{repack_index}.png"
+                output_path = os.path.join(output_dir, output_filename)
+                encoder.submit(output_path, _merge_image_list_for_repack, current_bucket_paths, output_path)
+                repack_index += 1
+                current_bucket_paths, current_bucket_size, current_bucket_height = [img_path], file_size, img_height
+            else:
+                current_bucket_paths.append(img_path)
+                current_bucket_size += file_size
+                current_bucket_height += img_height
+
+        if current_bucket_paths:
             output_filename = f"{base_filename}_repacked_{repack_index}.png"
             output_path = os.path.join(output_dir, output_filename)
-            if _merge_image_list_for_repack(current_bucket_paths, output_path):
-                repacked_paths.append(output_path)
-            repack_index += 1
-            current_bucket_paths, current_bucket_size, current_bucket_height = [img_path], file_size, img_height
-        else:
-            current_bucket_paths.append(img_path)
-            current_bucket_size += file_size
-            current_bucket_height += img_height
-
-    if current_bucket_paths:
-        output_filename = f"{base_filename}_repacked_{repack_index}.png"
-        output_path = os.path.join(output_dir, output_filename)
-        if _merge_image_list_for_repack(current_bucket_paths, output_path):
+            encoder.submit(output_path, _merge_image_list_for_repack, current_bucket_paths, output_path)
+    for output_path, merged, error in encoder.results():
+        if error is not None:
+            print(f"\n    警告: 重打包 '{os.path.basename(output_path)}' 失败: {error}")
+        elif merged:
             repacked_paths.append(output_path)
-    
+
     print(f"    重打包完成，共生成 {len(repacked_paths)} 个新的图片块。")
     print("    ... 正在清理原始分割文件 ...")
     original_files_to_clean = [p for p in split_image_paths if p not in repacked_paths]
@@ -821,41 +1170,90 @@ def repack_split_images(split_image_paths, output_dir, base_filename, max_size_m
     return natsorted(repacked_paths)
 
 
+def _report_outputs(writer):
+    for path in writer.paths.values():
+        print(f"    成功创建 {os.path.splitext(path)[1][1:].upper()}: {path}")
+
+
 def create_pdf_from_images(image_paths_list, output_pdf_dir, pdf_filename_only):
-    """从图片列表创建PDF。"""
-    print(f"\n  --- 步骤 3: 从图片片段创建 PDF '{pdf_filename_only}' ---")
+    """
+    从图片列表创建 PDF (按 OUTPUT_FORMAT 也可以是 CBZ 或两者)。
+
+    :return: 代表本次输出的文件路径 (见 comic_core.document_writer.primary_output_path)；失败时返回 None。
+    """
+    print(f"\n  --- 步骤 3: 从图片片段创建 {OUTPUT_FORMAT.upper()} '{pdf_filename_only}' ---")
     if not image_paths_list:
         print("    没有图片可用于创建 PDF。")
         return None
 
     safe_image_paths = []
+    dimensions = get_image_dimensions(image_paths_list, persist=False)
     for image_path in image_paths_list:
-        try:
-            with Image.open(image_path) as img:
-                if img.height > 65500 or img.width > 65500:
-                    print(f"\n    警告: 图片 '{os.path.basename(image_path)}' 尺寸过大，已跳过。")
-                else:
-                    safe_image_paths.append(image_path)
-        except Exception as e:
-            print(f"    警告: 无法打开图片 '{image_path}' 进行尺寸检查: {e}")
+        info = dimensions.get(image_path)
+        if info is None:
+            print(f"    警告: 无法打开图片 '{image_path}' 进行尺寸检查。")
+        elif OUTPUT_FORMAT != "cbz" and (info["height"] > 65500 or info["width"] > 65500):
+            print(f"\n    警告: 图片 '{os.path.basename(image_path)}' 尺寸过大，已跳过。")
+        else:
+            safe_image_paths.append(image_path)
     
     if not safe_image_paths: 
         return None
 
     os.makedirs(output_pdf_dir, exist_ok=True)
     pdf_full_path = os.path.join(output_pdf_dir, pdf_filename_only)
-    
-    images_for_pdf = [Image.open(p).convert('RGB') for p in safe_image_paths]
-    if not images_for_pdf: 
+
+    # 逐页写入，内存中只保留当前一页；RGB / 灰度 JPEG 原样嵌入 PDF，已编码的片段原样存入 CBZ
+    try:
+        with DocumentWriter(pdf_full_path, OUTPUT_FORMAT, PDF_DPI, PDF_IMAGE_JPEG_QUALITY) as writer:
+            for image_path in safe_image_paths:
+                writer.add_file(image_path, dimensions[image_path])
+    except Exception as e:
+        print(f"    错误: 创建 {OUTPUT_FORMAT.upper()} '{pdf_filename_only}' 失败: {e}")
         return None
+    _report_outputs(writer)
+    return writer.primary_path
+
+
+def _writable_pages(page_arrays):
+    """
+    去掉空页面；有页面超过 PDF 尺寸上限 (65500px，只输出 CBZ 时不限制) 时返回 None。
+    页面来自切割方案，跳过超限页面会丢失内容，因此整个文档判定失败而不是只给出警告。
+    """
+    safe_pages = []
+    for index, page in enumerate(page_arrays, start=1):
+        if OUTPUT_FORMAT != "cbz" and (page.shape[0] > PDF_MAX_PAGE_PIXELS or page.shape[1] > PDF_MAX_PAGE_PIXELS):
+            print(f"\n    错误: 第 {index} 页尺寸过大 ({page.shape[1]}x{page.shape[0]})，超过 PDF 上限，拒绝输出以免丢失内容。")
+            return None
+        if page.shape[0] > 0:
+            safe_pages.append(page)
+    return safe_pages
+
 
+def create_pdf_from_arrays(page_arrays, output_pdf_dir, pdf_filename_only):
+    """
+    从内存中的页面数组 (画布行切片) 创建 PDF / CBZ。与 create_pdf_from_images 不同，
+    有页面超过 PDF 尺寸上限时整个文档判定失败 (见 _writable_pages)。同时输出两种格式时每页只编码一次 JPEG。
+    """
+    print(f"\n  --- 步骤 3: 从内存页面创建 {OUTPUT_FORMAT.upper()} '{pdf_filename_only}' ---")
+    safe_pages = _writable_pages(page_arrays)
+    if safe_pages is None:
+        return None
+    if not safe_pages:
+        print("    没有图片可用于创建 PDF。")
+        return None
+
+    os.makedirs(output_pdf_dir, exist_ok=True)
+    pdf_full_path = os.path.join(output_pdf_dir, pdf_filename_only)
     try:
-        images_for_pdf[0].save(pdf_full_path, save_all=True, append_images=images_for_pdf[1:], resolution=float(PDF_DPI), quality=PDF_IMAGE_JPEG_QUALITY, optimize=True)
-        print(f"    成功创建 PDF: {pdf_full_path}")
-        return pdf_full_path
-    finally:
-        for img_obj in images_for_pdf: 
-            img_obj.close()
+        with DocumentWriter(pdf_full_path, OUTPUT_FORMAT, PDF_DPI, PDF_IMAGE_JPEG_QUALITY) as writer:
+            for page in safe_pages:
+                writer.add_image(Image.fromarray(page))
+    except Exception as e:
+        print(f"    错误: 创建 {OUTPUT_FORMAT.upper()} '{pdf_filename_only}' 失败: {e}")
+        return None
+    _report_outputs(writer)
+    return writer.primary_path
 
 
 def cleanup_intermediate_dirs(long_img_dir, split_img_dir):
@@ -870,6 +1268,646 @@ def cleanup_intermediate_dirs(long_img_dir, split_img_dir):
                 print(f"    删除文件夹 '{dir_path}' 失败: {e}")
 
 
+# --- 断点续跑 (项目清单) ---
+def pipeline_params():
+    """当前流水线参数：analysis 组影响行掩码，output 组只影响重打包与 PDF 输出。"""
+    return {
+        "analysis": {
+            "target_width": PDF_TARGET_PAGE_WIDTH_PIXELS,
+            "resize_quality": RESIZE_QUALITY,
+            "v2": [[list(color) for color in SPLIT_BAND_COLORS_RGB], COLOR_MATCH_TOLERANCE, MIN_SOLID_COLOR_BAND_HEIGHT],
+            "v4": [QUANTIZATION_FACTOR, MAX_UNIQUE_COLORS_IN_BG, MIN_SOLID_COLOR_BAND_HEIGHT_V4, EDGE_MARGIN_PERCENT],
+        },
+        "output": {
+            "max_repacked_mb": MAX_REPACKED_FILESIZE_MB,
+            "max_page_height": MAX_REPACKED_PAGE_HEIGHT_PX,
+            "pdf_dpi": PDF_DPI,
+            "jpeg_quality": PDF_IMAGE_JPEG_QUALITY,
+            "format": OUTPUT_FORMAT,
+        },
+    }
+
+
+def prepare_project_state(project_dir, pdf_path, resume=True):
+    """
+    计算项目的输入指纹并与上次的清单比较，决定可以跳过哪些阶段。
+
+    :return: {"manifest": 本次清单, "skip": 项目已完成, "reuse_long_image": 长图可复用,
+              "plan_cache": 传给 plan_split_from_array 的缓存或 None}；项目中没有图片时返回 None。
+    """
+    sorted_image_filepaths = collect_project_image_paths(project_dir)
+    if not sorted_image_filepaths:
+        return None
+    images_data, total_height, canvas_width = analyze_image_dimensions(sorted_image_filepaths, PDF_TARGET_PAGE_WIDTH_PIXELS)
+    previous = load_manifest(project_dir) if resume else None
+    inputs = fingerprint_inputs(images_data, project_dir, previous.get("inputs") if previous else None)
+    params = pipeline_params()
+    state = {
+        "manifest": {"status": "running", "params": params, "inputs": inputs, "masks": None, "plan": None, "artifacts": {}},
+        "skip": False,
+        "reuse_long_image": False,
+        "plan_cache": None,
+    }
+    if not previous or (previous.get("params") or {}).get("analysis") != params["analysis"]:
+        return state
+
+    same_inputs = inputs_match(previous.get("inputs"), inputs)
+    same_output = previous["params"].get("output") == params["output"]
+    artifacts = previous.get("artifacts") or {}
+    expected_outputs = {name: os.path.abspath(path) for name, path in output_paths(pdf_path, OUTPUT_FORMAT).items()}
+    output_records = artifacts.get("outputs") or {}
+    outputs_intact = (
+        {name: record["path"] for name, record in output_records.items()} == expected_outputs
+        and all(artifact_exists(record) for record in output_records.values())
+    )
+    if same_inputs and same_output and previous.get("status") == "done" and outputs_intact:
+        state["skip"] = True
+        state["manifest"] = previous
+        return state
+
+    if same_inputs and artifact_exists(artifacts.get("long_image"), project_dir):
+        state["reuse_long_image"] = True
+        state["manifest"]["artifacts"]["long_image"] = artifacts["long_image"]
+    masks = previous.get("masks") or {}
+    if masks.get("canvas_width") == canvas_width:
+        state["plan_cache"] = {
+            "prefix_rows": unchanged_prefix_rows(previous.get("inputs"), inputs),
+            "height": masks.get("height"),
+            "v2": masks.get("v2"),
+            "v4": masks.get("v4"),
+            "plan": previous.get("plan") if same_inputs and same_output else None,
+        }
+    return state
+
+
+def record_plan(project_dir, manifest, plan, canvas_shape):
+    """把方案与行掩码写入清单，中途崩溃后重新运行时可跳过行分析 (方案来自旁路文件、没有行掩码时只写方案)。"""
+    if plan.get("mask_runs"):
+        manifest["masks"] = {
+            "canvas_width": int(canvas_shape[1]),
+            "height": int(canvas_shape[0]),
+            "v2": plan["mask_runs"]["v2"],
+            "v4": plan["mask_runs"]["v4"],
+        }
+    manifest["plan"] = {
+        "method": plan["method"],
+        "segments": [list(segment) for segment in plan["segments"]],
+        "pages": [list(page) for page in plan["pages"]],
+    }
+    save_manifest(project_dir, manifest)
+
+
+def start_project(root_input_dir, subdir_name, overall_pdf_output_dir, options, record_memory=True):
+    """
+    项目的准备步骤：应用参数、检查项目清单 (断点续跑)、按内存预算选择模式、清理旧的中间文件。
+
+    :param record_memory: 为 True 时创建本项目的 StageMemoryRecorder (同一时间只能有一个项目在记录)。
+    :return: 项目上下文字典；输入未变化可以跳过时 ctx["result"] 已是最终结果。
+    """
+    global MEMORY_RECORDER
+    start_time = time.time()
+    configure_row_scan(options["coarse_factor"], options["verify_coarse"], options["scan_workers"],
+                       options.get("coarse_v4", False))
+    configure_encoder(options["encode_workers"], options["encode_queue_depth"])
+    configure_output(options["max_repacked_mb"], options["max_page_height"], options["jpeg_quality"], options["output"])
+    configure_resize(options["resize_quality"])
+    configure_page_dedup(options.get("skip_pages", ()))
+    configure_memory_governor(options.get("memory_governor", True))
+    current_processing_subdir = os.path.join(root_input_dir, subdir_name)
+    ctx = {
+        "name": subdir_name,
+        "options": options,
+        "start_time": start_time,
+        "project_dir": current_processing_subdir,
+        "long_image_dir": os.path.join(current_processing_subdir, MERGED_LONG_IMAGE_SUBDIR_NAME),
+        "split_dir": os.path.join(current_processing_subdir, SPLIT_IMAGES_SUBDIR_NAME),
+        "pdf_output_dir": overall_pdf_output_dir,
+        "pdf_filename": f"{subdir_name}.pdf",
+        "long_image_filename": f"{subdir_name}_{LONG_IMAGE_FILENAME_BASE}.png",
+        "result": None,
+    }
+
+    print(f"\n  --- 步骤 0: 检查项目清单 (断点续跑) ---")
+    state = prepare_project_state(
+        current_processing_subdir, os.path.join(overall_pdf_output_dir, ctx["pdf_filename"]), options["resume"]
+    ) if os.path.isdir(current_processing_subdir) else None
+    manifest = state["manifest"] if state else None
+    ctx.update(state=state, manifest=manifest, plan_cache=state["plan_cache"] if state else None)
+    ctx["on_plan"] = (lambda plan, shape: record_plan(current_processing_subdir, manifest, plan, shape)) if state else None
+    if state and state["skip"]:
+        created_pdf_path = primary_output_path(os.path.join(overall_pdf_output_dir, ctx["pdf_filename"]), OUTPUT_FORMAT)
+        print(f"    ⏭️  输入与参数均未变化，输出文件已存在，跳过项目: {os.path.basename(created_pdf_path)}")
+        ctx["result"] = {"name": subdir_name, "success": True, "pdf_path": created_pdf_path,
+                         "elapsed": time.time() - start_time, "log": None}
+        return ctx
+    if state:
+        save_manifest(current_processing_subdir, manifest)
+
+    print(f"\n  --- 内存调控: 按尺寸索引估算各阶段内存 ---")
+    budget_bytes = options.get("memory_budget_bytes")
+    ctx.update(mode=requested_mode(options), budget_bytes=budget_bytes)
+    ctx["chosen_mode"], ctx["memory_estimates"], governor_note = govern_project_mode(
+        current_processing_subdir, ctx["mode"], budget_bytes, PDF_TARGET_PAGE_WIDTH_PIXELS
+    )
+    _report_governor_choice(ctx, governor_note)
+    if record_memory:
+        MEMORY_RECORDER = StageMemoryRecorder()
+
+    # 清理旧的中间文件，以防上次失败残留；清单确认仍然有效的长图保留下来
+    if os.path.isdir(ctx["long_image_dir"]) and not (state and state["reuse_long_image"]):
+        shutil.rmtree(ctx["long_image_dir"])
+    if os.path.isdir(ctx["split_dir"]):
+        shutil.rmtree(ctx["split_dir"])
+    return ctx
+
+
+def _report_project_pdf(subdir_name, created_pdf_path):
+    if created_pdf_path:
+        print(f"\n  ✅ 项目 '{subdir_name}' 处理成功！PDF 已创建: {os.path.basename(created_pdf_path)}")
+    else:
+        print(f"\n  ❌ 项目 '{subdir_name}' 处理失败：无法创建 PDF 文件。")
+
+
+def run_project(ctx):
+    """按 start_project 选定的模式处理项目：合并 → 智能分割 + PDF 创建。:return: PDF 路径；失败时为 None。"""
+    options, state, manifest = ctx["options"], ctx["state"], ctx["manifest"]
+    subdir_name, current_processing_subdir = ctx["name"], ctx["project_dir"]
+    path_long_image_output_dir, path_split_images_output_dir = ctx["long_image_dir"], ctx["split_dir"]
+    overall_pdf_output_dir, pdf_filename = ctx["pdf_output_dir"], ctx["pdf_filename"]
+    long_image_filename = ctx["long_image_filename"]
+    created_pdf_path = None
+
+    if ctx["chosen_mode"] in ("streaming", "in_memory"):
+        created_long_image_path = None
+        if ctx["chosen_mode"] == "streaming":
+            _, created_pdf_path = stream_split_hybrid_with_pdf_fallback(
+                current_processing_subdir,
+                path_split_images_output_dir,
+                overall_pdf_output_dir,
+                pdf_filename,
+                subdir_name,
+                PDF_TARGET_PAGE_WIDTH_PIXELS
+            )
+        else:
+            _, created_pdf_path = process_project_in_memory(
+                current_processing_subdir,
+                path_long_image_output_dir,
+                path_split_images_output_dir,
+                overall_pdf_output_dir,
+                pdf_filename,
+                subdir_name,
+                PDF_TARGET_PAGE_WIDTH_PIXELS,
+                keep_intermediates=options["keep_intermediates"],
+                plan_cache=ctx["plan_cache"],
+                on_plan=ctx["on_plan"]
+            )
+        _report_project_pdf(subdir_name, created_pdf_path)
+    elif state and state["reuse_long_image"]:
+        created_long_image_path = os.path.join(path_long_image_output_dir, long_image_filename)
+        print(f"\n  --- 步骤 1: 输入未变化，复用上次合并的长图 '{long_image_filename}' ---")
+    else:
+        with memory_stage("merge"):
+            created_long_image_path = merge_to_long_image(
+                current_processing_subdir, path_long_image_output_dir,
+                long_image_filename, PDF_TARGET_PAGE_WIDTH_PIXELS
+            )
+        if created_long_image_path and state:
+            manifest["artifacts"]["long_image"] = artifact_record(created_long_image_path, current_processing_subdir)
+            save_manifest(current_processing_subdir, manifest)
+    
+    if created_long_image_path:
+        # ▼▼▼ 调用 V5 融合分割函数（包含 PDF 创建失败自动切换逻辑）▼▼▼
+        _, created_pdf_path = split_long_image_hybrid_with_pdf_fallback(
+            created_long_image_path, 
+            path_split_images_output_dir,
+            overall_pdf_output_dir,
+            pdf_filename,
+            subdir_name,
+            keep_intermediates=options["keep_intermediates"],
+            plan_cache=ctx["plan_cache"],
+            on_plan=ctx["on_plan"]
+        )
+        _report_project_pdf(subdir_name, created_pdf_path)
+    return created_pdf_path
+
+
+def complete_project(ctx, created_pdf_path):
+    """项目的收尾步骤：清理中间文件、更新清单、记录内存用量。:return: 结果字典 (见 process_project)。"""
+    global MEMORY_RECORDER
+    options, manifest, subdir_name = ctx["options"], ctx["manifest"], ctx["name"]
+    overall_pdf_output_dir, pdf_filename = ctx["pdf_output_dir"], ctx["pdf_filename"]
+    if created_pdf_path:
+        if options["keep_intermediates"]:
+            print("\n  --- 步骤 4: 已按 --keep-intermediates 保留中间文件 ---")
+        else:
+            cleanup_intermediate_dirs(ctx["long_image_dir"], ctx["split_dir"])
+            if manifest:
+                manifest["artifacts"].pop("long_image", None)
+        if manifest:
+            manifest["artifacts"]["outputs"] = {
+                name: artifact_record(path)
+                for name, path in output_paths(os.path.join(overall_pdf_output_dir, pdf_filename), OUTPUT_FORMAT).items()
+            }
+            manifest["status"] = "done"
+            save_manifest(ctx["project_dir"], manifest)
+    else:
+        print(f"  ❌ 项目文件夹 '{subdir_name}' 未能成功生成PDF，将保留中间文件以供检查。")
+
+    recorder, MEMORY_RECORDER = MEMORY_RECORDER, None
+    if recorder:
+        record_memory_usage(
+            overall_pdf_output_dir, subdir_name, ctx["mode"], ctx["chosen_mode"], ctx["budget_bytes"],
+            ctx["memory_estimates"], recorder,
+            project_features(collect_project_image_paths(ctx["project_dir"]) or []), time.time() - ctx["start_time"]
+        )
+
+    return {
+        "name": subdir_name,
+        "success": bool(created_pdf_path),
+        "pdf_path": created_pdf_path,
+        "elapsed": time.time() - ctx["start_time"],
+        "log": None,
+    }
+
+
+def process_project(root_input_dir, subdir_name, overall_pdf_output_dir, options):
+    """
+    处理单个项目文件夹：合并 → 智能分割 + PDF 创建 → 清理。不负责移动文件夹。
+
+    :param options: {"streaming": bool, "in_memory": bool, "pipelined": bool, "keep_intermediates": bool, "resume": bool,
+                     "coarse_factor": int, "verify_coarse": bool, "coarse_v4": bool, "scan_workers": int,
+                     "encode_workers": int, "encode_queue_depth": int,
+                     "max_repacked_mb": float, "max_page_height": int, "jpeg_quality": int,
+                     "resize_quality": str, "output": 'pdf' | 'cbz' | 'both', "skip_pages": [重复源图路径],
+                     "memory_budget_bytes": int | None, "memory_governor": bool}
+    :return: 结果字典 {"name", "success", "pdf_path", "elapsed", "log"}
+    """
+    ctx = start_project(root_input_dir, subdir_name, overall_pdf_output_dir, options)
+    if ctx["result"]:
+        return ctx["result"]
+    return complete_project(ctx, run_project(ctx))
+
+
+def process_project_captured(root_input_dir, subdir_name, overall_pdf_output_dir, options):
+    """并行模式的子进程入口：关闭进度条，并把该项目的全部输出收集到独立的日志缓冲区中。"""
+    global PROGRESS_BAR_ENABLED
+    PROGRESS_BAR_ENABLED = False
+    log_buffer = io.StringIO()
+    start_time = time.time()
+    with contextlib.redirect_stdout(log_buffer), contextlib.redirect_stderr(log_buffer):
+        try:
+            result = process_project(root_input_dir, subdir_name, overall_pdf_output_dir, options)
+        except Exception as e:
+            print(f"  ❌ 处理项目 '{subdir_name}' 时发生未捕获的错误: {e}")
+            traceback.print_exc()
+            result = {"name": subdir_name, "success": False, "pdf_path": None,
+                      "elapsed": time.time() - start_time, "log": None}
+    result["log"] = log_buffer.getvalue()
+    return result
+
+
+# --- 流水线模式 ---
+def _encode_rows(rows):
+    return encode_page(Image.fromarray(rows), OUTPUT_FORMAT, PDF_IMAGE_JPEG_QUALITY)
+
+
+def encode_plan_pages(canvas, plan):
+    """
+    按切割方案把画布行切片编码为待写入的页面 (在编码线程池中并行)。
+    :return: [encode_page 的结果]；有页面超过 PDF 尺寸上限时返回空列表 (写出阶段判定失败)。
+    """
+    print(f"\n  --- 步骤 3a: 编码 {len(plan['pages'])} 个页面 ---")
+    encoded = []
+    pages = _writable_pages([canvas[start_y:end_y] for start_y, end_y in plan["pages"]])
+    if pages is None:
+        return encoded
+    with SegmentEncoder(ENCODE_WORKERS, ENCODE_QUEUE_DEPTH) as encoder:
+        for index, page in enumerate(pages, start=1):
+            encoder.submit(index, _encode_rows, page)
+    for index, page, error in encoder.results():
+        if error is not None:
+            raise RuntimeError(f"编码第 {index} 页失败: {error}")
+        encoded.append(page)
+    return encoded
+
+
+def write_encoded_pages(encoded_pages, output_pdf_dir, pdf_filename_only):
+    """把已编码的页面按顺序写入 PDF / CBZ。:return: 输出文件路径；失败时删除残留文件并返回 None。"""
+    print(f"\n  --- 步骤 3b: 写入 {OUTPUT_FORMAT.upper()} '{pdf_filename_only}' ---")
+    if not encoded_pages:
+        print("    没有图片可用于创建 PDF。")
+        return None
+    os.makedirs(output_pdf_dir, exist_ok=True)
+    pdf_full_path = os.path.join(output_pdf_dir, pdf_filename_only)
+    try:
+        with DocumentWriter(pdf_full_path, OUTPUT_FORMAT, PDF_DPI, PDF_IMAGE_JPEG_QUALITY) as writer:
+            for page in encoded_pages:
+                writer.add_encoded(page)
+    except Exception as e:
+        print(f"    错误: 创建 {OUTPUT_FORMAT.upper()} '{pdf_filename_only}' 失败: {e}")
+        return None
+    _report_outputs(writer)
+    return writer.primary_path
+
+
+def _in_pipeline(ctx):
+    """项目仍需经过后续阶段 (没有跳过、失败，也没有留到流水线之后单独处理)。"""
+    return not ctx["result"] and not ctx.get("deferred")
+
+
+def _pipeline_decode(job):
+    """
+    流水线的解码阶段：准备项目并合并画布。内存调控改用流式模式的项目不进入流水线
+    (在解码线程中整体处理会阻塞后面所有项目)，标记为 deferred，等流水线排空后单独处理。
+    """
+    ctx = start_project(*job, record_memory=False)
+    if ctx["result"]:
+        return ctx
+    if ctx["chosen_mode"] != "in_memory":
+        print(f"    ↪️  {ctx['chosen_mode']} 模式的项目不进入流水线，待流水线中的项目全部完成后单独处理。")
+        ctx["deferred"] = True
+        return ctx
+    ctx["canvas"] = load_project_canvas(
+        ctx["project_dir"], ctx["long_image_dir"], ctx["name"], PDF_TARGET_PAGE_WIDTH_PIXELS,
+        ctx["options"]["keep_intermediates"]
+    )
+    if ctx["canvas"] is None:
+        _report_project_pdf(ctx["name"], None)
+        ctx["result"] = complete_project(ctx, None)
+    return ctx
+
+
+def _pipeline_analyze(ctx):
+    if _in_pipeline(ctx):
+        ctx["plan"] = plan_project_canvas(
+            ctx["canvas"], ctx["split_dir"], ctx["name"], ctx["options"]["keep_intermediates"],
+            ctx["plan_cache"], ctx["on_plan"]
+        )
+    return ctx
+
+
+def _pipeline_encode(ctx):
+    if _in_pipeline(ctx):
+        if ctx["options"]["keep_intermediates"]:
+            save_canvas_rows(ctx["canvas"], ctx["plan"]["pages"], ctx["split_dir"], ctx["name"] + "_repacked_{}.png")
+        ctx["encoded"] = encode_plan_pages(ctx["canvas"], ctx["plan"])
+        ctx["canvas"] = None  # 编码完成后画布不再需要，尽早释放
+    return ctx
+
+
+def _pipeline_write(ctx):
+    if _in_pipeline(ctx):
+        created_pdf_path = write_encoded_pages(ctx.pop("encoded"), ctx["pdf_output_dir"], ctx["pdf_filename"])
+        if not created_pdf_path:
+            print(f"    ❌ {ctx['plan']['method']} 方案的 PDF 创建失败。")
+            _remove_files(list(output_paths(os.path.join(ctx["pdf_output_dir"], ctx["pdf_filename"]), OUTPUT_FORMAT).values()),
+                          "失败的输出文件")
+        _report_project_pdf(ctx["name"], created_pdf_path)
+        ctx["result"] = complete_project(ctx, created_pdf_path)
+    return ctx
+
+
+def process_projects_pipelined(root_input_dir, subdir_names, overall_pdf_output_dir, options, on_result):
+    """
+    流水线模式：各项目按 解码 → 行分析 → 编码 → 写出 四个阶段依次流过，每个阶段一个线程，
+    第 N+1 个项目解码时第 N 个项目在做行分析、第 N-1 个项目在编码。各阶段与内存交接模式的处理完全相同，
+    输出一致。每个项目的输出收集在各自的日志中，完成时交给 on_result(序号, 结果)；最后打印各阶段利用率。
+    每个项目在各阶段的忙碌时间写入计时日志 (见 record_pipeline_timing)，供 CostModel 学习。
+
+    内存预算按 PIPELINE_CANVAS_SLOTS 平分给同时驻留的画布，放不下的项目由内存调控改用流式模式，
+    在流水线排空后逐个单独处理 (此时按整个预算重新选择模式，并照常记录内存用量)。
+    """
+    global PROGRESS_BAR_ENABLED
+    budget_bytes = options.get("memory_budget_bytes")
+    stage_options = dict(options, memory_budget_bytes=budget_bytes // PIPELINE_CANVAS_SLOTS if budget_bytes else None)
+    logs = [io.StringIO() for _ in subdir_names]
+    pipeline = StagePipeline(
+        [("decode", _pipeline_decode), ("analyze", _pipeline_analyze), ("encode", _pipeline_encode), ("write", _pipeline_write)],
+        PIPELINE_QUEUE_DEPTH
+    )
+
+    deferred = []
+
+    def failed(index, log, error):
+        log += f"  ❌ 处理项目 '{subdir_names[index]}' 时发生未捕获的错误: {error}\n"
+        return {"name": subdir_names[index], "success": False, "pdf_path": None, "elapsed": 0.0, "log": log}
+
+    def finished(index, ctx, error):
+        if error is not None:
+            on_result(index, failed(index, logs[index].getvalue(), error))
+            return
+        if ctx.get("deferred"):
+            deferred.append((index, ctx))
+            return
+        if "chosen_mode" in ctx:  # 断点续跑跳过的项目没有可记录的耗时
+            record_pipeline_timing(ctx, pipeline.item_seconds[index])
+        result = ctx["result"]
+        result["log"] = logs[index].getvalue()
+        on_result(index, result)
+
+    PROGRESS_BAR_ENABLED = False
+    try:
+        pipeline.run(
+            [(root_input_dir, name, overall_pdf_output_dir, stage_options) for name in subdir_names],
+            log_of=logs.__getitem__, on_result=finished
+        )
+        print("\n流水线各阶段利用率:")
+        for line in pipeline.report():
+            print(f"  {line}")
+        if deferred:
+            print(f"\n单独处理 {len(deferred)} 个未进入流水线的项目: {', '.join(ctx['name'] for _, ctx in deferred)}")
+        for index, ctx in deferred:
+            with contextlib.redirect_stdout(logs[index]), contextlib.redirect_stderr(logs[index]):
+                try:
+                    result = run_deferred_project(ctx, budget_bytes)
+                except Exception as e:
+                    result = failed(index, logs[index].getvalue(), e)
+            result["log"] = logs[index].getvalue()
+            on_result(index, result)
+    finally:
+        PROGRESS_BAR_ENABLED = True
+
+
+def run_deferred_project(ctx, budget_bytes):
+    """
+    在流水线之外处理 start_project 已准备好的项目，并像顺序模式一样记录内存用量。
+    流水线中的模式选择只用到预算的 1/PIPELINE_CANVAS_SLOTS，这里按整个预算 budget_bytes 重新选择，
+    能放下的项目仍按请求的模式处理。
+    """
+    global MEMORY_RECORDER
+    ctx["budget_bytes"] = budget_bytes
+    ctx["chosen_mode"], ctx["memory_estimates"], governor_note = govern_project_mode(
+        ctx["project_dir"], ctx["mode"], budget_bytes, PDF_TARGET_PAGE_WIDTH_PIXELS
+    )
+    print(f"\n  --- 内存调控: 按整个预算重新选择模式 ---")
+    _report_governor_choice(ctx, governor_note)
+    ctx["start_time"] = time.time()
+    MEMORY_RECORDER = StageMemoryRecorder()
+    try:
+        return complete_project(ctx, run_project(ctx))
+    finally:
+        MEMORY_RECORDER = None
+
+
+def record_pipeline_timing(ctx, stage_seconds):
+    """
+    流水线模式的计时记录：各阶段的忙碌时间按 PIPELINE_TIMING_STAGES 归到内存交接模式的阶段名下，
+    elapsed 为各阶段忙碌时间之和 (不含在队列中等待的时间)。多个项目同时驻留，RSS 无法归到单个项目，不做记录。
+    """
+    seconds = {}
+    for stage, busy in stage_seconds.items():
+        name = PIPELINE_TIMING_STAGES.get(stage, stage)
+        seconds[name] = seconds.get(name, 0.0) + busy
+    record = {"project": ctx["name"], "requested_mode": ctx["mode"], "mode": ctx["chosen_mode"], "pipelined": True,
+              "budget": ctx["budget_bytes"], "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    record.update(project_features(collect_project_image_paths(ctx["project_dir"]) or []))
+    record["elapsed"] = round(sum(seconds.values()), 3)
+    record["stages"] = {name: {"estimate": ctx["memory_estimates"].get(name), "seconds": round(value, 3)}
+                        for name, value in seconds.items()}
+    error = append_timing_record(os.path.join(ctx["pdf_output_dir"], MEMORY_CALIBRATION_FILENAME), record)
+    if error:
+        print(f"    警告: 写入计时日志失败: {error}")
+
+
+# --- 内存调控 ---
+def configure_memory_governor(enabled):
+    """设置超出内存预算时是否自动改用流式模式 (并行模式下在每个子进程中调用)。"""
+    global MEMORY_GOVERNOR_ENABLED
+    MEMORY_GOVERNOR_ENABLED = enabled
+
+
+def memory_stage(name):
+    """在当前项目的内存记录器中记录一个阶段；未在处理项目时什么也不做。"""
+    return MEMORY_RECORDER.stage(name) if MEMORY_RECORDER else contextlib.nullcontext()
+
+
+def requested_mode(options):
+    if options["streaming"]:
+        return "streaming"
+    return "in_memory" if options["in_memory"] or options.get("pipelined") else "classic"
+
+
+def govern_project_mode(project_dir, mode, budget_bytes, target_width=None):
+    """
+    按尺寸索引估算项目在请求模式与流式模式下各阶段的内存 (只读取图片文件头)，
+    请求模式的峰值超出预算时改用流式模式 (MEMORY_GOVERNOR_ENABLED 为 False 时只估算不切换)。
+
+    :return: (实际使用的模式, 该模式的 {阶段: 估算字节数}, 说明或 None)
+    """
+    dimensions = list(get_image_dimensions(collect_project_image_paths(project_dir) or []).values())
+    estimates = {
+        candidate: estimate_stage_bytes(dimensions, candidate, target_width, MAX_REPACKED_PAGE_HEIGHT_PX, ENCODE_QUEUE_DEPTH)
+        for candidate in {mode, "streaming"}
+    }
+    chosen, note = choose_mode(mode, estimates, budget_bytes if MEMORY_GOVERNOR_ENABLED else None)
+    return chosen, estimates[chosen], note
+
+
+def _report_governor_choice(ctx, note):
+    budget_bytes = ctx["budget_bytes"]
+    print(f"    {ctx['chosen_mode']} 模式预估峰值 {peak_estimate(ctx['memory_estimates']) / 1024 / 1024:.0f}MB，预算 "
+          f"{f'{budget_bytes / 1024 / 1024:.0f}MB' if budget_bytes else '不限'}")
+    if note:
+        print(f"    ⚠️  {note}")
+
+
+def record_memory_usage(pdf_output_dir, subdir_name, mode, chosen_mode, budget_bytes, estimates, recorder,
+                        features=None, elapsed=None):
+    """
+    打印各阶段的估算值与实测 RSS 增量，并追加一条记录到校准日志。
+    features (project_features 的结果) 与 elapsed 一并记录，供 CostModel 学习各阶段吞吐量。
+    """
+    record = {"project": subdir_name, "requested_mode": mode, "mode": chosen_mode, "budget": budget_bytes,
+              "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    record.update(features or {})
+    if elapsed is not None:
+        record["elapsed"] = round(elapsed, 3)
+    record.update(recorder.calibration_record(estimates))
+    to_mb = lambda value: "-" if value is None else f"{value / 1024 / 1024:.0f}MB"
+    print(f"\n  --- 内存用量 ({chosen_mode}): 阶段 估算 / 实测 RSS 增量 ---")
+    for stage, values in record["stages"].items():
+        print(f"    {stage:<9} {to_mb(values['estimate']):>8} / {to_mb(values['measured']):>8}")
+    error = append_timing_record(os.path.join(pdf_output_dir, MEMORY_CALIBRATION_FILENAME), record)
+    if error:
+        print(f"    警告: 写入内存校准日志失败: {error}")
+
+
+def plan_page_dedup(root_input_dir, sorted_subdirectories, report_path, max_distance=PAGE_DEDUP_MAX_DISTANCE):
+    """
+    去重阶段：按项目顺序计算所有源图的感知哈希 (缓存在各目录的尺寸索引中)，
+    找出与前面某张图片重复的源图，写出报告并返回要跳过的路径列表。源图本身不会被删除。
+    """
+    print(f"\n🔍 重复页面检测 (汉明距离 ≤ {max_distance})...")
+    ordered_paths = []
+    project_of = {}
+    for subdir_name in sorted_subdirectories:
+        for path in collect_project_image_paths(os.path.join(root_input_dir, subdir_name)) or []:
+            ordered_paths.append(path)
+            project_of[path] = subdir_name
+    if not ordered_paths:
+        return []
+
+    hashes = get_page_hashes(
+        ordered_paths,
+        progress=lambda done, total: print_progress_bar(done, total, prefix='    计算感知哈希:', suffix='完成', length=40)
+    )
+    dimensions = get_image_dimensions(ordered_paths)
+    duplicates = find_duplicate_pages(ordered_paths, hashes, dimensions, max_distance)
+
+    skipped_pixels = 0
+    report_entries = []
+    for duplicate in duplicates:
+        info = dimensions[duplicate["path"]]
+        skipped_pixels += info["width"] * info["height"]
+        report_entries.append({
+            "project": project_of[duplicate["path"]],
+            "file": os.path.relpath(duplicate["path"], root_input_dir),
+            "duplicate_of": os.path.relpath(duplicate["duplicate_of"], root_input_dir),
+            "dhash_distance": duplicate["dhash_distance"],
+            "phash_distance": duplicate["phash_distance"],
+            "width": info["width"],
+            "height": info["height"],
+        })
+    total_pixels = sum(info["width"] * info["height"] for info in dimensions.values() if info)
+    report = {
+        "version": 1,
+        "max_distance": max_distance,
+        "total_images": len(ordered_paths),
+        "skipped_images": len(report_entries),
+        "skipped_pixels": skipped_pixels,
+        "total_pixels": total_pixels,
+        "skipped": report_entries,
+    }
+    try:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"    警告: 写入去重报告失败: {e}")
+
+    if report_entries:
+        print(f"    跳过 {len(report_entries)}/{len(ordered_paths)} 张重复源图 "
+              f"(约占像素的 {skipped_pixels / max(1, total_pixels):.1%})，详见: {report_path}")
+        for entry in report_entries:
+            print(f"      - {entry['file']}  (与 {entry['duplicate_of']} 重复)")
+    else:
+        print("    未发现重复的源图。")
+    return [duplicate["path"] for duplicate in duplicates]
+
+
+def move_to_success_dir(project_path, success_move_target_dir):
+    """把处理成功的项目文件夹移动到 IMG 目录，返回是否成功。只在主进程中调用。"""
+    print(f"\n  --- 步骤 5: 移动已成功处理的项目文件夹 ---")
+    try:
+        print(f"    准备将 '{os.path.basename(project_path)}' 移动到 '{os.path.basename(success_move_target_dir)}' 文件夹中...")
+        shutil.move(project_path, success_move_target_dir)
+        moved_path = os.path.join(success_move_target_dir, os.path.basename(project_path))
+        print(f"    成功移动文件夹至: {moved_path}")
+        return True
+    except Exception as e:
+        print(f"    错误: 移动文件夹 '{os.path.basename(project_path)}' 失败: {e}")
+        return False
+
+
 def main(argv=None):
     print(f"[DEBUG child] main() entered; argv={argv!r}")
     # --- 修改：将路径参数设为必须 ---
@@ -882,17 +1920,151 @@ def main(argv=None):
         required=True, # 将此参数设置为必须
         help='(必须) 指定包含一个或多个项目子文件夹的【根目录】路径。'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='并行处理项目的进程数 (默认 1，即逐个处理)。'
+    )
+    parser.add_argument(
+        '--memory-budget-mb',
+        type=int,
+        default=None,
+        help='内存预算 (MB)，默认取当前可用内存的 75%%。单个项目的预估峰值超出预算时自动改用流式模式；\n'
+             '并行模式下同时运行项目的估算内存之和也不超过此值。'
+    )
+    parser.add_argument(
+        '--no-memory-governor',
+        action='store_true',
+        help='超出内存预算时不自动切换到流式模式，始终使用指定的模式 (仍会打印估算并记录实测内存)。'
+    )
+    parser.add_argument(
+        '--no-resume',
+        action='store_true',
+        help='忽略项目清单，所有项目与阶段都从头处理 (仍会写入新的清单)。'
+    )
+    parser.add_argument(
+        '--encode-workers',
+        type=int,
+        default=ENCODE_WORKERS,
+        help=f'片段与重打包 PNG 的编码线程数 (默认 {ENCODE_WORKERS})。'
+    )
+    parser.add_argument(
+        '--encode-queue-depth',
+        type=int,
+        default=ENCODE_QUEUE_DEPTH,
+        help=f'同时排队等待编码的片段上限 (默认 {ENCODE_QUEUE_DEPTH})，编码阶段的额外内存约为 队列深度 × 片段大小。'
+    )
+    parser.add_argument(
+        '--output',
+        choices=OUTPUT_FORMATS,
+        default=OUTPUT_FORMAT,
+        help=f'输出格式 (默认 {OUTPUT_FORMAT})：pdf；cbz 为不压缩的图片包 + ComicInfo.xml，\n'
+             '已编码的片段原样存入、不受 PDF 页面尺寸上限影响；both 同时输出两者，每页只编码一次。'
+    )
+    parser.add_argument(
+        '--max-repacked-mb',
+        type=float,
+        default=MAX_REPACKED_FILESIZE_MB,
+        help=f'重打包页面的估算大小上限 (MB，默认 {MAX_REPACKED_FILESIZE_MB})。'
+    )
+    parser.add_argument(
+        '--max-page-height',
+        type=int,
+        default=MAX_REPACKED_PAGE_HEIGHT_PX,
+        help=f'重打包页面的高度上限 (像素，默认 {MAX_REPACKED_PAGE_HEIGHT_PX})。'
+    )
+    parser.add_argument(
+        '--jpeg-quality',
+        type=int,
+        default=PDF_IMAGE_JPEG_QUALITY,
+        help=f'PDF 中图片的 JPEG 质量 (默认 {PDF_IMAGE_JPEG_QUALITY})。\n'
+             '只修改这三个输出参数时，清单或长图旁的切割方案旁路文件 (.cutplan.json) 中记录的切割行会被直接复用，跳过行分析。'
+    )
+    parser.add_argument(
+        '--resize-quality',
+        choices=list(RESIZE_QUALITY_GAPS),
+        default=RESIZE_QUALITY,
+        help=f'缩放到目标宽度的方式 (默认 {RESIZE_QUALITY})：fast 最快；balanced 先按 JPEG 解码时缩放与整数倍缩小，\n'
+             '再 LANCZOS 到精确宽度，画质与 exact 几乎无差别；exact 直接从原尺寸 LANCZOS。'
+    )
+    parser.add_argument(
+        '--dedup-pages',
+        action='store_true',
+        help='处理前按感知哈希 (dHash + pHash) 找出各章节中重复的源图 (片头、公告、广告页等)，\n'
+             f'只保留第一次出现的那张，其余不参与合并与输出；跳过的图片列在 PDF 输出目录的 {PAGE_DEDUP_REPORT_FILENAME} 中。'
+    )
+    parser.add_argument(
+        '--coarse-factor',
+        type=int,
+        default=COARSE_SCAN_FACTOR,
+        help=f'粗到细扫描的代理图缩小倍数 (默认 {COARSE_SCAN_FACTOR}，设为 1 则逐行全分辨率分析)。\n'
+             '只作用于 V2 (结果与全分辨率一致)；V4 默认逐行全分辨率分析，见 --coarse-v4。'
+    )
+    parser.add_argument(
+        '--coarse-v4',
+        action='store_true',
+        help='V4 也使用代理图粗扫描。V4 的代理判定是启发式的，网点 / 多色背景的色带可能被漏判，\n'
+             '切割点可能与全分辨率结果不同；建议配合 --verify-coarse 检查。'
+    )
+    parser.add_argument(
+        '--scan-workers',
+        type=int,
+        default=SCAN_WORKERS,
+        help=f'单张长图行分析使用的进程数 (默认 {SCAN_WORKERS})；与 --workers 同时使用时注意总进程数。'
+    )
+    parser.add_argument(
+        '--verify-coarse',
+        action='store_true',
+        help='校验模式：同时进行全分辨率扫描，比对切割点是否一致并以全分辨率结果为准。'
+    )
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument(
+        '--streaming',
+        action='store_true',
+        help='流式模式：边合并边分割，不生成完整长图，峰值内存只取决于最高的片段。'
+    )
+    mode_group.add_argument(
+        '--in-memory',
+        action='store_true',
+        help='内存交接模式：合并、分割、重打包在同一块内存画布上完成，只编码最终的 PDF。'
+    )
+    mode_group.add_argument(
+        '--pipelined',
+        action='store_true',
+        help='流水线模式：在内存交接模式的基础上，多个项目的解码、行分析、编码、写出四个阶段重叠进行 '
+             '(每个阶段一个线程)，结束时报告各阶段利用率。与 --workers 同时使用时按 --workers 处理。'
+    )
+    parser.add_argument(
+        '--keep-intermediates',
+        action='store_true',
+        help='调试用：保留长图、分割片段和重打包图片等中间文件 (内存交接模式下会额外写出这些文件)。'
+    )
     print("[DEBUG child] parser constructed; about to parse args")
     args = parser.parse_args(argv)
+    if not 1 <= args.max_page_height <= PDF_MAX_PAGE_PIXELS:
+        parser.error(f"--max-page-height 必须在 1 到 {PDF_MAX_PAGE_PIXELS} 之间 (PDF 页面上限)，当前为 {args.max_page_height}")
+    if not 0 < args.max_repacked_mb < float("inf"):
+        parser.error(f"--max-repacked-mb 必须大于 0，当前为 {args.max_repacked_mb}")
+    if not 1 <= args.jpeg_quality <= 100:
+        parser.error(f"--jpeg-quality 必须在 1 到 100 之间，当前为 {args.jpeg_quality}")
     print(f"[DEBUG child] args parsed; args.path={args.path!r}")
     # --- 修改结束 ---
 
     print("🚀 自动化图片批量处理流程 (V5 - 智能融合版)")
-    print("💡 特色：V2传统分割 + V4极速分割 双重保障，PDF创建失败时自动切换方法！")
+    print("💡 特色：V2传统分割 + V4极速分割 双重保障，V2 方案不满足页面限制时自动切换方法！")
     print("🎨 优化：使用预设韩漫常见背景色，提高分割速度和效率！")
     print("📋 工作流程: 1.合并 -> 2.智能分割+PDF创建 -> 3.清理 -> 4.移动成功项")
-    print("🔄 失败判定：V2方式分割后PDF创建失败时，清理V2分割文件并自动切换到V4方式")
-    print("⚠️  注意：V2分割失败的判定标准为PDF创建失败，而非单纯的分割失败")
+    if args.streaming:
+        print("🌊 流式模式：边合并边分割，不生成完整长图")
+    elif args.in_memory:
+        print("🧠 内存交接模式：各阶段直接交换内存画布，只编码最终 PDF")
+    elif args.pipelined:
+        print("🏭 流水线模式：解码 → 行分析 → 编码 → 写出 四个阶段在多个项目之间重叠进行")
+    if args.output != "pdf":
+        print(f"📦 输出格式：{args.output.upper()} (CBZ 以不压缩方式存入已编码的页面，并附带 ComicInfo.xml)")
+    print("🔄 失败判定：在编码前检查 V2 方案的页面高度 (≤ 65500px) 与大小预算，不合格时改用 V4 方案")
+    print("⚠️  注意：流式模式 (--streaming) 仍以 PDF 创建失败作为 V2 的失败判定")
     print("-" * 80)
     
     # --- 修改：简化路径处理逻辑 ---
@@ -937,69 +2109,119 @@ def main(argv=None):
 
     sorted_subdirectories = natsorted(subdirectories)
     print(f"\n将按顺序处理以下 {len(sorted_subdirectories)} 个项目文件夹: {', '.join(sorted_subdirectories)}")
-    failed_subdirs_list = []
-
-    for i, subdir_name in enumerate(sorted_subdirectories):
-        print(f"\n\n{'='*15} 开始处理项目: {subdir_name} ({i+1}/{len(sorted_subdirectories)}) {'='*15}")
-        current_processing_subdir = os.path.join(root_input_dir, subdir_name)
-        path_long_image_output_dir = os.path.join(current_processing_subdir, MERGED_LONG_IMAGE_SUBDIR_NAME)
-        path_split_images_output_dir = os.path.join(current_processing_subdir, SPLIT_IMAGES_SUBDIR_NAME)
-        
-        # 每次都清理旧的中间文件，以防上次失败残留
-        if os.path.isdir(path_long_image_output_dir): 
-            shutil.rmtree(path_long_image_output_dir)
-        if os.path.isdir(path_split_images_output_dir): 
-            shutil.rmtree(path_split_images_output_dir)
-
-        created_long_image_path = merge_to_long_image(
-            current_processing_subdir, path_long_image_output_dir,
-            f"{subdir_name}_{LONG_IMAGE_FILENAME_BASE}.png", PDF_TARGET_PAGE_WIDTH_PIXELS
+    options = {
+        "streaming": args.streaming,
+        "in_memory": args.in_memory,
+        "pipelined": args.pipelined,
+        "keep_intermediates": args.keep_intermediates,
+        "resume": not args.no_resume,
+        "coarse_factor": args.coarse_factor,
+        "verify_coarse": args.verify_coarse,
+        "coarse_v4": args.coarse_v4,
+        "scan_workers": args.scan_workers,
+        "encode_workers": args.encode_workers,
+        "encode_queue_depth": args.encode_queue_depth,
+        "max_repacked_mb": args.max_repacked_mb,
+        "max_page_height": args.max_page_height,
+        "jpeg_quality": args.jpeg_quality,
+        "resize_quality": args.resize_quality,
+        "output": args.output,
+        "skip_pages": [],
+        "memory_budget_bytes": None,
+        "memory_governor": not args.no_memory_governor,
+    }
+    if args.memory_budget_mb is not None:
+        options["memory_budget_bytes"] = args.memory_budget_mb * 1024 * 1024
+    else:
+        available = available_memory_bytes()
+        options["memory_budget_bytes"] = int(available * DEFAULT_MEMORY_BUDGET_FRACTION) if available else None
+    configure_memory_governor(options["memory_governor"])
+    if args.dedup_pages:
+        options["skip_pages"] = plan_page_dedup(
+            root_input_dir, sorted_subdirectories, os.path.join(overall_pdf_output_dir, PAGE_DEDUP_REPORT_FILENAME)
         )
+        # 主进程中的内存估算同样排除重复源图
+        configure_page_dedup(options["skip_pages"])
+    failed_subdirs_list = []
+    results_by_name = {}
 
-        pdf_created_for_this_subdir = False
-        created_pdf_path = None
-        repacked_final_paths = None
-        
-        if created_long_image_path:
-            # ▼▼▼ 调用 V5 融合分割函数（包含 PDF 创建失败自动切换逻辑）▼▼▼
-            repacked_final_paths, created_pdf_path = split_long_image_hybrid_with_pdf_fallback(
-                created_long_image_path, 
-                path_split_images_output_dir,
-                overall_pdf_output_dir,
-                f"{subdir_name}.pdf",
-                subdir_name
-            )
-            
-            if created_pdf_path: 
-                pdf_created_for_this_subdir = True
-                print(f"\n  ✅ 项目 '{subdir_name}' 处理成功！PDF 已创建: {os.path.basename(created_pdf_path)}")
-            else:
-                print(f"\n  ❌ 项目 '{subdir_name}' 处理失败：无法创建 PDF 文件。")
-
-        if pdf_created_for_this_subdir:
-            cleanup_intermediate_dirs(path_long_image_output_dir, path_split_images_output_dir)
-            
-            # --- 新增功能：移动处理成功的文件夹 ---
-            print(f"\n  --- 步骤 5: 移动已成功处理的项目文件夹 ---")
-            source_folder_to_move = current_processing_subdir
-            destination_parent_folder = success_move_target_dir
-            
-            try:
-                print(f"    准备将 '{os.path.basename(source_folder_to_move)}' 移动到 '{os.path.basename(destination_parent_folder)}' 文件夹中...")
-                shutil.move(source_folder_to_move, destination_parent_folder)
-                moved_path = os.path.join(destination_parent_folder, os.path.basename(source_folder_to_move))
-                print(f"    成功移动文件夹至: {moved_path}")
-            except Exception as e:
-                print(f"    错误: 移动文件夹 '{os.path.basename(source_folder_to_move)}' 失败: {e}")
-                if subdir_name not in failed_subdirs_list:
-                    failed_subdirs_list.append(f"{subdir_name} (移动失败)")
-
-        else:
-            print(f"  ❌ 项目文件夹 '{subdir_name}' 未能成功生成PDF，将保留中间文件以供检查。")
+    def finish_project(result):
+        """主进程中的收尾：登记结果，成功的项目移动到 IMG 目录。"""
+        subdir_name = result["name"]
+        results_by_name[subdir_name] = result
+        if not result["success"]:
             failed_subdirs_list.append(subdir_name)
-
+        elif not move_to_success_dir(os.path.join(root_input_dir, subdir_name), success_move_target_dir):
+            failed_subdirs_list.append(f"{subdir_name} (移动失败)")
         print(f"{'='*15} '{subdir_name}' 处理完毕 {'='*15}")
-        print_progress_bar(i + 1, len(sorted_subdirectories), prefix="总进度:", suffix='完成', length=40)
+        print_progress_bar(len(results_by_name), len(sorted_subdirectories), prefix="总进度:", suffix='完成', length=40)
+
+    if args.workers > 1 and len(sorted_subdirectories) > 1:
+        memory_budget_bytes = options["memory_budget_bytes"]
+        print(f"\n⚙️  并行模式: {args.workers} 个工作进程，内存预算: "
+              f"{f'{memory_budget_bytes / 1024 / 1024:.0f}MB' if memory_budget_bytes else '不限'}")
+        # 按此前运行的计时日志学习各阶段吞吐量，预测各项目耗时，最长的项目最先提交 (LPT)
+        history = load_timing_history(os.path.join(overall_pdf_output_dir, MEMORY_CALIBRATION_FILENAME))
+        cost_models = {}
+        memory_estimates, predicted_seconds = [], []
+        for subdir_name in sorted_subdirectories:
+            project_dir = os.path.join(root_input_dir, subdir_name)
+            # 与子进程中的判定相同：超出预算的项目按流式模式估算
+            chosen_mode, stage_estimates, _ = govern_project_mode(
+                project_dir, requested_mode(options), memory_budget_bytes, PDF_TARGET_PAGE_WIDTH_PIXELS
+            )
+            if chosen_mode not in cost_models:
+                cost_models[chosen_mode] = CostModel.from_history(history, chosen_mode)
+                print(f"    耗时模型 ({chosen_mode}) — {cost_models[chosen_mode].describe()}")
+            memory_estimates.append(peak_estimate(stage_estimates))
+            predicted_seconds.append(cost_models[chosen_mode].predict(project_features(collect_project_image_paths(project_dir) or [])))
+            print(f"    - {subdir_name}: 预估峰值内存 {memory_estimates[-1] / 1024 / 1024:.0f}MB ({chosen_mode})，"
+                  f"预计耗时 {predicted_seconds[-1]:.1f} 秒")
+        schedule = lpt_order(predicted_seconds)
+        print(f"    调度顺序 (预计耗时最长的优先): {', '.join(sorted_subdirectories[i] for i in schedule)}")
+
+        def on_result(index, result, error):
+            subdir_name = sorted_subdirectories[index]
+            print(f"\n\n{'='*15} 项目完成: {subdir_name} ({len(results_by_name) + 1}/{len(sorted_subdirectories)}) {'='*15}")
+            if error is not None:
+                print(f"  ❌ 工作进程处理项目 '{subdir_name}' 时异常退出: {error}")
+                result = {"name": subdir_name, "success": False, "pdf_path": None, "elapsed": 0.0, "log": None}
+            if result.get("log"):
+                print(result["log"].rstrip("\n"))
+            finish_project(result)
+
+        run_budgeted_pool(
+            [(root_input_dir, d, overall_pdf_output_dir, options) for d in sorted_subdirectories],
+            process_project_captured, args.workers, memory_budget_bytes, memory_estimates, on_result, order=schedule
+        )
+    elif args.pipelined and len(sorted_subdirectories) > 1:
+        memory_budget_bytes = options["memory_budget_bytes"]
+        print(f"\n🏭 流水线模式: 队列深度 {PIPELINE_QUEUE_DEPTH}，最多 {PIPELINE_CANVAS_SLOTS} 块画布同时驻留，内存预算: "
+              f"{f'{memory_budget_bytes / 1024 / 1024:.0f}MB' if memory_budget_bytes else '不限'}")
+
+        def on_result(index, result):
+            subdir_name = sorted_subdirectories[index]
+            print(f"\n\n{'='*15} 项目完成: {subdir_name} ({len(results_by_name) + 1}/{len(sorted_subdirectories)}) {'='*15}")
+            if result.get("log"):
+                print(result["log"].rstrip("\n"))
+            finish_project(result)
+
+        process_projects_pipelined(root_input_dir, sorted_subdirectories, overall_pdf_output_dir, options, on_result)
+    else:
+        if args.pipelined:
+            print("\n只有一个项目，流水线模式没有可重叠的阶段，按内存交接模式处理。")
+        for i, subdir_name in enumerate(sorted_subdirectories):
+            print(f"\n\n{'='*15} 开始处理项目: {subdir_name} ({i+1}/{len(sorted_subdirectories)}) {'='*15}")
+            finish_project(process_project(root_input_dir, subdir_name, overall_pdf_output_dir, options))
+
+    # 按项目顺序输出耗时，失败列表同样按项目顺序排列
+    failed_subdirs_list.sort(key=lambda d: sorted_subdirectories.index(d.split(" (")[0]))
+    if len(sorted_subdirectories) > 1:
+        print("\n各项目耗时:")
+        for subdir_name in sorted_subdirectories:
+            result = results_by_name.get(subdir_name)
+            status = "✅" if result and result["success"] else "❌"
+            print(f"  {status} {subdir_name}: {result['elapsed'] if result else 0.0:.1f} 秒")
 
     print("\n" + "=" * 80 + "\n【任务总结报告】\n" + "-" * 80)
     success_count = len(sorted_subdirectories) - len(failed_subdirs_list)
@@ -1,6 +1,9 @@
 import os
+import json
+import argparse
 from PIL import Image
 import natsort # 用于自然排序文件名 (e.g., img1, img2, img10)
+from comic_core.dimension_index import get_image_dimensions
 
 # --- 全局配置 ---
 # 支持的图片文件扩展名列表
@@ -9,15 +12,33 @@ IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif', '.tiff', '
 # 输出相关配置 (这些仍然可以硬编码或将来也改为交互式输入)
 OUTPUT_SUBFOLDER_NAME = "merged_output"         # 在选定的输入目录内部创建的用于存放输出结果的子文件夹名称
 MERGED_IMAGE_FILENAME = "stitched_long_image.png" # 合并后的图片文件名
+
+# PNG 压缩方案。长图动辄数亿像素，zlib 最高等级 (max，原来的做法) 要数分钟；
+# fast 的体积通常只大几个百分点，耗时却少一个数量级
+PNG_COMPRESSION_PROFILES = {
+    "fast": {"compress_level": 1},
+    "balanced": {"compress_level": 6},
+    "max": {"compress_level": 9, "optimize": True},
+}
+PNG_COMPRESSION = "fast"
+
+# 分段输出时清单文件的后缀 (与长图同名)
+STRIP_MANIFEST_SUFFIX = ".strips.json"
 # --- 全局配置结束 ---
 
-def merge_images_vertically(image_folder_path, output_image_path):
+def merge_images_vertically(image_folder_path, output_image_path, compression=PNG_COMPRESSION, strip_height=None):
     """
     将指定文件夹中的所有图片按文件名顺序垂直合并成一张大长图。
 
     参数:
         image_folder_path (str): 包含源图片的文件夹路径。
         output_image_path (str): 合并后大长图的完整保存路径。
+        compression (str): PNG 压缩方案，见 PNG_COMPRESSION_PROFILES。
+        strip_height (int): 给出时输出为多段长图 (每段不超过此高度) 与一个 JSON 清单，
+            用于超出看图软件尺寸上限的长图；每次只在内存中拼一段。
+
+    返回:
+        list: 已保存的图片路径。
     """
     # image_folder_path 已经是经过验证的目录路径
     
@@ -28,12 +49,12 @@ def merge_images_vertically(image_folder_path, output_image_path):
         ]
     except Exception as e: # Should not happen if image_folder_path is valid dir, but good for safety
         print(f"读取输入文件夹 '{image_folder_path}' 时发生意外错误: {e}")
-        return
+        return []
 
     if not image_filenames:
         print(f"在文件夹 '{os.path.abspath(image_folder_path)}' 中没有找到支持的图片文件。")
         print(f"支持的格式包括: {', '.join(IMAGE_EXTENSIONS)}")
-        return
+        return []
 
     sorted_image_filenames = natsort.natsorted(image_filenames)
 
@@ -43,43 +64,29 @@ def merge_images_vertically(image_folder_path, output_image_path):
 
     images_info = []
     print("\n正在分析图片尺寸...")
-    for filename in sorted_image_filenames:
-        filepath = os.path.join(image_folder_path, filename)
-        try:
-            with Image.open(filepath) as img:
-                images_info.append({
-                    "path": filepath,
-                    "width": img.width,
-                    "height": img.height
-                })
-        except Exception as e:
-            print(f"警告：无法打开或读取图片 '{filename}' 的尺寸信息，将跳过此图片: {e}")
+    filepaths = [os.path.join(image_folder_path, filename) for filename in sorted_image_filenames]
+    dimensions = get_image_dimensions(filepaths)  # 优先读取目录下的尺寸索引，缺失部分并行读取文件头
+    for filename, filepath in zip(sorted_image_filenames, filepaths):
+        info = dimensions.get(filepath)
+        if info is None:
+            print(f"警告：无法打开或读取图片 '{filename}' 的尺寸信息，将跳过此图片。")
+            continue
+        images_info.append({
+            "path": filepath,
+            "width": info["width"],
+            "height": info["height"]
+        })
 
     valid_images_info = [info for info in images_info if "width" in info]
     if not valid_images_info:
         print("没有有效的图片可供合并。")
-        return
+        return []
 
     total_height = sum(info['height'] for info in valid_images_info)
     max_width = max(info['width'] for info in valid_images_info)
 
     print(f"\n计算出的合并后图片尺寸: 宽度 = {max_width}px, 高度 = {total_height}px")
 
-    merged_image = Image.new('RGBA', (max_width, total_height), (0, 0, 0, 0))
-
-    current_y_offset = 0
-    print("\n正在合并图片...")
-    for item_info in valid_images_info:
-        try:
-            with Image.open(item_info["path"]) as img:
-                img_rgba = img.convert("RGBA")
-                x_offset = (max_width - img_rgba.width) // 2
-                merged_image.paste(img_rgba, (x_offset, current_y_offset))
-                current_y_offset += img_rgba.height
-                print(f"  已粘贴: {os.path.basename(item_info['path'])}")
-        except Exception as e:
-            print(f"警告：粘贴图片 '{os.path.basename(item_info['path'])}' 时发生错误，已跳过: {e}")
-
     output_dir_for_image = os.path.dirname(output_image_path)
     if not os.path.exists(output_dir_for_image):
         try:
@@ -87,17 +94,128 @@ def merge_images_vertically(image_folder_path, output_image_path):
             print(f"\n已创建输出子目录: {os.path.abspath(output_dir_for_image)}")
         except Exception as e:
             print(f"错误：创建输出子目录 '{output_dir_for_image}' 失败: {e}")
-            return
+            return []
 
+    strips = plan_strips(valid_images_info, strip_height)
+    if len(strips) > 1:
+        print(f"\n将输出为 {len(strips)} 段长图 (每段最高 {strip_height}px)，并附带 JSON 清单。")
 
-    try:
-        print(f"\n正在保存合并后的图片 (使用最大无损压缩等级，可能需要一些时间)...")
-        merged_image.save(output_image_path, format='PNG', optimize=True, compress_level=9)
-        print(f"图片成功合并并保存为: {os.path.abspath(output_image_path)}")
-        file_size_mb = os.path.getsize(output_image_path) / (1024 * 1024)
-        print(f"最终文件大小: {file_size_mb:.2f} MB")
-    except Exception as e:
-        print(f"错误：保存合并后的图片失败: {e}")
+    save_options = PNG_COMPRESSION_PROFILES[compression]
+    written = []
+    strip_records = []
+    image_records = []
+    strip_top = 0
+    for index, strip in enumerate(strips, 1):
+        strip_path = output_image_path if len(strips) == 1 else _strip_path(output_image_path, index)
+        print(f"\n正在合并图片{f' (第 {index}/{len(strips)} 段)' if len(strips) > 1 else ''}...")
+        strip_image = _compose_strip(strip, max_width)
+        for item_info, src_top, _, y in strip:
+            if src_top == 0:
+                image_records.append({"file": os.path.basename(item_info["path"]), "strip": index - 1, "top": strip_top + y})
+
+        try:
+            print(f"\n正在保存合并后的图片 ({strip_image.mode}，压缩方案: {compression})...")
+            strip_image.save(strip_path, format='PNG', **save_options)
+            print(f"图片成功合并并保存为: {os.path.abspath(strip_path)}")
+            file_size_mb = os.path.getsize(strip_path) / (1024 * 1024)
+            print(f"最终文件大小: {file_size_mb:.2f} MB")
+        except Exception as e:
+            print(f"错误：保存合并后的图片失败: {e}")
+            return written
+        written.append(strip_path)
+        strip_records.append({
+            "file": os.path.basename(strip_path), "top": strip_top,
+            "height": strip_image.height, "mode": strip_image.mode,
+        })
+        strip_top += strip_image.height
+        del strip_image
+
+    if len(strips) > 1:
+        manifest_path = os.path.splitext(output_image_path)[0] + STRIP_MANIFEST_SUFFIX
+        manifest = {
+            "version": 1,
+            "width": max_width,
+            "height": strip_top,
+            "strip_height": strip_height,
+            "compression": compression,
+            "strips": strip_records,
+            "images": image_records,
+        }
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        print(f"\n分段清单已保存为: {os.path.abspath(manifest_path)}")
+    return written
+
+
+def plan_strips(images_info, strip_height=None):
+    """
+    把图片按顺序分配到若干段长图中，每段不超过 strip_height 行 (None 表示只输出一段)。
+    尽量在图片之间分段；单张图片比 strip_height 还高时才在图片内部切开。
+
+    :return: [[(图片信息, 源图起始行, 源图结束行, 在本段中的 y 坐标)]]
+    """
+    if strip_height is not None and strip_height < 1:
+        raise ValueError(f"strip_height 必须 >= 1，当前为 {strip_height}")
+    if strip_height is None:
+        strip, y = [], 0
+        for info in images_info:
+            strip.append((info, 0, info["height"], y))
+            y += info["height"]
+        return [strip]
+
+    strips, strip, y = [], [], 0
+    for info in images_info:
+        src_top = 0
+        while src_top < info["height"]:
+            if y >= strip_height or (src_top == 0 and strip and y + info["height"] > strip_height):
+                strips.append(strip)
+                strip, y = [], 0
+            src_bottom = min(info["height"], src_top + strip_height - y)
+            strip.append((info, src_top, src_bottom, y))
+            y += src_bottom - src_top
+            src_top = src_bottom
+    if strip:
+        strips.append(strip)
+    return strips
+
+
+def _strip_path(output_image_path, index):
+    base, ext = os.path.splitext(output_image_path)
+    return f"{base}_part_{index:03d}{ext}"
+
+
+def _real_alpha(img):
+    """图片含有实际透明像素时返回其 RGBA 版本，否则返回 None (带 alpha 通道但全不透明的也算不透明)。"""
+    if img.mode not in ('RGBA', 'LA', 'PA', 'RGBa', 'La') and 'transparency' not in img.info:
+        return None
+    img_rgba = img.convert("RGBA")
+    return img_rgba if img_rgba.getextrema()[3][0] < 255 else None
+
+
+def _compose_strip(strip, width):
+    """
+    拼出一段长图。所有源图都不透明且与画布同宽时用 RGB 画布 (比 RGBA 少 1/4 数据)；
+    需要透明的左右留白，或遇到有实际透明像素的源图时才使用 / 升级为 RGBA。
+    """
+    height = sum(src_bottom - src_top for _, src_top, src_bottom, _ in strip)
+    needs_padding = any(item_info["width"] != width for item_info, _, _, _ in strip)
+    canvas = Image.new('RGBA', (width, height), (0, 0, 0, 0)) if needs_padding else Image.new('RGB', (width, height))
+
+    for item_info, src_top, src_bottom, y in strip:
+        try:
+            with Image.open(item_info["path"]) as img:
+                img_rgba = _real_alpha(img)
+                if img_rgba is not None and canvas.mode != 'RGBA':
+                    canvas = canvas.convert('RGBA')
+                source = img_rgba if img_rgba is not None else img.convert(canvas.mode)
+                if (src_top, src_bottom) != (0, source.height):
+                    source = source.crop((0, src_top, source.width, src_bottom))
+                x_offset = (width - source.width) // 2
+                canvas.paste(source, (x_offset, y))
+                print(f"  已粘贴: {os.path.basename(item_info['path'])}")
+        except Exception as e:
+            print(f"警告：粘贴图片 '{os.path.basename(item_info['path'])}' 时发生错误，已跳过: {e}")
+    return canvas
 
 if __name__ == "__main__":
     try:
@@ -113,14 +231,27 @@ if __name__ == "__main__":
         print("请在终端或命令行运行: pip install natsort")
         exit()
 
+    parser = argparse.ArgumentParser(description="把文件夹中的图片按顺序垂直合并为长图 (PNG)")
+    parser.add_argument('-p', '--path', default=None, help='包含待合并图片的文件夹路径 (省略时交互输入)。')
+    parser.add_argument('--compression', choices=list(PNG_COMPRESSION_PROFILES), default=PNG_COMPRESSION,
+                        help=f'PNG 压缩方案 (默认 {PNG_COMPRESSION})：fast 最快，max 体积最小但可能需要数分钟。')
+    parser.add_argument('--strip-height', type=int, default=None,
+                        help='输出为多段长图，每段不超过此高度 (像素)，并生成 JSON 清单；用于超出看图软件尺寸上限的长图。')
+    args = parser.parse_args()
+    if args.strip_height is not None and args.strip_height < 1:
+        parser.error(f"--strip-height 必须 >= 1，当前为 {args.strip_height}")
+
     print("欢迎使用图片合并脚本！")
     print("-" * 30)
 
     # --- 交互式获取输入目录 ---
     default_input_directory_name = "input_images_to_merge" # 默认的文件夹名
-    selected_input_dir = ""
+    selected_input_dir = os.path.abspath(args.path) if args.path else ""
+    if selected_input_dir and not os.path.isdir(selected_input_dir):
+        print(f"错误：路径 '{selected_input_dir}' 不是一个有效的目录或不存在。")
+        exit()
 
-    while True:
+    while not selected_input_dir:
         prompt_message = (
             f"请输入包含待合并图片的文件夹路径。\n"
             f"(例如: 'my_comics' 或 '/path/to/your/images')\n"
@@ -183,7 +314,7 @@ if __name__ == "__main__":
     full_output_image_path = os.path.join(output_subdirectory_full_path, MERGED_IMAGE_FILENAME)
 
     # 调用合并函数
-    merge_images_vertically(selected_input_dir, full_output_image_path)
+    merge_images_vertically(selected_input_dir, full_output_image_path, args.compression, args.strip_height)
 
     print("-" * 30)
     print("脚本处理完成。")
\ No newline at end of file
@@ -1,8 +1,13 @@
 import os
 import re
+import sys
 import pikepdf
 import logging
+import argparse
 import json  # 新增: 用于解析JSON
+from concurrent.futures import ProcessPoolExecutor
+
+from comic_core.pdf_dedup import deduplicate_images
 
 # --- 配置 ---
 # 设置日志记录
@@ -11,6 +16,12 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # 定义合并后PDF存放的子目录名称
 MERGED_PDF_SUBDIR_NAME = "merged_pdf"
 
+# 并行合并的进程数 (每个进程处理一个子文件夹)
+MERGE_WORKERS = max(1, min(os.cpu_count() or 1, 4))
+
+# 是否输出线性化 PDF：阅读器无需读完整个文件即可显示首页，适合很大的合集；保存会稍慢
+LINEARIZE_OUTPUT = False
+
 # 删除了旧的硬编码 DEFAULT_INPUT_DIR
 
 def natural_sort_key(s: str) -> list:
@@ -22,72 +33,128 @@ def natsorted(values):
     return sorted(values, key=natural_sort_key)
 
 
-def merge_pdfs_in_directory(root_dir: str):
-    """
-    合并指定目录结构下的PDF文件。
-    """
-    # 创建 merged_pdf 输出目录
-    output_dir = os.path.join(root_dir, MERGED_PDF_SUBDIR_NAME)
-    os.makedirs(output_dir, exist_ok=True)
-    logging.info(f"输出目录 '{output_dir}' 已准备就绪。")
-
-    subfolders = [d.path for d in os.scandir(root_dir) if d.is_dir() and d.name != MERGED_PDF_SUBDIR_NAME]
+def _collect_pdf_files(subfolder_path: str, log: list) -> list:
+    """递归查找子文件夹中的 PDF 文件，按自然顺序返回。"""
+    pdf_files_to_merge = []
+    for dirpath, _, filenames in os.walk(subfolder_path):
+        for filename in filenames:
+            if filename.lower().endswith('.pdf'):
+                pdf_path = os.path.join(dirpath, filename)
+                pdf_files_to_merge.append(pdf_path)
+                log.append((logging.INFO, f"  [找到文件] {os.path.relpath(pdf_path, subfolder_path)}"))
+    return natsorted(pdf_files_to_merge)
 
-    if not subfolders:
-        logging.warning(f"在根目录 '{root_dir}' 下没有找到需要处理的子文件夹。")
-        return
 
-    print(f"\n--- 发现 {len(subfolders)} 个子文件夹,准备开始合并 ---")
+def merge_subfolder(subfolder_path: str, output_dir: str, linearize: bool = False) -> dict:
+    """
+    把一个子文件夹 (含所有后代目录) 中的 PDF 合并为 output_dir/<子文件夹名>.pdf。可在子进程中运行。
 
-    for subfolder_path in natsorted(subfolders):
-        subfolder_name = os.path.basename(subfolder_path)
-        logging.info(f"===== 开始处理子文件夹: {subfolder_name} =====")
+    相同内容的图片只保留一份，保存时启用对象流压缩；linearize=True 时输出线性化 (快速网页查看) 的 PDF。
+    过程中的输出不直接打印，而是记录在返回值的 "log" 中 [(日志级别或 None 表示 print, 文本)]，
+    由主进程按子文件夹顺序输出，避免并行时互相穿插。
 
-        pdf_files_to_merge = []
-        logging.info(f"正在 '{subfolder_name}' 及其所有子目录中搜索PDF文件...")
-        for dirpath, _, filenames in os.walk(subfolder_path):
-            for filename in filenames:
-                if filename.lower().endswith('.pdf'):
-                    pdf_path = os.path.join(dirpath, filename)
-                    pdf_files_to_merge.append(pdf_path)
-                    logging.info(f"  [找到文件] {os.path.relpath(pdf_path, subfolder_path)}")
+    :return: {"name", "output", "pages", "deduplicated", "log"}；output 为 None 表示未生成文件。
+    """
+    subfolder_name = os.path.basename(subfolder_path)
+    log = [(logging.INFO, f"===== 开始处理子文件夹: {subfolder_name} =====")]
+    result = {"name": subfolder_name, "output": None, "pages": 0, "deduplicated": 0, "log": log}
 
-        pdf_files_to_merge = natsorted(pdf_files_to_merge)
+    log.append((logging.INFO, f"正在 '{subfolder_name}' 及其所有子目录中搜索PDF文件..."))
+    pdf_files_to_merge = _collect_pdf_files(subfolder_path, log)
 
-        if not pdf_files_to_merge:
-            logging.warning(f"在 '{subfolder_name}' 中没有找到任何PDF文件, 跳过。")
-            print(f"  🟡 在 '{subfolder_name}' 中未发现PDF, 跳过。\n")
-            continue
+    if not pdf_files_to_merge:
+        log.append((logging.WARNING, f"在 '{subfolder_name}' 中没有找到任何PDF文件, 跳过。"))
+        log.append((None, f"  🟡 在 '{subfolder_name}' 中未发现PDF, 跳过。\n"))
+        return result
 
-        print(f"  - 在 '{subfolder_name}' 中总共找到 {len(pdf_files_to_merge)} 个PDF文件, 准备合并。")
+    log.append((None, f"  - 在 '{subfolder_name}' 中总共找到 {len(pdf_files_to_merge)} 个PDF文件, 准备合并。"))
 
-        output_pdf_path = os.path.join(output_dir, f"{subfolder_name}.pdf")
-        new_pdf = pikepdf.Pdf.new()
+    output_pdf_path = os.path.join(output_dir, f"{subfolder_name}.pdf")
 
-        try:
+    try:
+        with pikepdf.Pdf.new() as new_pdf:
             for i, pdf_path in enumerate(pdf_files_to_merge):
                 try:
                     with pikepdf.open(pdf_path) as src_pdf:
                         new_pdf.pages.extend(src_pdf.pages)
-                        print(f"    ({i+1}/{len(pdf_files_to_merge)}) 已添加: {os.path.basename(pdf_path)}")
+                        log.append((None, f"    ({i+1}/{len(pdf_files_to_merge)}) 已添加: {os.path.basename(pdf_path)}"))
                 except Exception as e:
-                    logging.error(f"    合并文件 '{os.path.basename(pdf_path)}' 时出错: {e}")
+                    log.append((logging.ERROR, f"    合并文件 '{os.path.basename(pdf_path)}' 时出错: {e}"))
 
             if len(new_pdf.pages) > 0:
-                new_pdf.save(output_pdf_path)
-                print(f"  ✅ 成功! 合并后的文件保存在: '{output_pdf_path}'\n")
+                result["deduplicated"] = deduplicate_images(new_pdf)
+                if result["deduplicated"]:
+                    log.append((None, f"    已合并 {result['deduplicated']} 处重复图片引用。"))
+                new_pdf.save(
+                    output_pdf_path,
+                    compress_streams=True,
+                    object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                    linearize=linearize,
+                )
+                result["output"] = output_pdf_path
+                result["pages"] = len(new_pdf.pages)
+                log.append((None, f"  ✅ 成功! 合并后的文件保存在: '{output_pdf_path}'\n"))
             else:
-                logging.warning(f"'{subfolder_name}' 的合并结果为空, 未生成PDF文件。")
-        except Exception as e:
-            logging.error(f"保存合并后的PDF '{output_pdf_path}' 时发生严重错误: {e}")
-        finally:
-             pass
+                log.append((logging.WARNING, f"'{subfolder_name}' 的合并结果为空, 未生成PDF文件。"))
+    except Exception as e:
+        log.append((logging.ERROR, f"保存合并后的PDF '{output_pdf_path}' 时发生严重错误: {e}"))
+    return result
+
+
+def _report(result: dict):
+    for level, message in result["log"]:
+        if level is None:
+            print(message)
+        else:
+            logging.log(level, message)
+
+
+def merge_pdfs_in_directory(root_dir: str, workers: int = MERGE_WORKERS, linearize: bool = LINEARIZE_OUTPUT):
+    """
+    合并指定目录结构下的PDF文件。各子文件夹在 workers 个进程中并行合并，结果按子文件夹顺序输出。
+    """
+    # 创建 merged_pdf 输出目录
+    output_dir = os.path.join(root_dir, MERGED_PDF_SUBDIR_NAME)
+    os.makedirs(output_dir, exist_ok=True)
+    logging.info(f"输出目录 '{output_dir}' 已准备就绪。")
+
+    subfolders = [d.path for d in os.scandir(root_dir) if d.is_dir() and d.name != MERGED_PDF_SUBDIR_NAME]
+
+    if not subfolders:
+        logging.warning(f"在根目录 '{root_dir}' 下没有找到需要处理的子文件夹。")
+        return
+
+    subfolders = natsorted(subfolders)
+    workers = max(1, min(workers, len(subfolders)))
+    print(f"\n--- 发现 {len(subfolders)} 个子文件夹,准备开始合并 (并行进程数: {workers}) ---")
+
+    if workers == 1:
+        for subfolder_path in subfolders:
+            _report(merge_subfolder(subfolder_path, output_dir, linearize))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(merge_subfolder, path, output_dir, linearize) for path in subfolders]
+        for subfolder_path, future in zip(subfolders, futures):
+            try:
+                _report(future.result())
+            except Exception as e:
+                # 工作进程异常退出 (如内存不足) 只影响对应的子文件夹
+                logging.error(f"合并子文件夹 '{os.path.basename(subfolder_path)}' 时工作进程出错: {e}")
 
 # ▼▼▼ 主函数已按新标准修改 ▼▼▼
 def main():
     """
     主执行函数
     """
+    parser = argparse.ArgumentParser(description="按子文件夹合并PDF")
+    parser.add_argument('-p', '--path', default=None, help='目标根文件夹路径 (省略时交互输入)。')
+    parser.add_argument('--workers', type=int, default=MERGE_WORKERS,
+                        help=f'并行合并的进程数 (默认 {MERGE_WORKERS})，1 表示逐个合并。')
+    parser.add_argument('--linearize', action='store_true', default=LINEARIZE_OUTPUT,
+                        help='输出线性化 PDF，大文件在阅读器中可立即打开首页。')
+    args = parser.parse_args()
+
     print("\n--- PDF 合并工具 ---")
     print("本工具将自动查找每个子文件夹(及其所有后代目录)中的PDF文件,")
     print("并将它们合并成一个以该子文件夹命名的PDF文件。")
@@ -112,8 +179,13 @@ def main():
 
     default_root_dir_name = load_default_path_from_settings()
 
+    root_dir = os.path.abspath(args.path) if args.path else ""
+    if root_dir and not os.path.isdir(root_dir):
+        print(f"错误：路径 '{root_dir}' 不是一个有效的目录或不存在。")
+        sys.exit(1)
+
     # --- 标准化的路径处理逻辑 ---
-    while True:
+    while not root_dir:
         prompt_message = (
             f"\n- 请输入目标根文件夹的路径。\n"
             f"  (直接按 Enter 将使用默认路径: '{default_root_dir_name}'): "
@@ -134,7 +206,7 @@ def main():
     # --------------------------
 
     print(f"\n--- 开始处理, 根目录: {root_dir} ---")
-    merge_pdfs_in_directory(root_dir)
+    merge_pdfs_in_directory(root_dir, workers=args.workers, linearize=args.linearize)
     print("\n--- 所有操作完成 ---")
 
 if __name__ == "__main__":
@@ -0,0 +1,20 @@
+"""测试共用的合成条漫：白色背景上随机放置噪声内容块。"""
+
+import numpy as np
+
+BAND_COLORS = [(255, 255, 255), (0, 0, 0)]
+
+
+def make_strip(seed, height=3000, width=64):
+    """白色背景上随机放置噪声内容块，内容块之间的白色间隔高度随机。"""
+    rng = np.random.default_rng(seed)
+    strip = np.full((height, width, 3), 255, dtype=np.uint8)
+    y = int(rng.integers(0, 40))
+    while y < height:
+        block = int(rng.integers(5, 200))
+        strip[y:y + block] = rng.integers(0, 256, size=(min(block, height - y), width, 3), dtype=np.uint8)
+        # 在部分内容块中混入接近白色的行，检验容差边界
+        if rng.random() < 0.3:
+            strip[y:y + block:7] = 255 - rng.integers(0, 8, size=strip[y:y + block:7].shape, dtype=np.uint8)
+        y += block + int(rng.integers(1, 120))
+    return strip
@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# 将漫画处理模块目录与基准测试目录加入搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing', 'benchmarks'))
+
+from synthetic_corpus import generate_corpus, CORPUS_MANIFEST
+from bench_pipeline import TIERS, STAGES, run_benchmark
+
+QUICK = TIERS["quick"]
+
+
+def _read_chapter(chapter_dir, images):
+    return [np.asarray(Image.open(os.path.join(chapter_dir, image["file"])).convert("RGB")) for image in images]
+
+
+class TestSyntheticCorpus(unittest.TestCase):
+    """快速档：CI 规模的合成语料与分阶段基准测试。"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_generation_is_deterministic(self):
+        first = generate_corpus(os.path.join(self.tmp.name, "a"), dict(QUICK["corpus"], seed=7))
+        second = generate_corpus(os.path.join(self.tmp.name, "b"), dict(QUICK["corpus"], seed=7))
+        self.assertEqual(first, second)
+        for image in first["chapters"][0]["images"]:
+            with open(os.path.join(self.tmp.name, "a", "chapter_01", image["file"]), 'rb') as f_a, \
+                    open(os.path.join(self.tmp.name, "b", "chapter_01", image["file"]), 'rb') as f_b:
+                self.assertEqual(f_a.read(), f_b.read())
+
+    def test_bands_match_ground_truth(self):
+        spec = dict(QUICK["corpus"], formats=["png"], gradient_ratio=0.0, noisy_ratio=0.0)
+        corpus = generate_corpus(self.tmp.name, spec, band_colors=[(255, 255, 255), (0, 0, 0)])
+        chapter = corpus["chapters"][0]
+        strip = np.concatenate(_read_chapter(os.path.join(self.tmp.name, "chapter_01"), chapter["images"]))
+        self.assertEqual(strip.shape, (chapter["total_height"], spec["width"], 3))
+        self.assertTrue(chapter["bands"])
+        for band in chapter["bands"]:
+            self.assertTrue((strip[band["start"]:band["end"]] == band["color"]).all())
+        with open(os.path.join(self.tmp.name, CORPUS_MANIFEST), 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f)["chapters"][0]["total_height"], chapter["total_height"])
+
+    def test_quick_benchmark_reports_every_stage(self):
+        generate_corpus(self.tmp.name, QUICK["corpus"])
+        results = run_benchmark(self.tmp.name, repeat=1, target_width=QUICK["target_width"])
+        self.assertEqual(list(results["stages"]), STAGES)
+        for stage in STAGES:
+            self.assertGreater(results["stages"][stage]["best"], 0)
+        outputs = results["outputs"]["chapter_01"]
+        self.assertGreater(outputs["v2_segments"], 1)
+        self.assertTrue(outputs["hybrid_pdf"])
+        self.assertTrue(outputs["repacked_pdf"])
+        json.dumps(results)
+
+
+if __name__ == '__main__':
+    unittest.main()
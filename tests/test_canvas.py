@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.canvas import build_canvas_array, estimate_png_bytes, plan_repack
+
+
+class TestCanvas(unittest.TestCase):
+
+    def test_build_canvas_matches_pil_merge(self):
+        """内存画布与按 merge_to_long_image 规则缩放粘贴的结果一致。"""
+        rng = np.random.default_rng(0)
+        with tempfile.TemporaryDirectory() as tmp:
+            items = []
+            for i, (w, h) in enumerate([(30, 20), (60, 10), (45, 33)]):
+                path = os.path.join(tmp, f"{i}.png")
+                Image.fromarray(rng.integers(0, 256, size=(h, w, 3)).astype(np.uint8)).save(path)
+                items.append({"path": path, "width": 30, "height": int(h * (30 / w))})
+            expected = Image.new('RGB', (30, sum(item["height"] for item in items)), (255, 255, 255))
+            y = 0
+            for item in items:
+                with Image.open(item["path"]) as img:
+                    expected.paste(img.convert("RGB").resize((30, item["height"]), Image.Resampling.LANCZOS), (0, y))
+                y += item["height"]
+            np.testing.assert_array_equal(build_canvas_array(items, 30, 30), np.asarray(expected))
+
+    def test_failed_image_leaves_blank_at_end(self):
+        """与 merge_to_long_image 一致：解码失败的图片不占位置，空白留在画布末尾。"""
+        with tempfile.TemporaryDirectory() as tmp:
+            items = []
+            for i, value in enumerate([10, 20, 30]):
+                path = os.path.join(tmp, f"{i}.png")
+                Image.fromarray(np.full((5, 8, 3), value, dtype=np.uint8)).save(path)
+                items.append({"path": path, "width": 8, "height": 5})
+            with open(items[1]["path"], 'wb') as f:
+                f.write(b"not an image")
+            errors = []
+            canvas = build_canvas_array(items, 8, None, on_image_done=lambda done, total, error: errors.append(error))
+        self.assertIsNotNone(errors[1])
+        self.assertEqual(canvas[:, 0, 0].tolist(), [10] * 5 + [30] * 5 + [255] * 5)
+
+    def test_plan_repack_follows_double_limit(self):
+        """相邻片段按大小和高度上限分桶，每个页面是一个连续行区间。"""
+        segments = [(0, 10), (10, 25), (25, 30), (30, 60), (60, 61)]
+        sizes = {(0, 10): 4, (10, 25): 4, (25, 30): 4, (30, 60): 1, (60, 61): 1}
+        pages = plan_repack(segments, 10, 35, size_of=lambda s, e: sizes[(s, e)])
+        self.assertEqual(pages, [(0, 25), (25, 60), (60, 61)])
+        self.assertEqual(plan_repack([(0, 5)], 1, 1, size_of=lambda s, e: 100), [(0, 5)])
+
+    def test_estimate_png_bytes_scales_with_content(self):
+        flat = np.full((2000, 100, 3), 255, dtype=np.uint8)
+        noisy = np.random.default_rng(1).integers(0, 256, size=(2000, 100, 3)).astype(np.uint8)
+        self.assertLess(estimate_png_bytes(flat), estimate_png_bytes(noisy) // 50)
+        self.assertGreater(estimate_png_bytes(noisy), noisy.nbytes // 2)
+        self.assertEqual(estimate_png_bytes(flat[:0]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
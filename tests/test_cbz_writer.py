@@ -0,0 +1,102 @@
+import unittest
+import sys
+import os
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pikepdf
+from PIL import Image
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.cbz_writer import CbzWriter, COMIC_INFO_FILENAME, JPEG_MAX_DIMENSION, is_cbz_passthrough_candidate
+from comic_core.document_writer import DocumentWriter, encode_page, output_paths, primary_output_path
+from comic_core.dimension_index import get_image_dimensions
+
+
+class TestCbzWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cbz_path = os.path.join(self.tmp.name, "book.cbz")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _image_file(self, name, fmt, mode='RGB', size=(40, 90)):
+        path = os.path.join(self.tmp.name, name)
+        Image.new(mode, size, 120).save(path, fmt)
+        return path
+
+    def test_stored_pages_in_order_with_comic_info(self):
+        webp_path = self._image_file("a.webp", "WEBP")
+        with CbzWriter(self.cbz_path, title="第一话") as writer:
+            writer.add_file(webp_path, 40, 90, "WEBP")
+            data, extension, width, height, _ = encode_page(Image.new('RGBA', (30, 20), (0, 0, 255, 255)), "cbz", 85)
+            writer.add_bytes(data, extension, width, height)
+
+        with zipfile.ZipFile(self.cbz_path) as archive:
+            self.assertEqual(archive.namelist(), ["0001.webp", "0002.jpg", COMIC_INFO_FILENAME])
+            self.assertTrue(all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist()))
+            with open(webp_path, 'rb') as f:
+                self.assertEqual(archive.read("0001.webp"), f.read())
+            info = ET.fromstring(archive.read(COMIC_INFO_FILENAME))
+        self.assertEqual(info.findtext("Title"), "第一话")
+        self.assertEqual(info.findtext("PageCount"), "2")
+        self.assertEqual([page.get("ImageHeight") for page in info.find("Pages")], ["90", "20"])
+
+    def test_passthrough_candidates(self):
+        self.assertTrue(is_cbz_passthrough_candidate({"format": "WEBP", "mode": "RGBA"}))
+        self.assertTrue(is_cbz_passthrough_candidate({"format": "JPEG", "mode": "L"}))
+        self.assertFalse(is_cbz_passthrough_candidate({"format": "JPEG", "mode": "CMYK"}))
+        self.assertFalse(is_cbz_passthrough_candidate({"format": "BMP", "mode": "RGB"}))
+
+    def test_encode_page_falls_back_to_png_for_cbz(self):
+        """只输出 CBZ 时超过 JPEG 尺寸上限的页面改用 PNG；输出 PDF 时不改变 (由调用方检查尺寸)。"""
+        tall = Image.new('L', (1, JPEG_MAX_DIMENSION + 1), 0)
+        data, extension, width, height, mode = encode_page(tall, "cbz", 85)
+        self.assertEqual((extension, width, height, mode), (".png", 1, JPEG_MAX_DIMENSION + 1, "L"))
+        self.assertTrue(data.startswith(b"\x89PNG"))
+        self.assertEqual(encode_page(Image.new('RGBA', (4, 4)), "pdf", 85)[1:], (".jpg", 4, 4, "RGB"))
+
+    def test_document_writer_both_formats(self):
+        pdf_path = os.path.join(self.tmp.name, "book.pdf")
+        jpeg_path = self._image_file("a.jpg", "JPEG")
+        png_path = self._image_file("b.png", "PNG", 'RGBA')
+        dimensions = get_image_dimensions([jpeg_path, png_path], persist=False)
+
+        with DocumentWriter(pdf_path, "both", dpi=300, jpeg_quality=80) as writer:
+            writer.add_file(jpeg_path, dimensions[jpeg_path])
+            writer.add_file(png_path, dimensions[png_path])
+            writer.add_image(Image.new('RGB', (50, 60), (10, 200, 10)))
+        self.assertEqual(writer.primary_path, pdf_path)
+
+        with pikepdf.open(pdf_path) as pdf:
+            self.assertEqual(len(pdf.pages), 3)
+            shared_jpeg = pdf.pages[2].Resources.XObject.Im0.read_raw_bytes()
+        with zipfile.ZipFile(os.path.join(self.tmp.name, "book.cbz")) as archive:
+            self.assertEqual(archive.namelist()[:3], ["0001.jpg", "0002.png", "0003.jpg"])
+            with open(png_path, 'rb') as f:
+                self.assertEqual(archive.read("0002.png"), f.read())
+            # 内存页面只编码一次，PDF 与 CBZ 共用同一份 JPEG 数据
+            self.assertEqual(archive.read("0003.jpg"), shared_jpeg)
+
+    def test_output_paths_and_abort(self):
+        pdf_path = os.path.join(self.tmp.name, "x.pdf")
+        self.assertEqual(list(output_paths(pdf_path, "both")), ["pdf", "cbz"])
+        self.assertEqual(primary_output_path(pdf_path, "cbz"), os.path.join(self.tmp.name, "x.cbz"))
+        with self.assertRaises(ValueError):
+            output_paths(pdf_path, "epub")
+
+        with self.assertRaises(RuntimeError):
+            with DocumentWriter(pdf_path, "both") as writer:
+                writer.add_image(Image.new('RGB', (10, 10)))
+                raise RuntimeError("中途失败")
+        self.assertEqual([name for name in os.listdir(self.tmp.name) if name.startswith("x.")], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.coarse_scan import coarse_solid_mask, coarse_simple_mask_v4, refine_windows, min_proxy_run_length
+from comic_core.row_classifier import classify_solid_rows, classify_simple_rows_v4, find_solid_band_cuts, find_v4_band_cuts
+
+from synthetic_strips import make_strip, BAND_COLORS
+
+
+class TestCoarseScan(unittest.TestCase):
+
+    def test_v2_cuts_match_full_scan(self):
+        """V2 粗到细扫描得到的切割点与全分辨率扫描完全一致。"""
+        for seed in range(6):
+            strip = make_strip(seed)
+            full_cuts = find_solid_band_cuts(classify_solid_rows(strip, BAND_COLORS, 10), 50)
+            for factor in (2, 4, 8, 16):
+                mask, refined = coarse_solid_mask(strip, BAND_COLORS, 10, 50, factor)
+                self.assertLessEqual(refined, len(strip))
+                self.assertEqual(find_solid_band_cuts(mask, 50), full_cuts, f"seed={seed} factor={factor}")
+
+    def test_falls_back_when_band_shorter_than_two_blocks(self):
+        strip = make_strip(1, height=500)
+        self.assertEqual(min_proxy_run_length(14, 8), 0)
+        mask, refined = coarse_solid_mask(strip, BAND_COLORS, 10, 14, 8)
+        self.assertEqual(refined, len(strip))
+        np.testing.assert_array_equal(mask, classify_solid_rows(strip, BAND_COLORS, 10))
+
+    def test_refine_windows_expand_and_merge(self):
+        proxy = np.array([0, 1, 1, 0, 1, 0, 0, 0, 1, 1, 1, 0], dtype=bool)
+        # 长度 < 2 的候选段被忽略；相邻窗口扩展后重叠时合并
+        self.assertEqual(refine_windows(proxy, 4, 46, 2), [(0, 16), (28, 46)])
+        self.assertEqual(refine_windows(proxy, 4, 48, 1), [(0, 24), (28, 48)])
+
+    def test_v4_finds_plain_gaps(self):
+        strip = make_strip(3, width=400)
+        mask, refined = coarse_simple_mask_v4(strip, 32, 5, 0.1, 30, 8)
+        self.assertLess(refined, len(strip))
+        self.assertTrue(len(find_v4_band_cuts(mask, 30)) > 0)
+
+    def test_v4_narrow_proxy_falls_back(self):
+        strip = make_strip(3, width=64)
+        mask, refined = coarse_simple_mask_v4(strip, 32, 5, 0.1, 30, 8)
+        self.assertEqual(refined, len(strip))
+
+    def test_v4_proxy_misses_screentone_gap(self):
+        """四色网点背景在代理图上被平均成多种颜色而漏判，因此 V4 默认 (倍数 1) 逐行全分辨率分析。"""
+        rng = np.random.default_rng(0)
+        strip = rng.integers(0, 256, size=(1200, 800, 3)).astype(np.uint8)
+        tones = np.array([(255, 255, 255), (100, 255, 255), (255, 100, 255), (255, 255, 100)], dtype=np.uint8)
+        strip[400:700] = tones[rng.choice(4, size=(300, 800), p=[0.4, 0.2, 0.2, 0.2])]
+        full_mask = classify_simple_rows_v4(strip, 32, 5, 0.1)
+        self.assertTrue(len(find_v4_band_cuts(full_mask, 30)) > 0)
+        coarse_mask, _ = coarse_simple_mask_v4(strip, 32, 5, 0.1, 30, 8)
+        self.assertNotEqual(find_v4_band_cuts(coarse_mask, 30), find_v4_band_cuts(full_mask, 30))
+        mask, refined = coarse_simple_mask_v4(strip, 32, 5, 0.1, 30, 1)
+        self.assertEqual(refined, len(strip))
+        np.testing.assert_array_equal(mask, full_mask)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core import color_lut
+from comic_core.color_lut import band_color_lut, CACHE_DIR_ENV
+
+PALETTE = [(255, 255, 255), (0, 0, 0), (245, 245, 245), (245, 245, 245), (220, 220, 220)]
+
+
+def _brute_force(pixels, palette, tolerance):
+    d = pixels.astype(np.int64)[:, None, :] - np.array(palette, dtype=np.int64)[None, :, :]
+    return ((d ** 2).sum(axis=2) <= int(tolerance * tolerance)).any(axis=1)
+
+
+class TestColorLut(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {CACHE_DIR_ENV: self.tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        color_lut._cached_lut.cache_clear()
+        self.addCleanup(color_lut._cached_lut.cache_clear)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matches_euclidean_distance_exactly(self):
+        rng = np.random.default_rng(0)
+        random_pixels = rng.integers(0, 256, (20000, 3), dtype=np.uint8)
+        # 容差边界附近的像素：距离 (30, 30, 29) 刚好在 45 以内，(30, 30, 30) 刚好超出
+        edge_pixels = np.array([[225, 225, 226], [225, 225, 225], [190, 190, 191], [0, 45, 0], [0, 46, 0]], dtype=np.uint8)
+        for tolerance in (0, 45, 12.5):
+            lut = band_color_lut(PALETTE, tolerance)
+            for pixels in (random_pixels, edge_pixels):
+                np.testing.assert_array_equal(lut.contains(pixels), _brute_force(pixels, PALETTE, tolerance))
+        self.assertFalse(band_color_lut(PALETTE, -1).contains(np.zeros((1, 3), dtype=np.uint8)).any())
+
+    def test_any_shape_and_shared_cache(self):
+        image = np.zeros((4, 5, 3), dtype=np.uint8)
+        image[1, 2] = (100, 100, 100)
+        mask = band_color_lut(PALETTE, 45).contains(image)
+        self.assertEqual(mask.shape, (4, 5))
+        self.assertEqual(int(mask.sum()), 19)
+
+        # 重复列出的颜色与顺序不影响缓存键
+        self.assertIs(band_color_lut(list(reversed(PALETTE[:3])) + PALETTE[3:], 45), band_color_lut(PALETTE, 45))
+        cached = [name for name in os.listdir(self.tmp.name) if name.startswith("band_lut_")]
+        self.assertEqual(len(cached), 1)
+
+        # 新进程 (清空内存缓存) 直接读取磁盘缓存，不再构建
+        color_lut._cached_lut.cache_clear()
+        with mock.patch.object(color_lut, "build_lut_bits", side_effect=AssertionError("不应重新构建")):
+            np.testing.assert_array_equal(band_color_lut(PALETTE, 45).contains(image), mask)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+import tempfile
+
+from PIL import Image
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.cut_plan_sidecar import cut_plan_path, save_cut_plan, load_cut_plan
+from comic_core.canvas import estimate_png_bytes
+from comic_core.cut_planner import build_plan
+
+from synthetic_strips import make_strip
+
+ANALYSIS = {"target_width": 64, "v2": [[[255, 255, 255]], 0, 50]}
+
+
+class TestCutPlanSidecar(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.strip_path = os.path.join(self.tmp.name, "long.png")
+        self.strip = make_strip(3)
+        Image.fromarray(self.strip).save(self.strip_path)
+        self.height, self.width = self.strip.shape[:2]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_and_invalidation(self):
+        segments = [(0, 1000), (1000, 2200), (2200, self.height)]
+        save_cut_plan(self.strip_path, "V2", segments, self.width, self.height, ANALYSIS)
+        self.assertTrue(os.path.isfile(cut_plan_path(self.strip_path)))
+
+        stored = load_cut_plan(self.strip_path, self.width, self.height, ANALYSIS)
+        self.assertEqual(stored, {"method": "V2", "segments": segments})
+
+        # 分析参数变化时失效
+        changed = dict(ANALYSIS, v2=[[[255, 255, 255]], 5, 50])
+        self.assertIsNone(load_cut_plan(self.strip_path, self.width, self.height, changed))
+
+        # 长图被重新生成时失效
+        Image.fromarray(self.strip[:-10]).save(self.strip_path)
+        self.assertIsNone(load_cut_plan(self.strip_path, self.width, self.height, ANALYSIS))
+
+    def test_missing_or_corrupt_sidecar(self):
+        self.assertIsNone(load_cut_plan(self.strip_path, self.width, self.height, ANALYSIS))
+        with open(cut_plan_path(self.strip_path), 'w', encoding='utf-8') as f:
+            f.write("{not json")
+        self.assertIsNone(load_cut_plan(self.strip_path, self.width, self.height, ANALYSIS))
+
+    def test_output_only_change_replans_pages_from_stored_segments(self):
+        segments = [(start, min(start + 500, self.height)) for start in range(0, self.height, 500)]
+        save_cut_plan(self.strip_path, "V4", segments, self.width, self.height, ANALYSIS)
+        stored = load_cut_plan(self.strip_path, self.width, self.height, ANALYSIS)
+
+        size_of = lambda start, end: estimate_png_bytes(self.strip[start:end])
+        tall = build_plan(stored["method"], stored["segments"], self.width, size_of, 1 << 30, 3000)
+        short = build_plan(stored["method"], stored["segments"], self.width, size_of, 1 << 30, 1000)
+        self.assertEqual(len(tall["pages"]), 1)
+        self.assertEqual(len(short["pages"]), 3)
+        # 页面边界都落在保存的切割行上
+        boundaries = {end for _, end in segments}
+        self.assertTrue(all(end in boundaries for _, end in short["pages"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.cut_planner import build_plan, is_clean, is_feasible, choose_plan, force_slice_plan, PDF_MAX_PAGE_PIXELS
+
+
+def size_by_height(start, end):
+    return end - start
+
+
+class TestCutPlanner(unittest.TestCase):
+
+    def test_build_plan_groups_pages_and_sums_sizes(self):
+        plan = build_plan("V2", [(0, 10), (10, 25), (25, 30), (30, 60)], 100, size_by_height, 20, 1000)
+        self.assertEqual(plan["pages"], [(0, 10), (10, 30), (30, 60)])
+        self.assertEqual(plan["page_bytes"], [10, 20, 30])
+        self.assertEqual(plan["over_budget"], [(30, 60)])
+        self.assertTrue(is_feasible(plan))
+        self.assertFalse(is_clean(plan))
+
+    def test_too_tall_page_is_infeasible(self):
+        """单个片段超过 PDF 页面上限时方案不可行，选择时退到下一个方案。"""
+        height = PDF_MAX_PAGE_PIXELS + 100
+        v2 = build_plan("V2", [(0, height)], 100, lambda s, e: 0, 10, 30000)
+        v4 = build_plan("V4", [(0, height // 2), (height // 2, height)], 100, lambda s, e: 0, 10, 30000)
+        self.assertEqual(v2["too_tall"], [(0, height)])
+        self.assertIs(choose_plan([v2, v4]), v4)
+        self.assertIsNone(choose_plan([v2]))
+        self.assertIsNone(choose_plan([build_plan("V2", [], 100, size_by_height, 10, 10)]))
+
+    def test_choose_prefers_clean_then_order(self):
+        dirty = build_plan("V2", [(0, 50)], 10, size_by_height, 20, 1000)
+        clean = build_plan("V4", [(0, 20), (20, 40), (40, 50)], 10, size_by_height, 20, 1000)
+        self.assertIs(choose_plan([dirty, clean]), clean)
+        self.assertIs(choose_plan([clean, build_plan("V4", [(0, 10), (10, 50)], 10, size_by_height, 100, 1000)]), clean)
+
+    def test_force_slice_only_splits_tall_pages(self):
+        height = PDF_MAX_PAGE_PIXELS + 10
+        plan = build_plan("V2", [(0, 100), (100, 100 + height)], 10, lambda s, e: 0, 10, 30000)
+        forced = force_slice_plan(plan, 10, lambda s, e: 0, 10, 30000)
+        self.assertEqual(forced["pages"][0], (0, 100))
+        self.assertEqual(forced["pages"][1:], [(100, 30100), (30100, 60100), (60100, 100 + height)])
+        self.assertTrue(is_clean(forced))
+
+    def test_force_slice_never_exceeds_pdf_limit(self):
+        """高度上限设得比 PDF 上限还大时按 PDF 上限切开，不留下超高页面。"""
+        plan = build_plan("V2", [(0, 150000)], 10, lambda s, e: 0, 10, 70000)
+        forced = force_slice_plan(plan, 10, lambda s, e: 0, 10, 70000)
+        self.assertEqual(forced["pages"], [(0, 65500), (65500, 131000), (131000, 150000)])
+        self.assertTrue(is_feasible(forced))
+
+    def test_force_slice_rejects_too_wide_canvas(self):
+        plan = build_plan("V2", [(0, 100)], PDF_MAX_PAGE_PIXELS + 1, lambda s, e: 0, 10, 30000)
+        with self.assertRaises(ValueError):
+            force_slice_plan(plan, PDF_MAX_PAGE_PIXELS + 1, lambda s, e: 0, 10, 30000)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+from PIL import Image
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core import dimension_index
+from comic_core.dimension_index import get_image_dimensions, INDEX_FILENAME
+
+
+class TestDimensionIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i, size in enumerate([(10, 20), (30, 5), (7, 7)]):
+            path = os.path.join(self.tmp.name, f"{i}.png")
+            Image.new('RGB', size).save(path)
+            self.paths.append(path)
+        self.broken = os.path.join(self.tmp.name, "broken.jpg")
+        with open(self.broken, 'wb') as f:
+            f.write(b"not an image")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reads_headers_and_reuses_index(self):
+        """首次读取后写入索引，文件未变化时第二次不再打开图片。"""
+        result = get_image_dimensions(self.paths + [self.broken])
+        self.assertEqual([(result[p]["width"], result[p]["height"]) for p in self.paths], [(10, 20), (30, 5), (7, 7)])
+        self.assertEqual(result[self.paths[0]]["format"], "PNG")
+        self.assertIsNone(result[self.broken])
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp.name, INDEX_FILENAME)))
+
+        with patch.object(dimension_index, 'read_image_header', side_effect=AssertionError("不应重新读取")):
+            self.assertEqual(get_image_dimensions(self.paths + [self.broken]), result)
+
+    def test_changed_file_is_reread(self):
+        get_image_dimensions(self.paths)
+        Image.new('RGB', (40, 41)).save(self.paths[1])
+        os.utime(self.paths[1], ns=(0, 12345))
+        calls = []
+        original = dimension_index.read_image_header
+        with patch.object(dimension_index, 'read_image_header', side_effect=lambda p: calls.append(p) or original(p)):
+            result = get_image_dimensions(self.paths)
+        self.assertEqual(calls, [self.paths[1]])
+        self.assertEqual((result[self.paths[1]]["width"], result[self.paths[1]]["height"]), (40, 41))
+
+    def test_no_sidecar_without_persist(self):
+        get_image_dimensions(self.paths, persist=False)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, INDEX_FILENAME)))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
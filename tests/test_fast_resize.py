@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.fast_resize import draft_for_size, open_rgb_at_width, scaled_height
+
+
+def _smooth_image(width, height):
+    """平滑的渐变图案，缩放误差只来自重采样方式本身。"""
+    x = np.linspace(0, 4 * np.pi, width)
+    y = np.linspace(0, 6 * np.pi, height)[:, None]
+    r = (127 + 120 * np.sin(x + y)).astype(np.uint8)
+    g = (127 + 120 * np.cos(x - y / 2)).astype(np.uint8)
+    b = np.broadcast_to((x * 20 % 256).astype(np.uint8), (height, width))
+    return np.dstack([r, g, b])
+
+
+def _psnr(a, b):
+    mse = np.mean((a.astype(np.float32) - b.astype(np.float32)) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+class TestFastResize(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.jpeg_path = os.path.join(self.tmp.name, "src.jpg")
+        Image.fromarray(_smooth_image(1280, 960)).save(self.jpeg_path, "JPEG", quality=95)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_exact_matches_plain_lanczos(self):
+        with Image.open(self.jpeg_path) as img:
+            expected = img.convert("RGB").resize((300, scaled_height(1280, 960, 300)), Image.Resampling.LANCZOS)
+        result = open_rgb_at_width(self.jpeg_path, 300, quality="exact")
+        np.testing.assert_array_equal(np.asarray(result), np.asarray(expected))
+
+    def test_draft_decodes_jpeg_at_reduced_scale(self):
+        with Image.open(self.jpeg_path) as img:
+            draft_for_size(img, (300, 225), "balanced")
+            self.assertEqual(img.size, (640, 480))  # 1/2 解码，仍不小于 2 倍目标尺寸
+        with Image.open(self.jpeg_path) as img:
+            draft_for_size(img, (300, 225), "exact")
+            self.assertEqual(img.size, (1280, 960))
+
+    def test_fast_paths_keep_exact_size_and_quality(self):
+        reference = np.asarray(open_rgb_at_width(self.jpeg_path, 300, quality="exact"))
+        for quality, min_psnr in (("balanced", 35), ("fast", 28)):
+            result = open_rgb_at_width(self.jpeg_path, 300, quality=quality)
+            self.assertEqual(result.size, (300, 225))
+            self.assertGreater(_psnr(reference, np.asarray(result)), min_psnr, quality)
+
+        png_path = os.path.join(self.tmp.name, "src.png")
+        Image.open(self.jpeg_path).save(png_path)
+        self.assertEqual(open_rgb_at_width(png_path, 300, 200, quality="balanced").size, (300, 200))
+        self.assertEqual(open_rgb_at_width(png_path, 1280).size, (1280, 960))
+
+    def test_unknown_quality_rejected(self):
+        with self.assertRaises(ValueError):
+            open_rgb_at_width(self.jpeg_path, 300, quality="ultra")
+
+
+if __name__ == '__main__':
+    unittest.main()
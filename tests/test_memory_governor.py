@@ -0,0 +1,74 @@
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.memory_governor import (
+    StageMemoryRecorder, estimate_stage_bytes, peak_estimate, choose_mode, current_rss_bytes, MODES
+)
+
+MB = 1024 * 1024
+
+
+def _chapter(count, width=800, height=1600):
+    return [{"width": width, "height": height} for _ in range(count)]
+
+
+class TestMemoryGovernor(unittest.TestCase):
+
+    def test_canvas_stages_scale_with_total_height(self):
+        dimensions = _chapter(10) + [None]  # 无法读取的图片被跳过
+        classic = estimate_stage_bytes(dimensions, "classic", target_width=1500)
+        canvas = 1500 * 3000 * 10 * 3
+        self.assertEqual(set(classic), {"merge", "load", "analysis", "output"})
+        self.assertEqual(classic["load"], canvas * 3)
+        self.assertGreater(classic["merge"], canvas)
+        self.assertNotIn("load", estimate_stage_bytes(dimensions, "in_memory", target_width=1500))
+
+        # 流式模式只取决于最高的单张源图与页面上限，与章节长度无关
+        short = estimate_stage_bytes(_chapter(20), "streaming", target_width=1500)
+        long = estimate_stage_bytes(_chapter(200), "streaming", target_width=1500)
+        self.assertEqual(short, long)
+        self.assertLess(peak_estimate(long), peak_estimate(estimate_stage_bytes(_chapter(200), "classic", 1500)))
+
+    def test_choose_mode_falls_back_to_streaming(self):
+        estimates = {mode: estimate_stage_bytes(_chapter(200), mode, 1500) for mode in MODES}
+        self.assertEqual(choose_mode("classic", estimates, None), ("classic", None))
+        self.assertEqual(choose_mode("in_memory", estimates, 100 * 1024 * MB), ("in_memory", None))
+
+        mode, note = choose_mode("in_memory", estimates, peak_estimate(estimates["streaming"]) + 1)
+        self.assertEqual(mode, "streaming")
+        self.assertIn("改用流式模式", note)
+
+        # 很短的项目流式模式并不更省内存，保留原模式并给出警告
+        short = {mode: estimate_stage_bytes(_chapter(1, height=20000), mode, 1500) for mode in MODES}
+        mode, note = choose_mode("classic", short, 1 * MB)
+        self.assertEqual(mode, "classic")
+        self.assertIn("可能内存不足", note)
+
+    @unittest.skipIf(current_rss_bytes() is None, "当前平台无法读取进程 RSS")
+    def test_recorder_measures_stage_peaks(self):
+        recorder = StageMemoryRecorder(sample_seconds=0.001)
+        with recorder.stage("merge"):
+            block = np.ones(64 * MB, dtype=np.uint8)  # 逐页写入，确保计入 RSS
+            del block
+        with recorder.stage("output"):
+            pass
+        with recorder.stage("output"):
+            pass
+
+        record = recorder.calibration_record({"merge": 64 * MB, "analysis": 1})
+        self.assertEqual(list(record["stages"]), ["merge", "analysis", "output"])
+        self.assertGreaterEqual(record["stages"]["merge"]["measured"], 48 * MB)
+        self.assertIsNone(record["stages"]["analysis"]["measured"])  # 未运行的阶段
+        self.assertIsNone(record["stages"]["output"]["estimate"])
+        self.assertEqual(record["baseline_rss"], recorder.baseline_rss)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# 将漫画处理模块目录加入搜索路径，以便导入 merge_long_image
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from merge_long_image import merge_images_vertically, plan_strips, STRIP_MANIFEST_SUFFIX
+
+
+class TestMergeLongImage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "src")
+        os.makedirs(self.src)
+        self.output = os.path.join(self.tmp.name, "out", "long.png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _add(self, name, size, color, mode='RGB'):
+        Image.new(mode, size, color).save(os.path.join(self.src, name))
+
+    def test_opaque_sources_give_rgb_output(self):
+        self._add("1.png", (60, 40), (255, 0, 0, 255), 'RGBA')  # 带 alpha 通道但全不透明
+        self._add("2.jpg", (60, 30), (0, 0, 255))
+        self.assertEqual(merge_images_vertically(self.src, self.output), [self.output])
+        with Image.open(self.output) as img:
+            self.assertEqual((img.mode, img.size), ('RGB', (60, 70)))
+            self.assertEqual(img.getpixel((5, 5)), (255, 0, 0))
+
+    def test_transparency_or_padding_gives_rgba_output(self):
+        self._add("1.png", (60, 40), (255, 0, 0))
+        self._add("2.png", (60, 30), (0, 255, 0, 100), 'RGBA')
+        merge_images_vertically(self.src, self.output, compression="max")
+        with Image.open(self.output) as img:
+            self.assertEqual(img.mode, 'RGBA')
+            self.assertEqual(img.getpixel((5, 5)), (255, 0, 0, 255))
+            self.assertEqual(img.getpixel((5, 50)), (0, 255, 0, 100))
+
+        os.remove(os.path.join(self.src, "2.png"))
+        self._add("2.png", (40, 30), (0, 255, 0))
+        merge_images_vertically(self.src, self.output)
+        with Image.open(self.output) as img:
+            self.assertEqual(img.mode, 'RGBA')
+            self.assertEqual(img.getpixel((0, 50))[3], 0)  # 窄图两侧为透明留白
+
+    def test_plan_strips_prefers_image_boundaries(self):
+        infos = [{"height": h} for h in (30, 30, 100, 10)]
+        plan = plan_strips(infos, 50)
+        self.assertEqual([[(src_top, src_bottom, y) for _, src_top, src_bottom, y in strip] for strip in plan],
+                         [[(0, 30, 0)], [(0, 30, 0)], [(0, 50, 0)], [(50, 100, 0)], [(0, 10, 0)]])
+        self.assertEqual(len(plan_strips(infos, None)), 1)
+
+    def test_plan_strips_rejects_non_positive_height(self):
+        infos = [{"height": 100, "width": 5}]
+        for strip_height in (0, -1):
+            with self.assertRaises(ValueError):
+                plan_strips(infos, strip_height)
+
+    def test_strip_set_matches_single_image(self):
+        rng = np.random.default_rng(0)
+        for index, height in enumerate((50, 120, 40), 1):
+            Image.fromarray(rng.integers(0, 255, (height, 30, 3), dtype=np.uint8)).save(os.path.join(self.src, f"{index}.png"))
+        merge_images_vertically(self.src, self.output)
+        with Image.open(self.output) as img:
+            full = np.asarray(img)
+
+        strip_output = os.path.join(self.tmp.name, "strips", "long.png")
+        written = merge_images_vertically(self.src, strip_output, strip_height=100)
+        with open(os.path.splitext(strip_output)[0] + STRIP_MANIFEST_SUFFIX, encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.assertEqual([os.path.basename(p) for p in written], [s["file"] for s in manifest["strips"]])
+        self.assertEqual([s["height"] for s in manifest["strips"]], [50, 100, 60])
+        self.assertEqual([(i["file"], i["strip"], i["top"]) for i in manifest["images"]],
+                         [("1.png", 0, 0), ("2.png", 1, 50), ("3.png", 2, 170)])
+        strips = [np.asarray(Image.open(path)) for path in written]
+        np.testing.assert_array_equal(np.concatenate(strips), full)
+
+
+if __name__ == '__main__':
+    unittest.main()
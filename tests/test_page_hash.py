@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core import page_hash
+from comic_core.page_hash import HASH_FIELD, find_duplicate_pages, get_page_hashes
+from comic_core.dimension_index import INDEX_FILENAME, get_image_dimensions
+
+
+def _panel(seed, size=(300, 450)):
+    """带色块的随机分镜图，不同种子内容差异明显。"""
+    rng = np.random.default_rng(seed)
+    array = np.full((size[1], size[0], 3), 240, dtype=np.uint8)
+    for _ in range(12):
+        x0, y0 = rng.integers(0, size[0] - 40), rng.integers(0, size[1] - 40)
+        array[y0:y0 + rng.integers(20, 200), x0:x0 + rng.integers(20, 200)] = rng.integers(0, 255, 3)
+    return Image.fromarray(array)
+
+
+class TestPageHash(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _save(self, chapter, name, img, **kwargs):
+        folder = os.path.join(self.tmp.name, chapter)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, name)
+        img.save(path, **kwargs)
+        return path
+
+    def test_repeats_across_chapters_are_found_in_order(self):
+        credits = _panel(99)
+        paths = [
+            self._save("ch1", "01.png", _panel(1)),
+            self._save("ch1", "02.jpg", credits, quality=95),
+            self._save("ch1", "03.png", Image.new('RGB', (300, 450), (255, 255, 255))),
+            self._save("ch2", "01.png", _panel(2)),
+            # 重新压缩并略微缩小的同一张片尾图
+            self._save("ch2", "02.jpg", credits.resize((285, 427)), quality=60),
+            self._save("ch2", "03.png", Image.new('RGB', (300, 450), (255, 255, 255))),
+            self._save("ch2", "04.png", credits.resize((300, 200))),  # 宽高比不同，不算重复
+        ]
+        hashes = get_page_hashes(paths)
+        duplicates = find_duplicate_pages(paths, hashes, get_image_dimensions(paths))
+
+        # 纯白留白图不参与去重
+        self.assertEqual([(d["path"], d["duplicate_of"]) for d in duplicates], [(paths[4], paths[1])])
+        self.assertLessEqual(duplicates[0]["phash_distance"], page_hash.DEFAULT_MAX_DISTANCE)
+
+    def test_hashes_cached_in_dimension_index(self):
+        path = self._save("ch1", "01.png", _panel(3))
+        get_image_dimensions([path])
+        first = get_page_hashes([path])[path]
+        with open(os.path.join(self.tmp.name, "ch1", INDEX_FILENAME), encoding='utf-8') as f:
+            entry = json.load(f)["entries"]["01.png"]
+        # 哈希与尺寸信息保存在同一条目中
+        self.assertEqual(entry[HASH_FIELD], first)
+        self.assertEqual(entry["info"]["width"], 300)
+
+        with mock.patch.object(page_hash, "compute_page_hash", side_effect=AssertionError("不应重新计算")):
+            self.assertEqual(page_hash.get_page_hashes([path])[path], first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+import numpy as np
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core import parallel_scan
+from comic_core.parallel_scan import parallel_row_mask, partition_rows
+from comic_core.row_classifier import classify_solid_rows, classify_simple_rows_v4, find_solid_band_cuts
+
+from synthetic_strips import make_strip, BAND_COLORS
+
+
+class TestParallelScan(unittest.TestCase):
+
+    def test_partitions_overlap_and_cover(self):
+        with patch.object(parallel_scan, 'MIN_ROWS_PER_WORKER', 100):
+            self.assertEqual(partition_rows(1000, 4, 30), [(0, 280), (250, 530), (500, 780), (750, 1000)])
+            self.assertEqual(partition_rows(150, 4, 30), [(0, 150)])
+
+    def test_matches_single_process_scan(self):
+        """多进程分区 (含粗到细扫描) 的结果与单进程全分辨率扫描的切割点一致。"""
+        strip = make_strip(4, height=4000, width=200)
+        full_v2 = find_solid_band_cuts(classify_solid_rows(strip, BAND_COLORS, 10), 50)
+        with patch.object(parallel_scan, 'MIN_ROWS_PER_WORKER', 500):
+            for factor in (1, 8):
+                mask, _, partitions = parallel_row_mask(strip, "v2", (BAND_COLORS, 10, 50, factor), 50, 3)
+                self.assertEqual(partitions, 3)
+                self.assertEqual(find_solid_band_cuts(mask, 50), full_v2)
+            mask, _, _ = parallel_row_mask(strip, "v4", (32, 5, 0.1, 30, 1), 30, 3)
+            np.testing.assert_array_equal(mask, classify_simple_rows_v4(strip, 32, 5, 0.1))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+import io
+import tempfile
+
+import pikepdf
+from PIL import Image
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.pdf_dedup import deduplicate_images
+from comic_core.pdf_writer import StreamingPdfWriter
+from merge_pdfs import merge_subfolder, merge_pdfs_in_directory, MERGED_PDF_SUBDIR_NAME
+
+
+def _jpeg(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 60), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def _write_chapter(path, jpegs):
+    with StreamingPdfWriter(path, 72) as writer:
+        for data in jpegs:
+            writer.add_jpeg(data, 40, 60, 'RGB')
+
+
+class TestPdfDedup(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.logo, self.page_a, self.page_b = _jpeg((250, 0, 0)), _jpeg((0, 250, 0)), _jpeg((0, 0, 250))
+        self.volume = os.path.join(self.tmp.name, "volume")
+        os.makedirs(os.path.join(self.volume, "sub"))
+        _write_chapter(os.path.join(self.volume, "ch2.pdf"), [self.logo, self.page_a])
+        _write_chapter(os.path.join(self.volume, "sub", "ch10.pdf"), [self.logo, self.page_b])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _image_bytes(self, pdf):
+        return [page.Resources.XObject.Im0.read_raw_bytes() for page in pdf.pages]
+
+    def test_identical_images_share_one_object(self):
+        with pikepdf.Pdf.new() as pdf:
+            for name in ("ch2.pdf", os.path.join("sub", "ch10.pdf")):
+                with pikepdf.open(os.path.join(self.volume, name)) as src:
+                    pdf.pages.extend(src.pages)
+            self.assertEqual(deduplicate_images(pdf), 1)
+            objgens = [page.Resources.XObject.Im0.objgen for page in pdf.pages]
+            self.assertEqual(objgens[0], objgens[2])
+            self.assertEqual(len(set(objgens)), 3)
+            self.assertEqual(self._image_bytes(pdf), [self.logo, self.page_a, self.logo, self.page_b])
+            self.assertEqual(deduplicate_images(pdf), 0)
+
+    def test_merge_subfolder_writes_deduplicated_linearized_pdf(self):
+        result = merge_subfolder(self.volume, self.tmp.name, linearize=True)
+        self.assertEqual((result["pages"], result["deduplicated"]), (4, 1))
+        with pikepdf.open(result["output"]) as pdf:
+            self.assertTrue(pdf.is_linearized)
+            self.assertEqual(self._image_bytes(pdf), [self.logo, self.page_a, self.logo, self.page_b])
+            images = [obj for obj in pdf.objects if isinstance(obj, pikepdf.Stream) and obj.get("/Subtype") == "/Image"]
+            self.assertEqual(len(images), 3)
+
+    def test_parallel_merge_of_subfolders(self):
+        other = os.path.join(self.tmp.name, "other")
+        os.makedirs(other)
+        _write_chapter(os.path.join(other, "a.pdf"), [self.page_a])
+        with open(os.path.join(other, "broken.pdf"), 'wb') as f:
+            f.write(b"not a pdf")
+
+        merge_pdfs_in_directory(self.tmp.name, workers=2)
+        output_dir = os.path.join(self.tmp.name, MERGED_PDF_SUBDIR_NAME)
+        self.assertEqual(sorted(os.listdir(output_dir)), ["other.pdf", "volume.pdf"])
+        with pikepdf.open(os.path.join(output_dir, "other.pdf")) as pdf:
+            self.assertEqual(len(pdf.pages), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import sys
+import os
+import io
+import tempfile
+
+import numpy as np
+import fitz  # PyMuPDF
+from PIL import Image
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.pdf_rasterizer import (
+    PageRenderPool, find_single_image, plan_page_slices, render_page, slice_filenames,
+)
+
+
+def _make_pdf(path, page_heights):
+    """生成若干页宽 200pt 的 PDF，每页画上横向色带，便于比对分片是否首尾相接。"""
+    with fitz.open() as doc:
+        for height in page_heights:
+            page = doc.new_page(width=200, height=height)
+            for index, top in enumerate(range(0, int(height), 40)):
+                shade = (index * 37 % 255) / 255
+                page.draw_rect(fitz.Rect(0, top, 200, top + 40), color=None, fill=(shade, 0.4, 1 - shade))
+        doc.save(path)
+
+
+class TestPdfRasterizer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pdf_path = os.path.join(self.tmp.name, "book.pdf")
+        _make_pdf(self.pdf_path, [300, 1000])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_slice_plan_and_names(self):
+        self.assertEqual(plan_page_slices(1000, 400), [(0, 400), (400, 800), (800, 1000)])
+        self.assertEqual(plan_page_slices(400, 400), [(0, 400)])
+        self.assertEqual(slice_filenames("b", 7, 1, "png"), ["b_page_007.png"])
+        self.assertEqual(slice_filenames("b", 7, 2, "png"), ["b_page_007_part_01.png", "b_page_007_part_02.png"])
+
+    def test_clip_slices_match_full_page_render(self):
+        height, names, extracted = render_page(self.pdf_path, 1, self.tmp.name, "book", 72, 400, "png")
+        self.assertEqual((height, len(names), extracted), (1000, 3, False))
+
+        slices = [np.asarray(Image.open(os.path.join(self.tmp.name, name)).convert("RGB")) for name in names]
+        self.assertEqual([s.shape[0] for s in slices], [400, 400, 200])
+        with fitz.open(self.pdf_path) as doc:
+            pix = doc[1].get_pixmap(dpi=72)
+        full = np.frombuffer(pix.samples, np.uint8).reshape(pix.height, pix.width, 3)
+        np.testing.assert_array_equal(np.concatenate(slices), full)
+
+    def test_pool_results_in_page_order(self):
+        with PageRenderPool(max_workers=2) as pool:
+            results = [future.result() for future in pool.submit_pdf(self.pdf_path, self.tmp.name, "book", 72, 400, "png")]
+        self.assertEqual(results[0], (300, ["book_page_001.png"], False))
+        self.assertEqual(results[1][1][-1], "book_page_002_part_03.png")
+
+        with PageRenderPool(max_workers=1) as pool:
+            serial = [future.result() for future in pool.submit_pdf(self.pdf_path, self.tmp.name, "book", 72, 400, "png")]
+        self.assertEqual(serial, results)
+
+    def test_single_image_pages_extracted_without_rasterizing(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (120, 900), (200, 30, 30)).save(buffer, 'JPEG', quality=90)
+        jpeg_bytes = buffer.getvalue()
+        pdf_path = os.path.join(self.tmp.name, "comic.pdf")
+        with fitz.open() as doc:
+            for with_text in (False, True):
+                page = doc.new_page(width=120, height=900)
+                page.insert_image(page.rect, stream=jpeg_bytes, keep_proportion=False)
+                if with_text:
+                    page.insert_text((10, 20), "note")
+            doc.save(pdf_path)
+
+        with fitz.open(pdf_path) as doc:
+            self.assertIsNotNone(find_single_image(doc[0]))
+            self.assertIsNone(find_single_image(doc[1]))
+
+        height, names, extracted = render_page(pdf_path, 0, self.tmp.name, "comic", 72, 4000, "png")
+        self.assertEqual((height, names, extracted), (900, ["comic_page_001.jpg"], True))
+        with open(os.path.join(self.tmp.name, names[0]), 'rb') as f:
+            self.assertEqual(f.read(), jpeg_bytes)
+
+        # 超高的内嵌图片按原始分辨率切割
+        _, names, extracted = render_page(pdf_path, 0, self.tmp.name, "comic", 72, 400, "png")
+        self.assertTrue(extracted)
+        self.assertEqual([Image.open(os.path.join(self.tmp.name, n)).size for n in names], [(120, 400), (120, 400), (120, 100)])
+
+        _, names, extracted = render_page(pdf_path, 1, self.tmp.name, "comic", 72, 4000, "png")
+        self.assertEqual((names, extracted), (["comic_page_002.png"], False))
+        _, _, extracted = render_page(pdf_path, 0, self.tmp.name, "comic", 72, 4000, "png", extract_images=False)
+        self.assertFalse(extracted)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+import tempfile
+
+import pikepdf
+from PIL import Image
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.pdf_writer import StreamingPdfWriter, is_jpeg_passthrough_candidate
+from comic_core.document_writer import encode_page
+
+
+def add_image(writer, img):
+    data, _, width, height, mode = encode_page(img, "pdf", 85)
+    writer.add_jpeg(data, width, height, mode)
+
+
+class TestStreamingPdfWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pdf_path = os.path.join(self.tmp.name, "out.pdf")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pages_and_jpeg_passthrough(self):
+        """生成的 PDF 可被 pikepdf 正常解析，直接嵌入的 JPEG 字节保持不变。"""
+        jpeg_path = os.path.join(self.tmp.name, "page.jpg")
+        Image.new('RGB', (120, 300), (200, 30, 30)).save(jpeg_path, quality=90)
+        with open(jpeg_path, 'rb') as f:
+            jpeg_bytes = f.read()
+
+        with StreamingPdfWriter(self.pdf_path, dpi=300) as writer:
+            add_image(writer, Image.new('RGBA', (60, 90), (0, 0, 255, 255)))
+            writer.add_jpeg_file(jpeg_path, 120, 300, 'RGB')
+            add_image(writer, Image.new('L', (30, 40), 128))
+
+        with pikepdf.open(self.pdf_path) as pdf:
+            self.assertEqual(len(pdf.pages), 3)
+            self.assertEqual([float(v) for v in pdf.pages[1].MediaBox], [0, 0, 120 * 72 / 300, 300 * 72 / 300])
+            images = [page.Resources.XObject['/Im0'] for page in pdf.pages]
+            self.assertEqual([str(img.Filter) for img in images], ["/DCTDecode"] * 3)
+            self.assertEqual([str(img.ColorSpace) for img in images], ["/DeviceRGB", "/DeviceRGB", "/DeviceGray"])
+            self.assertEqual(images[1].read_raw_bytes(), jpeg_bytes)
+            decoded = pikepdf.PdfImage(images[0]).as_pil_image()
+            self.assertEqual(decoded.size, (60, 90))
+
+    def test_error_removes_partial_file(self):
+        with self.assertRaises(RuntimeError):
+            with StreamingPdfWriter(self.pdf_path) as writer:
+                add_image(writer, Image.new('RGB', (10, 10)))
+                raise RuntimeError("中途失败")
+        self.assertFalse(os.path.exists(self.pdf_path))
+
+    def test_passthrough_candidates(self):
+        self.assertTrue(is_jpeg_passthrough_candidate({"format": "JPEG", "mode": "RGB"}))
+        self.assertTrue(is_jpeg_passthrough_candidate({"format": "JPEG", "mode": "L"}))
+        self.assertFalse(is_jpeg_passthrough_candidate({"format": "JPEG", "mode": "CMYK"}))
+        self.assertFalse(is_jpeg_passthrough_candidate({"format": "PNG", "mode": "RGB"}))
+        self.assertFalse(is_jpeg_passthrough_candidate(None))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,94 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core import project_manifest
+from comic_core.project_manifest import (
+    fingerprint_inputs, inputs_match, unchanged_prefix_rows, mask_to_runs,
+    reusable_mask_rows, load_manifest, save_manifest, artifact_record, artifact_exists
+)
+from comic_core.coarse_scan import coarse_solid_mask
+from comic_core.row_classifier import classify_simple_rows_v4, find_solid_band_cuts, find_v4_band_cuts, runs_to_mask
+
+from synthetic_strips import make_strip, BAND_COLORS
+
+
+class TestProjectManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.project = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, data):
+        path = os.path.join(self.project, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_fingerprint_reuses_hash_for_unchanged_files(self):
+        items = [{"path": self._write(f"{i}.png", bytes([i]) * 10), "height": 5 + i} for i in range(3)]
+        first = fingerprint_inputs(items, self.project)
+        self.assertEqual([item["path"] for item in first], ["0.png", "1.png", "2.png"])
+
+        with patch.object(project_manifest, 'file_sha1', side_effect=AssertionError("不应重新计算")):
+            self.assertEqual(fingerprint_inputs(items, self.project, first), first)
+
+        items.append({"path": self._write("3.png", b"new"), "height": 7})
+        second = fingerprint_inputs(items, self.project, first)
+        self.assertFalse(inputs_match(first, second))
+        self.assertEqual(unchanged_prefix_rows(first, second), 5 + 6 + 7)
+        self.assertEqual(unchanged_prefix_rows(None, second), 0)
+
+    def test_incremental_mask_matches_full_analysis(self):
+        """追加内容后，复用旧掩码的前部并只重新分析其后的行，切割点与整体重新分析一致。"""
+        for seed in range(5):
+            old = make_strip(seed, height=2000, width=200)
+            appended = np.concatenate([old, make_strip(seed + 100, height=1500, width=200)])
+            # 让追加部分以背景开头，与旧内容末尾的背景连成一段
+            appended[2000:2030] = 255
+
+            old_runs = mask_to_runs(coarse_solid_mask(old, BAND_COLORS, 10, 50, 8)[0])
+            boundary = reusable_mask_rows(old_runs, 2000, 50)
+            mask = np.zeros(len(appended), dtype=bool)
+            mask[:boundary] = runs_to_mask(boundary, old_runs)
+            mask[boundary:] = coarse_solid_mask(appended[boundary:], BAND_COLORS, 10, 50, 8)[0]
+            full = coarse_solid_mask(appended, BAND_COLORS, 10, 50, 8)[0]
+            self.assertEqual(find_solid_band_cuts(mask, 50), find_solid_band_cuts(full, 50), f"seed={seed}")
+
+            old_runs = mask_to_runs(classify_simple_rows_v4(old, 32, 5, 0.1))
+            boundary = reusable_mask_rows(old_runs, 2000, 30)
+            mask = np.zeros(len(appended), dtype=bool)
+            mask[:boundary] = runs_to_mask(boundary, old_runs)
+            mask[boundary:] = classify_simple_rows_v4(appended[boundary:], 32, 5, 0.1)
+            full = classify_simple_rows_v4(appended, 32, 5, 0.1)
+            self.assertEqual(find_v4_band_cuts(mask, 30), find_v4_band_cuts(full, 30), f"seed={seed}")
+
+    def test_reusable_rows_back_off_to_run_start(self):
+        self.assertEqual(reusable_mask_rows([[10, 20], [900, 1000]], 1000, 50), 900)
+        self.assertEqual(reusable_mask_rows([[10, 20], [900, 940]], 1000, 50), 950)
+        self.assertEqual(reusable_mask_rows([], 30, 50), 0)
+
+    def test_manifest_and_artifacts_round_trip(self):
+        artifact = self._write("out.pdf", b"%PDF")
+        save_manifest(self.project, {"status": "done", "artifacts": {"pdf": artifact_record(artifact)}})
+        manifest = load_manifest(self.project)
+        self.assertEqual(manifest["status"], "done")
+        self.assertTrue(artifact_exists(manifest["artifacts"]["pdf"]))
+        self._write("out.pdf", b"%PDF-changed")
+        self.assertFalse(artifact_exists(manifest["artifacts"]["pdf"]))
+        self.assertIsNone(load_manifest(os.path.join(self.project, "missing")))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,53 @@
+import unittest
+import sys
+import os
+import time
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.project_pool import run_budgeted_pool
+
+
+def _timed_task(name, seconds):
+    start = time.time()
+    time.sleep(seconds)
+    if name == "boom":
+        raise RuntimeError("任务失败")
+    return name, start, time.time()
+
+
+class TestBudgetedPool(unittest.TestCase):
+
+    def test_large_tasks_never_overlap(self):
+        """两个超大项目的估算内存之和超过预算时不会同时运行，小项目可以穿插执行。"""
+        tasks = [("big1", 0.3), ("big2", 0.3), ("small1", 0.05), ("small2", 0.05)]
+        completed = []
+        results = run_budgeted_pool(tasks, _timed_task, 3, 100, [60, 60, 10, 10],
+                                    on_result=lambda i, result, error: completed.append(i))
+        self.assertEqual([r[0] for r in results], ["big1", "big2", "small1", "small2"])
+        self.assertEqual(sorted(completed), [0, 1, 2, 3])
+        big1, big2 = results[0], results[1]
+        self.assertTrue(big1[2] <= big2[1] or big2[2] <= big1[1], "两个大任务的运行时间发生了重叠")
+
+    def test_task_error_is_reported(self):
+        errors = {}
+        results = run_budgeted_pool([("ok", 0), ("boom", 0)], _timed_task, 2, None, [0, 0],
+                                    on_result=lambda i, result, error: errors.__setitem__(i, error))
+        self.assertEqual(results[0][0], "ok")
+        self.assertIsNone(results[1])
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], RuntimeError)
+
+    def test_submission_order(self):
+        """给出 order 时按该顺序提交，结果仍按任务顺序返回。"""
+        completed = []
+        results = run_budgeted_pool([("a", 0), ("b", 0), ("c", 0)], _timed_task, 1, None, [0, 0, 0],
+                                    on_result=lambda i, result, error: completed.append(i), order=[2, 0, 1])
+        self.assertEqual(completed, [2, 0, 1])
+        self.assertEqual([r[0] for r in results], ["a", "b", "c"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,84 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+from PIL import Image
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.project_scheduler import (
+    CostModel, project_features, load_timing_history, lpt_order, append_timing_record, OTHER_STAGE
+)
+
+
+def _record(pixels, files, mode="classic", elapsed=None, **stage_seconds):
+    record = {"pixels": pixels, "files": files, "mode": mode,
+              "stages": {name: {"seconds": seconds} for name, seconds in stage_seconds.items()}}
+    if elapsed is not None:
+        record["elapsed"] = elapsed
+    return record
+
+
+class TestProjectScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lpt_order(self):
+        self.assertEqual(lpt_order([1.0, 5.0, 3.0, 5.0]), [1, 3, 2, 0])
+
+    def test_learns_per_stage_throughput(self):
+        # merge: 1e-8 秒/像素 + 0.1 秒/文件；output: 2e-8 秒/像素；另有 1 秒未计入阶段的开销
+        records = [
+            _record(pixels, files, elapsed=pixels * 3e-8 + files * 0.1 + 1.0,
+                    merge=pixels * 1e-8 + files * 0.1, output=pixels * 2e-8)
+            for pixels, files in ((1e8, 10), (4e8, 100), (2e8, 20))
+        ]
+        model = CostModel.from_history(records)
+        self.assertEqual(set(model.stage_rates), {"merge", "output", OTHER_STAGE})
+        self.assertAlmostEqual(model.stage_rates["merge"][0], 1e-8)
+        self.assertAlmostEqual(model.stage_rates["merge"][1], 0.1)
+        self.assertAlmostEqual(model.predict({"pixels": 3e8, "files": 50}), 3e8 * 3e-8 + 5.0 + 1.0, delta=1.0)
+
+        # 只有其他模式的记录时退回使用全部记录；有本模式记录时只用本模式
+        self.assertEqual(CostModel.from_history(records, "streaming").samples, 3)
+        streaming = _record(1e8, 10, mode="streaming", stream=50.0)
+        self.assertEqual(set(CostModel.from_history(records + [streaming], "streaming").stage_rates), {"stream"})
+
+        default = CostModel.from_history([])
+        self.assertEqual(default.samples, 0)
+        self.assertGreater(default.predict({"pixels": 4e8, "files": 10}), default.predict({"pixels": 1e8, "files": 10}))
+
+    def test_history_log_round_trip(self):
+        log_path = os.path.join(self.tmp.name, "pdfs", "timing.jsonl")
+        self.assertEqual(load_timing_history(log_path), [])
+        self.assertIsNone(append_timing_record(log_path, _record(1e6, 2, convert=1.0)))
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write("{损坏的行\n" + json.dumps({"pixels": 0, "stages": {}}) + "\n")
+        self.assertIsNone(append_timing_record(log_path, _record(2e6, 4, convert=2.0)))
+
+        history = load_timing_history(log_path)
+        self.assertEqual([record["pixels"] for record in history], [1e6, 2e6])
+        self.assertEqual([record["pixels"] for record in load_timing_history(log_path, limit=1)], [2e6])
+
+    def test_project_features_from_dimension_index(self):
+        paths = []
+        for index, size in enumerate(((100, 200), (50, 60))):
+            path = os.path.join(self.tmp.name, f"{index}.png")
+            Image.new('RGB', size).save(path)
+            paths.append(path)
+        broken = os.path.join(self.tmp.name, "broken.png")
+        with open(broken, 'wb') as f:
+            f.write(b"not an image")
+        self.assertEqual(project_features(paths + [broken]), {"pixels": 100 * 200 + 50 * 60, "files": 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+import unittest
+import sys
+import os
+import math
+
+import numpy as np
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core import row_classifier
+from comic_core.row_classifier import (
+    classify_solid_rows, find_solid_band_cuts, cuts_to_segments, classify_simple_rows_v4, find_v4_band_cuts,
+    true_runs, runs_to_mask
+)
+
+BAND_COLORS = [(255, 255, 255), (0, 0, 0), (245, 245, 245), (245, 245, 245), (253, 245, 230), (120, 120, 120)]
+
+
+# --- 旧版逐像素实现，作为一致性校验的参照 ---
+def _reference_are_colors_close(color1, color2, tolerance):
+    if tolerance == 0:
+        return color1 == color2
+    r1, g1, b1 = color1
+    r2, g2, b2 = color2
+    distance = math.sqrt((r1 - r2)**2 + (g1 - g2)**2 + (b1 - b2)**2)
+    return distance <= tolerance
+
+
+def _reference_is_solid_color_row(pixels, y, width, solid_colors_list, tolerance):
+    if width == 0:
+        return False
+    first_pixel_rgb = tuple(int(v) for v in pixels[y, 0][:3])
+    base_color_match = None
+    for base_color in solid_colors_list:
+        if _reference_are_colors_close(first_pixel_rgb, base_color, tolerance):
+            base_color_match = first_pixel_rgb
+            break
+    if base_color_match is None:
+        return False
+    for x in range(1, width):
+        if not _reference_are_colors_close(tuple(int(v) for v in pixels[y, x][:3]), base_color_match, tolerance):
+            return False
+    return True
+
+
+def _reference_v2_segments(pixels, min_solid_band_height, band_colors_list, tolerance):
+    img_height, img_width = pixels.shape[:2]
+    segments = []
+    current_segment_start_y = 0
+    solid_band_after_last_content_start_y = -1
+    for y in range(img_height):
+        is_solid = _reference_is_solid_color_row(pixels, y, img_width, band_colors_list, tolerance)
+        if not is_solid:
+            if solid_band_after_last_content_start_y != -1:
+                solid_band_height = y - solid_band_after_last_content_start_y
+                if solid_band_height >= min_solid_band_height:
+                    cut_point_y = solid_band_after_last_content_start_y + (solid_band_height // 2)
+                    if cut_point_y > current_segment_start_y:
+                        segments.append((current_segment_start_y, cut_point_y))
+                    current_segment_start_y = cut_point_y
+            solid_band_after_last_content_start_y = -1
+        else:
+            if solid_band_after_last_content_start_y == -1:
+                solid_band_after_last_content_start_y = y
+    if current_segment_start_y < img_height and img_height - current_segment_start_y > 10:
+        segments.append((current_segment_start_y, img_height))
+    return segments
+
+
+def _reference_dominant_color(pixels_quantized):
+    if pixels_quantized.size == 0:
+        return None, 0
+    unique_colors, counts = np.unique(pixels_quantized.reshape(-1, 3), axis=0, return_counts=True)
+    return tuple(unique_colors[np.argmax(counts)]), len(unique_colors)
+
+
+def _reference_v4_simple_rows(pixels, quantization_factor, max_unique_colors, edge_margin_percent):
+    quantized_array = pixels // quantization_factor
+    img_width = pixels.shape[1]
+    margin_width = int(img_width * edge_margin_percent)
+    simple = []
+    for y in range(pixels.shape[0]):
+        center_color, center_count = _reference_dominant_color(quantized_array[y, margin_width:img_width - margin_width])
+        is_simple = center_count <= max_unique_colors and center_color is not None
+        if is_simple:
+            left_color, left_count = _reference_dominant_color(quantized_array[y, :margin_width])
+            is_simple = left_count <= max_unique_colors and left_color == center_color
+        if is_simple:
+            right_color, right_count = _reference_dominant_color(quantized_array[y, -margin_width:])
+            is_simple = right_count <= max_unique_colors and right_color == center_color
+        simple.append(is_simple)
+    return simple
+
+
+def _synthetic_strip(seed, width=37, tolerance=45):
+    """生成由内容块、纯色带、边界噪点带组成的测试长图。"""
+    rng = np.random.default_rng(seed)
+    blocks = []
+    for _ in range(12):
+        kind = rng.integers(0, 4)
+        height = int(rng.integers(1, 40))
+        if kind == 0:  # 随机内容
+            block = rng.integers(0, 256, size=(height, width, 3))
+        elif kind == 1:  # 干净的纯色带
+            color = np.array(BAND_COLORS[rng.integers(0, len(BAND_COLORS))])
+            block = np.broadcast_to(color, (height, width, 3)).copy()
+        elif kind == 2:  # 带噪点的纯色带，噪声幅度贴近容差边界
+            color = np.array(BAND_COLORS[rng.integers(0, len(BAND_COLORS))])
+            noise = rng.integers(-tolerance // 2, tolerance // 2 + 1, size=(height, width, 3))
+            block = np.clip(color + noise, 0, 255)
+        else:  # 行首为背景色，但行内出现内容
+            color = np.array(BAND_COLORS[rng.integers(0, len(BAND_COLORS))])
+            block = np.broadcast_to(color, (height, width, 3)).copy()
+            block[:, rng.integers(1, width)] = rng.integers(0, 256, size=3)
+        blocks.append(block)
+    return np.concatenate(blocks).astype(np.uint8)
+
+
+class TestRowClassifierParity(unittest.TestCase):
+
+    def test_mask_matches_reference(self):
+        """向量化掩码必须与旧版逐像素判定逐行一致。"""
+        for seed in range(6):
+            for tolerance in (0, 10, 45):
+                pixels = _synthetic_strip(seed, tolerance=max(tolerance, 1))
+                expected = [_reference_is_solid_color_row(pixels, y, pixels.shape[1], BAND_COLORS, tolerance)
+                            for y in range(pixels.shape[0])]
+                mask = classify_solid_rows(pixels, BAND_COLORS, tolerance)
+                self.assertEqual(mask.tolist(), expected, f"seed={seed}, tolerance={tolerance}")
+
+    def test_tolerance_boundary_is_inclusive(self):
+        """距离恰好等于容差时视为接近 (3^2 + 4^2 = 5^2)。"""
+        row = np.array([[[255, 255, 255], [252, 251, 255]]], dtype=np.uint8)
+        self.assertTrue(classify_solid_rows(row, BAND_COLORS, 5)[0])
+        self.assertFalse(classify_solid_rows(row, BAND_COLORS, 4.99)[0])
+
+    def test_cut_points_match_reference(self):
+        """切割点与旧版 V2 的逐行状态机完全一致。"""
+        for seed in range(8):
+            pixels = _synthetic_strip(seed)
+            for min_height in (1, 5, 20):
+                expected = _reference_v2_segments(pixels, min_height, BAND_COLORS, 45)
+                mask = classify_solid_rows(pixels, BAND_COLORS, 45)
+                cuts = find_solid_band_cuts(mask, min_height)
+                self.assertEqual(cuts_to_segments(cuts, pixels.shape[0], min_tail_height=11), expected,
+                                 f"seed={seed}, min_height={min_height}")
+
+    def test_chunked_scan_matches_single_pass(self):
+        """分块扫描的结果不依赖块大小。"""
+        pixels = _synthetic_strip(3)
+        full = classify_solid_rows(pixels, BAND_COLORS, 45)
+        original_chunk = row_classifier.CHUNK_PIXELS
+        try:
+            row_classifier.CHUNK_PIXELS = pixels.shape[1] * 7
+            chunked = classify_solid_rows(pixels, BAND_COLORS, 45)
+        finally:
+            row_classifier.CHUNK_PIXELS = original_chunk
+        self.assertEqual(full.tolist(), chunked.tolist())
+
+
+class TestV4ClassifierParity(unittest.TestCase):
+
+    def _low_color_strip(self, seed, width=50):
+        """生成每行只有少量颜色的长图，使主色调并列等边界情况频繁出现。"""
+        rng = np.random.default_rng(seed)
+        palette = rng.integers(0, 256, size=(8, 3))
+        rows = []
+        for _ in range(150):
+            num_colors = int(rng.integers(1, 8))
+            row = palette[rng.integers(0, num_colors, size=width)]
+            if rng.random() < 0.3:
+                row[:] = palette[0]
+            rows.append(row)
+        return np.array(rows, dtype=np.uint8)
+
+    def test_simple_rows_match_reference(self):
+        """颜色码 + 直方图 / 排序统计与旧版逐行 np.unique 判定一致。"""
+        for seed in range(4):
+            pixels = self._low_color_strip(seed)
+            for quantization_factor in (1, 32, 64):
+                for margin in (0.0, 0.1, 0.3):
+                    expected = _reference_v4_simple_rows(pixels, quantization_factor, 3, margin)
+                    mask = classify_simple_rows_v4(pixels, quantization_factor, 3, margin)
+                    self.assertEqual(mask.tolist(), expected,
+                                     f"seed={seed}, factor={quantization_factor}, margin={margin}")
+
+    def test_histogram_and_sort_paths_agree(self):
+        """强制走排序统计路径时结果不变。"""
+        pixels = self._low_color_strip(7)
+        by_histogram = classify_simple_rows_v4(pixels, 32, 5, 0.1)
+        original_limit = row_classifier.MAX_HISTOGRAM_CODES
+        try:
+            row_classifier.MAX_HISTOGRAM_CODES = 0
+            by_sort = classify_simple_rows_v4(pixels, 32, 5, 0.1)
+        finally:
+            row_classifier.MAX_HISTOGRAM_CODES = original_limit
+        self.assertEqual(by_histogram.tolist(), by_sort.tolist())
+
+    def test_cuts_skip_leading_and_trailing_blocks(self):
+        """首尾的空白区块不参与切割，其余达到高度的区块在中点切割。"""
+        mask = np.array([True] * 40 + [False] * 10 + [True] * 30 + [False] * 5 + [True] * 29 + [False] * 3 + [True] * 40)
+        self.assertEqual(find_v4_band_cuts(mask, 30), [65])
+
+    def test_runs_round_trip(self):
+        """runs_to_mask 是 true_runs 的逆操作；重叠的区间取逻辑或，超出高度的部分被截断。"""
+        mask = np.array([False, True, True, False, True] + [False] * 3 + [True] * 2)
+        self.assertEqual(runs_to_mask(len(mask), zip(*true_runs(mask))).tolist(), mask.tolist())
+        merged = runs_to_mask(20, [(2, 5), (8, 12), (10, 15), (18, 30)])
+        self.assertEqual(np.flatnonzero(merged).tolist(), [2, 3, 4] + list(range(8, 15)) + [18, 19])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
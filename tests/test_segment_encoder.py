@@ -0,0 +1,52 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.segment_encoder import SegmentEncoder
+
+
+class TestSegmentEncoder(unittest.TestCase):
+
+    def test_results_keep_submission_order_and_errors(self):
+        """结果按提交顺序返回，失败的任务单独报告，不影响其他任务。"""
+        def encode(index):
+            time.sleep(0.02 * (5 - index))  # 先提交的任务后完成
+            if index == 2:
+                raise ValueError("编码失败")
+            return index * 10
+
+        with SegmentEncoder(max_workers=4, queue_depth=4) as encoder:
+            for index in range(5):
+                encoder.submit(f"part_{index}.png", encode, index)
+        results = encoder.results()
+        self.assertEqual([path for path, _, _ in results], [f"part_{i}.png" for i in range(5)])
+        self.assertEqual([value for _, value, _ in results], [0, 10, None, 30, 40])
+        self.assertIsInstance(results[2][2], ValueError)
+
+    def test_queue_depth_bounds_in_flight_tasks(self):
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+
+        def encode():
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.01)
+            with lock:
+                state["running"] -= 1
+
+        with SegmentEncoder(max_workers=8, queue_depth=2) as encoder:
+            for index in range(10):
+                encoder.submit(index, encode)
+        self.assertEqual(len(encoder.results()), 10)
+        self.assertLessEqual(state["peak"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,85 @@
+import unittest
+import sys
+import os
+import io
+import time
+import threading
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.stage_pipeline import StagePipeline
+
+
+class TestStagePipeline(unittest.TestCase):
+
+    def test_results_keep_input_order(self):
+        pipeline = StagePipeline([("double", lambda x: x * 2), ("inc", lambda x: x + 1)])
+        results = pipeline.run(range(6))
+        self.assertEqual(results, [(x * 2 + 1, None) for x in range(6)])
+        self.assertEqual(pipeline.stats["double"]["items"], 6)
+
+    def test_stages_overlap(self):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def slow(x):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return x
+
+        pipeline = StagePipeline([("a", slow), ("b", slow), ("c", slow)])
+        pipeline.run(range(4))
+        self.assertGreaterEqual(peak[0], 2)  # 不同阶段同时处理不同的任务
+        self.assertLess(pipeline.wall, 12 * 0.05)
+
+    def test_error_skips_later_stages(self):
+        seen = []
+
+        def fail_on_two(x):
+            if x == 2:
+                raise ValueError("坏任务")
+            return x
+
+        pipeline = StagePipeline([("check", fail_on_two), ("record", lambda x: seen.append(x) or x)])
+        results = pipeline.run(range(4))
+        self.assertEqual(seen, [0, 1, 3])
+        self.assertIsNone(results[2][0])
+        self.assertIsInstance(results[2][1], ValueError)
+        self.assertEqual(pipeline.stats["record"]["items"], 3)
+        # 出错的任务只记录到出错为止的阶段
+        self.assertEqual(set(pipeline.item_seconds[2]), {"check"})
+        self.assertEqual(set(pipeline.item_seconds[3]), {"check", "record"})
+
+    def test_output_routed_to_item_logs(self):
+        logs = [io.StringIO() for _ in range(3)]
+        finished = []
+
+        def say(stage):
+            def fn(x):
+                print(f"{stage}:{x}")
+                return x
+            return fn
+
+        pipeline = StagePipeline([("a", say("a")), ("b", say("b"))])
+        pipeline.run(range(3), log_of=logs.__getitem__, on_result=lambda i, value, error: finished.append(i))
+        self.assertEqual([log.getvalue() for log in logs], [f"a:{i}\nb:{i}\n" for i in range(3)])
+        self.assertEqual(sorted(finished), [0, 1, 2])
+
+    def test_report_names_bottleneck(self):
+        pipeline = StagePipeline([("fast", lambda x: x), ("slow", lambda x: time.sleep(0.02) or x)])
+        pipeline.run(range(3))
+        utilization = pipeline.utilization()
+        self.assertGreater(utilization["slow"], utilization["fast"])
+        lines = pipeline.report()
+        self.assertEqual(len(lines), 4)
+        self.assertIn("瓶颈阶段: slow", lines[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
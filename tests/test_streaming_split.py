@@ -0,0 +1,140 @@
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# 将漫画处理模块目录加入搜索路径，以便导入 comic_core
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(PROJECT_ROOT, '02_comic_processing'))
+
+from comic_core.row_classifier import (
+    classify_solid_rows, find_solid_band_cuts, cuts_to_segments, classify_simple_rows_v4, find_v4_band_cuts
+)
+from comic_core.streaming_split import make_v2_splitter, make_v4_splitter, stream_segments
+
+BAND_COLORS = [(255, 255, 255), (0, 0, 0)]
+
+
+def _synthetic_strip(seed, width=40):
+    """内容块与纯白 / 纯黑色带交替的长图，色带高度跨越切割阈值。"""
+    rng = np.random.default_rng(seed)
+    blocks = []
+    for _ in range(10):
+        blocks.append(rng.integers(0, 256, size=(int(rng.integers(1, 60)), width, 3)))
+        color = BAND_COLORS[rng.integers(0, len(BAND_COLORS))]
+        blocks.append(np.broadcast_to(color, (int(rng.integers(1, 40)), width, 3)))
+    if rng.random() < 0.5:
+        blocks.insert(0, np.full((int(rng.integers(1, 40)), width, 3), 255))
+    return np.concatenate(blocks).astype(np.uint8)
+
+
+def _random_chunks(strip, rng):
+    """把长图切成随机高度的若干块，模拟逐张源图片到达。"""
+    bounds = np.sort(rng.choice(np.arange(1, len(strip)), size=min(8, len(strip) - 1), replace=False))
+    return np.split(strip, bounds)
+
+
+class TestStreamingSplitter(unittest.TestCase):
+
+    def _collect(self, splitter, chunks):
+        segments = []
+        for chunk in chunks:
+            segments += splitter.feed(chunk)
+        return segments + splitter.finish()
+
+    def test_v2_matches_full_strip(self):
+        """任意分块方式下，流式 V2 的片段与整图分割完全一致。"""
+        for seed in range(10):
+            strip = _synthetic_strip(seed)
+            rng = np.random.default_rng(100 + seed)
+            for min_height in (1, 10, 25):
+                mask = classify_solid_rows(strip, BAND_COLORS, 10)
+                expected = cuts_to_segments(find_solid_band_cuts(mask, min_height), len(strip), min_tail_height=11)
+                splitter = make_v2_splitter(BAND_COLORS, 10, min_height)
+                segments = self._collect(splitter, _random_chunks(strip, rng))
+                self.assertEqual([(s, e) for s, e, _ in segments], expected, f"seed={seed}, min={min_height}")
+                for start_y, end_y, rows in segments:
+                    np.testing.assert_array_equal(rows, strip[start_y:end_y])
+
+    def test_v4_matches_full_strip(self):
+        for seed in range(10):
+            strip = _synthetic_strip(seed)
+            rng = np.random.default_rng(200 + seed)
+            mask = classify_simple_rows_v4(strip, 32, 5, 0.1)
+            expected = cuts_to_segments(find_v4_band_cuts(mask, 15), len(strip))
+            splitter = make_v4_splitter(32, 5, 15, 0.1)
+            segments = self._collect(splitter, _random_chunks(strip, rng))
+            self.assertEqual([(s, e) for s, e, _ in segments], expected, f"seed={seed}")
+
+    def test_band_spanning_two_images(self):
+        """跨越两张源图片的色带在两图之间的中点切割，缓冲区随之释放。"""
+        content = np.random.default_rng(0).integers(0, 256, size=(30, 20, 3)).astype(np.uint8)
+        white = np.full((20, 20, 3), 255, dtype=np.uint8)
+        first, second = np.concatenate([content, white]), np.concatenate([white, content])
+        splitter = make_v2_splitter(BAND_COLORS, 0, 30)
+        self.assertEqual(splitter.feed(first), [])
+        emitted = splitter.feed(second)
+        self.assertEqual([(s, e) for s, e, _ in emitted], [(0, 50)])
+        self.assertEqual(splitter.buffer.buffered_rows, 50)
+        self.assertEqual([(s, e) for s, e, _ in splitter.finish()], [(50, 100)])
+        self.assertEqual(splitter.buffer.buffered_rows, 0)
+
+
+class TestStreamSegmentsFromFiles(unittest.TestCase):
+
+    def test_matches_merged_canvas(self):
+        """从源文件流式解码 (含缩放与居中) 的结果与先合并成长图再分割一致。"""
+        strip = _synthetic_strip(4, width=60)
+        bounds = [0, 70, 150, len(strip)]
+        with tempfile.TemporaryDirectory() as tmp:
+            items = []
+            for i, (a, b) in enumerate(zip(bounds, bounds[1:])):
+                path = os.path.join(tmp, f"{i}.png")
+                piece = strip[a:b] if i != 1 else strip[a:b, :50]
+                Image.fromarray(piece).save(path)
+                items.append({"path": path, "width": piece.shape[1], "height": piece.shape[0]})
+
+            canvas = Image.new('RGB', (60, len(strip)), (255, 255, 255))
+            y = 0
+            for item in items:
+                with Image.open(item["path"]) as img:
+                    canvas.paste(img.convert("RGB"), ((60 - img.width) // 2, y))
+                y += item["height"]
+            merged = np.asarray(canvas)
+            expected = cuts_to_segments(find_solid_band_cuts(classify_solid_rows(merged, BAND_COLORS, 0), 5),
+                                        len(merged), min_tail_height=11)
+
+            segments = list(stream_segments(items, 60, None, make_v2_splitter(BAND_COLORS, 0, 5)))
+            self.assertEqual([(s, e) for s, e, _ in segments], expected)
+            for start_y, end_y, rows in segments:
+                np.testing.assert_array_equal(rows, merged[start_y:end_y])
+
+    def test_failed_image_leaves_blank_at_end(self):
+        """与 merge_to_long_image 一致：解码失败的图片不占位置，空白留在长图末尾。"""
+        strip = _synthetic_strip(5, width=60)
+        bounds = [0, 70, 150, len(strip)]
+        with tempfile.TemporaryDirectory() as tmp:
+            items = []
+            for i, (a, b) in enumerate(zip(bounds, bounds[1:])):
+                path = os.path.join(tmp, f"{i}.png")
+                Image.fromarray(strip[a:b]).save(path)
+                items.append({"path": path, "width": 60, "height": b - a})
+            with open(items[1]["path"], 'wb') as f:
+                f.write(b"not an image")
+
+            errors = []
+            segments = list(stream_segments(items, 60, None, make_v4_splitter(4, 3, 5, 10),
+                                            on_image_done=lambda done, total, error: errors.append(error)))
+            streamed = np.concatenate([rows for _, _, rows in segments])
+            self.assertIsNotNone(errors[1])
+            expected = np.full_like(strip, 255)
+            expected[:70] = strip[:70]
+            expected[70:70 + len(strip) - 150] = strip[150:]
+            np.testing.assert_array_equal(streamed, expected[:len(streamed)])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)